@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Long-running local server for the Vercel API handlers
+
+Serves api/stock.py, api/stocks.py and api/ocr.py from one process, so the
+facade, the response cache and the stock metadata stay in memory between
+requests instead of being rebuilt by every cold serverless instance.
+
+Each handler module is imported on its first request (/api/ocr does not load
+Gemini until it is used). The quote handlers are warmed up before the server
+starts accepting requests unless --cold is given.
+
+Files in api/ starting with an underscore are not deployed as functions.
+
+Usage:
+    python -m api._server                # http://127.0.0.1:3001/api/stock?ticker=2330
+    python -m api._server --port 8000 --cold
+"""
+
+import argparse
+import importlib
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Request path -> handler module
+ROUTES = {
+    '/api/stock': 'api.stock',
+    '/api/stocks': 'api.stocks',
+    '/api/ocr': 'api.ocr',
+}
+
+
+def load_handler(path):
+    """Handler class serving a request path (None for unknown paths)"""
+    module = ROUTES.get(urlparse(path).path.rstrip('/'))
+    return importlib.import_module(module).handler if module else None
+
+
+class RouterHandler(BaseHTTPRequestHandler):
+    """Hands each request to the handler class of its route"""
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        try:
+            self.route = load_handler(self.path)
+        except ImportError as e:
+            self.send_error(501, f"Handler unavailable: {e}")
+            return False
+        if self.route is None:
+            self.send_error(404, "Not found")
+            return False
+        return True
+
+    def dispatch(self):
+        """Run the route's do_<METHOD> on a handler instance sharing this request's state"""
+        method = getattr(self.route, 'do_' + self.command, None)
+        if method is None:
+            self.send_error(501, f"Unsupported method ({self.command!r})")
+            return
+        # Created without __init__, which would read and serve a request of its own
+        target = self.route.__new__(self.route)
+        target.__dict__.update(self.__dict__)
+        try:
+            method(target)
+        finally:
+            # e.g. the handler sent 'Connection: close'
+            self.close_connection = target.close_connection
+
+    do_GET = do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = dispatch
+
+
+def make_server(host='127.0.0.1', port=3001, warm=True):
+    """Server for all routes; warm builds the facade and loads stock metadata first"""
+    if warm:
+        from api.stock import warm_up
+        warm_up()
+    return ThreadingHTTPServer((host, port), RouterHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the Vercel API handlers from one long-running process')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3001)
+    parser.add_argument('--cold', action='store_true', help='Skip the warm-up (build everything on the first request)')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, warm=not args.cold)
+    print(f"Serving {', '.join(ROUTES)} on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,19 +3,73 @@ from urllib.parse import urlparse, parse_qs
 import json
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import requests
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Import Stock Data Facade
-from stock_data_facade import StockDataFacade
+from response_cache import get_response_cache
+from indicators import compute_indicators
+from stock_registry import StockRegistry
 
-# Initialize facade (uses STOCK_DATA_PROVIDER env or defaults to 'twse')
-_stock_facade = StockDataFacade()
+# Stock Data Facade (uses STOCK_DATA_PROVIDER env or defaults to 'twse'), built on the
+# first request: the provider stack (requests, urllib3) is not imported on a cold start
+_stock_facade = None
+_stock_facade_lock = threading.Lock()
+
+# Stock names on the request path come from the registry file (refreshed out of band by
+# scripts/update_daily.py) and, for codes it does not know, from the provider's per-stock lookup:
+# rebuilding the registry here would pull the full FinMind stock list inside a request
+_stock_registry = None
+_stock_registry_lock = threading.Lock()
+
+# Computed responses, shared by requests served by this instance
+_response_cache = get_response_cache()
+
+# Max tickers per /api/stocks request
+MAX_BATCH_TICKERS = int(os.getenv('STOCK_BATCH_MAX_TICKERS', 50))
+
+def get_stock_facade():
+    """Get the facade shared by requests served by this instance"""
+    global _stock_facade
+    if _stock_facade is None:
+        with _stock_facade_lock:
+            if _stock_facade is None:
+                from stock_data_facade import StockDataFacade
+                _stock_facade = StockDataFacade()
+    return _stock_facade
+
+def get_request_registry():
+    """Get the read-only stock registry (STOCK_REGISTRY_FILE, never rebuilt) shared by requests"""
+    global _stock_registry
+    if _stock_registry is None:
+        with _stock_registry_lock:
+            if _stock_registry is None:
+                _stock_registry = StockRegistry(os.getenv('STOCK_REGISTRY_FILE'), sources=())
+    return _stock_registry
+
+def warm_up():
+    """Build the facade and load the stock metadata ahead of the first request (long-running servers)"""
+    get_stock_facade()
+    get_request_registry().entries()
 
 # Backward compatible helper functions
+def to_finmind_rows(data):
+    """Convert facade price rows to FinMind format for compatibility"""
+    result = []
+    for item in data:
+        result.append({
+            "date": item["date"],
+            "open": item["open"],
+            "max": item["high"],
+            "min": item["low"],
+            "close": item["close"],
+            "Trading_Volume": item["volume"]
+        })
+    return result
+
 def fetch_finmind_data(dataset, data_id, start_date):
     """
     Legacy function for backward compatibility
@@ -23,90 +77,143 @@ def fetch_finmind_data(dataset, data_id, start_date):
     """
     if dataset == "TaiwanStockPrice":
         end_date = datetime.now().strftime('%Y-%m-%d')
-        data = _stock_facade.get_stock_price(data_id, start_date, end_date)
-        
-        # Convert to FinMind format for compatibility
-        result = []
-        for item in data:
-            result.append({
-                "date": item["date"],
-                "open": item["open"],
-                "max": item["high"],
-                "min": item["low"],
-                "close": item["close"],
-                "Trading_Volume": item["volume"]
-            })
-        return result
+        data = get_stock_facade().get_stock_price(data_id, start_date, end_date)
+        return to_finmind_rows(data)
     elif dataset == "TaiwanStockInfo":
-        info = _stock_facade.get_stock_info(data_id)
+        info = get_stock_facade().get_stock_info(data_id)
         return [info] if info else []
     else:
         return []
 
 def get_stock_name(ticker_code):
-    """Get Chinese name using Stock Data Facade"""
+    """Get Chinese name from the request registry, asking the provider for codes it does not know"""
     try:
-        info = _stock_facade.get_stock_info(ticker_code)
-        return info.get("stock_name", ticker_code)
-    except:
+        info = get_stock_facade().get_stock_info(ticker_code, registry=get_request_registry())
+        return info.get("stock_name") or ticker_code
+    except Exception:
         return ticker_code
 
-# Pure Python Indicators
-def calculate_ma(prices, window):
-    """Calculate Simple Moving Average"""
-    if len(prices) < window:
-        return [None] * len(prices)
+def history_start_date():
+    """Start of the ~200 day history window behind each response"""
+    return (datetime.now() - timedelta(days=200)).strftime('%Y-%m-%d')
+
+def clean_ticker(ticker):
+    """'6488.TWO' / '2330.TW' -> bare code ('.TWO' first, it contains '.TW')"""
+    return ticker.strip().replace('.TWO', '').replace('.TW', '')
+
+def build_stock_payload(ticker_code, raw_data=None, name=None):
+    """
+    Build the /api/stock response (None if not found)
+
+    History (FinMind format rows) and name are fetched unless given.
+    """
+    # 1. Fetch Data
+    if raw_data is None:
+        raw_data = fetch_finmind_data("TaiwanStockPrice", ticker_code, history_start_date())
     
-    mas = [None] * (window - 1)
-    for i in range(window - 1, len(prices)):
-        window_slice = prices[i - window + 1 : i + 1]
-        mas.append(sum(window_slice) / window)
-    return mas
-
-def calculate_kd(highs, lows, closes):
-    """Calculate K, D (9, 3, 3)"""
-    length = len(closes)
-    k_vals = [50.0] * length # Default 50
-    d_vals = [50.0] * length
+    if not raw_data:
+        return None
+
+    # Parse Data
+    dates = []
+    opens = []
+    highs = []
+    lows = []
+    closes = []
+    volumes = []
     
-    # Needs at least 9 days
-    if length < 9:
-        return k_vals, d_vals
-
-    # Initial previous K/D
-    prev_k = 50.0
-    prev_d = 50.0
-
-    for i in range(length):
-        if i < 8:
-            k_vals[i] = prev_k
-            d_vals[i] = prev_d
-            continue
-            
-        # RSV Window: i-8 to i (inclusive 9 days)
-        window_highs = highs[i-8 : i+1]
-        window_lows = lows[i-8 : i+1]
-        
-        max_h = max(window_highs)
-        min_l = min(window_lows)
-        
-        if max_h == min_l:
-            rsv = 50.0
-        else:
-            rsv = ((closes[i] - min_l) / (max_h - min_l)) * 100
-            
-        # K = 2/3 * PrevK + 1/3 * RSV
-        curr_k = (2/3) * prev_k + (1/3) * rsv
-        # D = 2/3 * PrevD + 1/3 * K
-        curr_d = (2/3) * prev_d + (1/3) * curr_k
-        
-        k_vals[i] = curr_k
-        d_vals[i] = curr_d
-        
-        prev_k = curr_k
-        prev_d = curr_d
+    for item in raw_data:
+        dates.append(item["date"])
+        opens.append(float(item["open"]))
+        highs.append(float(item["max"]))
+        lows.append(float(item["min"]))
+        closes.append(float(item["close"]))
+        volumes.append(int(item["Trading_Volume"])) 
+    
+    # 2. Calculate Indicators (shared with the scanner; pure Python when NumPy is not installed)
+    ind = compute_indicators(opens, highs, lows, closes, volumes)
+    ma5, ma10, ma20, ma60 = ind['ma5'], ind['ma10'], ind['ma20'], ind['ma60']
+    k_vals, d_vals = ind['k'], ind['d']
+    
+    # 3. Livermore Logic
+    latest_idx = -1
+    current_price = closes[latest_idx]
+    latest_k = k_vals[latest_idx]
+    latest_d = d_vals[latest_idx]
+    
+    # Consecutive Red (flat bars under 100 lots break the streak, same as the scanner)
+    consecutive_red = ind['consecutive_red']
+    
+    # Stop Loss
+    tech_stop = lows[latest_idx]
+    money_stop = current_price * 0.90
+    stop_loss = max(tech_stop, money_stop)
+    
+    # 4. Prepare OHLC (Last 60)
+    ohlc_data = []
+    lookback = 60
+    start_idx = max(0, len(dates) - lookback)
+    
+    for i in range(start_idx, len(dates)):
+        ohlc_data.append({
+            "date": dates[i],
+            "open": opens[i],
+            "high": highs[i],
+            "low": lows[i],
+            "close": closes[i],
+            "volume": volumes[i],
+            "k": round(k_vals[i], 1),
+            "d": round(d_vals[i], 1),
+            "ma5": round(ma5[i], 2) if ma5[i] else None,
+            "ma10": round(ma10[i], 2) if ma10[i] else None,
+            "ma20": round(ma20[i], 2) if ma20[i] else None,
+            "ma60": round(ma60[i], 2) if ma60[i] else None
+        })
+    
+    # Latest Changes
+    if len(closes) >= 2:
+        prev_close = closes[-2]
+        change_pct = ((current_price - prev_close) / prev_close) * 100
+    else:
+        change_pct = 0.0
         
-    return k_vals, d_vals
+    if name is None:
+        name = get_stock_name(ticker_code)
+    
+    data = {
+        "ticker": ticker_code,
+        "name": name,
+        "currentPrice": round(current_price, 2),
+        "changePct": round(change_pct, 2),
+        "k": round(latest_k, 1),
+        "d": round(latest_d, 1),
+        "ohlc": ohlc_data,
+        "ma5": round(ma5[latest_idx], 2) if ma5[latest_idx] else None,
+        "ma10": round(ma10[latest_idx], 2) if ma10[latest_idx] else None,
+        "ma20": round(ma20[latest_idx], 2) if ma20[latest_idx] else None,
+        "ma60": round(ma60[latest_idx], 2) if ma60[latest_idx] else None,
+        "volume": int(volumes[latest_idx]),
+        "consecutiveRed": consecutive_red,
+        "stopLoss": round(stop_loss, 2)
+    }
+    return data
+
+def build_stock_payloads(ticker_codes):
+    """
+    Build responses for many tickers at once (None for tickers not found)
+
+    Histories are fetched concurrently over the facade's shared connection
+    pool, names on a small thread pool next to them.
+    """
+    with ThreadPoolExecutor(max_workers=min(8, len(ticker_codes) or 1)) as pool:
+        names = pool.map(get_stock_name, ticker_codes)
+        prices = get_stock_facade().get_stock_prices_many(ticker_codes, history_start_date(), datetime.now().strftime('%Y-%m-%d'))
+        names = dict(zip(ticker_codes, names))
+
+    return {
+        code: build_stock_payload(code, to_finmind_rows(prices.get(code) or []), names[code])
+        for code in ticker_codes
+    }
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -120,121 +227,27 @@ class handler(BaseHTTPRequestHandler):
             return
 
         try:
-            # 1. Clean ticker
-            ticker_code = ticker.replace('.TW', '').replace('.TWO', '')
-            
-            # 2. Fetch Data
-            start_date = (datetime.now() - timedelta(days=200)).strftime('%Y-%m-%d')
-            raw_data = fetch_finmind_data("TaiwanStockPrice", ticker_code, start_date)
-            
-            if not raw_data:
+            # Clean ticker
+            ticker_code = clean_ticker(ticker)
+
+            # Served from the per-instance cache until the next session settles
+            entry, hit = _response_cache.get_or_compute(ticker_code, lambda: build_stock_payload(ticker_code))
+
+            if entry is None:
                 self.send_response(404)
                 self.end_headers()
                 self.wfile.write(json.dumps({"error": "Stock not found"}).encode())
                 return
 
-            # Parse Data
-            dates = []
-            opens = []
-            highs = []
-            lows = []
-            closes = []
-            volumes = []
-            
-            for item in raw_data:
-                dates.append(item["date"])
-                opens.append(float(item["open"]))
-                highs.append(float(item["max"]))
-                lows.append(float(item["min"]))
-                closes.append(float(item["close"]))
-                volumes.append(int(item["Trading_Volume"])) 
-            
-            # 3. Calculate Indicators
-            ma5 = calculate_ma(closes, 5)
-            ma10 = calculate_ma(closes, 10)
-            ma20 = calculate_ma(closes, 20)
-            ma60 = calculate_ma(closes, 60)
-            
-            k_vals, d_vals = calculate_kd(highs, lows, closes)
-            
-            # 4. Livermore Logic
-            latest_idx = -1
-            current_price = closes[latest_idx]
-            latest_k = k_vals[latest_idx]
-            latest_d = d_vals[latest_idx]
-            
-            # Consecutive Red (Backwards)
-            consecutive_red = 0
-            for i in range(len(closes)-1, -1, -1):
-                c = closes[i]
-                o = opens[i]
-                v = volumes[i]
-                
-                # Check flat low vol (Shares < 1000)
-                is_flat_low_vol = (c == o) and (v < 1000) 
-                
-                if c >= o and not is_flat_low_vol:
-                    consecutive_red += 1
-                else:
-                    break
-            
-            # Stop Loss
-            tech_stop = lows[latest_idx]
-            money_stop = current_price * 0.90
-            stop_loss = max(tech_stop, money_stop)
-            
-            # 5. Prepare OHLC (Last 60)
-            ohlc_data = []
-            lookback = 60
-            start_idx = max(0, len(dates) - lookback)
-            
-            for i in range(start_idx, len(dates)):
-                ohlc_data.append({
-                    "date": dates[i],
-                    "open": opens[i],
-                    "high": highs[i],
-                    "low": lows[i],
-                    "close": closes[i],
-                    "volume": volumes[i],
-                    "k": round(k_vals[i], 1),
-                    "d": round(d_vals[i], 1),
-                    "ma5": round(ma5[i], 2) if ma5[i] else None,
-                    "ma10": round(ma10[i], 2) if ma10[i] else None,
-                    "ma20": round(ma20[i], 2) if ma20[i] else None,
-                    "ma60": round(ma60[i], 2) if ma60[i] else None
-                })
-            
-            # Latest Changes
-            if len(closes) >= 2:
-                prev_close = closes[-2]
-                change_pct = ((current_price - prev_close) / prev_close) * 100
-            else:
-                change_pct = 0.0
-                
-            name = get_stock_name(ticker_code)
-            
-            data = {
-                "ticker": ticker_code,
-                "name": name,
-                "currentPrice": round(current_price, 2),
-                "changePct": round(change_pct, 2),
-                "k": round(latest_k, 1),
-                "d": round(latest_d, 1),
-                "ohlc": ohlc_data,
-                "ma5": round(ma5[latest_idx], 2) if ma5[latest_idx] else None,
-                "ma10": round(ma10[latest_idx], 2) if ma10[latest_idx] else None,
-                "ma20": round(ma20[latest_idx], 2) if ma20[latest_idx] else None,
-                "ma60": round(ma60[latest_idx], 2) if ma60[latest_idx] else None,
-                "volume": int(volumes[latest_idx]),
-                "consecutiveRed": consecutive_red,
-                "stopLoss": round(stop_loss, 2)
-            }
-
-            self.send_response(200)
+            not_modified = entry.matches(self.headers.get('If-None-Match'))
+            self.send_response(304 if not_modified else 200)
             self.send_header('Content-type', 'application/json')
-            self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
+            for name, value in entry.headers().items():
+                self.send_header(name, value)
+            self.send_header('X-Cache', 'HIT' if hit else 'MISS')
             self.end_headers()
-            self.wfile.write(json.dumps(data).encode())
+            if not not_modified:
+                self.wfile.write(entry.body)
 
         except Exception as e:
             print(f"Error: {e}")
@@ -0,0 +1,62 @@
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import json
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.stock import MAX_BATCH_TICKERS, _response_cache, build_stock_payloads, clean_ticker
+
+
+def parse_tickers(query):
+    """Tickers from `?tickers=2330,2317` (or repeated `ticker=`), cleaned and de-duplicated in order"""
+    raw = []
+    for value in query.get('tickers', []) + query.get('ticker', []):
+        raw.extend(value.split(','))
+
+    tickers = []
+    for ticker in raw:
+        code = clean_ticker(ticker)
+        if code and code not in tickers:
+            tickers.append(code)
+    return tickers
+
+
+class handler(BaseHTTPRequestHandler):
+    """Batch variant of /api/stock: one round trip for a whole portfolio"""
+
+    def _send_error(self, status, message):
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps({"error": message}).encode())
+
+    def do_GET(self):
+        tickers = parse_tickers(parse_qs(urlparse(self.path).query))
+
+        if not tickers:
+            self._send_error(400, "Missing tickers")
+            return
+        if len(tickers) > MAX_BATCH_TICKERS:
+            self._send_error(400, f"Too many tickers (max {MAX_BATCH_TICKERS})")
+            return
+
+        try:
+            # Cached tickers are served as they are; all misses are fetched together
+            entries = _response_cache.get_or_compute_many(tickers, build_stock_payloads)
+            batch = _response_cache.combine(entries)
+
+            not_modified = batch.matches(self.headers.get('If-None-Match'))
+            self.send_response(304 if not_modified else 200)
+            self.send_header('Content-type', 'application/json')
+            for name, value in batch.headers().items():
+                self.send_header(name, value)
+            self.end_headers()
+            if not not_modified:
+                self.wfile.write(batch.body)
+
+        except Exception as e:
+            print(f"Error: {e}")
+            self._send_error(500, str(e))
@@ -8,18 +8,14 @@ from pathlib import Path
 
 # Local imports
 from config import COLORS, DATA_PERIOD
-from src.data_fetcher import get_stock_data, get_current_price, get_stock_info
+from src.data_fetcher import get_stock_info, get_multiple_stocks_data
+from src.dashboard_cache import get_dashboard_cache
 from src.watchlist_manager import (
     load_watchlist, save_watchlist, detect_watchlist_changes,
     add_to_watchlist, remove_from_watchlist,
     get_previous_trading_date, get_sample_stocks
 )
-from src.technical_analysis import (
-    calculate_kd, detect_kd_cross, get_kd_status,
-    get_volume_analysis, detect_breakout
-)
-from src.strategy_advisor import check_risk_status
-from src.charts import create_candlestick_chart
+from src.watchlist_view import get_stock_view, summary_row
 
 
 # Page config
@@ -48,6 +44,12 @@ def init_session_state():
         st.session_state.refresh_trigger = 0
 
 
+@st.cache_resource
+def warm_dashboard_cache() -> int:
+    """Load the nightly scan output into the shared disk cache (once per process)"""
+    return get_dashboard_cache().warm_from_scan_output()
+
+
 def refresh_data():
     """Refresh all data"""
     st.session_state.refresh_trigger += 1
@@ -304,49 +306,23 @@ def render_change_log(changes: dict):
         st.markdown("</div>", unsafe_allow_html=True)
 
 
-def render_stock_analysis_content(symbol: str, is_new: bool = False):
-    """Render individual stock analysis content (inside a tab)"""
-    # Get stock info
-    info = get_stock_info(symbol)
-    name = info.get('name', symbol)
-    
-    # Get price data
-    price_data = get_current_price(symbol)
-    current_price = price_data.get('current', 0)
-    change_pct = price_data.get('change_pct', 0)
-    
-    # Get historical data
-    df = get_stock_data(symbol, DATA_PERIOD)
-    
-    if df.empty:
+def render_stock_analysis_content(symbol: str, df, is_new: bool = False):
+    """Render the analysis of the selected stock"""
+    name = get_stock_info(symbol).get('name', symbol)
+
+    # Indicators, advice and chart are reused until the last bar changes
+    view = get_stock_view(symbol, name, df)
+    if view is None:
         st.warning(f"無法取得 {symbol} {name} 的資料")
         return
-    
-    # Calculate indicators
-    df = calculate_kd(df)
-    
-    # Get KD info
-    k_value = df['K'].iloc[-1] if 'K' in df.columns and not df['K'].isna().all() else 50
-    d_value = df['D'].iloc[-1] if 'D' in df.columns and not df['D'].isna().all() else 50
-    kd_status = get_kd_status(k_value)
-    kd_cross = detect_kd_cross(df)
-    
-    # Volume analysis
-    volume_analysis = get_volume_analysis(df)
-    
-    # Breakout detection
-    breakout = detect_breakout(df)
-    
-    # Get advice (using current price as "cost" for recommendation purposes)
-    advice = check_risk_status(
-        current_price=current_price,
-        cost=current_price * 0.95,  # Assume hypothetical 5% gain for analysis
-        k_value=k_value,
-        volume_ratio=volume_analysis.get('ratio', 1),
-        is_kd_golden_cross=(kd_cross.get('type') == 'golden'),
-        is_breakout=breakout.get('is_breakout', False),
-        breakout_type=breakout.get('type')
-    )
+
+    current_price = view["current_price"]
+    change_pct = view["change_pct"]
+    k_value = view["k_value"]
+    d_value = view["d_value"]
+    kd_status = view["kd_status"]
+    volume_analysis = view["volume_analysis"]
+    advice = view["advice"]
     
     # Colors
     price_color = COLORS["success"] if change_pct >= 0 else COLORS["danger"]
@@ -424,14 +400,18 @@ def render_stock_analysis_content(symbol: str, is_new: bool = False):
         """, unsafe_allow_html=True)
     
     # Chart
-    chart_fig = create_candlestick_chart(
-        df=df,
-        symbol=symbol,
-        name=name,
-        show_volume=True,
-        show_kd=True
-    )
-    st.plotly_chart(chart_fig, use_container_width=True, config={'displayModeBar': False})
+    st.plotly_chart(view["figure"], use_container_width=True, config={'displayModeBar': False})
+
+
+def render_watchlist_summary(symbols: list, data: dict, names: dict, new_entry_set: set):
+    """Render a compact summary grid for the stocks that are not selected"""
+    if not symbols:
+        return
+    rows = [summary_row(symbol, names[symbol], data[symbol], symbol in new_entry_set) for symbol in symbols]
+    st.markdown("""
+    <p style="color: #9CA3AF; font-size: 13px; margin: 24px 0 8px 0;">其他觀察標的</p>
+    """, unsafe_allow_html=True)
+    st.dataframe(rows, use_container_width=True, hide_index=True)
 
 
 def render_sidebar():
@@ -527,6 +507,7 @@ def render_sidebar():
 
 def main():
     """Main application"""
+    warm_dashboard_cache()
     init_session_state()
     
     # Render sidebar
@@ -548,32 +529,29 @@ def main():
     
     # Render stock analysis section
     if today_stocks:
+        # One batched download for the whole watchlist; the view and the summary read from it
+        data = get_multiple_stocks_data(today_stocks, DATA_PERIOD)
+        names = {symbol: get_stock_info(symbol).get('name', symbol) for symbol in today_stocks}
+
         st.markdown("""
         <h3 style="color: #FFFFFF; margin: 32px 0 16px 0; border-bottom: 1px solid rgba(99, 102, 241, 0.3); padding-bottom: 8px;">
             📈 個股分析報告
         </h3>
         <p style="color: #9CA3AF; font-size: 13px; margin-bottom: 20px;">
-            點選股票標籤查看 K 線圖、成交量、KD 指標及利弗摩爾交易建議
+            選擇股票查看 K 線圖、成交量、KD 指標及利弗摩爾交易建議
         </p>
         """, unsafe_allow_html=True)
         
-        # Create tab labels with stock info
-        tab_labels = []
-        for symbol in today_stocks:
-            info = get_stock_info(symbol)
-            name = info.get('name', symbol)
-            is_new = symbol in new_entry_set
-            label = f"{'✨ ' if is_new else ''}{symbol} {name}"
-            tab_labels.append(label)
-        
-        # Create tabs
-        tabs = st.tabs(tab_labels)
-        
-        # Render content for each tab
-        for idx, (tab, symbol) in enumerate(zip(tabs, today_stocks)):
-            with tab:
-                is_new = symbol in new_entry_set
-                render_stock_analysis_content(symbol, is_new=is_new)
+        # Only the selected stock is analysed and charted on each rerun
+        selected = st.selectbox(
+            "觀察標的",
+            today_stocks,
+            format_func=lambda symbol: f"{'✨ ' if symbol in new_entry_set else ''}{symbol} {names[symbol]}",
+            key="selected_symbol",
+            label_visibility="collapsed"
+        )
+        render_stock_analysis_content(selected, data[selected], is_new=selected in new_entry_set)
+        render_watchlist_summary([s for s in today_stocks if s != selected], data, names, new_entry_set)
     else:
         st.markdown("""
         <div style="
@@ -0,0 +1,145 @@
+"""
+Gemini OCR of brokerage inventory screenshots for the Flask backend
+
+Imported on the first /api/ocr request, so google.generativeai is not loaded
+by a server that only answers quote requests.
+"""
+import base64
+import json
+import os
+import re
+
+import google.generativeai as genai
+from flask import request, jsonify
+
+
+def parse_text_for_stocks(text):
+    """
+    Parses raw OCR text to find Taiwan stock patterns.
+    Heuristic: Look for 4-digit codes and associated numbers.
+    """
+    results = []
+    lines = text.split('\n')
+    
+    # Pattern for 4-digit stock code
+    code_pattern = re.compile(r'\b([1-9]\d{3}|00\d{2,3})\b')
+    
+    for line in lines:
+        line = line.strip()
+        if not line: continue
+        
+        codes = code_pattern.findall(line)
+        if not codes: continue
+        
+        for code in codes:
+            name = ""
+            cjk_match = re.search(r'[\u4e00-\u9fa5]{2,}', line)
+            if cjk_match:
+                name = cjk_match.group(0)
+            
+            numbers = re.findall(r'[\d,]+\.?\d*', line)
+            numbers = [n.replace(',', '') for n in numbers if n.replace(',', '') != code]
+            
+            shares = 0
+            cost = 0.0
+            
+            for n in numbers:
+                try:
+                    val = float(n)
+                    if val >= 1000: 
+                        shares = int(val)
+                    elif 0 < val < 5000: # Stock price range
+                        cost = val
+                except: continue
+            
+            results.append({
+                "ticker": code,
+                "name": name,
+                "shares": shares,
+                "cost": cost
+            })
+    return results
+
+def ocr_images():
+    # Use GEMINI_KEY from environment
+    api_key = os.environ.get("GEMINI_KEY")
+    if not api_key:
+        # Fallback to GOOGLE_API_KEY
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        
+    if not api_key:
+        print("Error: GEMINI_KEY not set")
+        return jsonify({"error": "Server missing API Key"}), 500
+        
+    genai.configure(api_key=api_key)
+    
+    # 接收 JSON (Base64 Images)
+    req_data = request.json
+    if not req_data or 'images' not in req_data:
+        return jsonify({"error": "No images provided"}), 400
+        
+    files = req_data['images']
+    if not files:
+        return jsonify({"error": "Empty image list"}), 400
+        
+    print(f"收到 {len(files)} 張圖片進行 Gemini OCR...")
+    
+    image_parts = []
+    
+    for img_obj in files:
+        try:
+            # Decode Base64
+            img_bytes = base64.b64decode(img_obj['data'])
+            image_parts.append({
+                "mime_type": img_obj['mime_type'],
+                "data": img_bytes
+            })
+        except Exception as e:
+            print(f"Image decode error: {e}")
+            return jsonify({"error": f"Image decode failed: {e}"}), 400
+        
+    prompt = """
+    你是一個台灣股市券商 App 截圖的解析專家。
+    使用者上傳了一組庫存截圖（可能包含多張，且內容可能有重疊）。
+    
+    請執行以下任務：
+    1. **提取資訊**：找出每一列的「股票代碼」、「股票名稱」、「庫存股數」、「平均成本」。
+    2. **去重合併**：因為截圖是連續的，上下兩張圖可能會顯示同一檔股票。請依據「股票代碼」去除重複項目，保留一份即可。
+    3. **容錯處理**：
+       - 股票代碼通常是 4 碼數字。
+       - 股數與成本請轉換為純數字（去除逗號）。
+       - 如果有無法辨識的欄位，請盡量推斷或標記 null。
+    
+    請直接回傳一個 **純 JSON 陣列**，不要包含任何 Markdown 格式 (如 ```json ... ```)。
+    格式範例：
+    [
+      {"ticker": "2330", "name": "台積電", "shares": 2000, "cost": 502.5},
+      {"ticker": "0050", "name": "元大台灣50", "shares": 1500, "cost": 120.1}
+    ]
+    """
+    
+    try:
+        # 使用 Gemini 1.5 Flash 確保穩定性，因為 2.0 可能在某些 API 環境尚未完全可用
+        model = genai.GenerativeModel("gemini-1.5-flash")
+        
+        # Generate
+        response = model.generate_content([prompt, *image_parts])
+        raw_text = response.text
+        
+        # Clean up Markdown formatting
+        cleaned_text = raw_text.strip()
+        if cleaned_text.startswith("```json"):
+            cleaned_text = cleaned_text[7:]
+        elif cleaned_text.startswith("```"):
+            cleaned_text = cleaned_text[3:]
+        if cleaned_text.endswith("```"):
+            cleaned_text = cleaned_text[:-3]
+            
+        result_json = json.loads(cleaned_text.strip())
+        print(f"Gemini OCR 成功，解析出 {len(result_json)} 筆資料")
+        
+        return jsonify(result_json)
+        
+    except Exception as e:
+        print(f"OCR Failed: {e}")
+        return jsonify({"error": str(e)}), 500
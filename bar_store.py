@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Local Columnar OHLCV Bar Store
+
+Persists daily bars on disk so repeated scans only download the days that
+are not stored yet. Bars are kept per stock and partitioned by month, each
+partition being a small columnar JSON file:
+
+    {root}/{stock_id}/{YYYY-MM}.json   -> {"date": [...], "open": [...], ...}
+    {root}/{stock_id}/_coverage.json   -> {"start": "YYYY-MM-DD", "end": "YYYY-MM-DD"}
+
+The coverage window records which date range has already been requested
+from the upstream provider, so holidays and weekends inside the window are
+not re-fetched.
+
+Weekly and monthly bars are aggregated from the daily bars with
+resample_bars(), each period dated by its last trading day.
+
+Environment Variable:
+    STOCK_BAR_STORE_DIR: Directory of the store. When set, StockDataFacade
+                         reads from the store first (default: disabled)
+
+Usage:
+    from bar_store import BarStore
+
+    store = BarStore('data/bars')
+    store.write('2330', bars)
+    bars = store.read('2330', '2024-01-01', '2024-03-31')
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+
+# Taiwan has no DST, a fixed offset avoids depending on tzdata
+TW_TZ = timezone(timedelta(hours=8))
+
+# Daily bars fetched before this time (Taiwan time) may still change
+MARKET_SETTLE_TIME = (14, 30)
+
+BAR_FIELDS = ('date', 'open', 'high', 'low', 'close', 'volume')
+
+
+def _shift_date(date_str: str, days: int) -> str:
+    """Shift a 'YYYY-MM-DD' string by N calendar days"""
+    dt = datetime.strptime(date_str, '%Y-%m-%d') + timedelta(days=days)
+    return dt.strftime('%Y-%m-%d')
+
+
+def _month_keys(start_date: str, end_date: str) -> List[str]:
+    """List 'YYYY-MM' partition keys covering the date range"""
+    year, month = int(start_date[:4]), int(start_date[5:7])
+    end_year, end_month = int(end_date[:4]), int(end_date[5:7])
+
+    keys = []
+    while (year, month) <= (end_year, end_month):
+        keys.append(f"{year}-{month:02d}")
+        if month == 12:
+            year, month = year + 1, 1
+        else:
+            month += 1
+    return keys
+
+
+def period_key(date_str: str, timeframe: str) -> str:
+    """
+    Period a daily bar belongs to
+
+    'W' gives the Monday of its week ('YYYY-MM-DD'), 'M' its month ('YYYY-MM').
+    """
+    if timeframe == 'W':
+        return _shift_date(date_str, -datetime.strptime(date_str, '%Y-%m-%d').weekday())
+    if timeframe == 'M':
+        return date_str[:7]
+    raise ValueError(f"Unknown timeframe: {timeframe}")
+
+
+def merge_bar(period_bar: Optional[Dict], bar: Dict) -> Dict:
+    """Extend a period bar with the next daily bar (a new period starts from the bar itself)"""
+    if period_bar is None:
+        return {field: bar[field] for field in BAR_FIELDS}
+    return {
+        'date': bar['date'],
+        'open': period_bar['open'],
+        'high': max(period_bar['high'], bar['high']),
+        'low': min(period_bar['low'], bar['low']),
+        'close': bar['close'],
+        'volume': period_bar['volume'] + bar['volume']
+    }
+
+
+def resample_bars(bars: List[Dict], timeframe: str) -> List[Dict]:
+    """
+    Aggregate daily bars (in date order) into weekly ('W') or monthly ('M') bars
+
+    Each period bar is dated by its last trading day, so the bar of the
+    period in progress carries the date of the latest daily bar.
+    """
+    periods: List[Dict] = []
+    current_key = None
+    for bar in bars:
+        key = period_key(bar['date'], timeframe)
+        if key != current_key:
+            periods.append(merge_bar(None, bar))
+            current_key = key
+        else:
+            periods[-1] = merge_bar(periods[-1], bar)
+    return periods
+
+
+def settled_date(now: Optional[datetime] = None) -> str:
+    """
+    Latest date whose daily bar is final
+
+    Before the market settles (Taiwan time), today's bar may still change,
+    so only yesterday is considered settled.
+    """
+    now = now or datetime.now(TW_TZ)
+    if (now.hour, now.minute) >= MARKET_SETTLE_TIME:
+        return now.strftime('%Y-%m-%d')
+    return (now - timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+class BarStore:
+    """Persistent per-stock daily bar store partitioned by month"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Paths & low level IO
+    # ------------------------------------------------------------------
+    def _stock_dir(self, stock_id: str) -> Path:
+        return self.root / stock_id
+
+    def _partition_path(self, stock_id: str, month_key: str) -> Path:
+        return self._stock_dir(stock_id) / f"{month_key}.json"
+
+    def _coverage_path(self, stock_id: str) -> Path:
+        return self._stock_dir(stock_id) / "_coverage.json"
+
+    @staticmethod
+    def _load_json(path: Path) -> Optional[dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _dump_json(path: Path, data: dict):
+        """Write atomically so a killed run never leaves a torn partition"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def _load_partition(self, stock_id: str, month_key: str) -> Dict[str, Dict]:
+        """Load a month partition as {date: bar}"""
+        columns = self._load_json(self._partition_path(stock_id, month_key))
+        if not columns or 'date' not in columns:
+            return {}
+
+        bars = {}
+        try:
+            for i, date in enumerate(columns['date']):
+                bars[date] = {field: columns[field][i] for field in BAR_FIELDS}
+        except (KeyError, IndexError):
+            # Corrupted partition: treat as missing so it gets re-fetched
+            return {}
+        return bars
+
+    def _save_partition(self, stock_id: str, month_key: str, bars: Dict[str, Dict]):
+        dates = sorted(bars)
+        columns = {field: [bars[d][field] for d in dates] for field in BAR_FIELDS}
+        self._dump_json(self._partition_path(stock_id, month_key), columns)
+
+    # ------------------------------------------------------------------
+    # Bars
+    # ------------------------------------------------------------------
+    def read(self, stock_id: str, start_date: str, end_date: str) -> List[Dict]:
+        """
+        Read stored bars within the date range
+
+        Returns:
+            List of dictionaries with keys: date, open, high, low, close, volume
+        """
+        if start_date > end_date:
+            return []
+
+        results = []
+        for month_key in _month_keys(start_date, end_date):
+            bars = self._load_partition(stock_id, month_key)
+            for date in sorted(bars):
+                if start_date <= date <= end_date:
+                    results.append(bars[date])
+        return results
+
+    def write(self, stock_id: str, bars: List[Dict]):
+        """Merge bars into their month partitions (same date is overwritten)"""
+        by_month: Dict[str, List[Dict]] = {}
+        for bar in bars:
+            by_month.setdefault(bar['date'][:7], []).append(bar)
+
+        for month_key, month_bars in by_month.items():
+            stored = self._load_partition(stock_id, month_key)
+            for bar in month_bars:
+                stored[bar['date']] = {field: bar[field] for field in BAR_FIELDS}
+            self._save_partition(stock_id, month_key, stored)
+
+    def stock_ids(self) -> List[str]:
+        """List stocks that have at least one stored partition"""
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+    # ------------------------------------------------------------------
+    # Coverage
+    # ------------------------------------------------------------------
+    def get_coverage(self, stock_id: str) -> Optional[Tuple[str, str]]:
+        """Get the (start, end) window already requested from upstream"""
+        data = self._load_json(self._coverage_path(stock_id))
+        if not data or 'start' not in data or 'end' not in data:
+            return None
+        return data['start'], data['end']
+
+    def set_coverage(self, stock_id: str, start_date: str, end_date: str):
+        self._dump_json(self._coverage_path(stock_id), {'start': start_date, 'end': end_date})
+
+    def extend_coverage(self, stock_id: str, start_date: str, end_date: str):
+        """
+        Merge a fetched range into the coverage window
+
+        Coverage stays a single contiguous window: a range that does not
+        touch the current window is ignored, so the days between them are
+        still reported by missing_ranges and fetched.
+        """
+        with self._lock:
+            coverage = self.get_coverage(stock_id)
+            if coverage is None:
+                self.set_coverage(stock_id, start_date, end_date)
+                return
+
+            cov_start, cov_end = coverage
+            touches = start_date <= _shift_date(cov_end, 1) and end_date >= _shift_date(cov_start, -1)
+            if touches:
+                self.set_coverage(stock_id, min(cov_start, start_date), max(cov_end, end_date))
+
+    def missing_ranges(self, stock_id: str, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        """
+        Compute the date ranges that still need to be fetched
+
+        Returns:
+            List of (start, end) tuples, at most one before and one after
+            the stored coverage window
+        """
+        coverage = self.get_coverage(stock_id)
+        if coverage is None:
+            return [(start_date, end_date)]
+
+        cov_start, cov_end = coverage
+        gaps = []
+        if start_date < cov_start:
+            gaps.append((start_date, min(end_date, _shift_date(cov_start, -1))))
+        if end_date > cov_end:
+            gaps.append((max(start_date, _shift_date(cov_end, 1)), end_date))
+        return gaps
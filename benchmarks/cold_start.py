@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Cold Start Probe
+
+Run by run_benchmark.py in a fresh interpreter per API entry point. Times the
+module import (what a serverless cold start pays before its first request) and
+lists the heavy modules that import pulled in. It then serves the module's
+handler on a local port and times each given request path in order: the first
+request of a cold process, later ones against the warm process (a repeated
+path is a response cache hit). Prints one JSON object on stdout.
+
+Usage:
+    python benchmarks/cold_start.py api.stock /api/stock?ticker=1101 /api/stock?ticker=1102
+    python benchmarks/cold_start.py backend.server
+"""
+
+import contextlib
+import json
+import os
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Modules the quote endpoints must not import before their first request
+HEAVY_MODULES = ('pandas', 'FinMind', 'cv2', 'pytesseract', 'google.generativeai', 'twstock', 'requests')
+
+
+def time_requests(handler_cls, paths):
+    """Serve handler_cls locally and time each path (status and milliseconds)"""
+    import threading
+    import urllib.error
+    import urllib.request
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler_cls)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    timings = []
+    try:
+        for path in paths:
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}{path}") as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            timings.append({'path': path, 'status': status, 'ms': round((time.perf_counter() - started) * 1000, 1)})
+    finally:
+        server.shutdown()
+        server.server_close()
+    return timings
+
+
+def main():
+    module_name, paths = sys.argv[1], sys.argv[2:]
+
+    started = time.perf_counter()
+    module = __import__(module_name, fromlist=['handler'])
+    report = {
+        'module': module_name,
+        'import_ms': round((time.perf_counter() - started) * 1000, 1),
+        'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+    if paths:
+        # Handler and provider logs go to stderr, the report alone to stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            report['requests'] = time_requests(module.handler, paths)
+    print(json.dumps(report))
+
+
+if __name__ == '__main__':
+    main()
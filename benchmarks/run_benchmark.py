@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Scan Pipeline Benchmark
+
+Runs the real scan code paths of scripts/update_daily.py against the local
+stand-in of the upstream APIs (benchmarks/stub_server.py) for synthetic
+universes of 100 / 1,000 / 2,000 tickers, and reports per stage:
+
+- alerts:    fetch_market_alerts + fetch_allowed_day_trade_targets
+- ingest:    whole-market daily tables into a bar store (--bulk only)
+- fetch:     StockDataFacade.get_stock_prices_many + DataFrame conversion
+- compute:   evaluate_livermore_criteria per ticker
+- serialize: per-ticker checkpoint records + the daily_scan_results.json payload
+
+Reported per stage: wall time, throughput (tickers/s), p50 / p99 per-ticker
+latency and the process peak RSS after the stage. Each universe runs in a
+fresh process so peak RSS is not carried over between sizes. Per-ticker fetch
+latency is measured from the moment a ticker takes one of the fetch slots
+(STOCK_FETCH_CONCURRENCY), so queueing behind other tickers is excluded.
+
+Rate limits are lifted unless --real-quotas is given, so the numbers show
+the pipeline itself rather than the configured API quota.
+
+Before the universes, the cold start of each API entry point (api/stock.py,
+api/stocks.py, backend/server.py) is measured in a fresh interpreter by
+benchmarks/cold_start.py: import time against IMPORT_BUDGET_MS, heavy modules
+pulled in by the import, then the first request, a warm request and a cached
+request (skipped with --no-cold-start).
+
+Usage:
+    python benchmarks/run_benchmark.py
+    python benchmarks/run_benchmark.py --universe 2000 --latency-ms 50 --jitter-ms 20 --error-rate 0.01
+    python benchmarks/run_benchmark.py --provider finmind --output bench.json
+    python benchmarks/run_benchmark.py --bulk
+    python benchmarks/run_benchmark.py --universe 100 --no-cold-start
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from stub_server import StubServer, SyntheticMarket, synthetic_universe
+except ModuleNotFoundError:
+    from benchmarks.stub_server import StubServer, SyntheticMarket, synthetic_universe
+
+
+DEFAULT_UNIVERSES = (100, 1000, 2000)
+
+# Effectively unlimited quota for the stand-in
+UNLIMITED_PER_MINUTE = 10 ** 7
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import-time budget per API entry point (ms): what a cold start pays before its first request
+IMPORT_BUDGET_MS = {'api.stock': 250, 'api.stocks': 250, 'backend.server': 400}
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..100); None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def stage_report(stage: str, tickers: int, seconds: float, latencies: Optional[List[float]] = None) -> dict:
+    latencies = latencies or []
+    p50 = percentile(latencies, 50)
+    p99 = percentile(latencies, 99)
+    return {
+        'stage': stage,
+        'tickers': tickers,
+        'seconds': round(seconds, 4),
+        'throughput': round(tickers / seconds, 1) if seconds > 0 else None,
+        'p50_ms': round(p50 * 1000, 3) if p50 is not None else None,
+        'p99_ms': round(p99 * 1000, 3) if p99 is not None else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def benchmark_env(server_url: str, options: dict) -> dict:
+    """Environment pointing the pipeline at the stand-in"""
+    env = {
+        'TWSE_BASE_URL': server_url,
+        'TPEX_BASE_URL': server_url,
+        'FINMIND_API_URL': f"{server_url}/api/v4/data",
+        'USE_STOCK_FACADE': options['provider'],
+        'STOCK_DATA_PROVIDER': options['provider'],
+        'STOCK_FETCH_CONCURRENCY': str(options['concurrency']),
+    }
+    if not options['real_quotas']:
+        env.update({
+            'RATE_LIMIT_TWSE_PER_MINUTE': str(UNLIMITED_PER_MINUTE),
+            'RATE_LIMIT_TPEX_PER_MINUTE': str(UNLIMITED_PER_MINUTE),
+            'RATE_LIMIT_FINMIND_PER_HOUR': str(UNLIMITED_PER_MINUTE * 60),
+        })
+    return env
+
+
+def run_universe(size: int, options: dict) -> dict:
+    """Benchmark one universe size (runs in a fresh process)"""
+    # Imported here: the upstream URLs are read from the environment at import time
+    from bar_store import BarStore, settled_date
+    from market_daily import ingest_market_range
+    from scripts import update_daily
+    from scripts.scan_checkpoint import ScanCheckpoint
+    from stock_data_facade import StockDataFacade
+    from stock_facade_adapter import _prices_to_dataframe
+
+    codes = synthetic_universe(size)
+    end_date = settled_date()
+    stages = []
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(open(os.devnull, 'w')):
+        start_date = update_daily.get_history_start_date()
+
+        # Alerts and day trade targets (fixed cost, independent of the universe)
+        started = time.perf_counter()
+        market_alerts = update_daily.fetch_market_alerts()
+        allowed = update_daily.fetch_allowed_day_trade_targets()
+        stages.append(stage_report('alerts', len(market_alerts), time.perf_counter() - started))
+
+        store = None
+        if options['bulk']:
+            store = BarStore(os.path.join(tmp, 'bars'))
+            started = time.perf_counter()
+            ingest_market_range(store, start_date, end_date)
+            stages.append(stage_report('ingest', size, time.perf_counter() - started))
+
+        # Fetch: every ticker takes one of `concurrency` slots, its clock starts then
+        facade = StockDataFacade(options['provider'], bar_store=store)
+        slots = None
+        latencies = {}
+        fetch_one = facade._aget_stock_price
+
+        async def timed_fetch(stock_id, *args):
+            nonlocal slots
+            if slots is None:
+                slots = asyncio.Semaphore(options['concurrency'])
+            async with slots:
+                ticker_started = time.perf_counter()
+                try:
+                    return await fetch_one(stock_id, *args)
+                finally:
+                    latencies[stock_id] = time.perf_counter() - ticker_started
+
+        facade._aget_stock_price = timed_fetch
+        started = time.perf_counter()
+        prices = facade.get_stock_prices_many(codes, start_date, end_date, concurrency=options['concurrency'])
+        histories = {}
+        for code, data in prices.items():
+            convert_started = time.perf_counter()
+            df = _prices_to_dataframe(code, data)
+            latencies[code] += time.perf_counter() - convert_started
+            if df is not None:
+                histories[code] = df
+        stages.append(stage_report('fetch', size, time.perf_counter() - started, list(latencies.values())))
+
+        # Compute
+        latencies = []
+        evaluated = {}
+        started = time.perf_counter()
+        for code, df in histories.items():
+            ticker_started = time.perf_counter()
+            evaluated[code] = update_daily.evaluate_livermore_criteria(code, df, market_alerts, allowed)
+            latencies.append(time.perf_counter() - ticker_started)
+        stages.append(stage_report('compute', len(histories), time.perf_counter() - started, latencies))
+
+        # Serialize
+        latencies = []
+        checkpoint = ScanCheckpoint(os.path.join(tmp, 'checkpoints'), end_date)
+        market_stats = update_daily.new_market_stats()
+        results = []
+        started = time.perf_counter()
+        for code, (data, change_pct) in evaluated.items():
+            ticker_started = time.perf_counter()
+            checkpoint.record_result(code, data, change_pct)
+            latencies.append(time.perf_counter() - ticker_started)
+            update_daily.add_to_market_stats(market_stats, change_pct)
+            if data:
+                results.append(data)
+        output = {'date': end_date, 'stocks': results, 'marketStats': market_stats}
+        output_file = os.path.join(tmp, 'daily_scan_results.json')
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+        output_bytes = os.path.getsize(output_file)
+        stages.append(stage_report('serialize', len(evaluated), time.perf_counter() - started, latencies))
+
+    return {
+        'universe': size,
+        'with_data': len(histories),
+        'qualified': len(results),
+        'output_bytes': output_bytes,
+        'stages': stages
+    }
+
+
+def run_cold_start(codes: List[str]) -> List[dict]:
+    """Cold start of each API entry point, each in a fresh interpreter (see cold_start.py)"""
+    first, second = ','.join(codes[:10]), ','.join(codes[10:20])
+    entry_points = {
+        # First request, another ticker in the warm process, the first ticker again (cache hit)
+        'api.stock': [f'/api/stock?ticker={codes[0]}', f'/api/stock?ticker={codes[1]}', f'/api/stock?ticker={codes[0]}'],
+        'api.stocks': [f'/api/stocks?tickers={first}', f'/api/stocks?tickers={second}', f'/api/stocks?tickers={first}'],
+        # History comes from the FinMind package, which the stand-in cannot serve: import only
+        'backend.server': [],
+    }
+    probe = os.path.join(ROOT_DIR, 'benchmarks', 'cold_start.py')
+    reports = []
+    for module, paths in entry_points.items():
+        result = subprocess.run([sys.executable, probe, module, *paths], cwd=ROOT_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            error = (result.stderr.strip().splitlines() or ['failed'])[-1]
+            reports.append({'module': module, 'error': error})
+            continue
+        report = json.loads(result.stdout)
+        report['budget_ms'] = IMPORT_BUDGET_MS[module]
+        report['over_budget'] = report['import_ms'] > report['budget_ms']
+        reports.append(report)
+    return reports
+
+
+def format_cold_start(reports: List[dict]) -> str:
+    lines = [
+        "Cold start (fresh interpreter per entry point)",
+        f"  {'entry point':<16}{'import ms':>10}{'budget':>8}{'first ms':>10}{'warm ms':>9}{'cached ms':>11}  heavy imports"
+    ]
+    for r in reports:
+        if 'error' in r:
+            lines.append(f"  {r['module']:<16}{'-':>10}  {r['error']}")
+            continue
+        timings = [str(t['ms']) if t['status'] < 400 else f"{t['status']}" for t in r.get('requests', [])]
+        timings += ['-'] * (3 - len(timings))
+        budget = f"{r['budget_ms']}{'!' if r['over_budget'] else ''}"
+        lines.append(
+            f"  {r['module']:<16}{r['import_ms']:>10}{budget:>8}{timings[0]:>10}{timings[1]:>9}{timings[2]:>11}"
+            f"  {', '.join(r['heavy_modules']) or '-'}"
+        )
+    return '\n'.join(lines)
+
+
+def format_report(report: dict) -> str:
+    def cell(value, width):
+        return f"{'-' if value is None else value:>{width}}"
+
+    lines = [
+        f"Universe {report['universe']:,}: {report['with_data']:,} with data, {report['qualified']} qualified, "
+        f"{report['requests']:,} requests ({report['errors']:,} failed), output {report['output_bytes']:,} bytes",
+        f"  {'stage':<10}{'tickers':>9}{'seconds':>10}{'tickers/s':>11}{'p50 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}"
+    ]
+    for s in report['stages']:
+        lines.append(
+            f"  {s['stage']:<10}{cell(s['tickers'], 9)}{cell(s['seconds'], 10)}{cell(s['throughput'], 11)}"
+            f"{cell(s['p50_ms'], 10)}{cell(s['p99_ms'], 10)}{cell(s['peak_rss_mb'], 13)}"
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scan pipeline against a local API stand-in')
+    parser.add_argument('--universe', type=int, nargs='+', default=list(DEFAULT_UNIVERSES), help='Universe sizes')
+    parser.add_argument('--provider', choices=['twse', 'finmind'], default='twse')
+    parser.add_argument('--bulk', action='store_true', help='Ingest whole-market daily tables into a bar store first')
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('STOCK_FETCH_CONCURRENCY', 8)))
+    parser.add_argument('--latency-ms', type=float, default=20, help='Latency added to every response')
+    parser.add_argument('--jitter-ms', type=float, default=10, help='Extra random latency per response')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of requests answered with 503')
+    parser.add_argument('--real-quotas', action='store_true', help='Keep the configured API rate limits')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-cold-start', action='store_true', help='Skip the API cold start measurement')
+    parser.add_argument('--output', help='Write the reports as JSON')
+    args = parser.parse_args()
+    options = vars(args)
+
+    market = SyntheticMarket(synthetic_universe(max(args.universe)), seed=args.seed)
+    server = StubServer(market, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                        error_rate=args.error_rate, seed=args.seed)
+
+    reports = []
+    cold_start = []
+    with server:
+        for key in ('RATE_LIMIT_STATE_FILE', 'STOCK_BAR_STORE_DIR', 'FINMIND_API_TOKEN', 'STOCK_REGISTRY_FILE'):
+            os.environ.pop(key, None)
+        os.environ.update(benchmark_env(server.url, options))
+
+        if not args.no_cold_start:
+            cold_start = run_cold_start(synthetic_universe(20))
+            print(format_cold_start(cold_start), end='\n\n', flush=True)
+
+        for size in args.universe:
+            server.stats.clear()
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                report = pool.submit(run_universe, size, options).result()
+            report['requests'] = server.stats['requests']
+            report['errors'] = server.stats['errors']
+            print(format_report(report), end='\n\n', flush=True)
+            reports.append(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': options, 'cold_start': cold_start, 'runs': reports}, f, ensure_ascii=False, indent=2)
+        print(f"Reports written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
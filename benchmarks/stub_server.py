@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Local Stand-In for the TWSE / TPEx / FinMind APIs
+
+Serves the endpoints used by the scan pipeline from a deterministic
+synthetic market, in the payload layouts recorded under benchmarks/fixtures/:
+
+- TWSE  /exchangeReport/STOCK_DAY, /exchangeReport/MI_INDEX, /exchangeReport/TWTB4U,
+        /rwd/zh/announcement/notice, /rwd/zh/announcement/punish
+- TPEx  daily close quotes, intraday (day trade) stats,
+        /openapi/v1/tpex_trading_warning_information, /openapi/v1/tpex_disposal_information
+- FinMind /api/v4/data?dataset=TaiwanStockPrice
+
+Latency and error rate are configurable so that fetch concurrency, rate
+limiting and retries can be measured without touching the real exchanges.
+
+Usage:
+    from benchmarks.stub_server import StubServer, SyntheticMarket, synthetic_universe
+
+    market = SyntheticMarket(synthetic_universe(1000))
+    with StubServer(market, latency=0.02, error_rate=0.01) as server:
+        os.environ['TWSE_BASE_URL'] = server.url   # before importing stock_data_facade
+        ...
+
+    # Or standalone
+    python benchmarks/stub_server.py --universe 2000 --latency-ms 30 --port 8765
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bar_store import settled_date
+from trading_calendar import get_trading_calendar
+
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+
+# Share of tickers listed on TWSE (the rest trade on TPEx)
+LISTED_RATIO = 0.75
+
+
+def load_fixture(name: str):
+    """Load a recorded payload from benchmarks/fixtures/"""
+    with open(FIXTURE_DIR / f"{name}.json", 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def synthetic_universe(size: int) -> List[str]:
+    """Ticker codes of a synthetic universe; a smaller universe is a prefix of a larger one"""
+    return [str(1101 + i) for i in range(size)]
+
+
+def _roc(date_str: str, sep: str = '/') -> str:
+    """'2024-10-04' -> '113/10/04' (or '1131004' with sep='')"""
+    year, month, day = date_str.split('-')
+    return sep.join([str(int(year) - 1911), month, day])
+
+
+def _price(value: float) -> str:
+    return f"{value:,.2f}"
+
+
+class SyntheticMarket:
+    """Deterministic daily bars for a universe of tickers"""
+
+    def __init__(self, codes: List[str], end_date: Optional[str] = None, days: int = 400,
+                 seed: int = 0, breakout_ratio: float = 0.1, alert_ratio: float = 0.03):
+        """
+        Args:
+            codes: Ticker codes
+            end_date: Last trading day (default: last settled day)
+            days: Calendar days of history
+            seed: Random seed
+            breakout_ratio: Share of tickers ending on a two-bar breakout
+            alert_ratio: Share of tickers with recent warning notices
+        """
+        self.codes = list(codes)
+        self._code_set = set(self.codes)
+        self.seed = seed
+        self.breakout_ratio = breakout_ratio
+        self.alert_ratio = alert_ratio
+        self.listed = set(self.codes[:int(len(self.codes) * LISTED_RATIO)])
+
+        calendar = get_trading_calendar()
+        end = datetime.strptime(end_date or settled_date(), '%Y-%m-%d')
+        self.trading_days = [
+            d.strftime('%Y-%m-%d')
+            for d in (end - timedelta(days=offset) for offset in range(days, -1, -1))
+            if calendar.is_trading_day(d.strftime('%Y-%m-%d'))
+        ]
+        self._trading_day_set = set(self.trading_days)
+        self._bars: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def _rng(self, code: str, salt: str = '') -> random.Random:
+        return random.Random(zlib.crc32(f"{self.seed}:{code}:{salt}".encode()))
+
+    def is_trading_day(self, date_str: str) -> bool:
+        return date_str in self._trading_day_set
+
+    def bars(self, code: str) -> List[Dict]:
+        """All bars of a ticker (volume in shares, as upstream reports it)"""
+        bars = self._bars.get(code)
+        if bars is not None:
+            return bars
+        if code not in self._code_set:
+            return []
+
+        rng = self._rng(code)
+        close = rng.uniform(10, 600)
+        bars = []
+        for date_str in self.trading_days:
+            open_price = close * (1 + rng.gauss(0, 0.01))
+            close = max(1.0, close * (1 + rng.gauss(0.0005, 0.02)))
+            high = max(open_price, close) * (1 + abs(rng.gauss(0, 0.005)))
+            low = min(open_price, close) * (1 - abs(rng.gauss(0, 0.005)))
+            bars.append({
+                'date': date_str,
+                'open': round(open_price, 2), 'high': round(high, 2),
+                'low': round(low, 2), 'close': round(close, 2),
+                'volume': rng.randint(200, 20000) * 1000
+            })
+
+        if self._rng(code, 'breakout').random() < self.breakout_ratio and len(bars) > 22:
+            # Two red bars closing above every high of the previous month
+            peak = max(bar['high'] for bar in bars[-22:-2])
+            for bar, (open_price, close) in zip(bars[-2:], [(peak, peak * 1.02), (peak * 1.02, peak * 1.05)]):
+                bar.update(open=round(open_price, 2), close=round(close, 2),
+                           high=round(close * 1.005, 2), low=round(open_price * 0.995, 2))
+
+        with self._lock:
+            self._bars[code] = bars
+        return bars
+
+    def bars_between(self, code: str, start_date: str, end_date: str) -> List[Dict]:
+        return [bar for bar in self.bars(code) if start_date <= bar['date'] <= end_date]
+
+    def day_quotes(self, date_str: str, listed: bool) -> Dict[str, Dict]:
+        """{code: bar} of one market on one day"""
+        if not self.is_trading_day(date_str):
+            return {}
+        index = self.trading_days.index(date_str)
+        return {
+            code: self.bars(code)[index]
+            for code in self.codes
+            if (code in self.listed) == listed
+        }
+
+    def alerted(self) -> List[str]:
+        """Tickers with a warning notice during the last few trading days"""
+        return [code for code in self.codes if self._rng(code, 'alert').random() < self.alert_ratio]
+
+
+class StubServer:
+    """Threaded HTTP server answering like the upstream APIs"""
+
+    def __init__(self, market: SyntheticMarket, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, host: str = '127.0.0.1', port: int = 0, seed: int = 0):
+        """
+        Args:
+            market: Synthetic market to serve
+            latency: Seconds added to every response
+            jitter: Extra random seconds (uniform 0..jitter) per response
+            error_rate: Share of requests answered with HTTP 503
+            host / port: Bind address (port 0 picks a free port)
+        """
+        self.market = market
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StubServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        """Serve in the calling thread until interrupted"""
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _delay_and_fail(self) -> bool:
+        """Sleep the configured latency; returns True if this request should fail"""
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; avoid the delayed-ACK stall on keep-alive
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                route = ROUTES.get(parsed.path)
+                with server._lock:
+                    server.stats['requests'] += 1
+                    server.stats[parsed.path] += 1
+
+                if route is None:
+                    self._send(404, {'stat': 'not found'})
+                    return
+                if server._delay_and_fail():
+                    with server._lock:
+                        server.stats['errors'] += 1
+                    self._send(503, {'stat': 'Service Unavailable'})
+                    return
+                self._send(200, route(server.market, params))
+
+            def _send(self, status: int, payload):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+# ----------------------------------------------------------------------
+# Payload builders, one per upstream endpoint
+# ----------------------------------------------------------------------
+
+NO_DATA = {'stat': '很抱歉，沒有符合條件的資料!'}
+
+
+def _stock_day(market: SyntheticMarket, params: dict):
+    date = params.get('date', '')
+    month_prefix = f"{date[:4]}-{date[4:6]}"
+    bars = [bar for bar in market.bars(params.get('stockNo', '')) if bar['date'].startswith(month_prefix)]
+    if not bars:
+        return NO_DATA
+
+    payload = load_fixture('twse_stock_day')
+    payload['date'] = date
+    payload['data'] = [
+        [_roc(bar['date']), f"{bar['volume']:,}", f"{int(bar['volume'] * bar['close']):,}",
+         _price(bar['open']), _price(bar['high']), _price(bar['low']), _price(bar['close']),
+         "0.00", f"{bar['volume'] // 2000:,}"]
+        for bar in bars
+    ]
+    payload['total'] = len(bars)
+    return payload
+
+
+def _mi_index(market: SyntheticMarket, params: dict):
+    date = params.get('date', '')
+    quotes = market.day_quotes(f"{date[:4]}-{date[4:6]}-{date[6:8]}", listed=True)
+    if not quotes:
+        return NO_DATA
+
+    payload = load_fixture('twse_mi_index')
+    payload['date'] = date
+    payload['tables'][1]['data'] = [
+        [code, code, f"{bar['volume']:,}", f"{bar['volume'] // 2000:,}", f"{int(bar['volume'] * bar['close']):,}",
+         _price(bar['open']), _price(bar['high']), _price(bar['low']), _price(bar['close']),
+         "", "0.00", _price(bar['close']), "1", _price(bar['close']), "1", "0.00"]
+        for code, bar in quotes.items()
+    ]
+    return payload
+
+
+def _tpex_daily_close(market: SyntheticMarket, params: dict):
+    roc_year, month, day = params.get('d', '0/0/0').split('/')
+    quotes = market.day_quotes(f"{int(roc_year) + 1911}-{month}-{day}", listed=False)
+
+    payload = load_fixture('tpex_daily_close_quotes')
+    payload['tables'][0]['data'] = [
+        [code, code, _price(bar['close']), "0.00", _price(bar['open']), _price(bar['high']), _price(bar['low']),
+         _price(bar['close']), f"{bar['volume']:,}", f"{int(bar['volume'] * bar['close']):,}",
+         f"{bar['volume'] // 2000:,}", _price(bar['close']), "1", _price(bar['close']), "1", "0", "0", "0"]
+        for code, bar in quotes.items()
+    ]
+    return payload
+
+
+def _recent_days(market: SyntheticMarket, count: int) -> List[str]:
+    return market.trading_days[-count:]
+
+
+def _twse_notice(market: SyntheticMarket, params: dict):
+    payload = load_fixture('twse_notice')
+    rows = []
+    for code in market.alerted():
+        if code in market.listed:
+            for date_str in _recent_days(market, 2):
+                rows.append([str(len(rows) + 1), code, code, "1", payload['data'][0][4], _roc(date_str), "0.00", "0.00"])
+    payload['data'] = rows
+    return payload
+
+
+def _twse_punish(market: SyntheticMarket, params: dict):
+    payload = load_fixture('twse_punish')
+    start, end = market.trading_days[-5], market.trading_days[-1]
+    payload['data'] = [
+        [str(i + 1), _roc(start), code, code, "1", "連續三次", f"{_roc(start)}～{_roc(end)}", "第一次處置", "約每五分鐘撮合一次", ""]
+        for i, code in enumerate(c for c in market.alerted()[::4] if c in market.listed)
+    ]
+    return payload
+
+
+def _tpex_warning(market: SyntheticMarket, params: dict):
+    template = load_fixture('tpex_trading_warning_information')[0]
+    return [
+        dict(template, Date=_roc(date_str, ''), SecuritiesCompanyCode=code, CompanyName=code)
+        for code in market.alerted() if code not in market.listed
+        for date_str in _recent_days(market, 2)
+    ]
+
+
+def _tpex_disposal(market: SyntheticMarket, params: dict):
+    template = load_fixture('tpex_disposal_information')[0]
+    start, end = market.trading_days[-5], market.trading_days[-1]
+    return [
+        dict(template, Date=_roc(start, ''), SecuritiesCompanyCode=code, CompanyName=code,
+             DispositionPeriod=f"{_roc(start, '')}~{_roc(end, '')}")
+        for code in market.alerted()[::4] if code not in market.listed
+    ]
+
+
+def _twtb4u(market: SyntheticMarket, params: dict):
+    payload = load_fixture('twse_twtb4u')
+    payload['tables'][1]['data'] = [[code, code, "", "1,000", "0", "0"] for code in market.codes if code in market.listed]
+    return payload
+
+
+def _tpex_intraday_stat(market: SyntheticMarket, params: dict):
+    payload = load_fixture('tpex_intraday_trading_stat')
+    payload['tables'][0]['data'] = [[code, code, "", "1,000", "0", "0"] for code in market.codes if code not in market.listed]
+    return payload
+
+
+def _finmind(market: SyntheticMarket, params: dict):
+    if params.get('dataset') != 'TaiwanStockPrice':
+        return {'msg': 'success', 'status': 200, 'data': []}
+
+    stock_id = params.get('data_id', '')
+    bars = market.bars_between(stock_id, params.get('start_date', ''), params.get('end_date', '9999-12-31'))
+    return {
+        'msg': 'success',
+        'status': 200,
+        'data': [
+            {'date': bar['date'], 'stock_id': stock_id, 'Trading_Volume': bar['volume'],
+             'Trading_money': int(bar['volume'] * bar['close']), 'open': bar['open'], 'max': bar['high'],
+             'min': bar['low'], 'close': bar['close'], 'spread': 0.0, 'Trading_turnover': bar['volume'] // 2000}
+            for bar in bars
+        ]
+    }
+
+
+# One server answers for every upstream host; the paths do not collide
+ROUTES = {
+    '/exchangeReport/STOCK_DAY': _stock_day,
+    '/exchangeReport/MI_INDEX': _mi_index,
+    '/exchangeReport/TWTB4U': _twtb4u,
+    '/rwd/zh/announcement/notice': _twse_notice,
+    '/rwd/zh/announcement/punish': _twse_punish,
+    '/web/stock/aftertrading/daily_close_quotes/stk_quote_result.php': _tpex_daily_close,
+    '/web/stock/trading/intraday_stat/intraday_trading_stat_result.php': _tpex_intraday_stat,
+    '/openapi/v1/tpex_trading_warning_information': _tpex_warning,
+    '/openapi/v1/tpex_disposal_information': _tpex_disposal,
+    '/api/v4/data': _finmind,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the TWSE / TPEx / FinMind APIs')
+    parser.add_argument('--universe', type=int, default=1000, help='Number of synthetic tickers')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Latency added to every response')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Extra random latency per response')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of requests answered with 503')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    market = SyntheticMarket(synthetic_universe(args.universe), seed=args.seed)
+    server = StubServer(market, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                        error_rate=args.error_rate, host=args.host, port=args.port, seed=args.seed)
+    print(f"Serving {args.universe} tickers at {server.url}")
+    print(f"  export TWSE_BASE_URL={server.url} TPEX_BASE_URL={server.url} FINMIND_API_URL={server.url}/api/v4/data")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
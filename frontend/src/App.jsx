@@ -33,6 +33,7 @@ import StockCardMini from './components/StockCardMini';
 import SimpleMarkdown from './components/SimpleMarkdown';
 import IndustryGroup from './components/IndustryGroup';
 import Header from './components/Header';
+import { expandScanData, tickersByDate } from './scanData';
 import { auth, db, googleProvider } from './firebase';
 import { signInWithPopup, signOut, onAuthStateChanged } from 'firebase/auth';
 import { doc, getDoc, setDoc, collection, onSnapshot } from 'firebase/firestore';
@@ -757,6 +758,9 @@ const DailyChangesSection = ({ changes, portfolio }) => {
 
 // --- 6. 不在掃描結果但在庫存的股票 (簡化版：不使用即時 API) ---
 // --- 6. 不在掃描結果但在庫存的股票 (手動同步 + Firestore 持久化) ---
+// /api/stocks 單次請求的股票數上限 (與伺服器 STOCK_BATCH_MAX_TICKERS 預設一致)
+const STOCKS_BATCH_SIZE = 50;
+
 const UnlistedPortfolioSection = ({ portfolio, scanResultTickers, user, stockHistoryMap = {} }) => {
   const [syncedData, setSyncedData] = useState({});
   const [loading, setLoading] = useState(false);
@@ -785,55 +789,50 @@ const UnlistedPortfolioSection = ({ portfolio, scanResultTickers, user, stockHis
     }
     setLoading(true);
 
-    // 改為序列執行 (Sequential) 以避免觸發 API Rate Limit (403 Forbidden)
-    for (const stock of unlistedStocks) {
-      try {
-        // Add cache-busting timestamp
-        const res = await fetch(`/api/stock?ticker=${stock.ticker}&t=${new Date().getTime()}`);
+    // 一次請求取得所有庫存 (伺服器端併發抓取並共用快取)，每批最多 STOCKS_BATCH_SIZE 檔
+    const tickers = [...new Set(unlistedStocks.map(stock => stock.ticker))].sort();
+    try {
+      for (let i = 0; i < tickers.length; i += STOCKS_BATCH_SIZE) {
+        const batch = tickers.slice(i, i + STOCKS_BATCH_SIZE);
+        const res = await fetch(`/api/stocks?tickers=${batch.map(encodeURIComponent).join(',')}`);
         const text = await res.text(); // 先讀取文字，避免 JSON 解析錯誤
 
+        let result;
         try {
-          if (!res.ok) {
-            console.error(`API Error Status: ${res.status} ${res.statusText}`);
-            try {
-              const errorJson = JSON.parse(text);
-              throw new Error(errorJson.error || 'API Error');
-            } catch (e) {
-              // If text is not JSON (e.g. empty or HTML), throw original text or status
-              throw new Error(`API Error: ${res.status} ${res.statusText}`);
-            }
-          }
-          const apiData = JSON.parse(text);
-
-          // 寫入 Firestore
-          await setDoc(doc(db, "users", user.uid, "portfolioAnalysis", stock.ticker), {
-            ticker: stock.ticker,
-            data: apiData,
-            lastUpdated: new Date().toISOString()
-          });
-
-          // 成功後稍微暫停，避免太快
-          await new Promise(resolve => setTimeout(resolve, 1000));
-
+          result = JSON.parse(text);
         } catch (jsonError) {
-          console.error(`Sync failed for ${stock.ticker}: Not valid JSON`, text.substring(0, 100)); // 只顯示前100字
+          console.error(`Sync failed: Not valid JSON`, text.substring(0, 100)); // 只顯示前100字
           // 如果是 HTML (通常是 404/500), 提示可能是環境問題
           if (text.trim().startsWith('<')) {
             throw new Error("API 回傳異常 (HTML)。請確認 Python Server (backend/server.py) 是否已啟動。");
           }
-          throw jsonError;
+          throw new Error(`API Error: ${res.status} ${res.statusText}`);
         }
-      } catch (err) {
-        console.error(`Sync failed for ${stock.ticker}`, err);
-        // 累積錯誤最後顯示，或顯示在 console
-        if (err.code === 'permission-denied') {
-          alert("權限不足：請檢查 Firebase Firestore Rules 設定。");
+        if (!res.ok) {
+          console.error(`API Error Status: ${res.status} ${res.statusText}`);
+          throw new Error(result.error || `API Error: ${res.status} ${res.statusText}`);
         }
-        // 若遇到 403，顯示提示並中斷後續
-        if (err.message.includes('403') || err.message.includes('Forbidden')) {
-          alert(`同步失敗 (${stock.ticker})：請求過於頻繁被拒 (403)。請稍後再試。`);
-          break;
+
+        if (result.missing?.length) {
+          console.error(`Sync failed for ${result.missing.join(', ')}: Stock not found`);
         }
+
+        // 寫入 Firestore
+        const lastUpdated = new Date().toISOString();
+        await Promise.all(Object.entries(result.stocks).map(([ticker, apiData]) =>
+          setDoc(doc(db, "users", user.uid, "portfolioAnalysis", ticker), {
+            ticker,
+            data: apiData,
+            lastUpdated
+          })
+        ));
+      }
+    } catch (err) {
+      console.error(`Sync failed`, err);
+      if (err.code === 'permission-denied') {
+        alert("權限不足：請檢查 Firebase Firestore Rules 設定。");
+      } else if (err.message.includes('403') || err.message.includes('Forbidden')) {
+        alert(`同步失敗：請求過於頻繁被拒 (403)。請稍後再試。`);
       }
     }
 
@@ -1154,7 +1153,7 @@ export default function App() {
 
       const response = await fetch(`${DATA_BASE_URL}/daily_scan_results.json?v=${cacheBuster}`);
       if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-      const result = await response.json();
+      const result = expandScanData(await response.json());
       setData(result);
 
       // [NEW] Fetch Market Ranks
@@ -1187,7 +1186,18 @@ export default function App() {
           const indexData = await indexRes.json();
           const last30Days = indexData.slice(0, 30); // Limit to last 30 days
 
-          // 1. 讀取快取
+          // 0. 歷史入選索引：一次請求取得最近所有日期的入選股票
+          let indexedTickers = {};
+          try {
+            const historyIndexRes = await fetch(`${DATA_BASE_URL}/history_index.json?v=${cacheBuster}`);
+            if (historyIndexRes.ok) {
+              indexedTickers = tickersByDate(await historyIndexRes.json());
+            }
+          } catch (err) {
+            console.warn("History index not available, falling back to daily files");
+          }
+
+          // 1. 讀取快取 (索引尚未涵蓋的舊日期才需要逐日下載)
           const CACHE_KEY = 'trendguard_history_cache_v1';
           let cache = {};
           try {
@@ -1197,7 +1207,7 @@ export default function App() {
           }
 
           // 2. 找出哪些日期需要下載 (快取中沒有的)
-          const datesToFetch = last30Days.filter(article => !cache[article.date]);
+          const datesToFetch = last30Days.filter(article => !indexedTickers[article.date] && !cache[article.date]);
 
           // 3. 平行下載缺失的日期
           if (datesToFetch.length > 0) {
@@ -1208,7 +1218,7 @@ export default function App() {
                   const histRes = await fetch(`${DATA_BASE_URL}/history/${article.date}.json`);
                   if (histRes.ok) {
                     const histData = await histRes.json();
-                    // 只儲存 tickers 陣列以節省空間
+                    // 只儲存 tickers 陣列以節省空間 (新舊格式的 stocks[].ticker 相同，無需還原)
                     cache[article.date] = (histData.stocks || []).map(s => s.ticker);
                   }
                 } catch (e) {
@@ -1227,7 +1237,7 @@ export default function App() {
           // 5. 構建 stockHistoryMap (Ticker -> List of Dates)
           const historyMap = {};
           last30Days.forEach(article => {
-            const tickers = cache[article.date] || [];
+            const tickers = indexedTickers[article.date] || cache[article.date] || [];
             tickers.forEach(ticker => {
               if (!historyMap[ticker]) {
                 historyMap[ticker] = [];
@@ -0,0 +1,24 @@
+// 文章索引分頁 (對應 scripts/articles_index.py)
+// - articles_index.json: 最近的文章
+// - articles_index/pages.json: { total, pages: [{ month, count }] } (新到舊)
+// - articles_index/{YYYY-MM}.json: 該月全部文章
+
+// 合併文章並依日期排序 (新到舊)，同日期以後者為準
+export const mergeArticles = (articles, page = []) => {
+  const byDate = new Map();
+  [...articles, ...page].forEach(article => byDate.set(article.date, article));
+  return [...byDate.values()].sort((a, b) => (a.date < b.date ? 1 : a.date > b.date ? -1 : 0));
+};
+
+// 尚需下載的月分頁 (新到舊)：已載入的文章已涵蓋整個月份者略過
+export const pendingMonths = (pagesIndex, articles) => {
+  if (!pagesIndex || !Array.isArray(pagesIndex.pages)) return [];
+  const loaded = {};
+  articles.forEach(article => {
+    const month = article.date.substring(0, 7);
+    loaded[month] = (loaded[month] || 0) + 1;
+  });
+  return pagesIndex.pages
+    .filter(page => (loaded[page.month] || 0) < page.count)
+    .map(page => page.month);
+};
@@ -0,0 +1,27 @@
+import { describe, it, expect } from 'vitest';
+import { mergeArticles, pendingMonths } from './articleIndex';
+
+const article = (date, title = date) => ({ date, title });
+
+describe('mergeArticles', () => {
+  it('sorts newest first and replaces articles of the same date', () => {
+    const merged = mergeArticles(
+      [article('2026-10-16'), article('2026-10-15', 'old')],
+      [article('2026-10-15', 'new'), article('2026-09-30')]
+    );
+    expect(merged.map(a => a.date)).toEqual(['2026-10-16', '2026-10-15', '2026-09-30']);
+    expect(merged[1].title).toBe('new');
+  });
+});
+
+describe('pendingMonths', () => {
+  it('skips months already covered by the recent list', () => {
+    const pages = { total: 5, pages: [{ month: '2026-10', count: 2 }, { month: '2026-09', count: 2 }, { month: '2026-08', count: 1 }] };
+    const recent = [article('2026-10-16'), article('2026-10-15'), article('2026-09-30')];
+    expect(pendingMonths(pages, recent)).toEqual(['2026-09', '2026-08']);
+  });
+
+  it('returns nothing without a page list', () => {
+    expect(pendingMonths(null, [article('2026-10-16')])).toEqual([]);
+  });
+});
@@ -4,6 +4,11 @@ import { Calendar, ChevronRight, Loader2, Sparkles, FileText } from 'lucide-reac
 import Header from '../components/Header';
 import { auth, googleProvider } from '../firebase';
 import { signInWithPopup, signOut, onAuthStateChanged } from 'firebase/auth';
+import { mergeArticles, pendingMonths } from '../articleIndex';
+
+const BASE_URL = import.meta.env.PROD
+    ? 'https://raw.githubusercontent.com/jet23058/TrendGuard/data'
+    : '/data';
 
 const ArticleList = () => {
     const [allArticles, setAllArticles] = useState([]);
@@ -13,6 +18,8 @@ const ArticleList = () => {
     const [hasMore, setHasMore] = useState(true);
     
     const observer = useRef();
+    const pendingPages = useRef([]);
+    const loadingPage = useRef(false);
     const ITEMS_PER_PAGE = 30;
 
     // Auth listener (Simplified for Header support)
@@ -39,6 +46,32 @@ const ArticleList = () => {
         }
     };
 
+    // 顯示下一批文章；已載入的文章都顯示完時，再下載下一個月分頁
+    const loadMore = useCallback(async () => {
+        if (loadingPage.current) return;
+        let articles = allArticles;
+
+        if (displayedArticles.length >= articles.length && pendingPages.current.length > 0) {
+            loadingPage.current = true;
+            const month = pendingPages.current.shift();
+            try {
+                const res = await fetch(`${BASE_URL}/articles_index/${month}.json`);
+                if (res.ok) {
+                    articles = mergeArticles(articles, await res.json());
+                    setAllArticles(articles);
+                }
+            } catch (err) {
+                console.error(`Error fetching articles page ${month}:`, err);
+            } finally {
+                loadingPage.current = false;
+            }
+        }
+
+        const nextBatch = articles.slice(0, displayedArticles.length + ITEMS_PER_PAGE);
+        setDisplayedArticles(nextBatch);
+        setHasMore(nextBatch.length < articles.length || pendingPages.current.length > 0);
+    }, [allArticles, displayedArticles]);
+
     // Infinite Scroll Observer Callback
     const lastArticleRef = useCallback(node => {
         if (loading) return;
@@ -46,40 +79,29 @@ const ArticleList = () => {
         
         observer.current = new IntersectionObserver(entries => {
             if (entries[0].isIntersecting && hasMore) {
-                setDisplayedArticles(prev => {
-                    const currentLen = prev.length;
-                    const nextLen = currentLen + ITEMS_PER_PAGE;
-                    const nextBatch = allArticles.slice(0, nextLen);
-                    
-                    if (nextLen >= allArticles.length) {
-                        setHasMore(false);
-                    }
-                    return nextBatch;
-                });
+                loadMore();
             }
         });
         
         if (node) observer.current.observe(node);
-    }, [loading, hasMore, allArticles]);
+    }, [loading, hasMore, loadMore]);
 
     useEffect(() => {
         const fetchArticles = async () => {
-            const BASE_URL = import.meta.env.PROD
-                ? 'https://raw.githubusercontent.com/jet23058/TrendGuard/data'
-                : '/data';
-
             try {
-                // Fetch the index file generated by backend
-                const res = await fetch(`${BASE_URL}/articles_index.json`);
+                // 最近的文章 + 分頁清單 (較舊的月份捲動到底時才下載)
+                const [res, pagesRes] = await Promise.all([
+                    fetch(`${BASE_URL}/articles_index.json`),
+                    fetch(`${BASE_URL}/articles_index/pages.json`).catch(() => null)
+                ]);
                 if (res.ok) {
-                    let data = await res.json();
-                    
-                    // Sort by date descending (Newest first)
-                    data.sort((a, b) => new Date(b.date) - new Date(a.date));
-                    
+                    const data = mergeArticles(await res.json());
+                    const pagesIndex = pagesRes && pagesRes.ok ? await pagesRes.json() : null;
+                    pendingPages.current = pendingMonths(pagesIndex, data);
+
                     setAllArticles(data);
                     setDisplayedArticles(data.slice(0, ITEMS_PER_PAGE));
-                    if (data.length <= ITEMS_PER_PAGE) {
+                    if (data.length <= ITEMS_PER_PAGE && pendingPages.current.length === 0) {
                         setHasMore(false);
                     }
                 } else {
@@ -4,6 +4,7 @@ import { ArrowLeft, Calendar, TrendingUp, Activity, AlertTriangle, ChevronRight,
 import StockCardMini from '../components/StockCardMini';
 import SimpleMarkdown from '../components/SimpleMarkdown';
 import IndustryGroup from '../components/IndustryGroup';
+import { expandScanData } from '../scanData';
 
 const DailyReport = () => {
     const { date } = useParams();
@@ -23,7 +24,7 @@ const DailyReport = () => {
                 // 1. Fetch Core Data (Scan Results)
                 const histRes = await fetch(`${BASE_URL}/history/${date}.json`);
                 if (histRes.ok) {
-                    const scanData = await histRes.json();
+                    const scanData = expandScanData(await histRes.json());
                     setData(scanData);
                 }
 
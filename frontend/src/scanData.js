@@ -0,0 +1,60 @@
+// 掃描結果精簡格式 (format: 2) 還原，對應 scripts/scan_output.py
+// - ohlc 為欄位陣列 { date: [...], open: [...], ... } -> 還原為每根 K 線一個物件
+// - changes.new / continued / removed 為股票代碼 -> 還原為完整股票物件
+// 舊格式 (無 format 欄位) 原樣回傳
+
+export const SCAN_FORMAT_VERSION = 2;
+
+const expandOhlc = (ohlc) => {
+  if (!ohlc || Array.isArray(ohlc)) return ohlc;
+  const keys = Object.keys(ohlc);
+  const length = Math.max(0, ...keys.map(key => ohlc[key].length));
+  return Array.from({ length }, (_, i) => {
+    const row = {};
+    keys.forEach(key => { row[key] = ohlc[key][i]; });
+    return row;
+  });
+};
+
+const expandStock = (stock) => (
+  stock && stock.ohlc && !Array.isArray(stock.ohlc) ? { ...stock, ohlc: expandOhlc(stock.ohlc) } : stock
+);
+
+export const expandScanData = (data) => {
+  if (!data || data.format !== SCAN_FORMAT_VERSION) return data;
+
+  const { format: _format, ...rest } = data;
+  const stocks = (data.stocks || []).map(expandStock);
+  const expanded = { ...rest, stocks };
+
+  if (data.changes) {
+    const byTicker = {};
+    stocks.forEach(stock => { byTicker[stock.ticker] = stock; });
+    (data.changes.removedStocks || []).forEach(stock => { byTicker[stock.ticker] = expandStock(stock); });
+    const resolve = (tickers = []) => tickers.map(ticker => byTicker[ticker]).filter(Boolean);
+
+    expanded.changes = {
+      new: resolve(data.changes.new),
+      continued: resolve(data.changes.continued),
+      removed: resolve(data.changes.removed)
+    };
+  }
+  return expanded;
+};
+
+// 歷史入選索引 (history_index.json，對應 scripts/history_index.py) -> { date: [入選代碼] }
+// 區間內每個掃描日都有鍵 (無入選為空陣列)；當日剔除 (removed) 的股票不列入
+export const tickersByDate = (index) => {
+  const result = {};
+  if (!index || !Array.isArray(index.fields)) return result;
+  const dateCol = index.fields.indexOf('date');
+  const tickerCol = index.fields.indexOf('ticker');
+  const statusCol = index.fields.indexOf('status');
+
+  (index.dates || []).forEach(date => { result[date] = []; });
+  (index.rows || []).forEach(row => {
+    if (row[statusCol] === 'removed') return;
+    (result[row[dateCol]] = result[row[dateCol]] || []).push(row[tickerCol]);
+  });
+  return result;
+};
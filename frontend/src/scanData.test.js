@@ -0,0 +1,57 @@
+import { describe, it, expect } from 'vitest';
+import { expandScanData, tickersByDate } from './scanData';
+
+const stock = (ticker, close) => ({
+  ticker,
+  name: ticker,
+  ohlc: [
+    { date: '2024-03-01', close: close - 1, ma5: null },
+    { date: '2024-03-04', close, ma5: close - 2 }
+  ]
+});
+
+const compactStock = (ticker, close) => ({
+  ticker,
+  name: ticker,
+  ohlc: { date: ['2024-03-01', '2024-03-04'], close: [close - 1, close], ma5: [null, close - 2] }
+});
+
+describe('expandScanData', () => {
+  it('restores OHLC rows and change references', () => {
+    const data = expandScanData({
+      format: 2,
+      date: '2024-03-04',
+      stocks: [compactStock('2330', 600), compactStock('2317', 150)],
+      changes: { new: ['2330'], continued: ['2317'], removed: ['1101'], removedStocks: [compactStock('1101', 40)] }
+    });
+
+    expect(data.format).toBeUndefined();
+    expect(data.stocks[0]).toEqual(stock('2330', 600));
+    expect(data.changes.new).toEqual([stock('2330', 600)]);
+    expect(data.changes.continued[0]).toBe(data.stocks[1]);
+    expect(data.changes.removed).toEqual([stock('1101', 40)]);
+  });
+
+  it('returns the legacy format unchanged', () => {
+    const legacy = { stocks: [stock('2330', 600)], changes: { new: [stock('2330', 600)], continued: [], removed: [] } };
+    expect(expandScanData(legacy)).toBe(legacy);
+    expect(expandScanData(null)).toBeNull();
+  });
+});
+
+describe('tickersByDate', () => {
+  it('groups listed tickers by date and skips removed rows', () => {
+    const index = {
+      format: 1,
+      fields: ['date', 'ticker', 'status', 'price', 'streak', 'priority'],
+      dates: ['2024-03-01', '2024-03-04', '2024-03-05'],
+      rows: [
+        ['2024-03-01', '1101', 'new', 40, 2, 92],
+        ['2024-03-04', '1101', 'removed', 40, 2, 92],
+        ['2024-03-04', '2330', 'new', 600, 3, 93]
+      ]
+    };
+    expect(tickersByDate(index)).toEqual({ '2024-03-01': ['1101'], '2024-03-04': ['2330'], '2024-03-05': [] });
+    expect(tickersByDate(null)).toEqual({});
+  });
+});
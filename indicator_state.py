@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Incremental Per-Ticker Indicator State
+
+Keeps the rolling and recursive indicators of one stock up to its last bar,
+so that appending a new daily bar updates everything in constant time
+instead of recomputing ~120 rows:
+
+- MA5 / MA10 / MA20 / MA60: rolling sums over a close ring buffer
+- KD (9, 3, 3): 9-bar high/low ring buffers + last K and D
+- 20-bar previous high (excluding the current bar)
+- Consecutive red K streak (flat low-volume bars break the streak)
+- 5-bar volume average and 20-bar close volatility
+
+Semantics match the one-pass calculation in indicators.py (MA windows,
+KD with 1/3 smoothing, RSV filled with 50, red K streak threshold).
+
+PeriodState runs the same indicators over weekly or monthly bars. It is fed
+daily bars: completed periods are folded into an IndicatorState, and the
+period in progress is one partial bar that each new day extends.
+
+States of all tickers are persisted together in one JSON file.
+
+Environment Variable:
+    INDICATOR_STATE_FILE: State file used by scripts/update_daily.py
+                          (default: data/state/indicators.json)
+
+Usage:
+    from indicator_state import IndicatorState, IndicatorStateStore
+
+    store = IndicatorStateStore('data/state/indicators.json')
+    states = store.load()
+    state = states.get('2330') or IndicatorState.from_bars(bars)
+    state.update(today_bar)
+    snapshot = state.snapshot()
+    store.save(states)
+
+    weekly = PeriodState.from_bars('W', bars)
+    weekly.update(today_bar)            # extends this week's bar
+    weekly.snapshot()
+"""
+
+import json
+import math
+import os
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from bar_store import BAR_FIELDS, merge_bar, period_key
+from indicators import (
+    KD_PERIOD, KD_WEIGHT, MA_WINDOWS, PREV_HIGH_DAYS, VOLATILITY_WINDOW, VOLUME_MA_WINDOW, is_red_bar,
+    volatility as indicator_volatility
+)
+
+# Longest window that needs raw closes kept
+_CLOSE_BUFFER = max(MA_WINDOWS) + 1
+
+
+class IndicatorState:
+    """Indicator state of one ticker, updated one bar at a time"""
+
+    def __init__(self):
+        self.last_date: Optional[str] = None
+        self.count = 0
+        self.last_bar: Optional[Dict] = None
+        self.prev_close: Optional[float] = None
+
+        # Ring buffers; the close buffer keeps one extra bar to drop from the sums
+        self.closes = deque(maxlen=_CLOSE_BUFFER)
+        self.highs = deque(maxlen=PREV_HIGH_DAYS + 1)
+        self.lows = deque(maxlen=KD_PERIOD)
+        self.volumes = deque(maxlen=VOLUME_MA_WINDOW)
+        self.close_sums = {window: 0.0 for window in MA_WINDOWS}
+
+        self.k: Optional[float] = None
+        self.d: Optional[float] = None
+        self.consecutive_red = 0
+
+    @classmethod
+    def from_bars(cls, bars: Iterable[Dict]) -> 'IndicatorState':
+        """Build a state by replaying bars in date order"""
+        state = cls()
+        for bar in bars:
+            state.update(bar)
+        return state
+
+    def update(self, bar: Dict) -> bool:
+        """
+        Append one daily bar
+
+        Args:
+            bar: {'date', 'open', 'high', 'low', 'close', 'volume'}
+
+        Returns:
+            False if the bar is not newer than the last bar (ignored)
+        """
+        if self.last_date is not None and bar['date'] <= self.last_date:
+            return False
+
+        open_price = float(bar['open'])
+        high = float(bar['high'])
+        low = float(bar['low'])
+        close = float(bar['close'])
+        volume = int(bar['volume'])
+
+        self.prev_close = self.closes[-1] if self.closes else None
+
+        # Rolling sums: add the new close, drop the one leaving each window
+        self.closes.append(close)
+        for window in MA_WINDOWS:
+            self.close_sums[window] += close
+            if len(self.closes) > window:
+                self.close_sums[window] -= self.closes[-window - 1]
+
+        if self.count % _CLOSE_BUFFER == 0:
+            # Re-sum once per buffer length to bound floating point drift (amortized O(1))
+            self._resync_sums()
+
+        self.highs.append(high)
+        self.lows.append(low)
+        self.volumes.append(volume)
+        self.count += 1
+
+        # RSV over the last 9 bars (50 until the window is full or when flat)
+        rsv = 50.0
+        if self.count >= KD_PERIOD:
+            high_9 = max(list(self.highs)[-KD_PERIOD:])
+            low_9 = min(self.lows)
+            if high_9 != low_9:
+                rsv = (close - low_9) / (high_9 - low_9) * 100
+
+        # The first RSV is always 50, the seed of indicators.smooth_kd
+        self.k = rsv if self.k is None else self.k + KD_WEIGHT * (rsv - self.k)
+        self.d = self.k if self.d is None else self.d + KD_WEIGHT * (self.k - self.d)
+
+        self.consecutive_red = self.consecutive_red + 1 if is_red_bar(open_price, close, volume) else 0
+
+        self.last_date = bar['date']
+        self.last_bar = {
+            'date': bar['date'], 'open': open_price, 'high': high,
+            'low': low, 'close': close, 'volume': volume
+        }
+        return True
+
+    def ma(self, window: int) -> Optional[float]:
+        """N-bar moving average of the close; None until N bars are seen"""
+        if self.count < window:
+            return None
+        return self.close_sums[window] / window
+
+    def prev_high(self) -> Optional[float]:
+        """Highest high of the previous 20 bars (excluding the last bar)"""
+        if len(self.highs) < 2:
+            return None
+        return max(list(self.highs)[:-1])
+
+    def volatility(self) -> Optional[float]:
+        """Coefficient of variation (sample std / mean) of the last 20 closes"""
+        return indicator_volatility(list(self.closes)[-VOLATILITY_WINDOW:])
+
+    def snapshot(self) -> Dict:
+        """Latest indicator values"""
+        change_pct = None
+        if self.prev_close:
+            change_pct = (self.last_bar['close'] - self.prev_close) / self.prev_close * 100
+
+        return {
+            'date': self.last_date,
+            'count': self.count,
+            'close': self.last_bar['close'] if self.last_bar else None,
+            'change_pct': change_pct,
+            'prev_high': self.prev_high(),
+            'ma5': self.ma(5),
+            'ma10': self.ma(10),
+            'ma20': self.ma(20),
+            'ma60': self.ma(60),
+            'k': self.k,
+            'd': self.d,
+            'consecutive_red': self.consecutive_red,
+            'vol_ma5': sum(self.volumes) / len(self.volumes) if self.volumes else None,
+            'volatility': self.volatility()
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            'last_date': self.last_date,
+            'count': self.count,
+            'last_bar': self.last_bar,
+            'prev_close': self.prev_close,
+            'closes': list(self.closes),
+            'highs': list(self.highs),
+            'lows': list(self.lows),
+            'volumes': list(self.volumes),
+            'k': self.k,
+            'd': self.d,
+            'consecutive_red': self.consecutive_red
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'IndicatorState':
+        state = cls()
+        state.last_date = data['last_date']
+        state.count = data['count']
+        state.last_bar = data['last_bar']
+        state.prev_close = data['prev_close']
+        state.closes.extend(data['closes'])
+        state.highs.extend(data['highs'])
+        state.lows.extend(data['lows'])
+        state.volumes.extend(data['volumes'])
+        state.k = data['k']
+        state.d = data['d']
+        state.consecutive_red = data['consecutive_red']
+
+        state._resync_sums()
+        return state
+
+    def _resync_sums(self):
+        """Rebuild the rolling sums exactly from the close buffer"""
+        closes = list(self.closes)
+        for window in MA_WINDOWS:
+            self.close_sums[window] = math.fsum(closes[-window:])
+
+
+class PeriodState:
+    """Indicator state of one ticker over weekly ('W') or monthly ('M') bars"""
+
+    def __init__(self, timeframe: str):
+        self.timeframe = timeframe
+        # Indicators over completed periods
+        self.completed = IndicatorState()
+        # Partial bar of the period in progress
+        self.current: Optional[Dict] = None
+        self.period: Optional[str] = None
+        # Last daily bar applied
+        self.last_date: Optional[str] = None
+
+    @classmethod
+    def from_bars(cls, timeframe: str, bars: Iterable[Dict]) -> 'PeriodState':
+        """Build a state by replaying daily bars in date order"""
+        state = cls(timeframe)
+        for bar in bars:
+            state.update(bar)
+        return state
+
+    def update(self, bar: Dict) -> bool:
+        """
+        Append one daily bar
+
+        Only the current period bar changes; the completed state is updated
+        once, when the first bar of the next period arrives.
+
+        Returns:
+            False if the bar is not newer than the last bar (ignored)
+        """
+        if self.last_date is not None and bar['date'] <= self.last_date:
+            return False
+
+        key = period_key(bar['date'], self.timeframe)
+        if key != self.period:
+            if self.current is not None:
+                self.completed.update(self.current)
+            self.period = key
+            self.current = merge_bar(None, bar)
+        else:
+            self.current = merge_bar(self.current, bar)
+        self.last_date = bar['date']
+        return True
+
+    @property
+    def count(self) -> int:
+        """Number of period bars, including the one in progress"""
+        return self.completed.count + (1 if self.current is not None else 0)
+
+    def view(self) -> IndicatorState:
+        """Indicator state including the period in progress (a copy)"""
+        state = IndicatorState.from_dict(self.completed.to_dict())
+        if self.current is not None:
+            state.update(self.current)
+        return state
+
+    def snapshot(self) -> Dict:
+        """Latest indicator values, the period in progress counting as the last bar"""
+        return self.view().snapshot()
+
+    def to_dict(self) -> Dict:
+        return {
+            'timeframe': self.timeframe,
+            'period': self.period,
+            'current': self.current,
+            'last_date': self.last_date,
+            'completed': self.completed.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PeriodState':
+        state = cls(data['timeframe'])
+        state.period = data['period']
+        state.current = {field: data['current'][field] for field in BAR_FIELDS} if data['current'] else None
+        state.last_date = data['last_date']
+        state.completed = IndicatorState.from_dict(data['completed'])
+        return state
+
+
+class IndicatorStateStore:
+    """Persist the indicator states of all tickers in one JSON file"""
+
+    def __init__(self, path, state_cls=IndicatorState):
+        self.path = Path(path)
+        # IndicatorState or PeriodState
+        self.state_cls = state_cls
+
+    def load(self) -> Dict[str, IndicatorState]:
+        """Load all states; a missing or corrupted file gives an empty dict"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        states = {}
+        for code, data in raw.get('states', {}).items():
+            try:
+                states[code] = self.state_cls.from_dict(data)
+            except (KeyError, TypeError):
+                continue
+        return states
+
+    def save(self, states: Dict[str, IndicatorState]):
+        """Write all states atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'states': {code: s.to_dict() for code, s in states.items()}}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
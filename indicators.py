@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Shared Technical Indicators
+
+The one implementation of the indicators shown and screened by the scanner
+(scripts/update_daily.py), the Flask backend, the Vercel API and the
+Streamlit app. All series are computed in one pass over the OHLCV columns:
+
+- MA5 / MA10 / MA20 / MA60 of the close (None until the window is full)
+- KD (9, 3, 3): RSV over 9 bars (50 until the window is full or when flat),
+  K = 2/3 * previous K + 1/3 * RSV, D = 2/3 * previous D + 1/3 * K, seeded at 50
+- 5-bar volume average
+- Latest values: consecutive red K streak (flat low-volume bars break the
+  streak), 20-bar close volatility and the previous 20-bar high
+
+NumPy is used when installed (cumulative sums and sliding windows); the
+serverless runtime without NumPy gets a pure-Python O(n) fallback with
+running sums and monotonic queues. Both give the same values.
+
+indicator_state.py keeps the same indicators incrementally, one bar at a time.
+
+Usage:
+    from indicators import compute_indicators
+
+    result = compute_indicators(opens, highs, lows, closes, volumes)
+    result['ma20'][-1], result['k'][-1], result['consecutive_red']
+"""
+
+import math
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+MA_WINDOWS = (5, 10, 20, 60)
+KD_PERIOD = 9
+# K and D move 1/3 of the way to the new RSV / K each bar
+KD_WEIGHT = 1 / 3
+KD_SEED = 50.0
+PREV_HIGH_DAYS = 20
+VOLUME_MA_WINDOW = 5
+VOLATILITY_WINDOW = 20
+
+# 判斷無量一字線的成交量門檻 (張)
+FLAT_LOW_VOLUME = 100
+
+
+def is_red_bar(open_price: float, close: float, volume: float) -> bool:
+    """Close >= open, excluding flat bars with less than FLAT_LOW_VOLUME lots"""
+    is_flat_low_vol = close == open_price and volume < FLAT_LOW_VOLUME
+    return close >= open_price and not is_flat_low_vol
+
+
+def smooth_kd(rsv: Sequence[float]) -> tuple:
+    """RSV series -> (K, D) lists with the 1/3 smoothing seeded at 50"""
+    k_values, d_values = [], []
+    k = d = KD_SEED
+    for value in rsv:
+        k += KD_WEIGHT * (value - k)
+        d += KD_WEIGHT * (k - d)
+        k_values.append(k)
+        d_values.append(d)
+    return k_values, d_values
+
+
+def consecutive_red(opens: Sequence[float], closes: Sequence[float], volumes: Sequence[float]) -> int:
+    """Red K bars in a row up to the last bar"""
+    streak = 0
+    for i in range(len(closes) - 1, -1, -1):
+        if not is_red_bar(opens[i], closes[i], volumes[i]):
+            break
+        streak += 1
+    return streak
+
+
+def volatility(closes: Sequence[float]) -> Optional[float]:
+    """Coefficient of variation (sample std / mean) of the last 20 closes"""
+    window = list(closes[-VOLATILITY_WINDOW:])
+    if len(window) < 2:
+        return None
+    mean = sum(window) / len(window)
+    variance = sum((c - mean) ** 2 for c in window) / (len(window) - 1)
+    return math.sqrt(variance) / mean if mean else None
+
+
+def prev_high(highs: Sequence[float]) -> Optional[float]:
+    """Highest high of the previous 20 bars (excluding the last bar)"""
+    if len(highs) < 2:
+        return None
+    return max(highs[-(PREV_HIGH_DAYS + 1):-1])
+
+
+def _rolling_mean_py(values: Sequence[float], window: int) -> List[Optional[float]]:
+    result: List[Optional[float]] = []
+    total = 0.0
+    for i, value in enumerate(values):
+        total += value
+        if i >= window:
+            total -= values[i - window]
+        result.append(total / window if i >= window - 1 else None)
+    return result
+
+
+def _rolling_extreme_py(values: Sequence[float], window: int, highest: bool) -> List[float]:
+    """Max (or min) of the last `window` values at each bar, with a monotonic queue"""
+    result = []
+    queue: deque = deque()
+    for i, value in enumerate(values):
+        while queue and (values[queue[-1]] <= value if highest else values[queue[-1]] >= value):
+            queue.pop()
+        queue.append(i)
+        if queue[0] <= i - window:
+            queue.popleft()
+        result.append(values[queue[0]])
+    return result
+
+
+def _rsv_py(highs, lows, closes) -> List[float]:
+    high_9 = _rolling_extreme_py(highs, KD_PERIOD, highest=True)
+    low_9 = _rolling_extreme_py(lows, KD_PERIOD, highest=False)
+    rsv = []
+    for i, close in enumerate(closes):
+        if i < KD_PERIOD - 1 or high_9[i] == low_9[i]:
+            rsv.append(50.0)
+        else:
+            rsv.append((close - low_9[i]) / (high_9[i] - low_9[i]) * 100)
+    return rsv
+
+
+def _rolling_mean_np(values, window: int) -> List[Optional[float]]:
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        sums = np.cumsum(np.concatenate(([0.0], values)))
+        result[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return [None if math.isnan(v) else v for v in result.tolist()]
+
+
+def _rsv_np(highs, lows, closes) -> List[float]:
+    rsv = np.full(len(closes), 50.0)
+    if len(closes) >= KD_PERIOD:
+        windows = np.lib.stride_tricks.sliding_window_view
+        high_9 = windows(highs, KD_PERIOD).max(axis=1)
+        low_9 = windows(lows, KD_PERIOD).min(axis=1)
+        spread = high_9 - low_9
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = (closes[KD_PERIOD - 1:] - low_9) / spread * 100
+        rsv[KD_PERIOD - 1:] = np.where(spread == 0, 50.0, values)
+    return rsv.tolist()
+
+
+def compute_indicators(opens: Sequence[float], highs: Sequence[float], lows: Sequence[float],
+                       closes: Sequence[float], volumes: Sequence[float]) -> Dict:
+    """
+    Compute every indicator of a bar series (oldest first)
+
+    Args:
+        opens, highs, lows, closes, volumes: Equal-length columns (lists or arrays; volume in lots)
+
+    Returns:
+        Per-bar lists 'ma5', 'ma10', 'ma20', 'ma60' (None until full), 'k', 'd',
+        'vol_ma5' (average of the available bars until full), and the latest
+        'consecutive_red', 'volatility' and 'prev_high'
+    """
+    if HAS_NUMPY:
+        columns = [np.asarray(column, dtype=np.float64) for column in (opens, highs, lows, closes, volumes)]
+        opens, highs, lows, closes, volumes = columns
+        mas = {window: _rolling_mean_np(closes, window) for window in MA_WINDOWS}
+        rsv = _rsv_np(highs, lows, closes)
+        vol_ma = _rolling_mean_np(volumes, VOLUME_MA_WINDOW)
+        opens, highs, closes, volumes = opens.tolist(), highs.tolist(), closes.tolist(), volumes.tolist()
+    else:
+        opens, highs, lows, closes, volumes = (
+            [float(v) for v in column] for column in (opens, highs, lows, closes, volumes)
+        )
+        mas = {window: _rolling_mean_py(closes, window) for window in MA_WINDOWS}
+        rsv = _rsv_py(highs, lows, closes)
+        vol_ma = _rolling_mean_py(volumes, VOLUME_MA_WINDOW)
+
+    k_values, d_values = smooth_kd(rsv)
+    # Shorter histories show the average of the bars they have
+    for i in range(min(VOLUME_MA_WINDOW - 1, len(volumes))):
+        vol_ma[i] = sum(volumes[:i + 1]) / (i + 1)
+
+    result = {f'ma{window}': values for window, values in mas.items()}
+    result.update({
+        'k': k_values,
+        'd': d_values,
+        'vol_ma5': vol_ma,
+        'consecutive_red': consecutive_red(opens, closes, volumes),
+        'volatility': volatility(closes),
+        'prev_high': prev_high(highs)
+    })
+    return result
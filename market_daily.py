@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Bulk Whole-Market Daily Quote Ingestion
+
+Instead of one STOCK_DAY request per stock per month, this module downloads
+the full-market daily quote table once per trading day and splits it into
+per-stock bars:
+
+1. TWSE (上市) - MI_INDEX with type=ALLBUT0999
+2. TPEx (上櫃) - daily close quotes
+
+The bars are written into the local BarStore, so a nightly scan costs
+two requests per trading day regardless of how many tickers are scanned.
+Holidays and typhoon closures known to the trading calendar are skipped
+without probing; a weekday on which TWSE answers with its "no data" stat
+(and TPEx has no quotes) is recorded as a closure so later runs skip it too.
+
+Longer histories (weekly / monthly screening) are backfilled backwards from
+the first ingested day with backfill_market_range, a bounded number of
+trading days per run, instead of fetching years of STOCK_DAY per ticker.
+
+Usage:
+    from bar_store import BarStore
+    from market_daily import ingest_market_range, backfill_market_range
+
+    store = BarStore('data/bars')
+    ingest_market_range(store, '2024-01-01', '2024-03-31')
+    backfill_market_range(store, '2019-01-01', max_days=250)
+"""
+
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from bar_store import BarStore, settled_date
+from rate_limiter import get_rate_limiter
+from scan_metrics import span
+from stock_data_facade import TPEX_BASE_URL, TWSE_BASE_URL, TWSE_NO_DATA_STAT, get_http_session
+from trading_calendar import get_trading_calendar
+
+# Market level high-water mark of ingested days
+MARKET_MANIFEST = "_market.json"
+
+
+def _to_float(value) -> Optional[float]:
+    """Parse a quote cell such as '1,234.50'; returns None for '--' or blanks"""
+    try:
+        return float(str(value).replace(',', '').strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _field_index(fields: List[str], names: tuple, default: int) -> int:
+    """Find a column by name; TPEx field names carry stray whitespace"""
+    stripped = [str(f).replace(' ', '').strip() for f in fields]
+    for name in names:
+        if name in stripped:
+            return stripped.index(name)
+    return default
+
+
+def _parse_quote_rows(rows: list, fields: list, date_str: str, layout: dict) -> Dict[str, Dict]:
+    """Split a full-market quote table into {stock_id: bar}"""
+    idx = {key: _field_index(fields, names, default) for key, (names, default) in layout.items()}
+
+    bars = {}
+    for row in rows:
+        try:
+            code = str(row[idx['code']]).strip()
+            open_price = _to_float(row[idx['open']])
+            high_price = _to_float(row[idx['high']])
+            low_price = _to_float(row[idx['low']])
+            close_price = _to_float(row[idx['close']])
+            volume = _to_float(row[idx['volume']])
+        except IndexError:
+            continue
+
+        # Rows without trades show '--' for prices
+        if None in (open_price, high_price, low_price, close_price, volume):
+            continue
+
+        bars[code] = {
+            'date': date_str,
+            'open': open_price,
+            'high': high_price,
+            'low': low_price,
+            'close': close_price,
+            'volume': int(volume) // 1000  # Convert shares to lots (張)
+        }
+    return bars
+
+
+# Expected fields: ['證券代號', '證券名稱', '成交股數', '成交筆數', '成交金額', '開盤價', '最高價', '最低價', '收盤價', ...]
+TWSE_LAYOUT = {
+    'code': (('證券代號',), 0),
+    'volume': (('成交股數',), 2),
+    'open': (('開盤價',), 5),
+    'high': (('最高價',), 6),
+    'low': (('最低價',), 7),
+    'close': (('收盤價',), 8),
+}
+
+# Expected fields: ['代號', '名稱', '收盤', '漲跌', '開盤', '最高', '最低', '均價', '成交股數', ...]
+TPEX_LAYOUT = {
+    'code': (('代號', '證券代號'), 0),
+    'close': (('收盤',), 2),
+    'open': (('開盤',), 4),
+    'high': (('最高',), 5),
+    'low': (('最低',), 6),
+    'volume': (('成交股數',), 8),
+}
+
+
+def fetch_twse_market_daily(date_str: str) -> Optional[Dict[str, Dict]]:
+    """
+    Fetch the full TWSE (上市) daily quote table for one day
+
+    Args:
+        date_str: Date in 'YYYY-MM-DD' format
+
+    Returns:
+        {stock_id: bar}; empty dict only when TWSE answers with its "no data" stat
+        (a closed day), None on request errors, other stats and unrecognised payloads
+    """
+    try:
+        params = {
+            'response': 'json',
+            'date': date_str.replace('-', ''),
+            'type': 'ALLBUT0999'
+        }
+        get_rate_limiter('twse').acquire()
+        with span('request.twse.mi_index'):
+            response = get_http_session().get(f"{TWSE_BASE_URL}/exchangeReport/MI_INDEX", params=params, timeout=30)
+        if response.status_code != 200:
+            return None
+
+        data = response.json()
+        stat = data.get('stat') or ''
+        if stat != 'OK':
+            # Holidays answer with a "no data" stat; anything else is an upstream error
+            if TWSE_NO_DATA_STAT in stat:
+                return {}
+            print(f"Error fetching TWSE market daily ({date_str}): {stat}")
+            return None
+
+        # Newer payloads list tables, older ones use data9/fields9
+        bars = None
+        for table in data.get('tables', []):
+            fields = table.get('fields', [])
+            if '證券代號' in fields and '收盤價' in fields:
+                bars = _parse_quote_rows(table.get('data', []), fields, date_str, TWSE_LAYOUT)
+                break
+        else:
+            if 'data9' in data:
+                bars = _parse_quote_rows(data['data9'], data.get('fields9', []), date_str, TWSE_LAYOUT)
+
+        if not bars:
+            # An OK stat without a quote table we can read: the layout changed
+            print(f"Error fetching TWSE market daily ({date_str}): unrecognised payload")
+            return None
+        return bars
+
+    except Exception as e:
+        print(f"Error fetching TWSE market daily ({date_str}): {e}")
+        return None
+
+
+def fetch_tpex_market_daily(date_str: str) -> Optional[Dict[str, Dict]]:
+    """
+    Fetch the full TPEx (上櫃) daily close quote table for one day
+
+    Args:
+        date_str: Date in 'YYYY-MM-DD' format
+
+    Returns:
+        {stock_id: bar}; empty dict on non-trading days, None on request errors
+    """
+    try:
+        d = datetime.strptime(date_str, '%Y-%m-%d')
+        roc_date = f"{d.year - 1911}/{d.month:02d}/{d.day:02d}"
+        url = f"{TPEX_BASE_URL}/web/stock/aftertrading/daily_close_quotes/stk_quote_result.php"
+        params = {'l': 'zh-tw', 'o': 'json', 'd': roc_date}
+
+        get_rate_limiter('tpex').acquire()
+        with span('request.tpex.daily_close'):
+            response = get_http_session().get(url, params=params, timeout=30)
+        if response.status_code != 200:
+            return None
+
+        data = response.json()
+
+        for table in data.get('tables', []):
+            fields = table.get('fields', [])
+            if table.get('data'):
+                return _parse_quote_rows(table['data'], fields, date_str, TPEX_LAYOUT)
+
+        if data.get('aaData'):
+            return _parse_quote_rows(data['aaData'], [], date_str, TPEX_LAYOUT)
+
+        return {}
+
+    except Exception as e:
+        print(f"Error fetching TPEx market daily ({date_str}): {e}")
+        return None
+
+
+def _load_manifest(store: BarStore) -> dict:
+    try:
+        with open(Path(store.root) / MARKET_MANIFEST, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(store: BarStore, manifest: dict):
+    Path(store.root).mkdir(parents=True, exist_ok=True)
+    with open(Path(store.root) / MARKET_MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def get_ingested_until(store: BarStore) -> Optional[str]:
+    """Get the last day already ingested from the full-market tables"""
+    return _load_manifest(store).get('end')
+
+
+def get_ingested_from(store: BarStore) -> Optional[str]:
+    """Get the first day ingested from the full-market tables (lowered by backfills)"""
+    return _load_manifest(store).get('start')
+
+
+def _fetch_market_day(date_str: str, calendar) -> Optional[Dict[str, Dict]]:
+    """
+    Both full-market tables of one trading day
+
+    Returns:
+        {stock_id: bar}; empty dict for a closure (recorded in the calendar), None on failure
+    """
+    twse_bars = fetch_twse_market_daily(date_str)
+    tpex_bars = fetch_tpex_market_daily(date_str)
+
+    # Only TWSE's explicit "no data" stat (an empty dict) marks a closure; the
+    # calendar persists it, so an empty side on an open day is retried instead
+    if twse_bars is None or tpex_bars is None or bool(twse_bars) != bool(tpex_bars):
+        print(f"⚠️ 全市場行情下載失敗 ({date_str})，下次執行時重試")
+        return None
+
+    day_bars = {**twse_bars, **tpex_bars}
+    if not day_bars:
+        # A settled weekday without quotes is an unscheduled closure (e.g. a typhoon day)
+        calendar.add_closure(date_str, '停止交易')
+    return day_bars
+
+
+def ingest_market_range(store: BarStore, start_date: str, end_date: str) -> dict:
+    """
+    Ingest full-market daily tables into the bar store
+
+    Days up to the stored high-water mark are skipped, so a nightly run only
+    downloads the new trading day. Ingestion stops at the first failed day
+    so that it is retried on the next run instead of leaving a hole.
+
+    Args:
+        store: Target bar store
+        start_date: First day to ingest ('YYYY-MM-DD')
+        end_date: Last day to ingest ('YYYY-MM-DD'), capped at the last settled day
+
+    Returns:
+        Summary dict with keys: start, end, days, requests, stocks
+    """
+    ingested_until = get_ingested_until(store)
+    if ingested_until and ingested_until >= start_date:
+        start_date = (datetime.strptime(ingested_until, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    end_date = min(end_date, settled_date())
+
+    summary = {'start': start_date, 'end': None, 'days': 0, 'requests': 0, 'stocks': 0}
+    if start_date > end_date:
+        return summary
+
+    calendar = get_trading_calendar()
+    bars_by_stock: Dict[str, List[Dict]] = {}
+    completed_until = None
+
+    current_dt = datetime.strptime(start_date, '%Y-%m-%d')
+    end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+    while current_dt <= end_dt:
+        date_str = current_dt.strftime('%Y-%m-%d')
+        current_dt += timedelta(days=1)
+
+        # Weekends, holidays and known closures never trade, skip without probing
+        if not calendar.is_trading_day(date_str):
+            completed_until = date_str
+            continue
+
+        day_bars = _fetch_market_day(date_str, calendar)
+        summary['requests'] += 2
+        if day_bars is None:
+            break
+        if day_bars:
+            summary['days'] += 1
+        for stock_id, bar in day_bars.items():
+            bars_by_stock.setdefault(stock_id, []).append(bar)
+        completed_until = date_str
+
+    if completed_until is None:
+        return summary
+
+    # One write per stock per month instead of one per day
+    for stock_id, bars in bars_by_stock.items():
+        store.write(stock_id, bars)
+        store.extend_coverage(stock_id, start_date, completed_until)
+
+    manifest = _load_manifest(store)
+    manifest['end'] = completed_until
+    manifest.setdefault('start', start_date)
+    _save_manifest(store, manifest)
+
+    summary['end'] = completed_until
+    summary['stocks'] = len(bars_by_stock)
+    return summary
+
+
+def backfill_market_range(store: BarStore, start_date: str, max_days: int) -> dict:
+    """
+    Extend the ingested range backwards towards start_date
+
+    Walks back from the day before the first ingested day, at most max_days
+    trading days per call, so a long history (e.g. 1400 sessions for monthly
+    bars) costs two requests per trading day spread over several runs.
+    Stops at the first failed day; the next call resumes from there.
+
+    Args:
+        store: Target bar store (must already hold an ingest_market_range run)
+        start_date: Earliest day needed ('YYYY-MM-DD')
+        max_days: Trading days to download in this call
+
+    Returns:
+        Summary dict with keys: start, end, days, requests, stocks (start is None when nothing was added)
+    """
+    ingested_from = get_ingested_from(store)
+    summary = {'start': None, 'end': None, 'days': 0, 'requests': 0, 'stocks': 0}
+    if ingested_from is None or ingested_from <= start_date:
+        return summary
+
+    calendar = get_trading_calendar()
+    end_date = (datetime.strptime(ingested_from, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+    bars_by_stock: Dict[str, List[Dict]] = {}
+    completed_from = None
+    downloaded = 0
+
+    current_dt = datetime.strptime(end_date, '%Y-%m-%d')
+    start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+    while current_dt >= start_dt:
+        date_str = current_dt.strftime('%Y-%m-%d')
+        current_dt -= timedelta(days=1)
+
+        if not calendar.is_trading_day(date_str):
+            completed_from = date_str
+            continue
+        if downloaded >= max_days:
+            break
+
+        day_bars = _fetch_market_day(date_str, calendar)
+        summary['requests'] += 2
+        downloaded += 1
+        if day_bars is None:
+            break
+        if day_bars:
+            summary['days'] += 1
+        for stock_id, bar in day_bars.items():
+            bars_by_stock.setdefault(stock_id, []).append(bar)
+        completed_from = date_str
+
+    if completed_from is None:
+        return summary
+
+    # Ranges that touch a stock's coverage extend it; a stock with a later
+    # window (e.g. listed since) keeps it and fetches the gap itself
+    for stock_id, bars in bars_by_stock.items():
+        store.write(stock_id, bars)
+        store.extend_coverage(stock_id, completed_from, end_date)
+
+    manifest = _load_manifest(store)
+    manifest['start'] = completed_from
+    _save_manifest(store, manifest)
+
+    summary.update({'start': completed_from, 'end': end_date, 'stocks': len(bars_by_stock)})
+    return summary
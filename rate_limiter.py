@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Token-Bucket Rate Limiter Shared Across Providers
+
+Each upstream API has one bucket that holds up to `capacity` request tokens
+and refills at the provider's quota rate. Callers take a token before every
+request, so requests are paced to use the whole quota without exceeding it,
+regardless of how many threads are fetching.
+
+Quotas:
+    finmind: 600 requests/hour anonymous, 1200 requests/hour with a token
+    twse / tpex: configurable per minute, with a small burst
+
+Bucket state (tokens left and when) can be persisted to a JSON file, so a
+follow-up run knows how much of the hourly quota is already spent.
+
+Environment Variable:
+    RATE_LIMIT_STATE_FILE: JSON file to persist bucket state (default: disabled)
+    RATE_LIMIT_FINMIND_PER_HOUR: Override the FinMind hourly quota
+    RATE_LIMIT_TWSE_PER_MINUTE: TWSE requests per minute (default: 300)
+    RATE_LIMIT_TPEX_PER_MINUTE: TPEx requests per minute (default: 300)
+
+Usage:
+    from rate_limiter import get_rate_limiter
+
+    limiter = get_rate_limiter('finmind')
+    limiter.acquire()          # Blocks until a token is available
+    response = session.get(...)
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from scan_metrics import count
+
+
+FINMIND_ANONYMOUS_PER_HOUR = 600
+FINMIND_TOKEN_PER_HOUR = 1200
+DEFAULT_EXCHANGE_PER_MINUTE = 300
+
+
+def provider_quota(name: str) -> Tuple[int, int, int]:
+    """
+    Get the quota of a provider
+
+    Returns:
+        (requests, period_seconds, capacity)
+    """
+    if name == 'finmind':
+        default = FINMIND_TOKEN_PER_HOUR if os.getenv('FINMIND_API_TOKEN') else FINMIND_ANONYMOUS_PER_HOUR
+        per_hour = int(os.getenv('RATE_LIMIT_FINMIND_PER_HOUR', default))
+        # The quota is counted per hour upstream, so the whole hour may be spent at once
+        return per_hour, 3600, per_hour
+
+    if name in ('twse', 'tpex'):
+        per_minute = int(os.getenv(f'RATE_LIMIT_{name.upper()}_PER_MINUTE', DEFAULT_EXCHANGE_PER_MINUTE))
+        # Exchanges block IPs on bursts, keep only ~2 seconds worth of tokens
+        return per_minute, 60, max(1, per_minute // 30)
+
+    raise ValueError(f"Unknown rate limit provider: {name}")
+
+
+class TokenBucket:
+    """Thread-safe token bucket"""
+
+    def __init__(self, name: str, rate: float, capacity: float,
+                 tokens: Optional[float] = None, updated_at: Optional[float] = None,
+                 clock=time.time, sleep=time.sleep):
+        """
+        Args:
+            name: Provider name
+            rate: Tokens refilled per second
+            capacity: Max tokens held (burst size)
+            tokens: Tokens left at updated_at (default: full)
+            updated_at: Wall clock time of the token count (default: now)
+            clock / sleep: Injectable for tests
+        """
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity if tokens is None else min(tokens, capacity)
+        self._updated_at = clock() if updated_at is None else updated_at
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = max(0.0, now - self._updated_at)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def available(self) -> float:
+        """Tokens available right now"""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """Seconds until `tokens` are available"""
+        with self._lock:
+            self._refill()
+            return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def budget(self, seconds: float) -> int:
+        """Number of requests that can be made within `seconds` from now"""
+        with self._lock:
+            self._refill()
+            return max(0, math.floor(self._tokens + seconds * self.rate))
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take tokens without waiting; returns False if not enough are available"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Take tokens, waiting for the bucket to refill if needed
+
+        Args:
+            tokens: Number of tokens
+            timeout: Max seconds to wait (default: wait as long as needed)
+
+        Returns:
+            True if acquired, False if the wait would exceed the timeout
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+
+            if deadline is not None and self._clock() + wait > deadline:
+                return False
+            count(f'rate_limit.waits.{self.name}')
+            count(f'rate_limit.wait_seconds.{self.name}', wait)
+            self._sleep(wait)
+
+    def to_state(self) -> dict:
+        with self._lock:
+            self._refill()
+            return {'tokens': self._tokens, 'updated_at': self._updated_at}
+
+
+# Provider name -> TokenBucket
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def _state_file() -> Optional[Path]:
+    path = os.getenv('RATE_LIMIT_STATE_FILE')
+    return Path(path) if path else None
+
+
+def _load_state() -> dict:
+    path = _state_file()
+    if path is None:
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def get_rate_limiter(name: str) -> TokenBucket:
+    """
+    Get the shared rate limiter of a provider
+
+    The first call creates the bucket from the provider quota and restores
+    its persisted state, if any.
+    """
+    limiter = _limiters.get(name)
+    if limiter is not None:
+        return limiter
+
+    with _limiters_lock:
+        if name not in _limiters:
+            requests_per_period, period, capacity = provider_quota(name)
+            saved = _load_state().get(name, {})
+            _limiters[name] = TokenBucket(
+                name,
+                rate=requests_per_period / period,
+                capacity=capacity,
+                tokens=saved.get('tokens'),
+                updated_at=saved.get('updated_at')
+            )
+        return _limiters[name]
+
+
+def save_rate_limit_state():
+    """Persist the state of all created limiters (no-op when RATE_LIMIT_STATE_FILE is unset)"""
+    path = _state_file()
+    if path is None:
+        return
+
+    state = _load_state()
+    with _limiters_lock:
+        for name, limiter in _limiters.items():
+            state[name] = limiter.to_state()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def reset_rate_limiters():
+    """Drop all created limiters (used by tests)"""
+    with _limiters_lock:
+        _limiters.clear()
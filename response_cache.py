@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Response Cache for the Stock API
+
+Keeps the serialized `/api/stock` response of each ticker in memory, so a
+popular ticker costs one upstream fetch per trading session instead of one
+per request. Expiry follows the Taiwan trading session:
+
+- End-of-day entries (latest bar already settled) stay valid until the next
+  session settles, e.g. an entry built Monday evening is served until
+  Tuesday 14:30 Taiwan time
+- Intraday entries (latest bar may still change) and entries that are behind
+  the last settled session (upstream not published yet) expire after a short TTL
+
+Sessions come from the trading calendar. The API never runs the daily
+scanner, so the TWSE holiday schedule of the current year is fetched on the
+first request that needs it (a failed download is retried after an hour);
+otherwise weekday holidays of years that are not built in would count as
+trading days and their entries would be refetched all day.
+
+The least recently used ticker is evicted once the cache is full. Every entry
+carries an ETag and a Cache-Control max-age matching its remaining lifetime,
+so browsers and the CDN can share the response and revalidate with
+If-None-Match.
+
+Environment Variable:
+    RESPONSE_CACHE_SIZE: Max cached tickers per process (default: 256)
+    RESPONSE_CACHE_INTRADAY_TTL: Seconds to keep intraday entries (default: 60)
+
+Batch requests (`/api/stocks`) look up every ticker, compute the misses in
+one call and combine the entries into a single response that expires with
+its earliest entry.
+
+Usage:
+    from response_cache import get_response_cache
+
+    entry, hit = get_response_cache().get_or_compute(ticker, lambda: build_stock_payload(ticker))
+    if entry is None:
+        ...  # not found, nothing cached
+    elif entry.matches(request.headers.get('If-None-Match')):
+        ...  # 304 with entry.headers()
+    else:
+        ...  # 200 with entry.body and entry.headers()
+
+    cache = get_response_cache()
+    batch = cache.combine(cache.get_or_compute_many(tickers, build_stock_payloads))
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bar_store import MARKET_SETTLE_TIME, TW_TZ, settled_date
+from scan_metrics import count
+from trading_calendar import TradingCalendar, fetch_twse_holidays, get_trading_calendar
+
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_INTRADAY_TTL = 60
+
+# Let shared caches serve a just-expired entry while they revalidate
+STALE_WHILE_REVALIDATE = 30
+
+# Seconds before a failed holiday schedule download is tried again
+SCHEDULE_RETRY_SECONDS = 3600
+
+# Year -> time.monotonic() of its last failed schedule download
+_schedule_failures: Dict[int, float] = {}
+_schedule_lock = threading.Lock()
+
+
+def session_calendar(now: datetime) -> TradingCalendar:
+    """The shared trading calendar, with the holiday schedule of this year (and the next, near year end) loaded"""
+    calendar = get_trading_calendar()
+    for year in sorted({now.year, (now + timedelta(days=14)).year}):
+        with _schedule_lock:
+            failed_at = _schedule_failures.get(year)
+            if failed_at is not None and time.monotonic() - failed_at < SCHEDULE_RETRY_SECONDS:
+                continue
+            if calendar.ensure_year(year, fetch=fetch_twse_holidays):
+                _schedule_failures.pop(year, None)
+            else:
+                _schedule_failures[year] = time.monotonic()
+    return calendar
+
+
+def next_settle_time(now: datetime) -> datetime:
+    """Next moment a trading session settles (trading days, MARKET_SETTLE_TIME Taiwan time)"""
+    now = now.astimezone(TW_TZ)
+    calendar = session_calendar(now)
+    candidate = now.replace(hour=MARKET_SETTLE_TIME[0], minute=MARKET_SETTLE_TIME[1], second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while not calendar.is_trading_day(candidate.strftime('%Y-%m-%d')):
+        candidate += timedelta(days=1)
+    return candidate
+
+
+def last_session_date(now: datetime) -> str:
+    """Latest trading day whose session has settled (holidays and closures skipped)"""
+    now = now.astimezone(TW_TZ)
+    return session_calendar(now).session_on_or_before(settled_date(now))
+
+
+def entry_lifetime(data_date: Optional[str], now: datetime, intraday_ttl: float) -> Tuple[float, str]:
+    """
+    How long a response whose latest bar is `data_date` stays valid
+
+    Returns:
+        (seconds, kind) where kind is 'eod', 'intraday' or 'behind'
+    """
+    now = now.astimezone(TW_TZ)
+    if data_date and data_date == last_session_date(now):
+        return (next_settle_time(now) - now).total_seconds(), 'eod'
+    if data_date and data_date > settled_date(now):
+        return intraday_ttl, 'intraday'
+    # Unknown date, or the upstream has not published the settled session yet
+    return intraday_ttl, 'behind'
+
+
+def latest_bar_date(payload: dict) -> Optional[str]:
+    """Date of the last OHLC bar in a stock payload"""
+    ohlc = payload.get('ohlc') or []
+    return ohlc[-1].get('date') if ohlc else None
+
+
+class CachedResponse:
+    """Serialized response with its validator and expiry"""
+
+    def __init__(self, body: bytes, expires_at: float, kind: str, clock: Callable[[], float]):
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        self.expires_at = expires_at
+        self.kind = kind
+        self._clock = clock
+
+    def ttl(self) -> int:
+        return max(0, int(self.expires_at - self._clock()))
+
+    def is_fresh(self) -> bool:
+        return self._clock() < self.expires_at
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an If-None-Match header already names this entry"""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or any(tag.removeprefix('W/') == self.etag for tag in tags)
+
+    def headers(self) -> Dict[str, str]:
+        ttl = self.ttl()
+        return {
+            'Cache-Control': f'public, max-age={ttl}, s-maxage={ttl}, stale-while-revalidate={STALE_WHILE_REVALIDATE}',
+            'ETag': self.etag,
+        }
+
+
+class ResponseCache:
+    """Thread-safe LRU of serialized responses with session-aware expiry"""
+
+    def __init__(self, max_entries: Optional[int] = None, intraday_ttl: Optional[float] = None,
+                 date_of: Callable[[dict], Optional[str]] = latest_bar_date,
+                 clock: Callable[[], float] = time.time):
+        if max_entries is None:
+            max_entries = int(os.getenv('RESPONSE_CACHE_SIZE', DEFAULT_MAX_ENTRIES))
+        if intraday_ttl is None:
+            intraday_ttl = float(os.getenv('RESPONSE_CACHE_INTRADAY_TTL', DEFAULT_INTRADAY_TTL))
+        self.max_entries = max(1, max_entries)
+        self.intraday_ttl = intraday_ttl
+        self._date_of = date_of
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, CachedResponse]' = OrderedDict()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Fresh entry for `key` (marked as recently used), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not entry.is_fresh():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, payload: dict) -> CachedResponse:
+        """Serialize and store a payload, evicting the least recently used entry if full"""
+        now = datetime.fromtimestamp(self._clock(), TW_TZ)
+        lifetime, kind = entry_lifetime(self._date_of(payload), now, self.intraday_ttl)
+        entry = CachedResponse(json.dumps(payload).encode(), self._clock() + lifetime, kind, self._clock)
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get_or_compute(self, key: str, compute: Callable[[], Optional[dict]]) -> Tuple[Optional[CachedResponse], bool]:
+        """
+        Cached entry for `key`, computing and storing it on a miss
+
+        Concurrent misses on the same key wait for a single computation.
+        A None payload (e.g. ticker not found) is not cached.
+
+        Returns:
+            (entry or None, hit)
+        """
+        entry = self.get(key)
+        if entry is not None:
+            count('response_cache.hits')
+            return entry, True
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                entry = self.get(key)
+                if entry is not None:
+                    count('response_cache.hits')
+                    return entry, True
+
+                count('response_cache.misses')
+                payload = compute()
+                return (self.put(key, payload) if payload is not None else None), False
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+    def get_or_compute_many(self, keys: List[str],
+                            compute_many: Callable[[List[str]], Dict[str, Optional[dict]]]) -> Dict[str, Optional[CachedResponse]]:
+        """
+        Cached entries for many keys, computing all misses with one `compute_many(missing)` call
+
+        Returns:
+            Dictionary of key -> entry, None for keys without a payload
+        """
+        entries = {key: self.get(key) for key in keys}
+        missing = [key for key, entry in entries.items() if entry is None]
+        count('response_cache.hits', len(keys) - len(missing))
+
+        if missing:
+            count('response_cache.misses', len(missing))
+            payloads = compute_many(missing)
+            for key in missing:
+                payload = payloads.get(key)
+                entries[key] = self.put(key, payload) if payload is not None else None
+        return entries
+
+    def combine(self, entries: Dict[str, Optional[CachedResponse]]) -> CachedResponse:
+        """
+        One response for a batch: `{"stocks": {key: payload}, "missing": [keys]}`
+
+        The cached bodies are spliced in as they are, and the batch expires
+        with its earliest entry (short TTL if nothing was found).
+        """
+        found = {key: entry for key, entry in entries.items() if entry is not None}
+        stocks = b', '.join(json.dumps(key).encode() + b': ' + entry.body for key, entry in found.items())
+        missing = json.dumps([key for key, entry in entries.items() if entry is None]).encode()
+        body = b'{"stocks": {' + stocks + b'}, "missing": ' + missing + b'}'
+
+        if found:
+            expires_at = min(entry.expires_at for entry in found.values())
+            kinds = {entry.kind for entry in found.values()}
+            kind = kinds.pop() if len(kinds) == 1 else 'mixed'
+        else:
+            expires_at, kind = self._clock() + self.intraday_ttl, 'behind'
+        return CachedResponse(body, expires_at, kind, self._clock)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Scan Run Metrics
+
+Collects structured timings and counters for one scan run, so that the
+cost of each stage can be compared between runs:
+
+- Spans: named timed sections (fetch_market_alerts, provider requests,
+  dataframe build, indicators, JSON write, ...), aggregated into
+  count / total / p50 / p99 / max
+- Counters: HTTP requests, bytes, errors and retries (recorded by a hook
+  on the shared HTTP session), cache hits and misses, rate limit waits
+
+Spans recorded in worker processes can be exported with `snapshot()` and
+merged into the parent's registry with `merge()`.
+
+Usage:
+    from scan_metrics import count, get_scan_metrics, span
+
+    with span('fetch_market_alerts'):
+        alerts = fetch_market_alerts()
+    count('bar_store.hits')
+
+    get_scan_metrics().write_report('frontend/public/data/scan_metrics.json')
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import urlparse
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of a sorted list (q in 0..100)"""
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+class ScanMetrics:
+    """Thread-safe registry of span durations and counters"""
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._spans: Dict[str, List[float]] = {}
+        self._counters: Dict[str, float] = {}
+        self.started_at = datetime.now().isoformat()
+        self._started = clock()
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+        self.started_at = datetime.now().isoformat()
+        self._started = self._clock()
+
+    @contextmanager
+    def span(self, name: str):
+        """Time the enclosed block (recorded even if it raises)"""
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.record(name, self._clock() - started)
+
+    def record(self, name: str, seconds: float):
+        """Add one span duration"""
+        with self._lock:
+            self._spans.setdefault(name, []).append(seconds)
+
+    def count(self, name: str, value: float = 1):
+        """Increase a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        """Raw spans and counters (picklable, for merging across processes)"""
+        with self._lock:
+            return {
+                'spans': {name: list(durations) for name, durations in self._spans.items()},
+                'counters': dict(self._counters)
+            }
+
+    def merge(self, snapshot: dict):
+        """Add spans and counters recorded elsewhere (e.g. in a worker process)"""
+        with self._lock:
+            for name, durations in snapshot.get('spans', {}).items():
+                self._spans.setdefault(name, []).extend(durations)
+            for name, value in snapshot.get('counters', {}).items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def report(self, **extra) -> dict:
+        """Aggregated, machine-readable run report"""
+        with self._lock:
+            spans = {}
+            for name, durations in sorted(self._spans.items()):
+                ordered = sorted(durations)
+                spans[name] = {
+                    'count': len(ordered),
+                    'total_s': round(sum(ordered), 4),
+                    'p50_ms': round(_percentile(ordered, 50) * 1000, 3),
+                    'p99_ms': round(_percentile(ordered, 99) * 1000, 3),
+                    'max_ms': round(ordered[-1] * 1000, 3)
+                }
+            counters = {name: round(value, 4) for name, value in sorted(self._counters.items())}
+
+        return {
+            'startedAt': self.started_at,
+            'durationSeconds': round(self._clock() - self._started, 3),
+            **extra,
+            'spans': spans,
+            'counters': counters
+        }
+
+    def write_report(self, path, **extra) -> dict:
+        """Write the report as JSON (atomically) and return it"""
+        report = self.report(**extra)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return report
+
+
+_metrics = ScanMetrics()
+
+
+def get_scan_metrics() -> ScanMetrics:
+    """Get the process-wide metrics registry"""
+    return _metrics
+
+
+def span(name: str):
+    """Time a block on the process-wide registry"""
+    return _metrics.span(name)
+
+
+def count(name: str, value: float = 1):
+    """Increase a counter on the process-wide registry"""
+    _metrics.count(name, value)
+
+
+def record_http_response(response, *args, **kwargs):
+    """
+    requests response hook: counts calls, bytes, errors and urllib3 retries per host
+
+    Register with `session.hooks['response'].append(record_http_response)`.
+    """
+    host = urlparse(response.url).hostname or 'unknown'
+    count('http.requests')
+    count(f'http.requests.{host}')
+    count('http.bytes', len(response.content or b''))
+    if response.status_code >= 400:
+        count('http.errors')
+
+    retries = getattr(getattr(response, 'raw', None), 'retries', None)
+    history = getattr(retries, 'history', None)
+    if history:
+        count('http.retries', len(history))
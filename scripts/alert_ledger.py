@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+市場警示帳本 (注意股 / 處置股)
+
+以 (代碼, 日期, 類型) 為鍵保存已下載的警示紀錄，每次更新只處理帳本高水位之後的資料：
+
+- TWSE 注意股 / 處置股：查詢起日為上次成功下載的日期 (同日稍晚公布的紀錄仍會取得)，
+  不再每次重抓 40 天
+- TPEx 注意股 / 處置股 OpenAPI 沒有日期條件：以 ETag / Last-Modified 條件式請求，
+  內容未變動 (304) 時不重新解析
+
+每檔股票的注意日期維持排序，count_6 / count_30 依交易日曆 (trading_calendar.py)
+取得最近 6 / 30 個交易日的起日後以二分搜尋計算，只需處理有警示的股票。
+超過 30 個交易日的注意紀錄與已結束的處置會被清除。
+
+警示物件格式與 update_daily.fetch_market_alerts() 原本的輸出相同：
+
+    {"type": "warning", "badge": "警示", "color": "yellow", "info": "注意股", "detail": ...,
+     "history": ["113/10/04", ...], "risk": {"level", "message", "count_6", "count_30"}}
+    {"type": "disposition", "badge": "處置", "color": "red", "info": "5分盤 (至 113/10/18)",
+     "detail": "期間: ...\\n措施: ...", "is_disposed": True}
+
+Environment Variable:
+    ALERT_LEDGER_FILE: 帳本檔 (預設不保存；update_daily.py 預設 data/state/alert_ledger.json)
+"""
+import bisect
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from trading_calendar import TradingCalendar, get_trading_calendar
+
+
+LEDGER_FORMAT = 1
+# 處置規則的兩個區間：最近 6 個與 30 個營業日
+RECENT_SESSIONS = 6
+WINDOW_SESSIONS = 30
+
+
+def roc_to_iso(roc_str: str) -> Optional[str]:
+    """'113/10/04' 或 '1131004' -> '2024-10-04'"""
+    roc_str = (roc_str or '').strip()
+    try:
+        if '/' in roc_str:
+            year, month, day = (int(part) for part in roc_str.split('/'))
+        elif len(roc_str) == 7:
+            year, month, day = int(roc_str[:3]), int(roc_str[3:5]), int(roc_str[5:])
+        else:
+            return None
+        return datetime(year + 1911, month, day).strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def iso_to_roc(iso_str: str) -> str:
+    """'2024-10-04' -> '113/10/04'"""
+    year, month, day = iso_str.split('-')
+    return f"{int(year) - 1911}/{month}/{day}"
+
+
+def disposition_frequency(content: str) -> str:
+    """處置內容 -> 撮合頻率標籤 (例如 '5分盤')"""
+    match = re.search(r'每(\S+)分鐘', content or '')
+    if match:
+        return f"{match.group(1)}分盤"
+    if "人工管制" in (content or ''):
+        return "人工管制"
+    return "處置"
+
+
+def _day(iso_str: str) -> datetime:
+    return datetime.strptime(iso_str, '%Y-%m-%d')
+
+
+class AlertLedger:
+    """注意 / 處置紀錄帳本，可保存為 JSON 檔"""
+
+    def __init__(self, path=None, calendar: Optional[TradingCalendar] = None):
+        self.path = Path(path) if path else None
+        self.calendar = calendar or get_trading_calendar()
+        # code -> {date: 注意交易資訊}
+        self.warnings: Dict[str, Dict[str, str]] = {}
+        # code -> {處置起日: {"end", "info", "detail"}}
+        self.dispositions: Dict[str, Dict[str, dict]] = {}
+        # 資料源 -> 最後成功下載的日期
+        self.high_water: Dict[str, str] = {}
+        # 資料源 -> {"etag", "last_modified"}
+        self.validators: Dict[str, dict] = {}
+        self._load()
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('format') != LEDGER_FORMAT:
+            return
+        self.warnings = data.get('warnings', {})
+        self.dispositions = data.get('dispositions', {})
+        self.high_water = data.get('highWater', {})
+        self.validators = data.get('validators', {})
+
+    def save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'format': LEDGER_FORMAT,
+            'highWater': self.high_water,
+            'validators': self.validators,
+            'warnings': self.warnings,
+            'dispositions': self.dispositions
+        }
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def window_start(self, today: datetime, sessions: int = WINDOW_SESSIONS) -> str:
+        """最近 sessions 個交易日 (含今天或今天之前最近的交易日) 的第一天"""
+        return self.calendar.offset(today.strftime('%Y-%m-%d'), -(sessions - 1))
+
+    def since(self, feed: str, today: datetime) -> datetime:
+        """資料源的下載起日：高水位當天，沒有高水位時為 30 個交易日區間的起日"""
+        start = _day(self.window_start(today))
+        mark = self.high_water.get(feed)
+        return max(start, _day(mark)) if mark else start
+
+    def mark(self, feed: str, today: datetime):
+        self.high_water[feed] = today.strftime('%Y-%m-%d')
+
+    def add_warning(self, code: str, date: str, reason: str) -> bool:
+        """加入一筆注意紀錄，回傳是否為新紀錄或內容有變"""
+        days = self.warnings.setdefault(code, {})
+        if days.get(date) == reason:
+            return False
+        days[date] = reason
+        return True
+
+    def add_disposition(self, code: str, start: str, end: str, info: str, detail: str) -> bool:
+        """加入一筆處置紀錄，回傳是否為新紀錄或內容有變"""
+        record = {'end': end, 'info': info, 'detail': detail}
+        periods = self.dispositions.setdefault(code, {})
+        if periods.get(start) == record:
+            return False
+        periods[start] = record
+        return True
+
+    def prune(self, today: datetime):
+        """清除 30 個交易日區間以前的注意紀錄與已結束的處置"""
+        cutoff = self.window_start(today)
+        yesterday = (today - timedelta(days=1)).strftime('%Y-%m-%d')
+        self.warnings = {
+            code: kept for code, days in self.warnings.items()
+            if (kept := {d: r for d, r in days.items() if d >= cutoff})
+        }
+        self.dispositions = {
+            code: kept for code, periods in self.dispositions.items()
+            if (kept := {s: p for s, p in periods.items() if p['end'] >= yesterday})
+        }
+
+    def risk(self, code: str, today: datetime) -> dict:
+        """注意次數與處置風險 (count_6 / count_30: 最近 6 / 30 個交易日內的注意次數)"""
+        dates = sorted(self.warnings.get(code, {}))
+        count_30 = len(dates) - bisect.bisect_left(dates, self.window_start(today))
+        count_6 = len(dates) - bisect.bisect_left(dates, self.window_start(today, RECENT_SESSIONS))
+
+        risk_level = "low"
+        risk_msg = ""
+        if count_6 >= 3:
+            risk_level = "high"
+            risk_msg = f"觸發 4/6 處置風險 (目前 {count_6}/6)"
+        elif count_6 >= 2:
+            risk_level = "medium"
+            risk_msg = f"近期注意次數增加 ({count_6}/6)"
+
+        if count_30 >= 10:
+            risk_level = "high"
+            risk_msg = f"觸發 12/30 處置風險 (目前 {count_30}/30)"
+
+        return {"level": risk_level, "message": risk_msg, "count_6": count_6, "count_30": count_30}
+
+    def alert(self, code: str, today: datetime) -> Optional[dict]:
+        """單一股票目前的警示 (處置中優先，其次為最近兩個交易日內的注意)"""
+        for start, period in sorted(self.dispositions.get(code, {}).items(), reverse=True):
+            if _day(start) <= today + timedelta(days=1) and today <= _day(period['end']) + timedelta(days=1):
+                return {
+                    "type": "disposition",
+                    "badge": "處置",
+                    "color": "red",
+                    "info": period['info'],
+                    "detail": period['detail'],
+                    "is_disposed": True
+                }
+
+        days = self.warnings.get(code, {})
+        if not days:
+            return None
+        latest = max(days)
+        if latest < self.window_start(today, 2):
+            return None
+        return {
+            "type": "warning",
+            "badge": "警示",
+            "color": "yellow",
+            "info": "注意股",
+            "detail": days[latest],
+            "history": [iso_to_roc(d) for d in sorted(days, reverse=True)],
+            "risk": self.risk(code, today)
+        }
+
+    def alerts(self, today: datetime, codes: Optional[List[str]] = None) -> Dict[str, dict]:
+        """目前有警示的股票 -> 警示物件；codes 指定時只計算這些股票"""
+        if codes is None:
+            codes = set(self.warnings) | set(self.dispositions)
+        alerts = {}
+        for code in codes:
+            alert = self.alert(code, today)
+            if alert:
+                alerts[code] = alert
+        return alerts
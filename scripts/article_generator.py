@@ -5,6 +5,13 @@ import sys
 from datetime import datetime
 from pathlib import Path
 
+try:
+    from scan_output import read_scan_output, write_scan_output
+    from articles_index import update_articles_index
+except ModuleNotFoundError:
+    from scripts.scan_output import read_scan_output, write_scan_output
+    from scripts.articles_index import update_articles_index
+
 # Setup Output Directory (for reading results)
 OUTPUT_DIR = Path("frontend/public/data")
 
@@ -312,8 +319,7 @@ def main(manual_trigger=False):
         return
 
     print(f"Reading scan results from {input_file}...")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = read_scan_output(input_file)
 
     print("Generating article...")
     article = generate_daily_article(data)
@@ -329,8 +335,7 @@ def main(manual_trigger=False):
         history_dir = OUTPUT_DIR / "history"
         history_dir.mkdir(exist_ok=True)
         history_file = history_dir / f"{data['date']}.json"
-        with open(history_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        write_scan_output(history_file, data)
         print(f"✅ History saved to {history_file}")
         
         # Regenerate the articles index after saving
@@ -338,62 +343,19 @@ def main(manual_trigger=False):
         generate_articles_index()
 
 def generate_articles_index():
-    """Appends new articles to the existing index JSON file."""
+    """Adds new or changed articles to the index (see scripts/articles_index.py)."""
     articles_dir = OUTPUT_DIR / "articles"
-    index_file = OUTPUT_DIR / "articles_index.json"
-    
+
     if not articles_dir.exists():
         print("⚠️ No articles directory found.")
         return
 
-    # 1. Try to load existing index from data branch (GitHub)
-    existing_index = []
-    try:
-        import urllib.request
-        url = "https://raw.githubusercontent.com/jet23058/TrendGuard/data/articles_index.json"
-        with urllib.request.urlopen(url, timeout=10) as response:
-            existing_index = json.loads(response.read().decode('utf-8'))
-            print(f"📥 Loaded existing index with {len(existing_index)} articles")
-    except Exception as e:
-        print(f"⚠️ Could not fetch existing index (will create new): {e}")
-    
-    # 2. Build a set of existing dates for deduplication
-    existing_dates = {item['date'] for item in existing_index}
-    
-    # 3. Scan local articles directory for new articles
-    new_articles = []
-    for file_path in sorted(articles_dir.glob("*.json"), reverse=True):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                article_date = data.get("date", file_path.stem)
-                
-                # Skip if already in index
-                if article_date in existing_dates:
-                    continue
-                    
-                summary_data = {
-                    "date": article_date,
-                    "title": data.get("title", "無標題"),
-                    "isAiGenerated": data.get("isAiGenerated", False),
-                    "preview": data.get("content", "")[:100].replace('#', '').strip() + "..." 
-                }
-                new_articles.append(summary_data)
-                print(f"➕ Adding new article: {article_date}")
-        except Exception as e:
-            print(f"⚠️ Failed to read article {file_path.name}: {e}")
-
-    # 4. Merge and sort (newest first)
-    merged_index = new_articles + existing_index
-    merged_index.sort(key=lambda x: x['date'], reverse=True)
-    
-    # 5. Write updated index file
     try:
-        with open(index_file, 'w', encoding='utf-8') as f:
-            json.dump(merged_index, f, ensure_ascii=False, indent=2)
-        print(f"✅ Articles index updated: {index_file} ({len(merged_index)} total articles)")
+        pages = update_articles_index(OUTPUT_DIR)
+        print(f"✅ Articles index updated: {OUTPUT_DIR / 'articles_index.json'} "
+              f"({pages['total']} total articles, {len(pages['pages'])} pages)")
     except Exception as e:
-        print(f"❌ Failed to write articles index: {e}")
+        print(f"❌ Failed to update articles index: {e}")
 
 if __name__ == "__main__":
     main(manual_trigger=True)
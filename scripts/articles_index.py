@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+文章索引 (增量更新)
+
+只解析新增或內容有變動的文章檔，不再每次讀取全部 articles/*.json：
+
+    articles_index.json               -> 最近 ARTICLES_INDEX_RECENT 篇 (陣列，格式與舊版相同)
+    articles_index/{YYYY-MM}.json     -> 依月份分頁的完整索引 (新到舊)
+    articles_index/pages.json         -> 分頁清單，供 ArticleList 捲動時逐月載入
+                                         {"total": 120, "pages": [{"month": "2026-10", "count": 12}, ...]}
+    articles_index/manifest.json      -> 已處理的文章檔與內容雜湊 {"format": 1, "files": {"2026-10-16.json": "..."}}
+
+本機沒有的索引檔會從 data 分支 (ARTICLES_DATA_URL) 下載；不存在 (404) 視為空索引，
+其他下載錯誤則中止更新，避免以不完整的資料覆寫分頁。
+第一次執行 (尚無分頁清單) 時，以舊版完整的 articles_index.json 建立月分頁。
+
+Environment Variable:
+    ARTICLES_INDEX_RECENT: articles_index.json 保留的文章數 (預設 60)
+    ARTICLES_DATA_URL: 既有索引的下載位置 (預設為 data 分支的 raw 網址)
+"""
+import hashlib
+import json
+import os
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+MANIFEST_FORMAT = 1
+INDEX_FILE = "articles_index.json"
+PAGE_DIR = "articles_index"
+PAGES_FILE = f"{PAGE_DIR}/pages.json"
+MANIFEST_FILE = f"{PAGE_DIR}/manifest.json"
+PREVIEW_LENGTH = 100
+DEFAULT_DATA_URL = "https://raw.githubusercontent.com/jet23058/TrendGuard/data"
+
+
+def recent_size() -> int:
+    return int(os.environ.get('ARTICLES_INDEX_RECENT', 60))
+
+
+def fetch_remote(rel_path: str):
+    """從 data 分支下載 JSON；檔案不存在回傳 None，其他錯誤往外拋"""
+    url = f"{os.environ.get('ARTICLES_DATA_URL', DEFAULT_DATA_URL).rstrip('/')}/{rel_path}"
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+
+
+def file_digest(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()[:16]
+
+
+def summarize_article(data: dict, default_date: str) -> dict:
+    """文章 -> 索引項目"""
+    return {
+        "date": data.get("date", default_date),
+        "title": data.get("title", "無標題"),
+        "isAiGenerated": data.get("isAiGenerated", False),
+        "preview": data.get("content", "")[:PREVIEW_LENGTH].replace('#', '').strip() + "..."
+    }
+
+
+def upsert(entries: List[dict], updates: List[dict]) -> List[dict]:
+    """以日期取代或加入項目，回傳新到舊排序的清單"""
+    by_date = {item['date']: item for item in entries}
+    by_date.update({item['date']: item for item in updates})
+    return sorted(by_date.values(), key=lambda item: item['date'], reverse=True)
+
+
+def _write(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+class ArticlesIndex:
+    """讀取 (本機優先，其次 data 分支) 並寫回文章索引檔"""
+
+    def __init__(self, output_dir, fetch: Optional[Callable[[str], object]] = fetch_remote):
+        self.output_dir = Path(output_dir)
+        self.fetch = fetch
+
+    def load(self, rel_path: str, default):
+        path = self.output_dir / rel_path
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        data = self.fetch(rel_path) if self.fetch else None
+        return default if data is None else data
+
+    def write(self, rel_path: str, data):
+        _write(self.output_dir / rel_path, data)
+
+
+def changed_articles(articles_dir: Path, manifest_files: Dict[str, str]) -> Dict[str, tuple]:
+    """找出雜湊與 manifest 不同的文章檔 -> {檔名: (雜湊, 索引項目)}"""
+    changed = {}
+    for path in sorted(articles_dir.glob("*.json")):
+        digest = file_digest(path)
+        if manifest_files.get(path.name) == digest:
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                changed[path.name] = (digest, summarize_article(json.load(f), path.stem))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Failed to read article {path.name}: {e}")
+    return changed
+
+
+def update_articles_index(output_dir, fetch: Optional[Callable[[str], object]] = fetch_remote) -> dict:
+    """
+    將新增或變動的文章加入索引，回傳分頁清單
+
+    只改寫受影響月份的分頁、分頁清單、最近文章與 manifest；沒有變動時不寫任何檔案。
+    """
+    index = ArticlesIndex(output_dir, fetch)
+    articles_dir = Path(output_dir) / "articles"
+    manifest = index.load(MANIFEST_FILE, {})
+    if manifest.get('format') != MANIFEST_FORMAT:
+        manifest = {"format": MANIFEST_FORMAT, "files": {}}
+
+    changed = changed_articles(articles_dir, manifest['files']) if articles_dir.exists() else {}
+    pages = index.load(PAGES_FILE, None)
+    if not changed and pages is not None:
+        return pages
+
+    recent = index.load(INDEX_FILE, [])
+    months: Dict[str, List[dict]] = {}
+    if pages is None:
+        # 舊版 articles_index.json 是完整清單，據此建立月分頁
+        for item in recent:
+            months.setdefault(item['date'][:7], []).append(item)
+        pages = {"total": 0, "pages": []}
+
+    updates = [entry for _, entry in changed.values()]
+    for entry in updates:
+        months.setdefault(entry['date'][:7], [])
+
+    counts = {page['month']: page['count'] for page in pages['pages']}
+    for month, seeded in months.items():
+        existing = index.load(f"{PAGE_DIR}/{month}.json", []) if month in counts else []
+        page = upsert(existing + seeded, [e for e in updates if e['date'].startswith(month)])
+        index.write(f"{PAGE_DIR}/{month}.json", page)
+        counts[month] = len(page)
+        print(f"➕ Updated articles page {month} ({len(page)} articles)")
+
+    pages = {
+        "total": sum(counts.values()),
+        "pages": [{"month": month, "count": counts[month]} for month in sorted(counts, reverse=True)]
+    }
+    manifest['files'].update({name: digest for name, (digest, _) in changed.items()})
+
+    index.write(INDEX_FILE, upsert(recent, updates)[:recent_size()])
+    index.write(PAGES_FILE, pages)
+    index.write(MANIFEST_FILE, manifest)
+    return pages
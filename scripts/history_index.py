@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+歷史入選索引
+
+每個 (日期, 股票) 一列精簡資料，取代前端逐日下載完整的 history/{date}.json：
+
+    history_index.json               -> 最近 HISTORY_INDEX_WINDOW 個交易日 (日曆一次請求即可載入)
+    history_index/{YYYY-MM}.json     -> 依月份分區的完整紀錄
+
+格式 (欄位式，與 scan_output.py 相同不縮排)：
+
+    {
+      "format": 1,
+      "fields": ["date", "ticker", "status", "price", "streak", "priority"],
+      "dates": ["2024-03-01", "2024-03-04", ...],   # 區間內的掃描日 (含無入選的日子)
+      "rows": [["2024-03-04", "2330", "new", 600.0, 3, 93], ...],
+      "partitions": ["2024-02", "2024-03"]
+    }
+
+status 為 new / continued / removed (當日剔除，價格等為剔除前最後一次入選的資料)。
+
+update_daily.py 每次掃描後以 update_history_index() 附加當日資料 (同日重跑會取代)；
+既有的 history/*.json 可用 --rebuild 一次建立索引：
+
+    python scripts/history_index.py --rebuild path/to/history
+
+Environment Variable:
+    HISTORY_INDEX_WINDOW: history_index.json 保留的交易日數 (預設 60)
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+try:
+    from scan_output import expand_scan_output, read_scan_output
+except ModuleNotFoundError:
+    from scripts.scan_output import expand_scan_output, read_scan_output
+
+
+INDEX_FORMAT = 1
+INDEX_FILE = "history_index.json"
+PARTITION_DIR = "history_index"
+FIELDS = ["date", "ticker", "status", "price", "streak", "priority"]
+
+
+def window_size() -> int:
+    return int(os.environ.get('HISTORY_INDEX_WINDOW', 60))
+
+
+def index_rows(output: dict) -> List[list]:
+    """單日掃描結果 -> 索引列 (依代碼排序)"""
+    output = expand_scan_output(output)
+    date = output['date']
+    changes = output.get('changes') or {}
+    new_tickers = {s['ticker'] for s in changes.get('new', [])}
+
+    def row(stock, status):
+        signal = stock.get('signal') or {}
+        return [date, stock['ticker'], status, stock.get('currentPrice'),
+                stock.get('consecutiveRed'), signal.get('priority')]
+
+    rows = [row(s, 'new' if s['ticker'] in new_tickers else 'continued') for s in output.get('stocks', [])]
+    rows += [row(s, 'removed') for s in changes.get('removed', [])]
+    return sorted(rows, key=lambda r: (r[1], r[2]))
+
+
+def empty_index() -> dict:
+    return {"format": INDEX_FORMAT, "fields": FIELDS, "dates": [], "rows": [], "partitions": []}
+
+
+def load_index(path) -> dict:
+    """讀取索引 (不存在或格式不符時回傳空索引)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return empty_index()
+    if index.get('format') != INDEX_FORMAT or index.get('fields') != FIELDS:
+        return empty_index()
+    return index
+
+
+def merge_rows(index: dict, date: str, rows: List[list], keep_dates: int = None) -> dict:
+    """以某日的列取代索引中同日的資料；keep_dates 指定時只保留最近的日期"""
+    dates = sorted(set(index['dates']) | {date})
+    if keep_dates:
+        dates = dates[-keep_dates:]
+    kept = set(dates)
+    merged = [r for r in index['rows'] if r[0] != date and r[0] in kept] + rows
+    return {**index, "dates": dates, "rows": sorted(merged, key=lambda r: (r[0], r[1]))}
+
+
+def _write(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def update_history_index(output_dir, output: dict) -> dict:
+    """
+    附加一天的掃描結果到最近區間索引與該月分區
+
+    月分區以既有分區檔 (若存在) 加上最近區間內同月份的資料重寫；
+    最近區間涵蓋超過一個月，因此當月分區總是完整。
+    """
+    output_dir = Path(output_dir)
+    date = output['date']
+    month = date[:7]
+    rows = index_rows(output)
+
+    window = merge_rows(load_index(output_dir / INDEX_FILE), date, rows, keep_dates=window_size())
+
+    partition_path = output_dir / PARTITION_DIR / f"{month}.json"
+    partition = load_index(partition_path)
+    for day in [d for d in window['dates'] if d.startswith(month)]:
+        partition = merge_rows(partition, day, [r for r in window['rows'] if r[0] == day])
+    partition['partitions'] = [month]
+
+    window['partitions'] = sorted(set(window.get('partitions', [])) | {month})
+    _write(partition_path, partition)
+    _write(output_dir / INDEX_FILE, window)
+    return window
+
+
+def rebuild_history_index(output_dir, history_files: Iterable[Path]) -> dict:
+    """由 history/{date}.json 重建全部月分區與最近區間索引"""
+    output_dir = Path(output_dir)
+    partitions: Dict[str, dict] = {}
+    for path in sorted(history_files):
+        output = read_scan_output(path)
+        if not output or 'date' not in output:
+            continue
+        month = output['date'][:7]
+        partitions[month] = merge_rows(partitions.get(month, empty_index()), output['date'], index_rows(output))
+
+    window = empty_index()
+    for month, partition in sorted(partitions.items()):
+        partition['partitions'] = [month]
+        _write(output_dir / PARTITION_DIR / f"{month}.json", partition)
+        for day in partition['dates']:
+            window = merge_rows(window, day, [r for r in partition['rows'] if r[0] == day], keep_dates=window_size())
+
+    window['partitions'] = sorted(partitions)
+    _write(output_dir / INDEX_FILE, window)
+    return window
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the history index from history/{date}.json files')
+    parser.add_argument('--rebuild', metavar='HISTORY_DIR', required=True, help='Directory of history/{date}.json files')
+    parser.add_argument('--output-dir', default='frontend/public/data', help='Where to write the index')
+    args = parser.parse_args()
+
+    files = list(Path(args.rebuild).glob('*.json'))
+    if not files:
+        print(f"❌ {args.rebuild} 中沒有歷史檔")
+        sys.exit(1)
+    index = rebuild_history_index(args.output_dir, files)
+    print(f"✅ 已由 {len(files)} 個歷史檔重建索引 ({len(index['partitions'])} 個月分區，最近 {len(index['dates'])} 個交易日)")
+
+
+if __name__ == '__main__':
+    main()
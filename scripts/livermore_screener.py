@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+向量化利弗摩爾篩選引擎
+
+將全市場的日 K 載入對齊的 2-D NumPy 陣列 (交易日 × 股票)，
+一次計算突破、站上所有均線與連續紅 K，取代逐檔建立 DataFrame。
+均線週期與無量一字線門檻與 indicators.py 共用。
+
+對齊方式：每檔股票以「最後一根 K 線」靠右對齊，不足的前段補 NaN。
+這與逐檔計算時 rolling / iloc[-N:] 以各自的 K 線序列為準的語意一致
+(停牌日不會被當成一根 K 線)。
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from indicators import FLAT_LOW_VOLUME, MA_WINDOWS
+
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class PriceMatrix:
+    """對齊後的全市場價格矩陣，每個欄位的 shape 為 (depth, n_stocks)"""
+
+    def __init__(self, codes: List[str], columns: Dict[str, np.ndarray], lengths: np.ndarray):
+        self.codes = codes
+        self.open = columns['open']
+        self.high = columns['high']
+        self.low = columns['low']
+        self.close = columns['close']
+        self.volume = columns['volume']
+        self.lengths = lengths
+
+    @property
+    def depth(self) -> int:
+        return self.close.shape[0]
+
+
+def build_price_matrix(histories: Dict[str, Dict[str, np.ndarray]], depth: Optional[int] = None) -> PriceMatrix:
+    """
+    將各股票的欄式歷史資料組成靠右對齊的價格矩陣
+
+    Args:
+        histories: {code: {'open': array, 'high': ..., 'low': ..., 'close': ..., 'volume': ...}}，
+                   每個陣列依日期遞增排序
+        depth: 保留最後幾根 K 線，預設為最長的歷史長度
+
+    Returns:
+        PriceMatrix
+    """
+    codes = list(histories)
+    lengths = np.array([len(histories[c]['close']) for c in codes], dtype=np.int64)
+    if depth is None:
+        depth = int(lengths.max()) if len(codes) else 0
+
+    columns = {}
+    for field in PRICE_FIELDS:
+        matrix = np.full((depth, len(codes)), np.nan, dtype=np.float64)
+        for j, code in enumerate(codes):
+            values = np.asarray(histories[code][field], dtype=np.float64)[-depth:] if depth else []
+            if len(values):
+                matrix[depth - len(values):, j] = values
+        columns[field] = matrix
+
+    return PriceMatrix(codes, columns, np.minimum(lengths, depth))
+
+
+def _tail_mean(matrix: np.ndarray, window: int) -> np.ndarray:
+    """最後一列的 N 日均值；資料不足 N 根時為 NaN (同 rolling 的 min_periods)"""
+    if matrix.shape[0] < window:
+        return np.full(matrix.shape[1], np.nan)
+    return matrix[-window:].mean(axis=0)
+
+
+def screen_livermore(matrix: PriceMatrix, lookback_days: int = 20) -> Dict[str, np.ndarray]:
+    """
+    對整個市場一次計算利弗摩爾突破條件
+
+    Args:
+        matrix: build_price_matrix 的結果
+        lookback_days: 突破幾日新高
+
+    Returns:
+        dict of arrays (長度皆為 n_stocks):
+        - valid: 資料是否足夠 (至少 lookback_days + 2 根 K 線)
+        - change_pct: 漲跌幅 (資料不足為 NaN)
+        - prev_high: 近 N 日最高價 (不含今日)
+        - consecutive_red: 連續紅 K 天數 (排除無量一字線)
+        - is_breakout / is_above_all_ma / is_two_red_k / qualified: 條件結果
+    """
+    n = len(matrix.codes)
+    valid = matrix.lengths >= lookback_days + 2
+    if matrix.depth < lookback_days + 2:
+        empty = np.zeros(n, dtype=bool)
+        return {
+            'valid': empty, 'change_pct': np.full(n, np.nan), 'prev_high': np.full(n, np.nan),
+            'consecutive_red': np.zeros(n, dtype=np.int64),
+            'is_breakout': empty, 'is_above_all_ma': empty, 'is_two_red_k': empty, 'qualified': empty
+        }
+
+    close = matrix.close
+    current_price = close[-1]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change_pct = (current_price - close[-2]) / close[-2] * 100
+        prev_high = matrix.high[-(lookback_days + 1):-1].max(axis=0)
+
+        # 連續紅 K：收盤 >= 開盤，且非無量一字線；NaN 補值比較結果為 False，自然中斷
+        is_red = (close >= matrix.open) & ~((close == matrix.open) & (matrix.volume < FLAT_LOW_VOLUME))
+        consecutive_red = np.cumprod(is_red[::-1], axis=0).sum(axis=0)
+
+        is_breakout = current_price > prev_high
+        is_above_all_ma = np.ones(n, dtype=bool)
+        for window in MA_WINDOWS:
+            # 與 NaN 比較為 False，MA60 不足時即不成立
+            is_above_all_ma &= current_price > _tail_mean(close, window)
+
+    is_two_red_k = consecutive_red >= 2
+    qualified = valid & is_breakout & is_above_all_ma & is_two_red_k
+
+    return {
+        'valid': valid,
+        'change_pct': np.where(valid, change_pct, np.nan),
+        'prev_high': prev_high,
+        'consecutive_red': consecutive_red,
+        'is_breakout': is_breakout,
+        'is_above_all_ma': is_above_all_ma,
+        'is_two_red_k': is_two_red_k,
+        'qualified': qualified
+    }
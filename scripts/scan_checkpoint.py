@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+全市場掃描檢查點
+
+掃描過程中逐檔寫入結果與失敗紀錄 (JSONL，每行寫入後立即 flush)，
+工作逾時或 API 中斷時已完成的部分不會遺失：
+
+    {root}/{YYYY-MM-DD}/results.jsonl   -> {"code", "data", "changePct"}  (data 為 None 代表不符合條件)
+    {root}/{YYYY-MM-DD}/failures.jsonl  -> {"code", "error"}
+
+`update_daily.py --resume` 只重新掃描失敗或尚未掃描的股票，
+並將檢查點中的全部結果合併輸出。
+"""
+import json
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+RESULTS_FILE = "results.jsonl"
+FAILURES_FILE = "failures.jsonl"
+
+
+class ScanCheckpoint:
+    """單一掃描日的檢查點"""
+
+    def __init__(self, root, scan_date: str):
+        self.root = Path(root)
+        self.scan_date = scan_date
+        self.path = self.root / scan_date
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """清除本日檢查點 (全新掃描)"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def exists(self) -> bool:
+        return (self.path / RESULTS_FILE).exists() or (self.path / FAILURES_FILE).exists()
+
+    def _append(self, filename: str, record: dict):
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.path / filename, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+
+    def record_result(self, code: str, data: Optional[dict], change_pct: Optional[float]):
+        """記錄一檔已完成的股票 (不論是否符合條件)"""
+        self._append(RESULTS_FILE, {'code': code, 'data': data, 'changePct': change_pct})
+
+    def record_failure(self, code: str, error: str):
+        """記錄一檔失敗的股票，--resume 時會重試"""
+        self._append(FAILURES_FILE, {'code': code, 'error': str(error)})
+
+    @staticmethod
+    def _read_jsonl(path: Path) -> List[dict]:
+        records = []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # 寫入中被中斷的最後一行
+                        continue
+        except OSError:
+            pass
+        return records
+
+    def load(self) -> Tuple[Dict[str, Tuple[Optional[dict], Optional[float]]], Dict[str, str]]:
+        """
+        讀取檢查點
+
+        Returns:
+            (completed: {code: (data, change_pct)}, failures: {code: error})；
+            重試成功的股票不會出現在 failures
+        """
+        completed = {
+            r['code']: (r.get('data'), r.get('changePct'))
+            for r in self._read_jsonl(self.path / RESULTS_FILE)
+        }
+        failures = {
+            r['code']: r.get('error', '')
+            for r in self._read_jsonl(self.path / FAILURES_FILE)
+            if r['code'] not in completed
+        }
+        return completed, failures
+
+    def remaining(self, target_list: Iterable[str]) -> List[str]:
+        """尚未完成 (失敗或未掃描) 的股票，保持原順序"""
+        completed, _ = self.load()
+        return [code for code in target_list if code not in completed]
+
+
+def prune_checkpoints(root, keep: int = 7):
+    """只保留最近 keep 天的檢查點"""
+    root = Path(root)
+    if not root.exists():
+        return
+    days = sorted(p for p in root.iterdir() if p.is_dir())
+    for path in days[:-keep] if keep else days:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+掃描結果輸出格式 (daily_scan_results.json 與 history/{date}.json)
+
+精簡格式 (format: 2) 與原本的結構相同，只有兩處不同：
+
+1. 每檔股票的 ohlc 改為欄位陣列，不再每根 K 線重複鍵名：
+       "ohlc": {"date": [...], "open": [...], "close": [...], ...}
+2. changes 的 new / continued / removed 只列股票代碼；new / continued 的完整資料
+   已在 stocks 中，removed (已不在 stocks) 的完整資料放在 changes.removedStocks
+
+寫出時不縮排；可另外產生預先壓縮的 .gz / .br 檔 (SCAN_OUTPUT_PRECOMPRESS)，
+供支援直接提供預壓縮檔的靜態主機使用。
+
+讀取一律經過 expand_scan_output，舊格式 (無 format 欄位) 原樣回傳，
+因此新舊歷史檔都能讀取。
+
+Environment Variable:
+    SCAN_OUTPUT_PRECOMPRESS: 另外輸出的預壓縮格式，逗號分隔 'gz'、'br' (預設不輸出)
+                             br 需安裝 brotli 套件，未安裝時略過
+"""
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+
+FORMAT_VERSION = 2
+
+
+def _columnar(rows: List[dict]) -> Dict[str, list]:
+    """[{date, open, ...}, ...] -> {date: [...], open: [...], ...}"""
+    keys = []
+    for row in rows:
+        for key in row:
+            if key not in keys:
+                keys.append(key)
+    return {key: [row.get(key) for row in rows] for key in keys}
+
+
+def _rows(columns: Dict[str, list]) -> List[dict]:
+    """_columnar 的反向轉換"""
+    length = max((len(values) for values in columns.values()), default=0)
+    return [{key: values[i] for key, values in columns.items()} for i in range(length)]
+
+
+def _compact_stock(stock: dict) -> dict:
+    ohlc = stock.get('ohlc')
+    if isinstance(ohlc, list):
+        return {**stock, 'ohlc': _columnar(ohlc)}
+    return stock
+
+
+def _expand_stock(stock: dict) -> dict:
+    ohlc = stock.get('ohlc')
+    if isinstance(ohlc, dict):
+        return {**stock, 'ohlc': _rows(ohlc)}
+    return stock
+
+
+def compact_scan_output(output: dict) -> dict:
+    """完整格式 -> 精簡格式 (已是精簡格式則原樣回傳)"""
+    if output.get('format') == FORMAT_VERSION:
+        return output
+
+    stocks = output.get('stocks', [])
+    compact = {'format': FORMAT_VERSION, **output, 'stocks': [_compact_stock(s) for s in stocks]}
+
+    changes = output.get('changes')
+    if changes is not None:
+        removed = changes.get('removed', [])
+        compact['changes'] = {
+            'new': [s['ticker'] for s in changes.get('new', [])],
+            'continued': [s['ticker'] for s in changes.get('continued', [])],
+            'removed': [s['ticker'] for s in removed],
+            'removedStocks': [_compact_stock(s) for s in removed]
+        }
+    return compact
+
+
+def expand_scan_output(data: Optional[dict]) -> Optional[dict]:
+    """精簡格式 -> 完整格式 (舊格式原樣回傳)"""
+    if not data or data.get('format') != FORMAT_VERSION:
+        return data
+
+    expanded = {key: value for key, value in data.items() if key != 'format'}
+    stocks = [_expand_stock(s) for s in data.get('stocks', [])]
+    expanded['stocks'] = stocks
+
+    changes = data.get('changes')
+    if changes is not None:
+        by_ticker = {s['ticker']: s for s in stocks}
+        by_ticker.update({s['ticker']: _expand_stock(s) for s in changes.get('removedStocks', [])})
+
+        def resolve(tickers):
+            return [by_ticker[t] for t in tickers if t in by_ticker]
+
+        expanded['changes'] = {
+            'new': resolve(changes.get('new', [])),
+            'continued': resolve(changes.get('continued', [])),
+            'removed': resolve(changes.get('removed', []))
+        }
+    return expanded
+
+
+def precompress_formats() -> List[str]:
+    """SCAN_OUTPUT_PRECOMPRESS 設定的預壓縮格式"""
+    formats = [f.strip().lower() for f in os.environ.get('SCAN_OUTPUT_PRECOMPRESS', '').split(',')]
+    return [f for f in formats if f == 'gz' or (f == 'br' and HAS_BROTLI)]
+
+
+def write_scan_output(path, output: dict, precompress: Optional[List[str]] = None) -> Path:
+    """以精簡格式寫出 (不縮排)，並依設定產生 .gz / .br 預壓縮檔"""
+    path = Path(path)
+    body = json.dumps(compact_scan_output(output), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_bytes(body)
+    os.replace(tmp_path, path)
+
+    for fmt in precompress_formats() if precompress is None else precompress:
+        if fmt == 'gz':
+            # mtime=0: 內容不變時壓縮檔也不變，不會產生多餘的 data 分支提交
+            Path(f"{path}.gz").write_bytes(gzip.compress(body, compresslevel=9, mtime=0))
+        elif fmt == 'br' and HAS_BROTLI:
+            Path(f"{path}.br").write_bytes(brotli.compress(body, quality=11))
+    return path
+
+
+def read_scan_output(path) -> dict:
+    """讀取掃描結果 (新舊格式皆可)，回傳完整格式"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return expand_scan_output(json.load(f))
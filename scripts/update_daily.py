@@ -10,6 +10,7 @@ import json
 import os
 import sys
 import concurrent.futures
+import queue
 import time
 import threading
 from datetime import datetime
@@ -69,230 +70,151 @@ try:
     HAS_TWSTOCK = True
 except ImportError:
     HAS_TWSTOCK = False
-    print("Warning: twstock not installed, using FinMind for stock names")
+    print("Warning: twstock not installed, using FinMind for stock names and the test stock list")
 
-import re
-import requests
 from datetime import timedelta
+from typing import Optional, Union
 
+from market_daily import backfill_market_range, get_ingested_from, ingest_market_range
+from stock_data_facade import TPEX_BASE_URL, TWSE_BASE_URL, get_http_session
+from scan_metrics import count, get_scan_metrics, span
+from stock_registry import get_stock_registry
+from trading_calendar import get_trading_calendar
+from rate_limiter import get_rate_limiter, save_rate_limit_state
+from bar_store import BarStore, settled_date
+from indicator_state import IndicatorState, IndicatorStateStore, PeriodState
+from indicators import MA_WINDOWS, compute_indicators
 
+try:
+    from alert_ledger import AlertLedger, disposition_frequency, roc_to_iso
+except ModuleNotFoundError:
+    from scripts.alert_ledger import AlertLedger, disposition_frequency, roc_to_iso
 
 
 
-def roc_to_date(roc_str):
-    """Convert ROC date string (e.g., '114/01/05') to datetime object"""
-    try:
-        parts = roc_str.split('/')
-        year = int(parts[0]) + 1911
-        return datetime(year, int(parts[1]), int(parts[2]))
-    except:
-        return None
 
-def fetch_market_alerts():
-    """Fetch TWSE/TPEx Warning and Disposition data with Risk Analysis"""
-    alerts = {}
-    history_db = {} # {code: [dates]}
+
+def _conditional_get(url: str, ledger: AlertLedger, feed: str):
+    """
+    以帳本保存的 ETag / Last-Modified 條件式下載
     
-    today = datetime.now()
+    Returns:
+        (內容, 新的 validators)；內容未變動 (304) 或下載失敗時內容為 None。
+        validators 由呼叫端在內容寫入帳本後才存回，解析或寫入失敗時下次仍會重新下載
+    """
+    validators = ledger.validators.get(feed, {})
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    r = get_http_session().get(url, headers=headers, timeout=10)
+    if r.status_code == 304:
+        count('alerts.not_modified')
+        return None, validators
+    if r.status_code != 200:
+        return None, validators
+    return r.json(), {'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified')}
+
+
+def _twse_alert_rows(data: dict) -> Optional[list]:
+    """TWSE 公告的資料列；回應為錯誤 stat (沒有 data) 時為 None，不可推進高水位"""
+    if 'data' not in data and data.get('stat') != 'OK':
+        return None
+    return data.get('data', [])
+
+
+def refresh_alert_ledger(ledger: AlertLedger, today: datetime) -> int:
+    """下載高水位之後的注意 / 處置紀錄並寫入帳本，回傳新增或變動的筆數"""
+    changed = 0
     today_str = today.strftime('%Y%m%d')
-    # Look back 40 days to ensure we have enough trading days for the 30-day rule
-    start_str = (today - timedelta(days=40)).strftime('%Y%m%d') 
-    
-    # 1. Fetch TWSE Warning History (Notice)
+
+    # 1. TWSE 注意股 (自上次下載的日期起)
     try:
-        url = "https://www.twse.com.tw/rwd/zh/announcement/notice"
+        url = f"{TWSE_BASE_URL}/rwd/zh/announcement/notice"
+        start_str = ledger.since('twse_notice', today).strftime('%Y%m%d')
         params = {'response': 'json', 'startDate': start_str, 'endDate': today_str}
-        r = requests.get(url, params=params, timeout=10)
-        data = r.json()
-        
-        if 'data' in data:
-            for item in data['data']:
-                code = item[1]
-                date_roc = item[5] # e.g. "114/01/30"
-                reason = item[4]
-                
-                if code not in history_db:
-                    history_db[code] = []
-                history_db[code].append(date_roc)
-                
-                # If it's today's alert, initialize the alert object
-                alert_dt = roc_to_date(date_roc)
-                if alert_dt and (today - alert_dt).days <= 1:
-                    alerts[code] = {
-                        "type": "warning",
-                        "badge": "警示",
-                        "color": "yellow",
-                        "info": "注意股",
-                        "detail": reason,
-                        "history": []
-                    }
+        rows = _twse_alert_rows(get_http_session().get(url, params=params, timeout=10).json())
+        if rows is None:
+            print("⚠️ TWSE notice: no data in response, retrying from the same date next run")
+
+        for item in rows or []:
+            date = roc_to_iso(item[5])  # e.g. "114/01/30"
+            if date:
+                changed += ledger.add_warning(item[1], date, item[4])
+        if rows is not None:
+            ledger.mark('twse_notice', today)
     except Exception as e:
         print(f"Error fetching TWSE notice: {e}")
 
-    # 2. Fetch TWSE Disposition (Punish)
+    # 2. TWSE 處置股
     try:
-        url = "https://www.twse.com.tw/rwd/zh/announcement/punish"
+        url = f"{TWSE_BASE_URL}/rwd/zh/announcement/punish"
+        start_str = ledger.since('twse_punish', today).strftime('%Y%m%d')
         params = {'response': 'json', 'startDate': start_str, 'endDate': today_str}
-        r = requests.get(url, params=params, timeout=10)
-        data = r.json()
-        
-        if 'data' in data:
-            for item in data['data']:
-                code = item[2]
-                period_str = item[6] 
-                content = item[8]
-                
-                if '～' in period_str:
-                    start_roc, end_roc = period_str.split('～')
-                    start_dt = roc_to_date(start_roc)
-                    end_dt = roc_to_date(end_roc)
-                    
-                    if start_dt and end_dt and start_dt <= today + timedelta(days=1) and today <= end_dt + timedelta(days=1): 
-                        freq = "處置"
-                        match = re.search(r'每(\S+)分鐘', content)
-                        if match:
-                            freq = f"{match.group(1)}分盤"
-                        elif "人工管制" in content:
-                            freq = "人工管制"
-                            
-                        alerts[code] = {
-                            "type": "disposition",
-                            "badge": "處置",
-                            "color": "red",
-                            "info": f"{freq} (至 {end_roc})",
-                            "detail": f"期間: {period_str}\n措施: {item[7]}",
-                            "is_disposed": True
-                        }
+        rows = _twse_alert_rows(get_http_session().get(url, params=params, timeout=10).json())
+        if rows is None:
+            print("⚠️ TWSE punish: no data in response, retrying from the same date next run")
+
+        for item in rows or []:
+            period_str = item[6]
+            if '～' not in period_str:
+                continue
+            start_roc, end_roc = period_str.split('～')
+            start, end = roc_to_iso(start_roc), roc_to_iso(end_roc)
+            if start and end:
+                changed += ledger.add_disposition(
+                    item[2], start, end,
+                    info=f"{disposition_frequency(item[8])} (至 {end_roc})",
+                    detail=f"期間: {period_str}\n措施: {item[7]}"
+                )
+        if rows is not None:
+            ledger.mark('twse_punish', today)
     except Exception as e:
         print(f"Error fetching TWSE punish: {e}")
 
-    # 3. Fetch TPEX (OTC) Alerts
+    # 3. TPEX (OTC) 注意股 / 處置股 (無日期條件，改用條件式請求)
     try:
-        base_url = "https://www.tpex.org.tw/openapi/v1"
-        
-        # 3.1 TPEX Warning History
-        r = requests.get(f"{base_url}/tpex_trading_warning_information", timeout=10)
-        if r.status_code == 200:
-            for item in r.json():
-                code = item.get('SecuritiesCompanyCode')
-                date_roc = item.get('Date') # Compact "1140130"
-                reason = item.get('TradingInformation', '')
-                
-                # Convert to slash format for consistency
-                if len(date_roc) == 7:
-                    fmt_date = f"{date_roc[:3]}/{date_roc[3:5]}/{date_roc[5:]}"
-                else:
-                    fmt_date = date_roc
-                    
-                if code not in history_db:
-                    history_db[code] = []
-                history_db[code].append(fmt_date)
-                
-                # Check if recent
-                alert_dt = None
-                if len(date_roc) == 7:
-                    alert_dt = datetime(int(date_roc[:3]) + 1911, int(date_roc[3:5]), int(date_roc[5:]))
-                
-                if alert_dt and (today - alert_dt).days <= 1:
-                    if code not in alerts:
-                        alerts[code] = {
-                            "type": "warning",
-                            "badge": "警示",
-                            "color": "yellow",
-                            "info": "注意股",
-                            "detail": reason,
-                            "history": []
-                        }
-
-        # 3.2 TPEX Disposition
-        r = requests.get(f"{base_url}/tpex_disposal_information", timeout=10)
-        if r.status_code == 200:
-            for item in r.json():
-                code = item.get('SecuritiesCompanyCode')
-                period_str = item.get('DispositionPeriod', '')
+        base_url = f"{TPEX_BASE_URL}/openapi/v1"
+
+        warnings, validators = _conditional_get(f"{base_url}/tpex_trading_warning_information", ledger, 'tpex_warning')
+        for item in warnings or []:
+            date = roc_to_iso(item.get('Date'))  # Compact "1140130"
+            if date:
+                changed += ledger.add_warning(item.get('SecuritiesCompanyCode'), date, item.get('TradingInformation', ''))
+        ledger.validators['tpex_warning'] = validators
+
+        disposals, validators = _conditional_get(f"{base_url}/tpex_disposal_information", ledger, 'tpex_disposal')
+        for item in disposals or []:
+            period_str = item.get('DispositionPeriod', '')
+            if '~' not in period_str:
+                continue
+            start_roc, end_roc = period_str.split('~')
+            start, end = roc_to_iso(start_roc), roc_to_iso(end_roc)
+            if start and end:
                 content = item.get('DisposalCondition', '')
-                
-                if '~' in period_str:
-                    try:
-                        start_roc, end_roc = period_str.split('~')
-                        def parse_roc_compact(d_str):
-                            if len(d_str) == 7:
-                                return datetime(int(d_str[:3]) + 1911, int(d_str[3:5]), int(d_str[5:]))
-                            return roc_to_date(d_str)
-                            
-                        start_dt = parse_roc_compact(start_roc)
-                        end_dt = parse_roc_compact(end_roc)
-                        
-                        if start_dt and end_dt and start_dt <= today + timedelta(days=1) and today <= end_dt + timedelta(days=1):
-                            freq = "處置"
-                            match = re.search(r'每(\S+)分鐘', content)
-                            if match:
-                                freq = f"{match.group(1)}分盤"
-                            elif "人工管制" in content:
-                                freq = "人工管制"
-                                
-                            alerts[code] = {
-                                "type": "disposition",
-                                "badge": "處置",
-                                "color": "red",
-                                "info": f"{freq} (至 {end_roc})",
-                                "detail": f"期間: {period_str}\n措施: {content}",
-                                "is_disposed": True
-                            }
-                    except: pass
+                changed += ledger.add_disposition(
+                    item.get('SecuritiesCompanyCode'), start, end,
+                    info=f"{disposition_frequency(content)} (至 {end_roc})",
+                    detail=f"期間: {period_str}\n措施: {content}"
+                )
+        ledger.validators['tpex_disposal'] = validators
     except Exception as e:
         print(f"Error fetching TPEX alerts: {e}")
 
-    # 4. Risk Analysis (Calculating Disposition Proximity)
-    for code, alert_obj in alerts.items():
-        if alert_obj.get('type') == 'disposition':
-            continue # Already disposed
-            
-        hist = sorted(list(set(history_db.get(code, []))), reverse=True)
-        alert_obj['history'] = hist
-        
-        # Calculate Risk Metrics
-        # Rule 1: 3 consecutive days
-        consecutive = 0
-        # This is tricky because we need trading days. 
-        # For simplicity, we count consecutive entries in the sorted history.
-        consecutive = 1
-        # Check if previous days were also in history
-        # (Need a calendar or just check if dates are close)
-        # For now, let's just use the count in recent window.
-        
-        count_30 = len(hist)
-        count_6 = 0
-        # Approx count in last 6 trading days (approx 10 calendar days)
-        cutoff_6 = today - timedelta(days=10)
-        for d_str in hist:
-            d_dt = roc_to_date(d_str)
-            if d_dt and d_dt >= cutoff_6:
-                count_6 += 1
-        
-        # Determine Risk Level
-        risk_level = "low"
-        risk_msg = ""
-        
-        if count_6 >= 3:
-            risk_level = "high"
-            risk_msg = f"觸發 4/6 處置風險 (目前 {count_6}/6)"
-        elif count_6 >= 2:
-            risk_level = "medium"
-            risk_msg = f"近期注意次數增加 ({count_6}/6)"
-            
-        if count_30 >= 10:
-            risk_level = "high"
-            risk_msg = f"觸發 12/30 處置風險 (目前 {count_30}/30)"
-            
-        alert_obj['risk'] = {
-            "level": risk_level,
-            "message": risk_msg,
-            "count_6": count_6,
-            "count_30": count_30
-        }
+    ledger.prune(today)
+    ledger.save()
+    return changed
+
 
-    return alerts
+def fetch_market_alerts(ledger: Optional[AlertLedger] = None):
+    """Fetch TWSE/TPEx Warning and Disposition data with Risk Analysis"""
+    if ledger is None:
+        ledger = AlertLedger(os.environ.get('ALERT_LEDGER_FILE'))
+    today = datetime.now()
+    refresh_alert_ledger(ledger, today)
+    return ledger.alerts(today)
 
 def fetch_allowed_day_trade_targets():
     """取得所有可現股當沖的股票代碼 (上市+上櫃)"""
@@ -302,8 +224,8 @@ def fetch_allowed_day_trade_targets():
     try:
         # TWTB4U: 當日沖銷交易標的及成交量值
         # 若不帶日期，預設回傳最近交易日
-        url = "https://www.twse.com.tw/exchangeReport/TWTB4U?response=json"
-        r = requests.get(url, timeout=10)
+        url = f"{TWSE_BASE_URL}/exchangeReport/TWTB4U?response=json"
+        r = get_http_session().get(url, timeout=10)
         data = r.json()
         if 'tables' in data:
             for t in data['tables']:
@@ -318,18 +240,18 @@ def fetch_allowed_day_trade_targets():
 
     # 2. TPEX (上櫃)
     try:
-        # TPEX 需要指定日期，嘗試回推最近 5 天直到抓到資料
+        # TPEX 需要指定日期，依交易日曆由最近的交易日往前試 (假日不發請求)
         found = False
-        base_date = datetime.now()
+        today = datetime.now().strftime('%Y-%m-%d')
         
-        for i in range(5):
-            d = base_date - timedelta(days=i)
+        for day in get_trading_calendar().recent_sessions(3, today):
+            d = datetime.strptime(day, '%Y-%m-%d')
             roc_year = d.year - 1911
             date_str = f"{roc_year}/{d.month:02d}/{d.day:02d}"
             
-            url = f"https://www.tpex.org.tw/web/stock/trading/intraday_stat/intraday_trading_stat_result.php?l=zh-tw&o=json&d={date_str}"
+            url = f"{TPEX_BASE_URL}/web/stock/trading/intraday_stat/intraday_trading_stat_result.php?l=zh-tw&o=json&d={date_str}"
             try:
-                r = requests.get(url, timeout=5)
+                r = get_http_session().get(url, timeout=5)
                 data = r.json()
                 if 'tables' in data:
                     for t in data['tables']:
@@ -356,6 +278,16 @@ LOOKBACK_DAYS = 20  # 突破幾日新高
 TEST_MODE = os.environ.get('TEST_MODE', 'true').lower() == 'true'  # GitHub Actions 設為 false
 OUTPUT_DIR = Path("frontend/public/data")
 MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 5)) # Parallel workers
+BULK_INGEST = os.environ.get('BULK_INGEST', 'true').lower() == 'true'  # 以全市場行情表取代逐檔逐月請求
+SCAN_ENGINE = os.environ.get('SCAN_ENGINE', 'incremental').lower()  # 'incremental'、'vectorized'、'pipeline' 或 'per_stock'
+SCAN_TIMEFRAMES = [tf.strip() for tf in os.environ.get('SCAN_TIMEFRAMES', '').upper().split(',') if tf.strip() in ('W', 'M')]  # 另外以週 K ('W') / 月 K ('M') 篩選，逗號分隔 (預設不篩選)
+BULK_BACKFILL_SESSIONS = int(os.environ.get('BULK_BACKFILL_SESSIONS', 250))  # 週 K / 月 K 所需歷史每次執行回補的交易日數 (每日 2 次請求)
+COMPUTE_WORKERS = int(os.environ.get('COMPUTE_WORKERS', os.cpu_count() or 1))  # pipeline 引擎的運算行程數
+PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', 64))  # 已下載、待運算的股票上限 (背壓)
+COMPUTE_BATCH_SIZE = int(os.environ.get('COMPUTE_BATCH_SIZE', 16))  # 每次送進運算行程的股票數
+RATE_LIMIT_MAX_WAIT = int(os.environ.get('RATE_LIMIT_MAX_WAIT', 900))  # 等待 API 配額的最長秒數，超出的股票延到下次執行
+SCAN_PENDING_FILE = Path(os.environ.get('SCAN_PENDING_FILE', 'data/state/scan_pending.json'))  # 上次未掃描的股票
+CHECKPOINT_DIR = Path(os.environ.get('SCAN_CHECKPOINT_DIR', 'data/checkpoints'))  # 逐檔掃描結果檢查點 (--resume 用)
 
 # 測試用股票清單 (擴大範圍)
 TEST_STOCKS = [
@@ -380,29 +312,9 @@ TEST_STOCKS = [
     '2408'
 ]
 
-from typing import Optional
-
 def get_stock_name(code: str) -> tuple:
-    """取得股票中文名稱、產業別與市場別"""
-    market = "上市" # Default
-    
-    if HAS_TWSTOCK and code in twstock.codes:
-        info = twstock.codes[code]
-        market = info.market
-        return info.name, info.group if hasattr(info, 'group') else "其他", market
-    
-    # Fallback: 使用 FinMind
-    try:
-        loader = get_finmind_loader()
-        df = loader.TaiwanStockInfo()
-        stock_info = df[df['stock_id'] == code]
-        if not stock_info.empty:
-            # FinMind doesn't explicitly separate Listed/OTC in simple info sometimes, 
-            # but usually it's there. For now default to '上市' or guess.
-            return stock_info.iloc[0]['stock_name'], stock_info.iloc[0]['industry_category'], market
-    except Exception:
-        pass
-    return code, "其他", market
+    """取得股票中文名稱、產業別與市場別 (由股票基本資料表查詢，不需網路)"""
+    return get_stock_registry().describe(code)
 
 
 def get_all_tw_targets() -> list:
@@ -429,112 +341,278 @@ def get_all_tw_targets() -> list:
     return targets
 
 
-def check_livermore_criteria(code: str, market_alerts: Optional[dict] = None, allowed_day_trade_targets: Optional[set] = None) -> tuple[Optional[dict], Optional[float]]:
+# 週 K / 月 K 的歷史交易日數 (60 根均線 + 突破區間，約 64 週 / 66 個月)
+# 只在第一次建立狀態時讀取；成本由全市場行情表回補或配額規劃控制 (plan_timeframe_bootstraps)
+PERIOD_HISTORY_SESSIONS = {'W': 320, 'M': 1400}
+TIMEFRAME_NAMES = {'W': 'weekly', 'M': 'monthly'}
+TIMEFRAME_TAGS = {'W': '週線突破', 'M': '月線突破'}
+
+
+def get_history_sessions(timeframe: str = 'D') -> int:
+    """
+    根據 Provider 動態調整歷史資料的交易日數
+    
+    TWSE Provider 需要逐月請求，所以只取計算季線 (MA60) 所需的交易日並留少量餘裕
+    FinMind Provider 一次請求即可，所以可以拿較多資料
+    週 K / 月 K 需要 60 根以上的週期 K 棒 (只在第一次建立指標狀態時讀取)
+    """
+    if timeframe in PERIOD_HISTORY_SESSIONS:
+        return PERIOD_HISTORY_SESSIONS[timeframe]
+    if USE_FACADE:
+        # 使用 Facade 時，查詢 provider 類型
+        facade = get_stock_facade()
+        if facade.get_provider_name() == 'twse':
+            # TWSE: 季線 (MA60) 需要 60 根 K 線，多取 15 個交易日
+            return 75
+        # FinMind: 約 6 個月
+        return 120
+    # 傳統 FinMind: 約 6 個月
+    return 120
+
+
+def get_history_start_date(timeframe: str = 'D') -> str:
+    """歷史資料起日：以交易日曆回推 get_history_sessions() 個交易日 (假日、颱風停市不計)"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    return get_trading_calendar().offset(today, -(get_history_sessions(timeframe) - 1))
+
+
+def bulk_ingest_store() -> Optional[BarStore]:
+    """全市場行情表寫入的 K 線儲存庫；未使用 (非 TWSE Provider、未啟用儲存庫或 BULK_INGEST=false) 時為 None"""
+    if not USE_FACADE or not BULK_INGEST:
+        return None
+    facade = get_stock_facade()
+    if facade.bar_store is None or facade.get_provider_name() != 'twse':
+        return None
+    return facade.bar_store
+
+
+def ingest_market_daily_tables():
+    """
+    以全市場每日行情表預先填入本地 K 線儲存庫
+    
+    每個交易日只需上市、上櫃各一次請求，之後逐檔查詢皆由本地儲存庫提供。
+    僅在使用 TWSE Provider 且啟用 K 線儲存庫時執行 (FinMind 成交量單位不同，不混用)。
+    設定 SCAN_TIMEFRAMES 時，週 K / 月 K 所需的較長歷史也由行情表往前回補，
+    每次執行最多 BULK_BACKFILL_SESSIONS 個交易日，不再逐檔請求數年的 STOCK_DAY。
+    """
+    store = bulk_ingest_store()
+    if store is None:
+        return None
+    
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date = get_history_start_date()
+    
+    print("📥 下載全市場每日行情表 (上市 MI_INDEX + 上櫃收盤行情)...")
+    summary = ingest_market_range(store, start_date, end_date)
+    print(f"   已匯入 {summary['days']} 個交易日 / {summary['stocks']} 檔 (請求 {summary['requests']} 次)")
+    
+    if SCAN_TIMEFRAMES:
+        backfill_start = min(get_history_start_date(tf) for tf in SCAN_TIMEFRAMES)
+        backfill = backfill_market_range(store, backfill_start, BULK_BACKFILL_SESSIONS)
+        if backfill['start']:
+            print(f"   週 K / 月 K 歷史回補至 {backfill['start']} (目標 {backfill_start}，"
+                  f"{backfill['days']} 個交易日，請求 {backfill['requests']} 次)")
+    return summary
+
+
+def get_quota_provider() -> Optional[str]:
+    """
+    取得以「每小時配額」計算的 Provider 名稱
+    
+    FinMind 每檔股票約耗用 1 次請求，配額不足時需分批掃描；
+    TWSE 僅以每分鐘速率節流，不需分批，回傳 None。
+    """
+    if not USE_FACADE:
+        return 'finmind'
+    if get_stock_facade().get_provider_name() == 'finmind':
+        return 'finmind'
+    return None
+
+
+def estimate_request_cost(code: str, start_date: str, end_date: str) -> int:
+    """估計取得單一股票歷史資料所需的請求數 (本地 K 線儲存庫已涵蓋的區間不需請求)"""
+    if USE_FACADE:
+        bar_store = get_stock_facade().bar_store
+        if bar_store is not None:
+            return len(bar_store.missing_ranges(code, start_date, end_date))
+    return 1
+
+
+def load_market_cap_ranks() -> dict:
+    """讀取市值排名 {code: rank}"""
+    rank_file = OUTPUT_DIR / "market_cap_rank.json"
+    if rank_file.exists():
+        try:
+            with open(rank_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get("ranks", {})
+        except Exception:
+            pass
+    return {}
+
+
+def load_pending_targets() -> list:
+    """讀取上次因配額不足而延後掃描的股票"""
+    try:
+        with open(SCAN_PENDING_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get('pending', [])
+    except (OSError, ValueError):
+        return []
+
+
+def save_pending_targets(pending: list):
+    """儲存本次延後掃描的股票，下次執行時優先掃描"""
+    SCAN_PENDING_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(SCAN_PENDING_FILE, 'w', encoding='utf-8') as f:
+        json.dump({
+            'updatedAt': datetime.now().isoformat(),
+            'pending': pending
+        }, f, ensure_ascii=False, indent=2)
+
+
+def plan_scan_batch(target_list: list, limiter, max_wait: float = None) -> tuple[list, list]:
+    """
+    依 API 配額決定本次掃描的股票
+    
+    可用請求數 = 目前剩餘配額 + 最長等待時間內補充的配額。
+    上次延後的股票優先，其次依市值排名；超出配額的股票延到下次執行，
+    多次執行後即可涵蓋全市場，而非固定只掃描前段股票。
+    
+    Returns:
+        (本次掃描清單, 延後清單)
+    """
+    if max_wait is None:
+        max_wait = RATE_LIMIT_MAX_WAIT
+    
+    targets = set(target_list)
+    pending = [code for code in load_pending_targets() if code in targets]
+    pending_set = set(pending)
+    ranks = load_market_cap_ranks()
+    rest = sorted((code for code in target_list if code not in pending_set), key=lambda x: ranks.get(x, 99999))
+    
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date = get_history_start_date()
+    
+    budget = limiter.budget(max_wait)
+    batch, deferred = [], []
+    used = 0
+    for code in pending + rest:
+        cost = estimate_request_cost(code, start_date, end_date)
+        if used + cost <= budget:
+            batch.append(code)
+            used += cost
+        else:
+            deferred.append(code)
+    
+    return batch, deferred
+
+
+class StockDataUnavailable(Exception):
+    """取得不到歷史資料 (可能為上游 API 錯誤)，用來與「不符合條件」區分"""
+
+
+def check_livermore_criteria(code: str, market_alerts: Optional[dict] = None, allowed_day_trade_targets: Optional[set] = None, raise_errors: bool = False, lookback_days: Optional[int] = None) -> tuple[Optional[dict], Optional[float]]:
     """
     檢查是否符合利弗摩爾突破條件
     
+    Args:
+        raise_errors: True 時錯誤不再靜默忽略 (無資料時拋出 StockDataUnavailable)，
+                      供檢查點記錄失敗並於 --resume 時重試
+        lookback_days: 突破幾日新高 (預設 LOOKBACK_DAYS)
+    
     Returns:
         (full_data, change_pct)
         - full_data: 符合條件的完整資料，若不符合則為 None
         - change_pct: 該股票的漲跌幅 (float)，若無法取得資料則為 None
     """
     try:
-        # Check alerts first
-        alert_data = market_alerts.get(code) if market_alerts else None
-        
-        # 使用 FinMind API 取得股票資料
-        loader = get_finmind_loader()
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        
-        # 根據 Provider 動態調整歷史資料天數
-        # TWSE Provider 需要逐月請求，所以縮短天數避免太多請求
-        # FinMind Provider 一次請求即可，所以可以拿較多資料
-        if USE_FACADE:
-            # 使用 Facade 時，查詢 provider 類型
-            facade = get_stock_facade()
-            if facade.get_provider_name() == 'twse':
-                # TWSE: 為了計算季線 (MA60)，需要至少 60 筆交易日資料
-                # 抓取 110 天 (約 3.6 個月) 確保扣除假日後有足夠 K 線
-                lookback_days = 110
-            else:
-                # FinMind: 抓 180 天（約 6 個月）
-                lookback_days = 180
-        else:
-            # 傳統 FinMind: 抓 180 天
-            lookback_days = 180
-        
-        start_date = (datetime.now() - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
-        
-        raw_df = loader.taiwan_stock_daily(
+        raw_df = fetch_stock_history(code)
+        if raise_errors and (raw_df is None or len(raw_df) == 0):
+            raise StockDataUnavailable(f"No price data for {code}")
+        return evaluate_livermore_criteria(code, raw_df, market_alerts, allowed_day_trade_targets, raise_errors, lookback_days)
+    except Exception as e:
+        if raise_errors:
+            raise
+        # 靜默忽略錯誤
+        return None, None
+
+
+def fetch_stock_history(code: str, start_date: Optional[str] = None):
+    """取得單一股票的日 K 歷史資料 (FinMind DataLoader 格式 DataFrame；start_date 預設為 get_history_start_date())"""
+    # 使用 FinMind API 取得股票資料
+    loader = get_finmind_loader()
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date = start_date or get_history_start_date()
+    
+    if not USE_FACADE:
+        # FinMind 套件內部直接發出請求，在此取得配額 (Facade 模式由 Provider 自行節流)
+        get_rate_limiter('finmind').acquire()
+    
+    with span('fetch_stock_history'):
+        return loader.taiwan_stock_daily(
             stock_id=code,
             start_date=start_date,
             end_date=end_date
         )
+
+
+def evaluate_livermore_criteria(code: str, raw_df, market_alerts: Optional[dict] = None, allowed_day_trade_targets: Optional[set] = None, raise_errors: bool = False, lookback_days: Optional[int] = None) -> tuple[Optional[dict], Optional[float]]:
+    """
+    以已取得的歷史資料檢查利弗摩爾突破條件 (不含網路請求)
+    
+    Returns:
+        同 check_livermore_criteria
+    """
+    lookback_days = lookback_days or LOOKBACK_DAYS
+    try:
+        # Check alerts first
+        alert_data = market_alerts.get(code) if market_alerts else None
         
-        if raw_df is None or len(raw_df) < LOOKBACK_DAYS + 2:
+        if raw_df is None or len(raw_df) < lookback_days + 2:
             return None, None
         
         # FinMind 返回的欄位名稱與 yfinance 不同，需要轉換
         # FinMind: date, stock_id, Trading_Volume, Trading_money, open, max, min, close, spread, Trading_turnover
-        df = raw_df.copy()
-        df = df.rename(columns={
-            'open': 'Open',
-            'max': 'High',
-            'min': 'Low',
-            'close': 'Close',
-            'Trading_Volume': 'Volume'
-        })
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.set_index('date').sort_index()
-        
-        # 計算均線
-        df['MA5'] = df['Close'].rolling(window=5).mean()
-        df['MA10'] = df['Close'].rolling(window=10).mean()
-        df['MA20'] = df['Close'].rolling(window=20).mean()
-        df['MA60'] = df['Close'].rolling(window=60).mean()
+        with span('build_dataframe'):
+            df = raw_df.copy()
+            df = df.rename(columns={
+                'open': 'Open',
+                'max': 'High',
+                'min': 'Low',
+                'close': 'Close',
+                'Trading_Volume': 'Volume'
+            })
+            df['date'] = pd.to_datetime(df['date'])
+            df = df.set_index('date').sort_index()
         
-        today = df.iloc[-1]
-        yesterday = df.iloc[-2]
+        # 均線、KD、5 日均量、連續紅 K、波動率、前 N 日高點 (indicators.py 一次計算)
+        with span('indicators'):
+            opens = df['Open'].to_numpy(dtype=float)
+            highs = df['High'].to_numpy(dtype=float)
+            lows = df['Low'].to_numpy(dtype=float)
+            closes = df['Close'].to_numpy(dtype=float)
+            volumes = df['Volume'].to_numpy(dtype=float)
+            ind = compute_indicators(opens, highs, lows, closes, volumes)
         
-        current_price = float(today['Close'])
-        prev_close = float(yesterday['Close'])
+        current_price = float(closes[-1])
+        prev_close = float(closes[-2])
 
         # [DEBUG] 新增：印出每檔股票的掃描狀態，便於除錯
-        print(f"[DEBUG] {code} Date:{df.index[-1].strftime('%Y-%m-%d')} Close:{current_price} Open:{today['Open']} Vol:{today['Volume']}")
+        print(f"[DEBUG] {code} Date:{df.index[-1].strftime('%Y-%m-%d')} Close:{current_price} Open:{opens[-1]} Vol:{int(volumes[-1])}")
         
         # 漲跌幅 (即便不符合條件也要回傳，用於市場統計)
         change_pct = ((current_price - prev_close) / prev_close) * 100
         
-        open_price = float(today['Open'])
+        # 近 N 日最高價 (不含今日)
+        prev_high = float(highs[-(lookback_days+1):-1].max())
         
-        # 計算近 N 日最高價 (不含今日)
-        past_data = df['High'].iloc[-(LOOKBACK_DAYS+1):-1]
-        prev_high = float(past_data.max())
-        
-        # 計算連續紅 K 天數
-        # 修正: 排除「無量一字線」 (Open==Close 且 成交量 < 100張)
-        consecutive_red = 0
-        for i in range(len(df)-1, -1, -1):
-            c = float(df['Close'].iloc[i])
-            o = float(df['Open'].iloc[i])
-            v = int(df['Volume'].iloc[i])
-            
-            # 判斷是否為無量一字線 (量少於 100 張)
-            # 注意: FinMind volume 單位為張
-            is_flat_low_vol = (c == o) and (v < 100)
-            
-            if c >= o and not is_flat_low_vol:  # 收盤 >= 開盤，且非無量一字線
-                consecutive_red += 1
-            else:
-                break
+        # 連續紅 K 天數 (排除無量一字線：開盤 = 收盤且成交量 < 100 張)
+        consecutive_red = ind['consecutive_red']
         
         # 條件檢查
         is_breakout = current_price > prev_high
-        is_above_all_ma = (
-            current_price > float(today['MA5']) and
-            current_price > float(today['MA10']) and
-            current_price > float(today['MA20']) and
-            not pd.isna(today['MA60']) and current_price > float(today['MA60'])
+        is_above_all_ma = all(
+            ind[f'ma{window}'][-1] is not None and current_price > ind[f'ma{window}'][-1]
+            for window in MA_WINDOWS
         )
         is_two_red_k = consecutive_red >= 2
         
@@ -545,60 +623,42 @@ def check_livermore_criteria(code: str, market_alerts: Optional[dict] = None, al
             return None, change_pct
         
         # 計算支撐點
-        tech_stop = float(today['Low'])
+        tech_stop = float(lows[-1])
         money_stop = current_price * 0.90
         stop_loss = max(tech_stop, money_stop)
         
         # 取得中文名稱、產業、市場
-        name, sector, market = get_stock_name(code)
-        
-        # 計算 KD 指標 (9, 3, 3)
-        k_period = 9
-        d_period = 3
-        
-        # 計算 RSV 並平滑得到 K, D
-        df['low_9'] = df['Low'].rolling(window=k_period).min()
-        df['high_9'] = df['High'].rolling(window=k_period).max()
-        df['RSV'] = ((df['Close'] - df['low_9']) / (df['high_9'] - df['low_9'])) * 100
-        df['RSV'] = df['RSV'].fillna(50)
+        with span('get_stock_name'):
+            name, sector, market = get_stock_name(code)
         
-        # K = 2/3 * 前日K + 1/3 * RSV
-        df['K'] = df['RSV'].ewm(span=3, adjust=False).mean()
-        df['D'] = df['K'].ewm(span=d_period, adjust=False).mean()
-        
-        # 計算 5 日均量
-        df['vol_ma5'] = df['Volume'].rolling(window=5).mean()
-        
-        # 取得 K 線數據 (最近 30 天)
+        # 取得 K 線數據 (最近 30 天，KD (9, 3, 3) 與均線由 indicators.py 計算)
         ohlc_data = []
-        for idx, row in df.tail(30).iterrows():
+        dates = df.index.strftime("%Y-%m-%d")
+        for i in range(max(0, len(df) - 30), len(df)):
             ohlc_data.append({
-                "date": idx.strftime("%Y-%m-%d"),
-                "open": round(float(row['Open']), 2),
-                "high": round(float(row['High']), 2),
-                "low": round(float(row['Low']), 2),
-                "close": round(float(row['Close']), 2),
-                "volume": int(row['Volume']),
-                "volMa5": int(row['vol_ma5']) if not pd.isna(row['vol_ma5']) else int(row['Volume']),
-                "k": round(float(row['K']), 1) if not pd.isna(row['K']) else 50,
-                "d": round(float(row['D']), 1) if not pd.isna(row['D']) else 50,
-                "ma5": round(float(row['MA5']), 2) if not pd.isna(row['MA5']) else None,
-                "ma10": round(float(row['MA10']), 2) if not pd.isna(row['MA10']) else None,
-                "ma20": round(float(row['MA20']), 2) if not pd.isna(row['MA20']) else None
+                "date": dates[i],
+                "open": round(float(opens[i]), 2),
+                "high": round(float(highs[i]), 2),
+                "low": round(float(lows[i]), 2),
+                "close": round(float(closes[i]), 2),
+                "volume": int(volumes[i]),
+                "volMa5": int(ind['vol_ma5'][i]),
+                "k": round(ind['k'][i], 1),
+                "d": round(ind['d'][i], 1),
+                "ma5": round(ind['ma5'][i], 2) if ind['ma5'][i] is not None else None,
+                "ma10": round(ind['ma10'][i], 2) if ind['ma10'][i] is not None else None,
+                "ma20": round(ind['ma20'][i], 2) if ind['ma20'][i] is not None else None
             })
         
         # 取得最新 KD 值
-        latest_k = round(float(df['K'].iloc[-1]), 1) if not pd.isna(df['K'].iloc[-1]) else 50
-        latest_d = round(float(df['D'].iloc[-1]), 1) if not pd.isna(df['D'].iloc[-1]) else 50
+        latest_k = round(ind['k'][-1], 1)
+        latest_d = round(ind['d'][-1], 1)
         
-        # [NEW] 計算波動率 (判斷箱型整理)
-        # 取近 20 日收盤價計算變異係數 (CV = std / mean)
-        last_20_closes = df['Close'].tail(20)
-        volatility = last_20_closes.std() / last_20_closes.mean()
-        is_box_breakout = volatility < 0.05  # 波動率小於 5% 視為盤整
+        # [NEW] 波動率 (判斷箱型整理)：近 20 日收盤價的變異係數 (CV = std / mean)
+        is_box_breakout = ind['volatility'] is not None and ind['volatility'] < 0.05  # 波動率小於 5% 視為盤整
         
         # 動態調整 Signal 文字
-        signal_text = f"🔥 股價創 {LOOKBACK_DAYS} 日新高"
+        signal_text = f"🔥 股價創 {lookback_days} 日新高"
         priority_score = 90 + consecutive_red
         
         # Tags List for Frontend
@@ -640,7 +700,7 @@ def check_livermore_criteria(code: str, market_alerts: Optional[dict] = None, al
             "stopLoss": round(stop_loss, 2),
             "k": latest_k,
             "d": latest_d,
-            "volume": int(today['Volume']),
+            "volume": int(volumes[-1]),
             "signal": {
                 "type": "breakout", # 統一為 breakout，因為現在都必須符合技術條件
                 "text": f"{signal_text}。技術支撐位 {round(stop_loss, 1)}",
@@ -653,10 +713,33 @@ def check_livermore_criteria(code: str, market_alerts: Optional[dict] = None, al
         return full_data, change_pct
         
     except Exception as e:
+        if raise_errors:
+            raise
         # 靜默忽略錯誤
         return None, None
 
 
+def carry_forward_deferred(previous_data: Optional[dict], results: list, deferred: list) -> list:
+    """
+    延後掃描的股票沿用上次的結果
+
+    配額不足而延到下次執行的股票今天沒有掃描，不能視為剔除；上次入選者保留上次的資料
+    (carriedFrom 記錄資料日期)，否則會先被列為剔除、下次掃描後又列為新進。
+
+    Returns:
+        沿用的股票清單 (呼叫端併入 results)
+    """
+    if not previous_data or not deferred:
+        return []
+    deferred_set = set(deferred)
+    scanned = {s['ticker'] for s in results}
+    carried = []
+    for stock in previous_data.get('stocks', []):
+        if stock['ticker'] in deferred_set and stock['ticker'] not in scanned:
+            carried.append({**stock, 'carriedFrom': stock.get('carriedFrom') or previous_data.get('date')})
+    return carried
+
+
 def calculate_changes(previous_data: Optional[dict], current_stocks: list) -> dict:
     """
     計算與前一日的差異 (新進、續漲、剔除)
@@ -729,8 +812,28 @@ def calculate_changes(previous_data: Optional[dict], current_stocks: list) -> di
     }
 
 
-def update_existing_alerts():
-    """僅更新現有檔案中的警示資訊"""
+def apply_alerts(stocks: list, market_alerts: dict, tickers: Optional[set] = None) -> list:
+    """以最新警示更新股票的 alert 欄位 (tickers 指定時只處理這些股票)，回傳有變動的代碼"""
+    changed = []
+    for stock in stocks:
+        code = stock['ticker']
+        if tickers is not None and code not in tickers:
+            continue
+        alert_data = market_alerts.get(code)
+        # Update alert field (even if None, to clear old alerts if they expired)
+        if stock.get('alert') != alert_data:
+            stock['alert'] = alert_data
+            changed.append(code)
+    return changed
+
+
+def update_existing_alerts() -> tuple:
+    """
+    僅更新現有檔案中的警示資訊
+
+    警示帳本只下載新紀錄，只有警示有變動的股票會被改寫；
+    沒有任何變動時不寫出檔案。回傳 (掃描結果, 有變動的代碼)。
+    """
     print(f"\n=== 市場警示更新模式 ===")
     output_file = OUTPUT_DIR / "daily_scan_results.json"
     
@@ -739,25 +842,24 @@ def update_existing_alerts():
         sys.exit(1)
         
     try:
-        with open(output_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        market_alerts = fetch_market_alerts()
-        print(f"取得市場警示資料: {len(market_alerts)} 筆")
-        
-        updated_count = 0
+        data = read_scan_output(output_file)
+
+        ledger = AlertLedger(os.environ.get('ALERT_LEDGER_FILE'))
+        today = datetime.now()
+        with span('refresh_alert_ledger'):
+            new_records = refresh_alert_ledger(ledger, today)
         stocks = data.get('stocks', [])
-        
-        for stock in stocks:
-            code = stock['ticker']
-            alert_data = market_alerts.get(code)
-            
-            # Update alert field (even if None, to clear old alerts if they expired)
-            if stock.get('alert') != alert_data:
-                stock['alert'] = alert_data
-                updated_count += 1
-                if alert_data:
-                    print(f"⚠️ {code} {stock['name']} 新增/更新警示: {alert_data['badge']}")
+        market_alerts = ledger.alerts(today, [stock['ticker'] for stock in stocks])
+        print(f"警示帳本新增/變動 {new_records} 筆，掃描結果中有警示: {len(market_alerts)} 檔")
+
+        changed = apply_alerts(stocks, market_alerts)
+        for code in changed:
+            if market_alerts.get(code):
+                print(f"⚠️ {code} 新增/更新警示: {market_alerts[code]['badge']}")
+
+        if not changed:
+            print("✅ 警示無變動，不改寫掃描結果")
+            return data, changed
         
         # Update timestamps
         # If quoteTime doesn't exist (legacy), use old updatedAt as quoteTime
@@ -768,13 +870,20 @@ def update_existing_alerts():
         data['updatedAt'] = datetime.now().isoformat() # General update time
         
         # Save
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        write_scan_output(output_file, data)
+
+        # 同日的歷史檔 (若存在) 只更新有變動的股票
+        history_file = OUTPUT_DIR / "history" / f"{data['date']}.json"
+        if history_file.exists():
+            history = read_scan_output(history_file)
+            if apply_alerts(history.get('stocks', []), market_alerts, set(changed)):
+                history['alertUpdateTime'] = data['alertUpdateTime']
+                write_scan_output(history_file, history)
             
-        print(f"✅ 已更新 {updated_count} 筆警示狀態")
+        print(f"✅ 已更新 {len(changed)} 筆警示狀態")
         print(f"警示更新時間: {data['alertUpdateTime']}")
         
-        return data
+        return data, changed
         
     except Exception as e:
         print(f"更新警示失敗: {e}")
@@ -788,16 +897,709 @@ try:
 except ModuleNotFoundError:
     from scripts.article_generator import generate_daily_article, save_to_json, generate_articles_index
 
-def process_single_stock(code, market_alerts, allowed_day_trade_targets):
-    """Worker function for parallel processing"""
+try:
+    from livermore_screener import build_price_matrix, screen_livermore
+except ModuleNotFoundError:
+    from scripts.livermore_screener import build_price_matrix, screen_livermore
+
+try:
+    from scan_checkpoint import ScanCheckpoint, prune_checkpoints
+except ModuleNotFoundError:
+    from scripts.scan_checkpoint import ScanCheckpoint, prune_checkpoints
+
+try:
+    from scan_output import read_scan_output, write_scan_output
+except ModuleNotFoundError:
+    from scripts.scan_output import read_scan_output, write_scan_output
+
+try:
+    from history_index import update_history_index
+except ModuleNotFoundError:
+    from scripts.history_index import update_history_index
+
+def process_single_stock(code, market_alerts, allowed_day_trade_targets, lookback_days=None):
+    """
+    Worker function for parallel processing
+    
+    Returns:
+        (code, data, change_pct, error)；error 不為 None 代表失敗 (非「不符合條件」)
+    """
     try:
-        # Small delay to prevent burst rate limit
-        time.sleep(0.1) 
-        data, change_pct = check_livermore_criteria(code, market_alerts, allowed_day_trade_targets)
-        return code, data, change_pct
+        # 請求節流由各 Provider 共用的 token bucket 處理 (rate_limiter.py)
+        data, change_pct = check_livermore_criteria(code, market_alerts, allowed_day_trade_targets, raise_errors=True,
+                                                    lookback_days=lookback_days)
+        return code, data, change_pct, None
     except Exception as e:
         print(f"Error processing {code}: {e}")
-        return code, None, None
+        return code, None, None, str(e) or type(e).__name__
+
+def new_market_stats() -> dict:
+    """市場寬度統計 (Market Breadth)"""
+    return {
+        "up": 0,
+        "down": 0,
+        "flat": 0,
+        "total_scanned": 0
+    }
+
+
+def add_to_market_stats(market_stats: dict, change_pct: Optional[float]):
+    """統計市場漲跌"""
+    if change_pct is None:
+        return
+    market_stats["total_scanned"] += 1
+    if change_pct > 0:
+        market_stats["up"] += 1
+    elif change_pct < 0:
+        market_stats["down"] += 1
+    else:
+        market_stats["flat"] += 1
+
+
+def checkpoint_result(checkpoint, code, data, change_pct):
+    """將單檔掃描結果寫入檢查點 (未使用檢查點時略過)"""
+    if checkpoint is not None:
+        checkpoint.record_result(code, data, change_pct)
+
+
+def checkpoint_failure(checkpoint, code, error):
+    """將單檔失敗寫入檢查點 (未使用檢查點時略過)"""
+    if checkpoint is not None:
+        checkpoint.record_failure(code, error)
+
+
+def evaluate_qualified(code, raw_df, market_alerts, allowed_day_trade_targets, checkpoint=None):
+    """組出符合條件股票的完整輸出並寫入檢查點"""
+    try:
+        data, change_pct = evaluate_livermore_criteria(code, raw_df, market_alerts, allowed_day_trade_targets, raise_errors=True)
+    except Exception as e:
+        print(f"\nError processing {code}: {e}")
+        checkpoint_failure(checkpoint, code, str(e) or type(e).__name__)
+        return None
+    checkpoint_result(checkpoint, code, data, change_pct)
+    return data
+
+
+def scan_per_stock(target_list, market_alerts, allowed_day_trade_targets, checkpoint=None):
+    """逐檔掃描：每檔股票在執行緒中各自取得資料並以 pandas 計算指標"""
+    results = []
+    market_stats = new_market_stats()
+    total = len(target_list)
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # Submit tasks
+        futures = {executor.submit(process_single_stock, code, market_alerts, allowed_day_trade_targets): code for code in target_list}
+        
+        completed_count = 0
+        for future in concurrent.futures.as_completed(futures):
+            code = futures[future]
+            try:
+                _, data, change_pct, error = future.result()
+                if error is None:
+                    checkpoint_result(checkpoint, code, data, change_pct)
+                else:
+                    checkpoint_failure(checkpoint, code, error)
+                
+                completed_count += 1
+                if completed_count % 10 == 0:
+                    print(f"\r進度: {completed_count}/{total} ({(completed_count/total)*100:.1f}%)", end="", flush=True)
+                
+                add_to_market_stats(market_stats, change_pct)
+                        
+                if data:
+                    results.append(data)
+                    
+            except Exception as exc:
+                print(f"\nError processing {code}: {exc}")
+    
+    return results, market_stats
+
+
+def stream_scan(target_list, market_alerts, allowed_day_trade_targets, lookback_days=None, progress_every=25):
+    """
+    邊掃描邊產生事件，符合條件的股票一算出來就送出 (供串流端點使用)
+
+    以 process_single_stock 逐檔掃描，不寫入檢查點或輸出檔。
+    呼叫端停止迭代 (例如連線中斷) 時，尚未開始的股票會被取消。
+
+    Yields:
+        {"type": "start", "total": N, "lookbackDays": n}
+        {"type": "stock", "stock": {...}, "done": k, "total": N, "marketStats": {...}}
+        {"type": "progress", "done": k, "total": N, "marketStats": {...}}  (每 progress_every 檔)
+        {"type": "done", "done": N, "total": N, "qualified": q, "failed": [...], "marketStats": {...}}
+    """
+    lookback_days = lookback_days or LOOKBACK_DAYS
+    total = len(target_list)
+    market_stats = new_market_stats()
+    qualified = 0
+    failed = []
+    yield {"type": "start", "total": total, "lookbackDays": lookback_days}
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    try:
+        futures = [executor.submit(process_single_stock, code, market_alerts, allowed_day_trade_targets, lookback_days)
+                   for code in target_list]
+        for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            code, data, change_pct, error = future.result()
+            if error is not None:
+                failed.append(code)
+            add_to_market_stats(market_stats, change_pct)
+
+            if data:
+                qualified += 1
+                yield {"type": "stock", "stock": data, "done": done, "total": total, "marketStats": dict(market_stats)}
+            elif done % progress_every == 0:
+                yield {"type": "progress", "done": done, "total": total, "marketStats": dict(market_stats)}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    yield {"type": "done", "done": total, "total": total, "qualified": qualified, "failed": failed,
+           "marketStats": market_stats}
+
+
+def format_scan_event(event: dict, fmt: str = 'ndjson') -> str:
+    """將 stream_scan 事件編碼為 NDJSON 一行，或 Server-Sent Events 一則 (fmt='sse')"""
+    payload = json.dumps(event, ensure_ascii=False)
+    if fmt == 'sse':
+        return f"event: {event['type']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+def load_histories(target_list) -> dict:
+    """平行取得所有股票的日 K 歷史資料 (使用 K 線儲存庫時皆為本地讀取)"""
+    loader = get_finmind_loader()
+    if hasattr(loader, 'taiwan_stock_daily_many'):
+        # Facade 模式：以非同步連線池一次取得全部股票 (同時請求數由 STOCK_FETCH_CONCURRENCY 控制)
+        end_date = datetime.now().strftime('%Y-%m-%d')
+        start_date = get_history_start_date()
+        histories = loader.taiwan_stock_daily_many(list(target_list), start_date, end_date)
+        print(f"載入: {len(histories)}/{len(target_list)}")
+        return {code: df for code, df in histories.items() if len(df) > 0}
+    
+    histories = {}
+    total = len(target_list)
+    
+    def _fetch(code):
+        try:
+            return code, fetch_stock_history(code)
+        except Exception as e:
+            print(f"\nError fetching {code}: {e}")
+            return code, None
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for completed_count, (code, raw_df) in enumerate(executor.map(_fetch, target_list), start=1):
+            if completed_count % 10 == 0:
+                print(f"\r載入: {completed_count}/{total} ({(completed_count/total)*100:.1f}%)", end="", flush=True)
+            if raw_df is not None and len(raw_df) > 0:
+                histories[code] = raw_df
+    print()
+    return histories
+
+
+def scan_vectorized(target_list, market_alerts, allowed_day_trade_targets, checkpoint=None):
+    """
+    向量化掃描：先載入全部歷史資料，再以 NumPy 一次計算全市場條件
+    
+    僅有符合條件的股票會再經過 evaluate_livermore_criteria 組出完整輸出，
+    因此 full_data 與逐檔掃描完全相同。
+    """
+    with span('load_histories'):
+        histories = load_histories(target_list)
+    for code in target_list:
+        if code not in histories:
+            checkpoint_failure(checkpoint, code, "No price data")
+    
+    columns = {}
+    for code, raw_df in histories.items():
+        df = raw_df.sort_values('date')
+        columns[code] = {
+            'open': df['open'].to_numpy(dtype=float),
+            'high': df['max'].to_numpy(dtype=float),
+            'low': df['min'].to_numpy(dtype=float),
+            'close': df['close'].to_numpy(dtype=float),
+            'volume': df['Trading_Volume'].to_numpy(dtype=float),
+        }
+    
+    compute_start = time.time()
+    with span('indicators.vectorized'):
+        screen = screen_livermore(build_price_matrix(columns), LOOKBACK_DAYS)
+    print(f"向量化計算完成: {len(columns)} 檔，耗時 {(time.time() - compute_start) * 1000:.1f} ms")
+    
+    results = []
+    market_stats = new_market_stats()
+    codes = list(columns)
+    for i, code in enumerate(codes):
+        if not screen['valid'][i]:
+            # 資料不足 (如新上市) 屬於不符合條件，而非失敗
+            checkpoint_result(checkpoint, code, None, None)
+            continue
+        change_pct = float(screen['change_pct'][i])
+        add_to_market_stats(market_stats, change_pct)
+        
+        if screen['qualified'][i]:
+            data = evaluate_qualified(code, histories[code], market_alerts, allowed_day_trade_targets, checkpoint)
+            if data:
+                results.append(data)
+        else:
+            checkpoint_result(checkpoint, code, None, change_pct)
+    
+    return results, market_stats
+
+
+def df_to_bars(raw_df) -> list:
+    """FinMind 格式 DataFrame 轉為依日期排序的 K 線 dict 清單"""
+    if raw_df is None or len(raw_df) == 0:
+        return []
+    df = raw_df.sort_values('date')
+    return [
+        {
+            'date': pd.Timestamp(row.date).strftime('%Y-%m-%d'),
+            'open': float(row.open),
+            'high': float(row.max),
+            'low': float(row.min),
+            'close': float(row.close),
+            'volume': int(row.Trading_Volume)
+        }
+        for row in df.itertuples(index=False)
+    ]
+
+
+def fetch_bars_since(code: str, start_date: str) -> list:
+    """取得指定日期 (含) 之後的日 K (使用 K 線儲存庫時通常只需讀取本地資料)"""
+    loader = get_finmind_loader()
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    if start_date > end_date:
+        return []
+    
+    if not USE_FACADE:
+        get_rate_limiter('finmind').acquire()
+    
+    return df_to_bars(loader.taiwan_stock_daily(stock_id=code, start_date=start_date, end_date=end_date))
+
+
+def advance_indicator_state(code: str, state: Optional[Union[IndicatorState, PeriodState]], timeframe: str = 'D') -> tuple:
+    """
+    將指標狀態推進到最新一根 K 線
+    
+    已有狀態時只取得上次之後的新 K 線 (每日通常只有一根)，以 O(1) 更新；
+    無狀態或狀態已過舊時，以完整歷史資料重建。
+    timeframe 為 'W' / 'M' 時狀態為 PeriodState，新的日 K 只更新當期的週 K / 月 K。
+    
+    Returns:
+        (可保存的狀態 - 只含已收盤確定的 K 線, 用於本次篩選的狀態 - 含盤中 K 線)
+    """
+    stale_before = get_history_start_date()
+    if state is None or state.last_date < stale_before:
+        count('indicator_state.rebuilds')
+        start_date = get_history_start_date(timeframe) if timeframe != 'D' else None
+        bars = df_to_bars(fetch_stock_history(code, start_date))
+        state = PeriodState(timeframe) if timeframe != 'D' else IndicatorState()
+    else:
+        count('indicator_state.hits')
+        next_day = (datetime.strptime(state.last_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        bars = fetch_bars_since(code, next_day)
+    
+    # 盤中 K 線仍可能變動，只套用到篩選用的副本，不寫入保存的狀態
+    last_settled = settled_date()
+    unsettled = []
+    with span('indicator_state.update'):
+        for bar in bars:
+            if bar['date'] <= last_settled:
+                state.update(bar)
+            else:
+                unsettled.append(bar)
+    
+    if state.count == 0 and not unsettled:
+        return None, None
+    
+    screen_state = state
+    if unsettled:
+        screen_state = type(state).from_dict(state.to_dict())
+        for bar in unsettled:
+            screen_state.update(bar)
+    
+    return (state if state.count else None), screen_state
+
+
+def screen_indicator_state(state: Union[IndicatorState, PeriodState]) -> tuple[bool, Optional[float]]:
+    """
+    以指標狀態 (日 K 或週 K / 月 K) 檢查突破、站上所有均線與連續紅 K 條件
+    
+    Returns:
+        (是否符合條件, 漲跌幅)；資料不足時為 (False, None)
+    """
+    if state.count < LOOKBACK_DAYS + 2:
+        return False, None
+    
+    snapshot = state.snapshot()
+    current_price = snapshot['close']
+    
+    is_breakout = current_price > snapshot['prev_high']
+    is_above_all_ma = all(
+        snapshot[key] is not None and current_price > snapshot[key]
+        for key in ('ma5', 'ma10', 'ma20', 'ma60')
+    )
+    is_two_red_k = snapshot['consecutive_red'] >= 2
+    
+    return (is_breakout and is_above_all_ma and is_two_red_k), snapshot['change_pct']
+
+
+# 運算行程的共用參數 (由 initializer 設定一次，避免每批重複序列化)
+_compute_context = {}
+
+
+def _init_compute_worker(market_alerts, allowed_day_trade_targets):
+    _compute_context['market_alerts'] = market_alerts
+    _compute_context['allowed_day_trade_targets'] = allowed_day_trade_targets
+
+
+def _evaluate_batch(batch) -> list:
+    """
+    運算階段：在子行程中對一批已下載的股票檢查條件
+    
+    Returns:
+        [(code, data, change_pct, error), ...]
+    """
+    outputs = []
+    for code, raw_df in batch:
+        try:
+            data, change_pct = evaluate_livermore_criteria(
+                code, raw_df,
+                _compute_context.get('market_alerts'),
+                _compute_context.get('allowed_day_trade_targets'),
+                raise_errors=True
+            )
+            outputs.append((code, data, change_pct, None))
+        except Exception as e:
+            outputs.append((code, None, None, str(e) or type(e).__name__))
+    return outputs
+
+
+def _evaluate_batch_in_worker(batch) -> tuple:
+    """子行程執行 _evaluate_batch，並帶回該批的計時資料供主行程合併"""
+    metrics = get_scan_metrics()
+    metrics.reset()
+    outputs = _evaluate_batch(batch)
+    return outputs, metrics.snapshot()
+
+
+def scan_pipeline(target_list, market_alerts, allowed_day_trade_targets, checkpoint=None, compute_workers=None):
+    """
+    兩階段管線掃描：I/O 與 CPU 分離
+    
+    1. 下載階段：MAX_WORKERS 個執行緒取得歷史資料，放入有上限的佇列 (佇列滿時下載暫停)
+    2. 運算階段：以 ProcessPoolExecutor 分批計算指標與條件，不與下載執行緒競爭 GIL
+    3. 寫入階段：僅由主執行緒彙整 market_stats、結果與檢查點
+    
+    compute_workers <= 1 時於主執行緒直接運算 (不建立子行程)。
+    """
+    compute_workers = compute_workers or COMPUTE_WORKERS
+    results = []
+    market_stats = new_market_stats()
+    total = len(target_list)
+    fetched = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    
+    def _fetch(code):
+        try:
+            raw_df = fetch_stock_history(code)
+            error = None if raw_df is not None and len(raw_df) > 0 else "No price data"
+        except Exception as e:
+            raw_df, error = None, str(e) or type(e).__name__
+        fetched.put((code, raw_df, error))
+    
+    completed_count = 0
+    
+    def _write(outputs):
+        nonlocal completed_count
+        for code, data, change_pct, error in outputs:
+            completed_count += 1
+            if completed_count % 10 == 0:
+                print(f"\r進度: {completed_count}/{total} ({(completed_count/total)*100:.1f}%)", end="", flush=True)
+            if error is not None:
+                checkpoint_failure(checkpoint, code, error)
+                continue
+            checkpoint_result(checkpoint, code, data, change_pct)
+            add_to_market_stats(market_stats, change_pct)
+            if data:
+                results.append(data)
+    
+    compute = None
+    if compute_workers > 1:
+        compute = concurrent.futures.ProcessPoolExecutor(
+            max_workers=compute_workers,
+            initializer=_init_compute_worker,
+            initargs=(market_alerts, allowed_day_trade_targets)
+        )
+        # 先啟動子行程再建立下載執行緒 (多執行緒狀態下 fork 並不安全)
+        compute.submit(_evaluate_batch, []).result()
+    else:
+        _init_compute_worker(market_alerts, allowed_day_trade_targets)
+    
+    in_flight = {}
+    
+    def _collect(futures):
+        for future in futures:
+            batch = in_flight.pop(future)
+            try:
+                outputs, worker_metrics = future.result()
+                get_scan_metrics().merge(worker_metrics)
+                _write(outputs)
+            except Exception as e:
+                # 子行程異常終止：整批記為失敗，--resume 時重試
+                _write([(code, None, None, f"Compute error: {e}") for code, _ in batch])
+    
+    def _submit(batch):
+        try:
+            if compute is None:
+                outputs = _evaluate_batch(batch)
+            else:
+                in_flight[compute.submit(_evaluate_batch_in_worker, batch)] = batch
+                outputs = None
+        except Exception as e:
+            # 運算失敗或行程池已損壞 (例如子行程 OOM 後的 BrokenProcessPool)：整批記為失敗，--resume 時重試
+            outputs = [(code, None, None, f"Compute error: {e}") for code, _ in batch]
+        if outputs is not None:
+            _write(outputs)
+            return
+        # 限制運算中的批次數，讓佇列的背壓傳回下載階段
+        if len(in_flight) >= compute_workers * 2:
+            done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            _collect(done)
+    
+    fetchers = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    downloads = []
+    try:
+        for code in target_list:
+            downloads.append(fetchers.submit(_fetch, code))
+        
+        batch = []
+        for _ in range(total):
+            code, raw_df, error = fetched.get()
+            if error is not None:
+                _write([(code, None, None, error)])
+                continue
+            batch.append((code, raw_df))
+            if len(batch) >= COMPUTE_BATCH_SIZE:
+                _submit(batch)
+                batch = []
+            _collect([f for f in list(in_flight) if f.done()])
+        
+        if batch:
+            _submit(batch)
+        
+        _collect(list(concurrent.futures.as_completed(list(in_flight))))
+    finally:
+        # 提前離開時取消尚未開始的下載，並清空佇列讓卡在 put() 的下載執行緒結束，避免程序停住
+        fetchers.shutdown(wait=False, cancel_futures=True)
+        while not all(f.done() for f in downloads):
+            try:
+                fetched.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        fetchers.shutdown()
+        if compute is not None:
+            compute.shutdown(cancel_futures=True)
+    
+    return results, market_stats
+
+
+def scan_incremental(target_list, market_alerts, allowed_day_trade_targets, checkpoint=None):
+    """
+    增量掃描：以保存的指標狀態 (均線累計和、KD、連紅天數) 加上今日 K 線更新
+    
+    每檔每日只需取得新的 K 線；僅符合條件的股票再讀取歷史資料，
+    經過 evaluate_livermore_criteria 組出與逐檔掃描相同的完整輸出。
+    """
+    state_store = IndicatorStateStore(os.environ.get('INDICATOR_STATE_FILE', 'data/state/indicators.json'))
+    with span('indicator_state.load'):
+        states = state_store.load()
+    print(f"載入指標狀態: {len(states)} 檔")
+    
+    results = []
+    market_stats = new_market_stats()
+    qualified = []
+    total = len(target_list)
+    
+    def _advance(code):
+        try:
+            return code, advance_indicator_state(code, states.get(code)), None
+        except Exception as e:
+            print(f"\nError updating {code}: {e}")
+            return code, (states.get(code), None), str(e) or type(e).__name__
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for completed_count, (code, (saved_state, screen_state), error) in enumerate(executor.map(_advance, target_list), start=1):
+            if completed_count % 10 == 0:
+                print(f"\r更新: {completed_count}/{total} ({(completed_count/total)*100:.1f}%)", end="", flush=True)
+            
+            if saved_state is not None:
+                states[code] = saved_state
+            if screen_state is None:
+                checkpoint_failure(checkpoint, code, error or "No price data")
+                continue
+            
+            is_qualified, change_pct = screen_indicator_state(screen_state)
+            add_to_market_stats(market_stats, change_pct)
+            if is_qualified:
+                qualified.append(code)
+            else:
+                checkpoint_result(checkpoint, code, None, change_pct)
+    print()
+    
+    with span('indicator_state.save'):
+        state_store.save(states)
+    
+    for code in qualified:
+        try:
+            raw_df = fetch_stock_history(code)
+        except Exception as e:
+            checkpoint_failure(checkpoint, code, str(e) or type(e).__name__)
+            continue
+        data = evaluate_qualified(code, raw_df, market_alerts, allowed_day_trade_targets, checkpoint)
+        if data:
+            results.append(data)
+    
+    return results, market_stats
+
+
+def period_state_path(timeframe: str) -> Path:
+    """週 K / 月 K 指標狀態檔 (與 INDICATOR_STATE_FILE 同目錄，例如 indicators_weekly.json)"""
+    path = Path(os.environ.get('INDICATOR_STATE_FILE', 'data/state/indicators.json'))
+    return path.with_name(f"{path.stem}_{TIMEFRAME_NAMES[timeframe]}{path.suffix}")
+
+
+def plan_timeframe_bootstraps(target_list: list, states: dict, timeframe: str) -> tuple[list, list]:
+    """
+    決定本次可建立週 K / 月 K 指標狀態的股票
+    
+    第一次建立狀態需要 PERIOD_HISTORY_SESSIONS 個交易日的歷史 (月 K 約 67 個月)：
+    - 全市場行情表 (TWSE)：等行情表回補涵蓋所需區間後才建立，不逐檔請求
+    - 以每小時配額計算的 Provider (FinMind)：只在目前剩餘配額內建立 (不等待補充)
+    - 其他 (逐檔逐月請求的 TWSE)：只受每分鐘速率限制，全部建立
+    
+    Returns:
+        (本次推進的股票, 延後建立的股票)；已有狀態的股票一律推進
+    """
+    stale_before = get_history_start_date()
+    needs = [code for code in target_list
+             if states.get(code) is None or states[code].last_date < stale_before]
+    if not needs:
+        return list(target_list), []
+    
+    store = bulk_ingest_store()
+    quota_provider = get_quota_provider()
+    if store is not None:
+        ingested_from = get_ingested_from(store)
+        postponed = set(needs) if ingested_from is None or ingested_from > get_history_start_date(timeframe) else set()
+    elif quota_provider:
+        start_date = get_history_start_date(timeframe)
+        end_date = datetime.now().strftime('%Y-%m-%d')
+        budget = get_rate_limiter(quota_provider).budget(0)
+        used = 0
+        postponed = set()
+        for code in needs:
+            cost = estimate_request_cost(code, start_date, end_date)
+            if used + cost <= budget:
+                used += cost
+            else:
+                postponed.add(code)
+    else:
+        postponed = set()
+    
+    return [code for code in target_list if code not in postponed], [code for code in needs if code in postponed]
+
+
+def scan_timeframes(target_list, timeframes) -> dict:
+    """
+    以週 K / 月 K 檢查突破、站上所有均線與連續紅 K 條件 (SCAN_TIMEFRAMES)
+    
+    各週期的指標狀態分開保存，新的日 K 只更新當期的週 K / 月 K；
+    日 K 已由全市場行情表寫入本地 K 線儲存庫時不需額外請求。
+    只有第一次建立狀態時需要較長的歷史資料 (PERIOD_HISTORY_SESSIONS)，
+    由 plan_timeframe_bootstraps 控制成本，尚未建立的股票於之後的執行補上。
+    
+    Returns:
+        {週期: [符合條件的股票代碼]}
+    """
+    qualified = {}
+    for timeframe in timeframes:
+        state_store = IndicatorStateStore(period_state_path(timeframe), PeriodState)
+        states = state_store.load()
+        advance_list, postponed = plan_timeframe_bootstraps(target_list, states, timeframe)
+        if postponed:
+            print(f"{TIMEFRAME_TAGS[timeframe]}: {len(postponed)} 檔尚待建立指標狀態 (歷史資料回補中或配額不足)，下次執行補上")
+        
+        def _advance(code):
+            try:
+                return code, advance_indicator_state(code, states.get(code), timeframe)
+            except Exception as e:
+                print(f"\nError updating {code} ({timeframe}): {e}")
+                return code, (None, None)
+        
+        codes = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for code, (saved_state, screen_state) in executor.map(_advance, advance_list):
+                if saved_state is not None:
+                    states[code] = saved_state
+                if screen_state is not None and screen_indicator_state(screen_state)[0]:
+                    codes.append(code)
+        
+        with span('indicator_state.save'):
+            state_store.save(states)
+        qualified[timeframe] = sorted(codes)
+        print(f"{TIMEFRAME_TAGS[timeframe]}: {len(codes)} 檔")
+    return qualified
+
+
+def tag_timeframe_breakouts(stocks: list, qualified: dict):
+    """日 K 符合條件的股票若週 K / 月 K 也符合，加上「週線突破」/「月線突破」標籤"""
+    for stock in stocks:
+        for timeframe, codes in qualified.items():
+            tag = TIMEFRAME_TAGS[timeframe]
+            if stock['ticker'] in codes and tag not in stock['tags']:
+                stock['tags'].append(tag)
+
+
+def write_scan_metrics(date_str: str, run_info: dict):
+    """
+    輸出本次掃描的各階段耗時與計數 (HTTP 請求、位元組、重試、快取命中)
+
+    scan_metrics.json 為最新一次，metrics/{日期}.json 保留每日紀錄供比較趨勢
+    """
+    try:
+        metrics = get_scan_metrics()
+        report = metrics.write_report(OUTPUT_DIR / "scan_metrics.json", date=date_str, run=run_info)
+        metrics.write_report(OUTPUT_DIR / "metrics" / f"{date_str}.json", date=date_str, run=run_info)
+        counters = report['counters']
+        print(f"📈 掃描指標: HTTP {counters.get('http.requests', 0):.0f} 次 "
+              f"({counters.get('http.bytes', 0) / 1024 / 1024:.1f} MB, 重試 {counters.get('http.retries', 0):.0f} 次)，"
+              f"K 線快取命中 {counters.get('bar_store.hits', 0):.0f} 檔")
+    except Exception as e:
+        print(f"⚠️ 掃描指標輸出失敗 (不影響主流程): {e}")
+
+
+def merge_checkpoint_results(checkpoint, target_list) -> tuple[list, dict, dict]:
+    """
+    由檢查點彙整掃描結果
+    
+    Returns:
+        (符合條件的股票清單, 市場統計, 失敗 {code: error})
+    """
+    completed, failures = checkpoint.load()
+    targets = set(target_list)
+    
+    results = []
+    market_stats = new_market_stats()
+    for code, (data, change_pct) in completed.items():
+        if code not in targets:
+            continue
+        add_to_market_stats(market_stats, change_pct)
+        if data:
+            results.append(data)
+    
+    failures = {code: error for code, error in failures.items() if code in targets}
+    return results, market_stats, failures
+
 
 def main():
     """主程式"""
@@ -805,11 +1607,26 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--update-alerts', action='store_true', help='Update existing alerts only')
     parser.add_argument('--generate-article-only', action='store_true', help='Generate article from existing data only')
+    parser.add_argument('--resume', action='store_true', help="Resume today's scan: retry failed or missing tickers only")
     args = parser.parse_args()
 
+    # 本地 K 線儲存庫：已下載過的日 K 不再重抓，只補缺少的日期 (設為空字串可停用)
+    os.environ.setdefault('STOCK_BAR_STORE_DIR', 'data/bars')
+    # API 配額狀態 (跨次執行保存剩餘請求數)
+    os.environ.setdefault('RATE_LIMIT_STATE_FILE', 'data/state/rate_limit.json')
+    # 股票基本資料表 (名稱、產業、市場；每個交易日建立一次)
+    os.environ.setdefault('STOCK_REGISTRY_FILE', 'data/state/stock_registry.json')
+    # 市場警示帳本 (--update-alerts 只下載新紀錄)
+    os.environ.setdefault('ALERT_LEDGER_FILE', 'data/state/alert_ledger.json')
+    # 交易日曆 (證交所休市日與颱風停市；每年下載一次休市日程)
+    os.environ.setdefault('TRADING_CALENDAR_FILE', 'data/state/trading_calendar.json')
+    get_trading_calendar().ensure_year(datetime.now().year)
+
     # Check arguments
     if args.update_alerts:
-        data = update_existing_alerts()
+        data, changed = update_existing_alerts()
+        if not changed:
+            return
         
         # Merge article generation for alert updates
         try:
@@ -832,8 +1649,7 @@ def main():
             sys.exit(1)
             
         try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = read_scan_output(output_file)
             
             article = generate_daily_article(data)
             if save_to_json(article):
@@ -858,98 +1674,97 @@ def main():
     previous_data = None
     if output_file.exists():
         try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                previous_data = json.load(f)
+            previous_data = read_scan_output(output_file)
         except Exception as e:
             print(f"無法讀取舊資料: {e}")
 
     # 取得股票清單
     target_list = get_all_tw_targets()
+    all_targets = list(target_list)
     total = len(target_list)
     
-    # 警告：無 Token 時掃描大量股票風險
-    token = os.environ.get("FINMIND_API_TOKEN")
+    # 檢查點：逐檔記錄結果與失敗，--resume 時只重跑失敗或尚未掃描的股票
+    checkpoint = ScanCheckpoint(CHECKPOINT_DIR, datetime.now().strftime('%Y-%m-%d'))
+    if args.resume and checkpoint.exists():
+        target_list = checkpoint.remaining(target_list)
+        total = len(target_list)
+        print(f"♻️ 接續今日掃描: 已完成 {len(all_targets) - total} 檔，重試/補掃 {total} 檔")
+    else:
+        checkpoint.reset()
+    prune_checkpoints(CHECKPOINT_DIR)
     
-    # [NEW] Anonymous Optimization: Prioritize and Limit
-    if not token and total > 600:
-        print(f"⚠️ 未設定 Token，啟用「匿名安全模式」")
-        print(f"   將限制掃描前 550 檔熱門股票，以避免觸發 API 限制 (600次/hr)。")
-        
-        # Load ranks to prioritize
-        rank_file = OUTPUT_DIR / "market_cap_rank.json"
-        ranks = {}
-        if rank_file.exists():
-            try:
-                with open(rank_file, 'r', encoding='utf-8') as f:
-                    ranks = json.load(f).get("ranks", {})
-            except: pass
-            
-        # Sort: Ranked stocks first (low rank number), then others
-        target_list.sort(key=lambda x: ranks.get(x, 99999))
-        
-        # Slice
-        target_list = target_list[:550]
+    # 依 API 配額分批掃描 (取代匿名模式固定只掃描前 550 檔)
+    deferred = []
+    quota_provider = get_quota_provider()
+    if quota_provider:
+        limiter = get_rate_limiter(quota_provider)
+        target_list, deferred = plan_scan_batch(target_list, limiter)
         total = len(target_list)
-        print(f"   ✅ 已篩選前 {total} 檔高市值股票進行掃描。")
-    elif not token:
-        print(f"⚠️ 警告: 未設定 Token，但股票數量 {total} 在限制範圍內，繼續執行。")
+        print(f"📊 API 配額 ({quota_provider}): 剩餘 {limiter.available():.0f} 次，"
+              f"最長等待 {RATE_LIMIT_MAX_WAIT} 秒")
+        if deferred:
+            print(f"   本次掃描 {total} 檔，其餘 {len(deferred)} 檔延到下次執行 (優先掃描)")
     
     # 取得市場警示 (處置/注意)
-    market_alerts = fetch_market_alerts()
+    with span('fetch_market_alerts'):
+        market_alerts = fetch_market_alerts()
     print(f"取得市場警示資料: {len(market_alerts)} 筆")
     
 
     
     # 取得可當沖標的清單
-    allowed_day_trade_targets = fetch_allowed_day_trade_targets()
+    with span('fetch_allowed_day_trade_targets'):
+        allowed_day_trade_targets = fetch_allowed_day_trade_targets()
     
-    results = []
-    
-    # 市場寬度統計 (Market Breadth)
-    market_stats = {
-        "up": 0,
-        "down": 0,
-        "flat": 0,
-        "total_scanned": 0
-    }
+    # 以全市場行情表更新本地 K 線 (請求數隨交易日數，而非股票數 × 月數)
+    with span('ingest_market_daily_tables'):
+        ingest_market_daily_tables()
     
-    print(f"🚀 開始平行掃描 (Workers: {MAX_WORKERS})...")
+    if SCAN_ENGINE == 'pipeline':
+        print(f"🚀 開始掃描 (Engine: pipeline, Fetch Workers: {MAX_WORKERS}, Compute Workers: {COMPUTE_WORKERS})...")
+    else:
+        print(f"🚀 開始掃描 (Engine: {SCAN_ENGINE}, Workers: {MAX_WORKERS})...")
     start_time = time.time()
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # Submit tasks
-        futures = {executor.submit(process_single_stock, code, market_alerts, allowed_day_trade_targets): code for code in target_list}
-        
-        completed_count = 0
-        for future in concurrent.futures.as_completed(futures):
-            code = futures[future]
-            try:
-                _, data, change_pct = future.result()
-                
-                completed_count += 1
-                if completed_count % 10 == 0:
-                    print(f"\r進度: {completed_count}/{total} ({(completed_count/total)*100:.1f}%)", end="", flush=True)
-                
-                # 統計市場漲跌
-                if change_pct is not None:
-                    market_stats["total_scanned"] += 1
-                    if change_pct > 0:
-                        market_stats["up"] += 1
-                    elif change_pct < 0:
-                        market_stats["down"] += 1
-                    else:
-                        market_stats["flat"] += 1
-                        
-                if data:
-                    results.append(data)
-                    
-            except Exception as exc:
-                print(f"\nError processing {code}: {exc}")
+    with span(f'scan.{SCAN_ENGINE}'):
+        if SCAN_ENGINE == 'incremental':
+            scan_incremental(target_list, market_alerts, allowed_day_trade_targets, checkpoint)
+        elif SCAN_ENGINE == 'vectorized':
+            scan_vectorized(target_list, market_alerts, allowed_day_trade_targets, checkpoint)
+        elif SCAN_ENGINE == 'pipeline':
+            scan_pipeline(target_list, market_alerts, allowed_day_trade_targets, checkpoint)
+        else:
+            scan_per_stock(target_list, market_alerts, allowed_day_trade_targets, checkpoint)
+    
+    # 以檢查點合併本次與先前 (--resume) 的結果
+    results, market_stats, failures = merge_checkpoint_results(checkpoint, all_targets)
+    
+    # 週 K / 月 K 篩選 (沿用已更新的日 K，延到下次執行的股票不列入)
+    timeframe_results = {}
+    if SCAN_TIMEFRAMES:
+        deferred_set = set(deferred)
+        with span('scan.timeframes'):
+            timeframe_results = scan_timeframes([code for code in all_targets if code not in deferred_set], SCAN_TIMEFRAMES)
+        tag_timeframe_breakouts(results, timeframe_results)
+
+    # 延後的股票沿用上次結果，不列入剔除 / 新進
+    carried = carry_forward_deferred(previous_data, results, deferred)
+    if carried:
+        print(f"   延後掃描的股票中有 {len(carried)} 檔沿用上次入選結果")
+        results.extend(carried)
 
     elapsed = time.time() - start_time
+    
+    # 保存配額狀態與延後清單，下次執行由此接續
+    save_rate_limit_state()
+    if quota_provider:
+        save_pending_targets(deferred)
+    
     print(f"\n\n掃描完成！耗時: {elapsed:.2f} 秒")
     print(f"市場統計: 上漲 {market_stats['up']} / 下跌 {market_stats['down']} / 平盤 {market_stats['flat']}")
     print(f"符合條件: {len(results)} 檔\n")
+    if failures:
+        print(f"⚠️ {len(failures)} 檔取得資料失敗，可執行 --resume 只重試這些股票\n")
     
 
     
@@ -957,7 +1772,8 @@ def main():
     results.sort(key=lambda x: x['signal']['priority'], reverse=True)
     
     # 計算差異
-    changes = calculate_changes(previous_data, results)
+    with span('calculate_changes'):
+        changes = calculate_changes(previous_data, results)
 
     # 輸出結果
     if results:
@@ -994,22 +1810,30 @@ def main():
                 "new": len(changes['new']),
                 "continued": len(changes['continued']),
                 "removed": len(changes['removed'])
-            }
+            },
+            # 延後掃描、沿用上次結果的股票數
+            "carried": len(carried)
         },
         "changes": changes
     }
+    if timeframe_results:
+        # 週 K / 月 K 符合條件的股票代碼 {"W": [...], "M": [...]}
+        output["timeframes"] = timeframe_results
     
     # 寫入 JSON
     output_file = OUTPUT_DIR / "daily_scan_results.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
-    
-    # [NEW] Save History JSON for Article Page
-    history_dir = OUTPUT_DIR / "history"
-    history_dir.mkdir(exist_ok=True)
-    history_file = history_dir / f"{output['date']}.json"
-    with open(history_file, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
+    with span('write_json'):
+        # 精簡格式 (欄位式 K 線、changes 以代碼參照)，見 scan_output.py
+        write_scan_output(output_file, output)
+        
+        # [NEW] Save History JSON for Article Page
+        history_dir = OUTPUT_DIR / "history"
+        history_dir.mkdir(exist_ok=True)
+        history_file = history_dir / f"{output['date']}.json"
+        write_scan_output(history_file, output)
+
+        # 每日入選的精簡索引 (前端日曆一次請求載入)
+        update_history_index(OUTPUT_DIR, output)
     print(f"✅ History saved to {history_file}")
     
     print(f"\n✅ 已輸出至 {output_file}")
@@ -1019,12 +1843,23 @@ def main():
     # -----------------------------------------------
     try:
         print("正在產生盤勢分析文章...")
-        article = generate_daily_article(output)
-        save_to_json(article)
+        with span('generate_article'):
+            article = generate_daily_article(output)
+            save_to_json(article)
         print("✅ 已產生每日分析文章並儲存")
     except Exception as e:
         print(f"⚠️ 文章產生失敗 (不影響主流程): {e}")
     
+    write_scan_metrics(output['date'], {
+        'engine': SCAN_ENGINE,
+        'provider': os.environ.get('STOCK_DATA_PROVIDER', 'twse') if USE_FACADE else 'finmind',
+        'resumed': args.resume,
+        'targets': total,
+        'qualified': len(results),
+        'failed': len(failures),
+        'scanSeconds': round(elapsed, 3)
+    })
+    
     return output
 
 
@@ -0,0 +1,222 @@
+"""
+Dashboard Cache Module - 儀表板跨程序共用快取
+
+st.cache_data 只存在單一程序的記憶體中，重新啟動或多個 Streamlit worker 都要重新下載。
+這裡把資料放在磁碟上，所有 worker 共用，重新啟動後立即可用：
+
+- 日 K：已收盤的 K 線寫入本地 K 線儲存庫 (bar_store.BarStore，成交量為張)，不會過期；
+  coverage 記錄已下載的區間
+- 報價：每檔最近一次下載的結果 (尚未收盤的 K 線與最新 K 線日期)，有效期依交易時段：
+  交易時段內、或上游尚未更新最近收盤日時為 DASHBOARD_INTRADAY_TTL 秒；
+  最新 K 線已是最近收盤日時有效到下一次開盤 (response_cache.entry_lifetime)
+- 基本資料：名稱、產業、市場，有效到下一次收盤
+- 市場後綴：試出來的 .TW / .TWO，不會過期
+
+報價、基本資料與後綴各檔一個 JSON 檔，以暫存檔 + os.replace 寫入，
+多個程序同時讀寫也不會讀到寫一半的檔案。
+
+夜間掃描結果 (daily_scan_results.json) 可預先寫入快取 (warm_from_scan_output)，
+入選股票在重新啟動後不需任何請求。
+
+Environment Variable:
+    DASHBOARD_CACHE_DIR: 快取目錄 (預設 data/cache/dashboard)
+    DASHBOARD_INTRADAY_TTL: 盤中報價保留秒數 (預設 300)
+
+Usage:
+    from src.dashboard_cache import get_dashboard_cache
+
+    cache = get_dashboard_cache()
+    bars = cache.history('2330', '2024-09-01')   # None: 需要重新下載
+    cache.put_history('2330', '2024-09-01', downloaded_bars)
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from bar_store import BAR_FIELDS, MARKET_SETTLE_TIME, TW_TZ, BarStore, settled_date
+from response_cache import entry_lifetime, next_settle_time
+from trading_calendar import get_trading_calendar
+
+DEFAULT_CACHE_DIR = "data/cache/dashboard"
+DEFAULT_INTRADAY_TTL = 300
+
+# 夜間掃描結果
+SCAN_RESULTS_FILE = Path("frontend/public/data/daily_scan_results.json")
+
+MARKET_SUFFIXES = {"上市": ".TW", "上櫃": ".TWO"}
+
+# 開盤時間 (台灣時間)
+MARKET_OPEN_TIME = (9, 0)
+
+
+def in_session(now: datetime) -> bool:
+    """交易日的開盤到收盤結算之間 (報價隨時會變)"""
+    now = now.astimezone(TW_TZ)
+    return (get_trading_calendar().is_trading_day(now.strftime("%Y-%m-%d"))
+            and MARKET_OPEN_TIME <= (now.hour, now.minute) < MARKET_SETTLE_TIME)
+
+
+def next_open_time(now: datetime) -> datetime:
+    """下一次開盤時間 (交易日 MARKET_OPEN_TIME 台灣時間)"""
+    now = now.astimezone(TW_TZ)
+    calendar = get_trading_calendar()
+    candidate = now.replace(hour=MARKET_OPEN_TIME[0], minute=MARKET_OPEN_TIME[1], second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while not calendar.is_trading_day(candidate.strftime("%Y-%m-%d")):
+        candidate += timedelta(days=1)
+    return candidate
+
+
+class DashboardCache:
+    """磁碟上的日 K、報價與基本資料快取，多個程序共用同一個目錄"""
+
+    def __init__(self, root, intraday_ttl: Optional[float] = None,
+                 clock: Optional[Callable[[], datetime]] = None):
+        self.root = Path(root)
+        self.store = BarStore(self.root / "bars")
+        if intraday_ttl is None:
+            intraday_ttl = float(os.getenv("DASHBOARD_INTRADAY_TTL", DEFAULT_INTRADAY_TTL))
+        self.intraday_ttl = intraday_ttl
+        self._clock = clock
+
+    def now(self) -> datetime:
+        return self._clock() if self._clock else datetime.now(TW_TZ)
+
+    # ------------------------------------------------------------------
+    # Entries
+    # ------------------------------------------------------------------
+    def _entry_path(self, kind: str, symbol: str) -> Path:
+        return self.root / kind / f"{symbol}.json"
+
+    def _read_entry(self, kind: str, symbol: str):
+        """項目內容，不存在或已過期時為 None"""
+        try:
+            with open(self._entry_path(kind, symbol), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        expires = entry.get("expires")
+        if expires is not None and expires <= self.now().timestamp():
+            return None
+        return entry.get("value")
+
+    def _write_entry(self, kind: str, symbol: str, value, seconds: Optional[float] = None):
+        """寫入項目 (seconds 為 None 時不會過期)"""
+        expires = self.now().timestamp() + seconds if seconds is not None else None
+        path = self._entry_path(kind, symbol)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"expires": expires, "value": value}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    # ------------------------------------------------------------------
+    # History & quotes
+    # ------------------------------------------------------------------
+    def history(self, symbol: str, start_date: str) -> Optional[List[Dict]]:
+        """
+        start_date 起的日 K (含盤中 K 線)
+
+        Returns:
+            K 線列表 (可能為空：查無資料也會暫存)；報價已過期或區間未下載過時為 None
+        """
+        quote = self._read_entry("quotes", symbol)
+        coverage = self.store.get_coverage(symbol)
+        if quote is None or coverage is None or coverage[0] > start_date:
+            return None
+        return self.store.read(symbol, start_date, coverage[1]) + [
+            bar for bar in quote["live"] if bar["date"] >= start_date
+        ]
+
+    def put_history(self, symbol: str, start_date: str, bars: List[Dict]):
+        """下載結果 (start_date 起)：已收盤的 K 線寫入儲存庫，其餘留在報價中"""
+        now = self.now()
+        settled = settled_date(now)
+        final = [bar for bar in bars if bar["date"] <= settled]
+        if final:
+            self.store.write(symbol, final)
+        self.store.extend_coverage(symbol, start_date, settled)
+
+        latest = bars[-1]["date"] if bars else None
+        seconds, kind = entry_lifetime(latest, now, self.intraday_ttl)
+        if in_session(now):
+            seconds = self.intraday_ttl
+        elif kind == "eod":
+            seconds = min(seconds, (next_open_time(now) - now).total_seconds())
+        live = [{field: bar[field] for field in BAR_FIELDS} for bar in bars if bar["date"] > settled]
+        self._write_entry("quotes", symbol, {"date": latest, "live": live}, seconds)
+
+    # ------------------------------------------------------------------
+    # Info & suffixes
+    # ------------------------------------------------------------------
+    def info(self, symbol: str) -> Optional[dict]:
+        return self._read_entry("info", symbol)
+
+    def put_info(self, symbol: str, info: dict):
+        """基本資料有效到下一次收盤"""
+        now = self.now()
+        self._write_entry("info", symbol, info, (next_settle_time(now) - now).total_seconds())
+
+    def suffix(self, symbol: str) -> Optional[str]:
+        return self._read_entry("suffixes", symbol)
+
+    def put_suffix(self, symbol: str, suffix: str):
+        if self.suffix(symbol) != suffix:
+            self._write_entry("suffixes", symbol, suffix)
+
+    # ------------------------------------------------------------------
+    # Warm-up
+    # ------------------------------------------------------------------
+    def warm_from_scan_output(self, path=SCAN_RESULTS_FILE) -> int:
+        """
+        把夜間掃描結果的 K 線與基本資料寫入快取
+
+        已有有效報價的股票 (例如盤中已下載過) 不會被較舊的掃描結果覆蓋。
+
+        Returns:
+            寫入的股票數
+        """
+        # Imported here: only the warm-up reads the scan output format
+        from scripts.scan_output import read_scan_output
+
+        try:
+            data = read_scan_output(path)
+        except (OSError, ValueError):
+            return 0
+
+        warmed = 0
+        for stock in (data or {}).get("stocks", []):
+            symbol = stock.get("ticker")
+            bars = [{field: bar[field] for field in BAR_FIELDS} for bar in stock.get("ohlc") or []]
+            if not symbol or not bars or self._read_entry("quotes", symbol) is not None:
+                continue
+            self.put_history(symbol, bars[0]["date"], bars)
+            suffix = MARKET_SUFFIXES.get(stock.get("market"), ".TW")
+            self.put_suffix(symbol, suffix)
+            self.put_info(symbol, {
+                "name": stock.get("name") or symbol,
+                "symbol": symbol,
+                "market": suffix.lstrip("."),
+                "sector": stock.get("sector") or "",
+                "industry": "",
+            })
+            warmed += 1
+        return warmed
+
+
+_dashboard_cache: Optional[DashboardCache] = None
+_dashboard_cache_lock = threading.Lock()
+
+
+def get_dashboard_cache() -> DashboardCache:
+    """Get the shared cache (DASHBOARD_CACHE_DIR)"""
+    global _dashboard_cache
+    if _dashboard_cache is None:
+        with _dashboard_cache_lock:
+            if _dashboard_cache is None:
+                _dashboard_cache = DashboardCache(os.getenv("DASHBOARD_CACHE_DIR", DEFAULT_CACHE_DIR))
+    return _dashboard_cache
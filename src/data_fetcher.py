@@ -1,139 +1,231 @@
 """
 Data Fetcher Module - 股票資料抓取
 Uses yfinance to fetch Taiwan stock data
+
+整份觀察清單以一次 yf.download 批次下載 (yfinance 平行取得各檔)，不再逐檔呼叫
+Ticker.history；結果存在磁碟快取 (src/dashboard_cache.py)，所有 Streamlit worker 共用，
+重新啟動後不必重新下載，get_stock_data、get_current_price 共用同一份資料。
+
+- 市場後綴 (.TW 上市 / .TWO 上櫃) 先依股票基本資料表推測，試出來的後綴記住，
+  上櫃股票不會每次都先試一次 .TW
+- 名稱、產業與市場來自股票基本資料表 (stock_registry.py)，不再呼叫 ticker.info
+- 現價與漲跌取自同一份日 K 的最後兩根 (盤中最後一根即為目前價格)
+- 價格為未還原股價、成交量為張，與掃描結果 (TWSE / FinMind) 一致
 """
+from datetime import timedelta
+from typing import Dict, List, Tuple
+
 import yfinance as yf
 import pandas as pd
-from datetime import datetime, timedelta
 import streamlit as st
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
+from src.dashboard_cache import MARKET_SUFFIXES, get_dashboard_cache
+from stock_registry import get_stock_registry
+
+# yfinance 資料期間 -> 日曆天數
+PERIOD_DAYS = {"1d": 1, "5d": 7, "1mo": 31, "3mo": 92, "6mo": 183, "1y": 366}
+
+OHLCV_COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+
+def period_start(period: str) -> str:
+    """資料期間的起日 (台灣時間)"""
+    days = PERIOD_DAYS.get(period, PERIOD_DAYS["1mo"])
+    return (get_dashboard_cache().now() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def frame_to_bars(df: pd.DataFrame) -> List[Dict]:
+    """yfinance DataFrame -> K 線列表 (成交量由股換算為張)"""
+    bars = []
+    for idx, row in zip(df.index, df.itertuples()):
+        if pd.isna(row.Close):
+            continue
+        bars.append({
+            "date": idx.strftime("%Y-%m-%d"),
+            "open": round(float(row.Open), 2),
+            "high": round(float(row.High), 2),
+            "low": round(float(row.Low), 2),
+            "close": round(float(row.Close), 2),
+            "volume": int(row.Volume) // 1000 if not pd.isna(row.Volume) else 0,
+        })
+    return bars
+
+
+def bars_to_frame(bars: List[Dict]) -> pd.DataFrame:
+    """K 線列表 -> OHLCV DataFrame (以日期為索引)"""
+    if not bars:
+        return pd.DataFrame()
+    df = pd.DataFrame(bars).rename(columns=OHLCV_COLUMNS)
+    df.index = pd.to_datetime(df.pop("date"))
+    return df[list(OHLCV_COLUMNS.values())]
+
+
+def guess_suffix(symbol: str) -> Tuple[str, bool]:
+    """(後綴, 是否已確認)：已確認的後綴優先，其次依股票基本資料表的市場，預設 .TW"""
+    suffix = get_dashboard_cache().suffix(symbol)
+    if suffix:
+        return suffix, True
+    entry = get_stock_registry().get(symbol)
+    return MARKET_SUFFIXES.get(entry.get("market") if entry else None, ".TW"), False
+
+
+def download_batch(tickers: List[str], start_date: str) -> Dict[str, pd.DataFrame]:
+    """
+    以一次 yf.download 下載多檔日 K (未還原股價)
+
+    Args:
+        tickers: yfinance 代號 (例如 2330.TW)
+        start_date: 起日 (YYYY-MM-DD)
+
+    Returns:
+        dict with yfinance ticker as key and non-empty OHLCV DataFrame as value
+    """
+    try:
+        raw = yf.download(tickers, start=start_date, group_by="ticker", auto_adjust=False,
+                          threads=True, progress=False)
+    except Exception as e:
+        st.error(f"無法取得 {', '.join(tickers)} 的資料: {e}")
+        return {}
+    if raw is None or raw.empty:
+        return {}
+
+    frames = {}
+    for ticker in tickers:
+        if isinstance(raw.columns, pd.MultiIndex):
+            if ticker not in raw.columns.get_level_values(0):
+                continue
+            df = raw[ticker]
+        else:
+            # 單檔時部分 yfinance 版本回傳單層欄位
+            df = raw
+        # 批次中其他股票有資料的日期，這檔為整列 NaN
+        df = df.dropna(how="all")
+        if not df.empty:
+            frames[ticker] = df
+    return frames
+
+
+def get_multiple_stocks_data(symbols: list, period: str = "1mo") -> dict:
+    """
+    批次取得多檔股票資料
+
+    快取中沒有或報價已過期的代碼以一次請求下載；推測的後綴沒有資料時，
+    這些代碼再以另一個後綴一起重試一次。
+
+    Args:
+        symbols: 股票代碼列表
+        period: 資料期間
+
+    Returns:
+        dict with symbol as key and DataFrame as value
+    """
+    cache = get_dashboard_cache()
+    start_date = period_start(period)
+    cached = {}
+    for symbol in dict.fromkeys(symbols):
+        bars = cache.history(symbol, start_date)
+        if bars is not None:
+            cached[symbol] = bars
+
+    missing = [symbol for symbol in dict.fromkeys(symbols) if symbol not in cached]
+    if missing:
+        guesses = {symbol: guess_suffix(symbol) for symbol in missing}
+        frames = download_batch([symbol + suffix for symbol, (suffix, _) in guesses.items()], start_date)
+        found = {}
+        retry = {}
+        for symbol, (suffix, confirmed) in guesses.items():
+            if symbol + suffix in frames:
+                found[symbol] = (suffix, frames[symbol + suffix])
+            elif not confirmed:
+                retry[symbol] = ".TWO" if suffix == ".TW" else ".TW"
+        if retry:
+            frames = download_batch([symbol + suffix for symbol, suffix in retry.items()], start_date)
+            for symbol, suffix in retry.items():
+                if symbol + suffix in frames:
+                    found[symbol] = (suffix, frames[symbol + suffix])
+
+        for symbol in missing:
+            bars = []
+            if symbol in found:
+                suffix, df = found[symbol]
+                cache.put_suffix(symbol, suffix)
+                bars = frame_to_bars(df)
+            # 查無資料也暫存，避免每次重新整理都再請求
+            cache.put_history(symbol, start_date, bars)
+            cached[symbol] = bars
+
+    return {symbol: bars_to_frame(cached[symbol]) for symbol in symbols}
+
+
 def get_stock_data(symbol: str, period: str = "1mo") -> pd.DataFrame:
     """
     取得股票歷史 K 線資料
-    
+
     Args:
         symbol: 股票代碼 (不含 .TW 後綴)
         period: 資料期間 (1d, 5d, 1mo, 3mo, 6mo, 1y)
-    
+
     Returns:
         DataFrame with OHLCV data
     """
-    ticker_symbol = f"{symbol}.TW"
-    try:
-        ticker = yf.Ticker(ticker_symbol)
-        df = ticker.history(period=period)
-        if df.empty:
-            # Try .TWO for OTC stocks
-            ticker_symbol = f"{symbol}.TWO"
-            ticker = yf.Ticker(ticker_symbol)
-            df = ticker.history(period=period)
-        return df
-    except Exception as e:
-        st.error(f"無法取得 {symbol} 的資料: {e}")
-        return pd.DataFrame()
+    return get_multiple_stocks_data([symbol], period)[symbol]
 
 
-def get_current_price(symbol: str) -> dict:
+def get_current_price(symbol: str, period: str = "1mo") -> dict:
     """
-    取得即時價格資訊
-    
+    取得即時價格資訊 (與 get_stock_data 共用同一份日 K)
+
     Args:
         symbol: 股票代碼
-    
+        period: 日 K 資料期間 (與 get_stock_data 相同時不會另外請求)
+
     Returns:
         dict with current price, change, change_pct
     """
-    ticker_symbol = f"{symbol}.TW"
-    try:
-        ticker = yf.Ticker(ticker_symbol)
-        info = ticker.info
-        
-        # Get from fast_info if available
-        if hasattr(ticker, 'fast_info'):
-            fast = ticker.fast_info
-            current = fast.get('lastPrice', 0)
-            prev_close = fast.get('previousClose', current)
-        else:
-            current = info.get('currentPrice', info.get('regularMarketPrice', 0))
-            prev_close = info.get('previousClose', current)
-        
-        if current == 0:
-            # Fallback to history
-            hist = ticker.history(period="2d")
-            if not hist.empty:
-                current = hist['Close'].iloc[-1]
-                prev_close = hist['Close'].iloc[-2] if len(hist) > 1 else current
-        
-        change = current - prev_close
-        change_pct = (change / prev_close * 100) if prev_close else 0
-        
-        return {
-            "current": current,
-            "prev_close": prev_close,
-            "change": change,
-            "change_pct": change_pct
-        }
-    except Exception as e:
+    df = get_stock_data(symbol, period)
+    if df.empty or "Close" not in df.columns:
         return {
             "current": 0,
             "prev_close": 0,
             "change": 0,
             "change_pct": 0,
-            "error": str(e)
+            "error": f"無法取得 {symbol} 的資料"
         }
 
+    current = float(df["Close"].iloc[-1])
+    prev_close = float(df["Close"].iloc[-2]) if len(df) > 1 else current
+    change = current - prev_close
+    change_pct = (change / prev_close * 100) if prev_close else 0
+
+    return {
+        "current": current,
+        "prev_close": prev_close,
+        "change": change,
+        "change_pct": change_pct
+    }
+
 
 def get_stock_info(symbol: str) -> dict:
     """
-    取得股票基本資訊
-    
+    取得股票基本資訊 (股票基本資料表，結果存在快取中到下一次收盤)
+
     Args:
         symbol: 股票代碼
-    
+
     Returns:
         dict with stock name and other info
     """
-    ticker_symbol = f"{symbol}.TW"
-    try:
-        ticker = yf.Ticker(ticker_symbol)
-        info = ticker.info
-        
-        name = info.get('longName', info.get('shortName', symbol))
-        
-        # Extract Chinese name if available
-        if name and '(' in name:
-            name = name.split('(')[0].strip()
-        
-        return {
+    cache = get_dashboard_cache()
+    info = cache.info(symbol)
+    if info is None:
+        name, sector, market = get_stock_registry().describe(symbol)
+        suffix = cache.suffix(symbol) or MARKET_SUFFIXES.get(market, ".TW")
+        info = {
             "name": name,
             "symbol": symbol,
-            "market": info.get('market', 'TW'),
-            "sector": info.get('sector', ''),
-            "industry": info.get('industry', ''),
-        }
-    except Exception:
-        return {
-            "name": symbol,
-            "symbol": symbol,
-            "market": "TW",
-            "sector": "",
+            "market": suffix.lstrip("."),
+            "sector": sector,
             "industry": "",
         }
-
-
-def get_multiple_stocks_data(symbols: list, period: str = "1mo") -> dict:
-    """
-    批次取得多檔股票資料
-    
-    Args:
-        symbols: 股票代碼列表
-        period: 資料期間
-    
-    Returns:
-        dict with symbol as key and DataFrame as value
-    """
-    result = {}
-    for symbol in symbols:
-        result[symbol] = get_stock_data(symbol, period)
-    return result
+        cache.put_info(symbol, info)
+    return info
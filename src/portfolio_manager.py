@@ -3,11 +3,13 @@ Portfolio Manager Module - 持股管理與異動偵測
 """
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 from typing import Optional
 import streamlit as st
 
+from trading_calendar import get_trading_calendar
+
 # Portfolio directory
 PORTFOLIO_DIR = Path("data/portfolios")
 
@@ -67,13 +69,8 @@ def save_portfolio(portfolio: dict, date: Optional[str] = None):
 
 
 def get_yesterday_date() -> str:
-    """取得前一個交易日日期（簡化處理，實際應考慮假日）"""
-    today = datetime.now()
-    yesterday = today - timedelta(days=1)
-    # Skip weekends
-    while yesterday.weekday() >= 5:
-        yesterday -= timedelta(days=1)
-    return yesterday.strftime("%Y-%m-%d")
+    """取得前一個交易日日期（依交易日曆跳過週末、國定假日與颱風停市）"""
+    return get_trading_calendar().previous_trading_day(datetime.now().strftime("%Y-%m-%d"))
 
 
 def detect_changes(today_portfolio: dict, yesterday_portfolio: dict) -> dict:
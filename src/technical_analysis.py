@@ -2,19 +2,18 @@
 Technical Analysis Module - KD 指標計算與技術分析
 """
 import pandas as pd
-import numpy as np
-import pandas_ta as ta
 
+from indicators import compute_indicators
 
-def calculate_kd(df: pd.DataFrame, k_period: int = 9, d_period: int = 3, smooth_k: int = 3) -> pd.DataFrame:
+
+def calculate_kd(df: pd.DataFrame) -> pd.DataFrame:
     """
-    計算 KD 指標 (Stochastic Oscillator)
+    計算 KD 指標 (9, 3, 3)
+    
+    與每日掃描、API 相同的算法 (indicators.py)：K = 2/3 前日K + 1/3 RSV，D = 2/3 前日D + 1/3 K
     
     Args:
         df: OHLCV DataFrame
-        k_period: K 週期 (預設 9)
-        d_period: D 週期 (預設 3)
-        smooth_k: K 平滑週期 (預設 3)
     
     Returns:
         DataFrame with K and D columns added
@@ -22,22 +21,9 @@ def calculate_kd(df: pd.DataFrame, k_period: int = 9, d_period: int = 3, smooth_
     if df.empty:
         return df
     
-    # Calculate using pandas_ta
-    stoch = ta.stoch(df['High'], df['Low'], df['Close'], 
-                     k=k_period, d=d_period, smooth_k=smooth_k)
-    
-    if stoch is not None:
-        df['K'] = stoch[f'STOCHk_{k_period}_{d_period}_{smooth_k}']
-        df['D'] = stoch[f'STOCHd_{k_period}_{d_period}_{smooth_k}']
-    else:
-        # Manual calculation as fallback
-        low_min = df['Low'].rolling(window=k_period).min()
-        high_max = df['High'].rolling(window=k_period).max()
-        
-        rsv = (df['Close'] - low_min) / (high_max - low_min) * 100
-        df['K'] = rsv.ewm(span=smooth_k, adjust=False).mean()
-        df['D'] = df['K'].ewm(span=d_period, adjust=False).mean()
-    
+    ind = compute_indicators(df['Open'], df['High'], df['Low'], df['Close'], df['Volume'])
+    df['K'] = ind['k']
+    df['D'] = ind['d']
     return df
 
 
@@ -3,11 +3,13 @@ Watchlist Manager Module - 每日觀察清單管理
 """
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 from typing import Optional, List
 import streamlit as st
 
+from trading_calendar import get_trading_calendar
+
 # Watchlist directory
 WATCHLIST_DIR = Path("data/watchlists")
 
@@ -70,13 +72,8 @@ def save_watchlist(stocks: List[str], date: Optional[str] = None):
 
 
 def get_previous_trading_date() -> str:
-    """取得前一個交易日日期"""
-    today = datetime.now()
-    yesterday = today - timedelta(days=1)
-    # Skip weekends
-    while yesterday.weekday() >= 5:
-        yesterday -= timedelta(days=1)
-    return yesterday.strftime("%Y-%m-%d")
+    """取得前一個交易日日期（依交易日曆跳過週末、國定假日與颱風停市）"""
+    return get_trading_calendar().previous_trading_day(datetime.now().strftime("%Y-%m-%d"))
 
 
 def detect_watchlist_changes(today_stocks: List[str], yesterday_stocks: List[str]) -> dict:
@@ -0,0 +1,140 @@
+"""
+Watchlist View Module - 觀察清單檢視
+
+Streamlit 每次互動都會重新執行整支 app.py；觀察清單只計算、繪製選取的那一檔，
+其他股票以摘要表顯示 (取自已批次下載的日 K 最後兩根，不計算指標也不建立圖表)，
+觀察清單變長時每次重新執行的時間不隨之增加。
+
+選取股票的指標、操作提示與 Plotly 圖表依 (股票代碼, 最後一根 K 線) 保存在程序記憶體中，
+切換股票或重新整理時不重算；最後一根 K 線改變 (新的交易日或盤中報價更新) 時才重建。
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from src.charts import create_candlestick_chart
+from src.strategy_advisor import check_risk_status
+from src.technical_analysis import (
+    calculate_kd, detect_kd_cross, get_kd_status,
+    get_volume_analysis, detect_breakout
+)
+
+# 保存的股票檢視數 (超過時移除最久未使用的)
+MAX_VIEWS = 64
+
+_views: "OrderedDict[Tuple, dict]" = OrderedDict()
+_views_lock = threading.Lock()
+
+
+def last_bar_key(df: pd.DataFrame) -> Optional[Tuple[str, float, float]]:
+    """最後一根 K 線 (日期, 收盤, 成交量)；盤中報價更新時收盤與成交量會改變"""
+    if df.empty:
+        return None
+    last = df.iloc[-1]
+    return df.index[-1].strftime("%Y-%m-%d"), float(last["Close"]), float(last["Volume"])
+
+
+def price_change(df: pd.DataFrame) -> Dict[str, float]:
+    """最後兩根收盤的現價與漲跌幅 (與 data_fetcher.get_current_price 相同)"""
+    current = float(df["Close"].iloc[-1])
+    prev_close = float(df["Close"].iloc[-2]) if len(df) > 1 else current
+    change_pct = ((current - prev_close) / prev_close * 100) if prev_close else 0
+    return {"current": current, "change_pct": change_pct}
+
+
+def summary_row(symbol: str, name: str, df: pd.DataFrame, is_new: bool = False) -> dict:
+    """
+    摘要表的一列 (未選取的股票)
+
+    Args:
+        symbol: 股票代碼
+        name: 股票名稱
+        df: 日 K
+        is_new: 是否為今日新加入
+
+    Returns:
+        dict with 代碼 / 名稱 / 現價 / 漲跌幅 (%) / 日期
+    """
+    row = {"代碼": f"{'✨ ' if is_new else ''}{symbol}", "名稱": name,
+           "現價": None, "漲跌幅 (%)": None, "日期": None}
+    if not df.empty:
+        price = price_change(df)
+        row.update({
+            "現價": round(price["current"], 2),
+            "漲跌幅 (%)": round(price["change_pct"], 2),
+            "日期": df.index[-1].strftime("%Y-%m-%d"),
+        })
+    return row
+
+
+def build_stock_view(symbol: str, name: str, df: pd.DataFrame) -> dict:
+    """
+    計算單一股票的指標、操作提示與圖表
+
+    Args:
+        symbol: 股票代碼
+        name: 股票名稱
+        df: 日 K (不可為空)
+
+    Returns:
+        dict with price / KD / volume / breakout / advice values and the Plotly figure
+    """
+    df = calculate_kd(df.copy())
+    price = price_change(df)
+
+    k_value = df['K'].iloc[-1] if 'K' in df.columns and not df['K'].isna().all() else 50
+    d_value = df['D'].iloc[-1] if 'D' in df.columns and not df['D'].isna().all() else 50
+    kd_cross = detect_kd_cross(df)
+    volume_analysis = get_volume_analysis(df)
+    breakout = detect_breakout(df)
+
+    # Get advice (using current price as "cost" for recommendation purposes)
+    advice = check_risk_status(
+        current_price=price["current"],
+        cost=price["current"] * 0.95,  # Assume hypothetical 5% gain for analysis
+        k_value=k_value,
+        volume_ratio=volume_analysis.get('ratio', 1),
+        is_kd_golden_cross=(kd_cross.get('type') == 'golden'),
+        is_breakout=breakout.get('is_breakout', False),
+        breakout_type=breakout.get('type')
+    )
+
+    return {
+        "current_price": price["current"],
+        "change_pct": price["change_pct"],
+        "k_value": k_value,
+        "d_value": d_value,
+        "kd_status": get_kd_status(k_value),
+        "volume_analysis": volume_analysis,
+        "advice": advice,
+        "figure": create_candlestick_chart(df=df, symbol=symbol, name=name, show_volume=True, show_kd=True),
+    }
+
+
+def get_stock_view(symbol: str, name: str, df: pd.DataFrame) -> Optional[dict]:
+    """
+    依 (股票代碼, 最後一根 K 線) 取得保存的股票檢視，沒有時建立
+
+    Returns:
+        build_stock_view 的結果；沒有資料時為 None
+    """
+    bar = last_bar_key(df)
+    if bar is None:
+        return None
+    key = (symbol, len(df)) + bar
+    with _views_lock:
+        view = _views.get(key)
+        if view is not None:
+            _views.move_to_end(key)
+            return view
+
+    # Built outside the lock; two sessions building the same view just do it twice
+    view = build_stock_view(symbol, name, df)
+    with _views_lock:
+        _views[key] = view
+        while len(_views) > MAX_VIEWS:
+            _views.popitem(last=False)
+    return view
+
@@ -8,20 +8,114 @@ This facade provides a unified interface for fetching stock data from multiple s
 
 Environment Variable:
     STOCK_DATA_PROVIDER: Set to 'twse' or 'finmind' (default: 'twse')
+    STOCK_BAR_STORE_DIR: Local bar store directory, read before fetching (default: disabled)
+    STOCK_FETCH_CONCURRENCY: Max in-flight requests for get_stock_prices_many (default: 8)
+    STOCK_HTTP_RETRIES: Retries of failed requests (connection errors, 429 / 5xx) (default: 2)
+    TWSE_BASE_URL / TPEX_BASE_URL / FINMIND_API_URL: Upstream endpoints
+        (default: the official hosts; pointed at benchmarks/stub_server.py when benchmarking)
     
 Usage:
     from stock_data_facade import StockDataFacade
     
     facade = StockDataFacade()  # Uses STOCK_DATA_PROVIDER env or defaults to 'twse'
     data = facade.get_stock_price('2330', '2024-01-01', '2024-01-31')
+    
+    # Many stocks at once over pooled connections
+    data_by_id = facade.get_stock_prices_many(['2330', '2317'], '2024-01-01', '2024-01-31')
 """
 
+import asyncio
 import os
+import threading
 import requests
-import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from bar_store import BarStore, settled_date
+from rate_limiter import get_rate_limiter
+from scan_metrics import count, record_http_response, span
+from stock_registry import StockRegistry, get_stock_registry
+
+
+DEFAULT_FETCH_CONCURRENCY = int(os.getenv('STOCK_FETCH_CONCURRENCY', 8))
+HTTP_RETRIES = int(os.getenv('STOCK_HTTP_RETRIES', 2))
+
+# Upstream endpoints (overridable to replay fixtures from a local stand-in)
+TWSE_BASE_URL = os.getenv('TWSE_BASE_URL', 'https://www.twse.com.tw').rstrip('/')
+TPEX_BASE_URL = os.getenv('TPEX_BASE_URL', 'https://www.tpex.org.tw').rstrip('/')
+FINMIND_API_URL = os.getenv('FINMIND_API_URL', 'https://api.finmindtrade.com/api/v4/data')
+
+# TWSE answers a period without trades with this stat (很抱歉，沒有符合條件的資料!)
+TWSE_NO_DATA_STAT = "沒有符合條件的資料"
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Get the shared pooled HTTP session
+    
+    Reusing keep-alive connections avoids a new TCP/TLS handshake per request.
+    The pool is sized for the configured fetch concurrency. Transient failures
+    are retried with backoff, and every response is counted in the scan metrics.
+    """
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                pool_size = max(DEFAULT_FETCH_CONCURRENCY, 10)
+                retry = Retry(
+                    total=HTTP_RETRIES,
+                    # An unreachable host rarely recovers within seconds; retry it once at most
+                    connect=min(HTTP_RETRIES, 1),
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(['GET']),
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.hooks['response'].append(record_http_response)
+                _http_session = session
+    return _http_session
+
+
+def _month_list(start_date: str, end_date: str) -> List[Tuple[int, int]]:
+    """List (year, month) pairs covering the date range"""
+    start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+    end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+    
+    months = []
+    current_dt = start_dt.replace(day=1)
+    while current_dt <= end_dt:
+        months.append((current_dt.year, current_dt.month))
+        
+        # Move to next month
+        if current_dt.month == 12:
+            current_dt = current_dt.replace(year=current_dt.year + 1, month=1)
+        else:
+            current_dt = current_dt.replace(month=current_dt.month + 1)
+    return months
+
+
+def _month_range(year: int, month: int, start_date: str, end_date: str) -> Tuple[str, str]:
+    """The part of a month that falls within the date range"""
+    first = datetime(year, month, 1)
+    last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return max(start_date, first.strftime('%Y-%m-%d')), min(end_date, last.strftime('%Y-%m-%d'))
+
+
+async def _run_blocking(func, *args):
+    """Run a blocking provider call on the event loop's executor"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
 
 
 class StockDataProvider(ABC):
@@ -54,13 +148,47 @@ class StockDataProvider(ABC):
             Dictionary with keys: stock_id, stock_name
         """
         pass
+    
+    async def afetch_stock_price(self, stock_id: str, start_date: str, end_date: str,
+                                 semaphore: asyncio.Semaphore) -> List[Dict]:
+        """
+        Async variant of fetch_stock_price
+        
+        The default runs the blocking call on the loop executor while holding
+        one slot of the in-flight semaphore. Providers that need several
+        requests per stock can override it to pipeline them.
+        """
+        async with semaphore:
+            return await _run_blocking(self.fetch_stock_price, stock_id, start_date, end_date)
+    
+    def fetch_stock_price_covered(self, stock_id: str, start_date: str,
+                                  end_date: str) -> Tuple[List[Dict], List[Tuple[str, str]]]:
+        """
+        Fetch stock price data and report which parts of the range were fetched
+        
+        The bar store records only the fetched ranges as covered, so a part
+        that failed is requested again instead of becoming a permanent hole.
+        The default treats an empty result as a failure of the whole range.
+        
+        Returns:
+            (bars, fetched ranges as (start, end) tuples)
+        """
+        bars = self.fetch_stock_price(stock_id, start_date, end_date)
+        return bars, [(start_date, end_date)] if bars else []
+    
+    async def afetch_stock_price_covered(self, stock_id: str, start_date: str, end_date: str,
+                                         semaphore: asyncio.Semaphore) -> Tuple[List[Dict], List[Tuple[str, str]]]:
+        """Async variant of fetch_stock_price_covered"""
+        bars = await self.afetch_stock_price(stock_id, start_date, end_date, semaphore)
+        return bars, [(start_date, end_date)] if bars else []
 
 
 class TWSEProvider(StockDataProvider):
     """Taiwan Stock Exchange data provider"""
     
     def __init__(self):
-        self.base_url = "https://www.twse.com.tw"
+        self.base_url = TWSE_BASE_URL
+        self.session = get_http_session()
         
     def fetch_stock_price(self, stock_id: str, start_date: str, end_date: str) -> List[Dict]:
         """
@@ -69,45 +197,62 @@ class TWSEProvider(StockDataProvider):
         TWSE API provides monthly data, so we need to fetch multiple months
         if the date range spans across months.
         """
+        return self.fetch_stock_price_covered(stock_id, start_date, end_date)[0]
+    
+    async def afetch_stock_price(self, stock_id: str, start_date: str, end_date: str,
+                                 semaphore: asyncio.Semaphore) -> List[Dict]:
+        return (await self.afetch_stock_price_covered(stock_id, start_date, end_date, semaphore))[0]
+    
+    def fetch_stock_price_covered(self, stock_id: str, start_date: str,
+                                  end_date: str) -> Tuple[List[Dict], List[Tuple[str, str]]]:
+        """Fetch month by month; a month counts as fetched unless its request failed"""
+        months = _month_list(start_date, end_date)
         try:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-            
-            all_data = []
-            
-            # Generate list of year-month pairs to fetch
-            current_dt = start_dt.replace(day=1)
-            while current_dt <= end_dt:
-                year = current_dt.year
-                month = current_dt.month
-                
-                # Fetch data for this month
-                monthly_data = self._fetch_monthly_data(stock_id, year, month)
-                all_data.extend(monthly_data)
-                
-                # Move to next month
-                if month == 12:
-                    current_dt = current_dt.replace(year=year + 1, month=1)
-                else:
-                    current_dt = current_dt.replace(month=month + 1)
-            
-            # Filter data within date range
-            filtered_data = [
-                item for item in all_data
-                if start_date <= item['date'] <= end_date
-            ]
-            
-            return filtered_data
-            
+            monthly = [self._fetch_monthly_data(stock_id, year, month) for year, month in months]
         except Exception as e:
             print(f"TWSE API Error: {e}")
-            return []
+            return [], []
+        return self._combine_months(months, monthly, start_date, end_date)
     
-    def _fetch_monthly_data(self, stock_id: str, year: int, month: int) -> List[Dict]:
-        """Fetch stock data for a specific month from TWSE"""
+    async def afetch_stock_price_covered(self, stock_id: str, start_date: str, end_date: str,
+                                         semaphore: asyncio.Semaphore) -> Tuple[List[Dict], List[Tuple[str, str]]]:
+        """Fetch all months of one stock concurrently (each month holds one in-flight slot)"""
+        async def fetch_month(year, month):
+            async with semaphore:
+                return await _run_blocking(self._fetch_monthly_data, stock_id, year, month)
+        
+        months = _month_list(start_date, end_date)
         try:
-            # Small delay to avoid rate limiting (TWSE recommends not too frequent)
-            time.sleep(0.1)
+            monthly = await asyncio.gather(*(fetch_month(y, m) for y, m in months))
+        except Exception as e:
+            print(f"TWSE API Error: {e}")
+            return [], []
+        return self._combine_months(months, monthly, start_date, end_date)
+    
+    @staticmethod
+    def _combine_months(months: List[Tuple[int, int]], monthly: List[Optional[List[Dict]]],
+                        start_date: str, end_date: str) -> Tuple[List[Dict], List[Tuple[str, str]]]:
+        """Filter the monthly bars to the range and list the months that were fetched"""
+        bars = [
+            item for month_data in monthly for item in month_data or []
+            if start_date <= item['date'] <= end_date
+        ]
+        fetched = [
+            _month_range(year, month, start_date, end_date)
+            for (year, month), month_data in zip(months, monthly) if month_data is not None
+        ]
+        return bars, fetched
+    
+    def _fetch_monthly_data(self, stock_id: str, year: int, month: int) -> Optional[List[Dict]]:
+        """
+        Fetch stock data for a specific month from TWSE
+        
+        Returns:
+            Bars of the month (empty when TWSE has no trades for it), None when the request failed
+        """
+        try:
+            # Shared token bucket paces requests across all threads
+            get_rate_limiter('twse').acquire()
             
             # TWSE API endpoint for daily stock data
             url = f"{self.base_url}/exchangeReport/STOCK_DAY"
@@ -117,16 +262,18 @@ class TWSEProvider(StockDataProvider):
                 'stockNo': stock_id
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            with span('request.twse.stock_day'):
+                response = self.session.get(url, params=params, timeout=10)
             
             if response.status_code != 200:
-                return []
+                return None
             
             data = response.json()
             
-            # Check if request was successful
-            if data.get('stat') != 'OK':
-                return []
+            # Check if request was successful; "no data" is a month without trades
+            stat = data.get('stat') or ''
+            if stat != 'OK':
+                return [] if TWSE_NO_DATA_STAT in stat else None
             
             # Parse data
             results = []
@@ -181,7 +328,7 @@ class TWSEProvider(StockDataProvider):
             
         except Exception as e:
             print(f"Error fetching monthly data for {stock_id} ({year}-{month:02d}): {e}")
-            return []
+            return None
     
     def fetch_stock_info(self, stock_id: str) -> Dict:
         """
@@ -199,7 +346,7 @@ class TWSEProvider(StockDataProvider):
                 'type': 'ALLBUT0999'
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -231,11 +378,34 @@ class FinMindProvider(StockDataProvider):
     """FinMind data provider"""
     
     def __init__(self):
-        self.base_url = "https://api.finmindtrade.com/api/v4/data"
+        self.base_url = FINMIND_API_URL
         self.token = os.getenv("FINMIND_API_TOKEN")
+        self.session = get_http_session()
         
     def fetch_stock_price(self, stock_id: str, start_date: str, end_date: str) -> List[Dict]:
         """Fetch stock price from FinMind API"""
+        return self.fetch_stock_price_covered(stock_id, start_date, end_date)[0]
+    
+    def fetch_stock_price_covered(self, stock_id: str, start_date: str,
+                                  end_date: str) -> Tuple[List[Dict], List[Tuple[str, str]]]:
+        """
+        One request for the whole range; it counts as fetched unless the request failed
+        
+        A successful answer without rows (suspended stock, holidays only) is
+        fetched too, so the range is not requested again on every run.
+        """
+        results = self._fetch_price_rows(stock_id, start_date, end_date)
+        if results is None:
+            return [], []
+        return results, [(start_date, end_date)]
+    
+    async def afetch_stock_price_covered(self, stock_id: str, start_date: str, end_date: str,
+                                         semaphore: asyncio.Semaphore) -> Tuple[List[Dict], List[Tuple[str, str]]]:
+        async with semaphore:
+            return await _run_blocking(self.fetch_stock_price_covered, stock_id, start_date, end_date)
+    
+    def _fetch_price_rows(self, stock_id: str, start_date: str, end_date: str) -> Optional[List[Dict]]:
+        """Price rows of one request; None if the request failed"""
         try:
             params = {
                 "dataset": "TaiwanStockPrice",
@@ -247,15 +417,17 @@ class FinMindProvider(StockDataProvider):
             if self.token:
                 params["token"] = self.token
             
-            response = requests.get(self.base_url, params=params, timeout=10)
+            get_rate_limiter('finmind').acquire()
+            with span('request.finmind'):
+                response = self.session.get(self.base_url, params=params, timeout=10)
             
             if response.status_code != 200:
-                return []
+                return None
             
             data = response.json()
             
             if data.get("msg") != "success":
-                return []
+                return None
             
             # Convert FinMind format to standard format
             results = []
@@ -273,7 +445,7 @@ class FinMindProvider(StockDataProvider):
             
         except Exception as e:
             print(f"FinMind API Error: {e}")
-            return []
+            return None
     
     def fetch_stock_info(self, stock_id: str) -> Dict:
         """Fetch stock information from FinMind"""
@@ -286,7 +458,8 @@ class FinMindProvider(StockDataProvider):
             if self.token:
                 params["token"] = self.token
             
-            response = requests.get(self.base_url, params=params, timeout=10)
+            get_rate_limiter('finmind').acquire()
+            response = self.session.get(self.base_url, params=params, timeout=10)
             
             if response.status_code != 200:
                 return {'stock_id': stock_id, 'stock_name': stock_id}
@@ -315,18 +488,24 @@ class StockDataFacade:
     abstracting away the complexity of different data sources.
     """
     
-    def __init__(self, provider: Optional[str] = None):
+    def __init__(self, provider: Optional[str] = None, bar_store: Optional[BarStore] = None):
         """
         Initialize the facade with a specific provider
         
         Args:
             provider: 'twse' or 'finmind'. If None, uses STOCK_DATA_PROVIDER env var,
                      defaulting to 'twse'
+            bar_store: Optional local bar store. If None, uses STOCK_BAR_STORE_DIR env var
+                       when set, otherwise every request goes upstream
         """
         if provider is None:
             provider = os.getenv('STOCK_DATA_PROVIDER', 'twse').lower()
         
+        if bar_store is None and os.getenv('STOCK_BAR_STORE_DIR'):
+            bar_store = BarStore(os.getenv('STOCK_BAR_STORE_DIR'))
+        
         self.provider = provider
+        self.bar_store = bar_store
         self._provider_instance = self._create_provider(provider)
     
     def _create_provider(self, provider: str) -> StockDataProvider:
@@ -360,19 +539,138 @@ class StockDataFacade:
         Returns:
             List of price data dictionaries
         """
-        return self._provider_instance.fetch_stock_price(stock_id, start_date, end_date)
+        if self.bar_store is None:
+            return self._provider_instance.fetch_stock_price(stock_id, start_date, end_date)
+        return self._get_stock_price_from_store(stock_id, start_date, end_date)
+    
+    def _get_stock_price_from_store(self, stock_id: str, start_date: str, end_date: str) -> List[Dict]:
+        """
+        Serve price data from the local bar store, fetching only missing days
+        """
+        gaps = self.bar_store.missing_ranges(stock_id, start_date, end_date)
+        count('bar_store.misses' if gaps else 'bar_store.hits')
+        for gap_start, gap_end in gaps:
+            bars, fetched = self._provider_instance.fetch_stock_price_covered(stock_id, gap_start, gap_end)
+            self._store_gap(stock_id, bars, fetched)
+        
+        return self.bar_store.read(stock_id, start_date, end_date)
+    
+    def _store_gap(self, stock_id: str, bars: List[Dict], fetched: List[Tuple[str, str]]):
+        """
+        Write fetched bars and record the fetched ranges as covered
+        
+        Only the ranges the provider actually fetched count as covered, so a
+        failed month stays a gap and is requested again. Fetched ranges are
+        recorded only up to the last settled date, so an intraday run
+        re-fetches today's bar on the next call.
+        """
+        if bars:
+            self.bar_store.write(stock_id, bars)
+        
+        # Merge adjacent ranges into runs; a run separated by a failed month stays apart
+        settled = settled_date()
+        runs = []
+        for start, end in sorted(fetched):
+            end = min(end, settled)
+            if start > end:
+                continue
+            if runs and start <= (datetime.strptime(runs[-1][1], '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d'):
+                runs[-1] = (runs[-1][0], max(runs[-1][1], end))
+            else:
+                runs.append((start, end))
+        
+        if not runs:
+            # Nothing fetched (e.g. an upstream error), keep the gap open
+            return
+        
+        # Extend outward from the stored window so each run touches the one before it;
+        # without a window the newest run is kept and the older part is retried
+        coverage = self.bar_store.get_coverage(stock_id)
+        for start, end in sorted(runs, reverse=coverage is None or runs[-1][1] < coverage[0]):
+            self.bar_store.extend_coverage(stock_id, start, end)
+    
+    def get_stock_prices_many(self, stock_ids: List[str], start_date: str, end_date: str,
+                              concurrency: Optional[int] = None) -> Dict[str, List[Dict]]:
+        """
+        Get stock price data for many stocks concurrently
+        
+        Requests share one pooled HTTP session and at most `concurrency`
+        requests are in flight at once; the months of a single stock are
+        pipelined rather than fetched one after another.
+        
+        Args:
+            stock_ids: Stock ticker codes
+            start_date: Start date in 'YYYY-MM-DD' format
+            end_date: End date in 'YYYY-MM-DD' format
+            concurrency: Max in-flight requests (default: STOCK_FETCH_CONCURRENCY)
+            
+        Returns:
+            Dictionary of stock_id -> list of price data dictionaries
+        """
+        concurrency = concurrency or DEFAULT_FETCH_CONCURRENCY
+        
+        async def runner():
+            # Size the executor to the in-flight limit so it never becomes the bottleneck
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+            return await self.aget_stock_prices_many(stock_ids, start_date, end_date, concurrency)
+        
+        return asyncio.run(runner())
     
-    def get_stock_info(self, stock_id: str) -> Dict:
+    async def aget_stock_prices_many(self, stock_ids: List[str], start_date: str, end_date: str,
+                                     concurrency: Optional[int] = None) -> Dict[str, List[Dict]]:
+        """Async variant of get_stock_prices_many for callers that own an event loop"""
+        semaphore = asyncio.Semaphore(concurrency or DEFAULT_FETCH_CONCURRENCY)
+        results = await asyncio.gather(*(
+            self._aget_stock_price(stock_id, start_date, end_date, semaphore) for stock_id in stock_ids
+        ))
+        return dict(zip(stock_ids, results))
+    
+    async def _aget_stock_price(self, stock_id: str, start_date: str, end_date: str,
+                                semaphore: asyncio.Semaphore) -> List[Dict]:
+        provider = self._provider_instance
+        try:
+            if self.bar_store is None:
+                return await provider.afetch_stock_price(stock_id, start_date, end_date, semaphore)
+            
+            gaps = await _run_blocking(self.bar_store.missing_ranges, stock_id, start_date, end_date)
+            count('bar_store.misses' if gaps else 'bar_store.hits')
+            for gap_start, gap_end in gaps:
+                bars, fetched = await provider.afetch_stock_price_covered(stock_id, gap_start, gap_end, semaphore)
+                await _run_blocking(self._store_gap, stock_id, bars, fetched)
+            
+            return await _run_blocking(self.bar_store.read, stock_id, start_date, end_date)
+        except Exception as e:
+            print(f"Error fetching stock price for {stock_id}: {e}")
+            return []
+    
+    def get_stock_info(self, stock_id: str, registry: Optional[StockRegistry] = None) -> Dict:
         """
         Get stock information
         
+        Read from the stock registry; the provider is only asked for codes
+        the registry does not know, and the name it returns is remembered.
+        
         Args:
             stock_id: Stock ticker code
+            registry: Registry to read (default: the shared get_stock_registry())
             
         Returns:
             Dictionary with stock information
         """
-        return self._provider_instance.fetch_stock_info(stock_id)
+        registry = registry or get_stock_registry()
+        entry = registry.get(stock_id)
+        if entry is not None:
+            return {
+                'stock_id': stock_id,
+                'stock_name': entry['name'],
+                'industry_category': entry.get('sector'),
+                'market': entry.get('market')
+            }
+        
+        info = self._provider_instance.fetch_stock_info(stock_id)
+        if info.get('stock_name') and info['stock_name'] != stock_id:
+            registry.remember(stock_id, info['stock_name'])
+        return info
     
     def get_provider_name(self) -> str:
         """Get current provider name"""
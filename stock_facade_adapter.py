@@ -9,7 +9,9 @@ to the Facade pattern seamless for existing code.
 import os
 import pandas as pd
 from datetime import datetime
+from scan_metrics import span
 from stock_data_facade import StockDataFacade
+from stock_registry import get_stock_registry
 
 
 # Singleton instance
@@ -45,10 +47,37 @@ def get_stock_price_as_dataframe(stock_id, start_date, end_date):
     
     try:
         data = facade.get_stock_price(stock_id, start_date, end_date)
+        return _prices_to_dataframe(stock_id, data)
         
-        if not data:
-            return None
-        
+    except Exception as e:
+        print(f"Error fetching stock price for {stock_id}: {e}")
+        return None
+
+
+def get_stock_prices_as_dataframes(stock_ids, start_date, end_date):
+    """
+    Fetch price data for many stocks concurrently over pooled connections
+    
+    Returns:
+        Dictionary of stock_id -> DataFrame (same format as get_stock_price_as_dataframe);
+        stocks without data are omitted
+    """
+    facade = get_stock_facade()
+    
+    frames = {}
+    for stock_id, data in facade.get_stock_prices_many(stock_ids, start_date, end_date).items():
+        df = _prices_to_dataframe(stock_id, data)
+        if df is not None:
+            frames[stock_id] = df
+    return frames
+
+
+def _prices_to_dataframe(stock_id, data):
+    """Convert facade price dicts to a FinMind-compatible DataFrame"""
+    if not data:
+        return None
+    
+    with span('build_dataframe'):
         # Convert to DataFrame with FinMind-compatible column names
         df = pd.DataFrame(data)
         
@@ -66,13 +95,7 @@ def get_stock_price_as_dataframe(stock_id, start_date, end_date):
         df['date'] = pd.to_datetime(df['date'])
         
         # Reorder columns to match FinMind format
-        df = df[['date', 'stock_id', 'Trading_Volume', 'open', 'max', 'min', 'close']]
-        
-        return df
-        
-    except Exception as e:
-        print(f"Error fetching stock price for {stock_id}: {e}")
-        return None
+        return df[['date', 'stock_id', 'Trading_Volume', 'open', 'max', 'min', 'close']]
 
 
 def get_stock_info(stock_id):
@@ -125,14 +148,31 @@ class FacadeDataLoader:
         """
         return get_stock_price_as_dataframe(stock_id, start_date, end_date)
     
+    def taiwan_stock_daily_many(self, stock_ids, start_date, end_date):
+        """
+        Fetch Taiwan stock daily data for many stocks concurrently
+        
+        Returns dictionary of stock_id -> DataFrame (FinMind format)
+        """
+        return get_stock_prices_as_dataframes(stock_ids, start_date, end_date)
+    
     def TaiwanStockInfo(self):
         """
-        Mock method for getting Taiwan stock info
+        Taiwan stock info of every listed stock, read from the stock registry
         
-        Note: This method is not fully implemented as it requires fetching
-        all stock info, which is not efficient. Use get_stock_info() instead
-        for individual stocks.
+        Returns DataFrame in FinMind format (stock_id, stock_name,
+        industry_category, type, date)
         """
-        print("Warning: TaiwanStockInfo() is not fully implemented in facade mode")
-        print("Use get_stock_info(stock_id) for individual stock information")
-        return pd.DataFrame()
+        markets = {'上市': 'twse', '上櫃': 'tpex'}
+        rows = [
+            {
+                'stock_id': code,
+                'stock_name': entry['name'],
+                'industry_category': entry.get('sector'),
+                'type': markets.get(entry.get('market'), entry.get('market')),
+                'date': entry.get('listed')
+            }
+            for code, entry in get_stock_registry().entries().items()
+            if entry.get('status') == 'listed'
+        ]
+        return pd.DataFrame(rows, columns=['stock_id', 'stock_name', 'industry_category', 'type', 'date'])
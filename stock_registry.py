@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Stock Metadata Registry
+
+One table of name, sector, market (上市/上櫃), type and listing status for
+every listed stock and ETF. It is built once per trading day and kept in an
+in-memory dict, so name / sector / market lookups in the scanner and the
+APIs are dictionary reads instead of network calls.
+
+Sources, in order (the first one that returns data is used):
+1. twstock.codes - bundled with the package, no network
+2. FinMind TaiwanStockInfo - one full-market request, when twstock is missing
+
+Codes that drop out of the source are kept with status 'delisted' and the
+day they were first missed. Warrants are left out (tens of thousands of
+codes that are never scanned or looked up).
+
+A registry with no sources only reads the persisted file and never
+rebuilds; unknown codes fall back to the code itself. The API uses one on
+the request path so a cold instance never downloads the full stock list.
+
+Environment Variable:
+    STOCK_REGISTRY_FILE: JSON file to persist the registry (default: disabled)
+
+Usage:
+    from stock_registry import get_stock_registry
+
+    registry = get_stock_registry()
+    name, sector, market = registry.describe('2330')
+"""
+
+import importlib.util
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from bar_store import settled_date
+from rate_limiter import get_rate_limiter
+from scan_metrics import count
+
+# twstock parses its bundled code table on import (~0.3 s), so it is imported
+# only when the registry is rebuilt, not when a service imports this module
+HAS_TWSTOCK = importlib.util.find_spec('twstock') is not None
+twstock = None
+
+
+REGISTRY_FORMAT = 1
+DEFAULT_SECTOR = "其他"
+DEFAULT_MARKET = "上市"
+FINMIND_MARKETS = {'twse': '上市', 'tpex': '上櫃'}
+
+
+def _iso_date(value) -> Optional[str]:
+    """'1994/09/05' -> '1994-09-05'"""
+    return str(value).replace('/', '-') if value else None
+
+
+def twstock_source() -> Optional[Dict[str, dict]]:
+    """Registry entries from the code table bundled with twstock"""
+    global twstock
+    if not HAS_TWSTOCK:
+        return None
+    if twstock is None:
+        import twstock
+
+    stocks = {}
+    for code, info in twstock.codes.items():
+        if '權證' in (info.type or ''):
+            continue
+        stocks[code] = {
+            'name': info.name,
+            'sector': info.group or DEFAULT_SECTOR,
+            'market': info.market,
+            'type': info.type,
+            'listed': _iso_date(info.start),
+        }
+    return stocks
+
+
+def finmind_source() -> Optional[Dict[str, dict]]:
+    """Registry entries from one full-market FinMind TaiwanStockInfo request"""
+    # Imported here: stock_data_facade itself looks names up in the registry
+    from stock_data_facade import FINMIND_API_URL, get_http_session
+
+    params = {'dataset': 'TaiwanStockInfo'}
+    token = os.getenv('FINMIND_API_TOKEN')
+    if token:
+        params['token'] = token
+
+    get_rate_limiter('finmind').acquire()
+    response = get_http_session().get(FINMIND_API_URL, params=params, timeout=30)
+    response.raise_for_status()
+    payload = response.json()
+    if payload.get('msg') != 'success':
+        return None
+
+    stocks = {}
+    for row in payload.get('data', []):
+        code = row.get('stock_id')
+        market = FINMIND_MARKETS.get(row.get('type'))
+        # A stock appears once per industry category; keep the first
+        if not code or not market or code in stocks:
+            continue
+        sector = row.get('industry_category') or DEFAULT_SECTOR
+        stocks[code] = {
+            'name': row.get('stock_name') or code,
+            'sector': sector,
+            'market': market,
+            'type': 'ETF' if 'ETF' in sector else '股票',
+            'listed': row.get('date'),
+        }
+    return stocks
+
+
+DEFAULT_SOURCES = (twstock_source, finmind_source)
+
+
+def merge_listing(previous: Dict[str, dict], fresh: Dict[str, dict], today: str,
+                  same_source: bool = True) -> Dict[str, dict]:
+    """
+    Combine a fresh source table with the previous registry
+
+    Codes missing from the fresh table are marked delisted, but only when both
+    tables come from the same source (sources differ in what they cover).
+    """
+    stocks = {code: {**entry, 'status': 'listed', 'delisted': None} for code, entry in fresh.items()}
+    for code, entry in previous.items():
+        if code in stocks:
+            continue
+        if same_source and entry.get('status') == 'listed':
+            entry = {**entry, 'status': 'delisted', 'delisted': today}
+        stocks[code] = entry
+    return stocks
+
+
+class StockRegistry:
+    """In-memory stock metadata, rebuilt from the sources once per trading day"""
+
+    def __init__(self, path=None, sources: Sequence[Callable[[], Optional[Dict[str, dict]]]] = DEFAULT_SOURCES,
+                 clock: Optional[Callable[[], datetime]] = None):
+        self.path = Path(path) if path else None
+        self.sources = sources
+        self._clock = clock
+        self._stocks: Dict[str, dict] = {}
+        self._source: Optional[str] = None
+        self._built_for: Optional[str] = None
+        self._checked_for: Optional[str] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _ensure_current(self):
+        today = settled_date(self._clock() if self._clock else None)
+        if self._checked_for == today:
+            return
+        with self._lock:
+            if self._checked_for == today:
+                return
+            if not self._loaded:
+                self._load()
+            if self._built_for != today and self.sources:
+                self._rebuild(today)
+            # Also set when every source failed: retry tomorrow, not on every lookup
+            self._checked_for = today
+
+    def _load(self):
+        self._loaded = True
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('format') != REGISTRY_FORMAT:
+            return
+        self._stocks = data.get('stocks', {})
+        self._source = data.get('source')
+        self._built_for = data.get('builtFor')
+
+    def _rebuild(self, today: str):
+        for source in self.sources:
+            try:
+                fresh = source()
+            except Exception as e:
+                print(f"⚠️ Stock registry source {source.__name__} failed: {e}")
+                continue
+            if fresh:
+                break
+        else:
+            count('stock_registry.build_failures')
+            return
+
+        self._stocks = merge_listing(self._stocks, fresh, today, same_source=self._source == source.__name__)
+        self._source = source.__name__
+        self._built_for = today
+        count('stock_registry.builds')
+        self._save()
+
+    def _save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {'format': REGISTRY_FORMAT, 'builtFor': self._built_for, 'source': self._source, 'stocks': self._stocks}
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def get(self, code: str) -> Optional[dict]:
+        """Registry entry of a code, or None if unknown"""
+        self._ensure_current()
+        return self._stocks.get(code)
+
+    def entries(self) -> Dict[str, dict]:
+        """All registry entries (code -> entry)"""
+        self._ensure_current()
+        return dict(self._stocks)
+
+    def name(self, code: str) -> str:
+        entry = self.get(code)
+        return entry['name'] if entry else code
+
+    def describe(self, code: str) -> Tuple[str, str, str]:
+        """(name, sector, market), falling back to (code, '其他', '上市')"""
+        entry = self.get(code)
+        if entry is None:
+            return code, DEFAULT_SECTOR, DEFAULT_MARKET
+        return entry['name'], entry.get('sector') or DEFAULT_SECTOR, entry.get('market') or DEFAULT_MARKET
+
+    def remember(self, code: str, name: str):
+        """Keep a name found by a per-stock lookup (in memory only, until the next rebuild)"""
+        self._ensure_current()
+        with self._lock:
+            self._stocks.setdefault(code, {
+                'name': name, 'sector': DEFAULT_SECTOR, 'market': DEFAULT_MARKET,
+                'type': None, 'listed': None, 'status': 'listed', 'delisted': None,
+            })
+
+
+_registry: Optional[StockRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_stock_registry() -> StockRegistry:
+    """Get the shared registry (persisted to STOCK_REGISTRY_FILE if set)"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = StockRegistry(os.getenv('STOCK_REGISTRY_FILE'))
+    return _registry
@@ -0,0 +1,221 @@
+"""
+Unit tests for the market alert ledger (scripts/alert_ledger.py) and the
+delta-based --update-alerts refresh in scripts/update_daily.py
+"""
+import json
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import sys
+sys.path.insert(0, '.')
+from scripts import update_daily
+from scripts.alert_ledger import AlertLedger, roc_to_iso
+from scripts.scan_output import read_scan_output, write_scan_output
+
+
+NOW = datetime(2024, 10, 4, 20, 0)
+
+
+def response(payload=None, status=200, headers=None):
+    r = MagicMock(status_code=status, headers=headers or {})
+    r.json.return_value = payload
+    return r
+
+
+class FakeSession:
+    """Serves the four alert feeds and records every request"""
+
+    def __init__(self, notice=(), punish=(), tpex_warning=(), tpex_disposal=(), etag=None):
+        self.feeds = {'notice': list(notice), 'punish': list(punish),
+                      'tpex_trading_warning_information': list(tpex_warning),
+                      'tpex_disposal_information': list(tpex_disposal)}
+        self.etag = etag
+        self.broken = set()  # feeds answering with an error stat / an unparsable body
+        self.calls = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        feed = url.rsplit('/', 1)[-1]
+        self.calls.append((feed, params, headers))
+        if feed in ('notice', 'punish'):
+            return response({'stat': '查詢失敗'} if feed in self.broken else {'data': self.feeds[feed]})
+        if self.etag and (headers or {}).get('If-None-Match') == self.etag:
+            return response(status=304)
+        r = response(self.feeds[feed], headers={'ETag': self.etag} if self.etag else {})
+        if feed in self.broken:
+            r.json.side_effect = ValueError('Expecting value')
+        return r
+
+
+def notice(code, roc_date, reason='第一款'):
+    return ['1', code, '名稱', '1', reason, roc_date, '100.00', '10.0']
+
+
+def punish(code, period, content='約每五分鐘撮合一次'):
+    return ['1', '113/10/04', code, '名稱', '1', '連續三次', period, '第一次處置', content, '']
+
+
+def refresh(ledger, session, now=NOW):
+    with patch.object(update_daily, 'get_http_session', return_value=session):
+        return update_daily.refresh_alert_ledger(ledger, now)
+
+
+class TestAlertLedger:
+
+    def test_roc_dates(self):
+        assert roc_to_iso('113/10/04') == '2024-10-04'
+        assert roc_to_iso('1131004') == '2024-10-04'
+        assert roc_to_iso('') is None
+
+    def test_warning_risk_counts(self):
+        ledger = AlertLedger()
+        for day in ['2024-09-10', '2024-09-20', '2024-09-30', '2024-10-02', '2024-10-04']:
+            ledger.add_warning('3017', day, '第一款')
+
+        alert = ledger.alert('3017', NOW)
+        assert alert['type'] == 'warning'
+        assert alert['history'][0] == '113/10/04'
+        assert alert['risk']['count_30'] == 5
+        assert alert['risk']['count_6'] == 3
+        assert alert['risk']['level'] == 'high'
+
+    def test_old_warnings_do_not_alert(self):
+        ledger = AlertLedger()
+        ledger.add_warning('3017', '2024-09-30', '第一款')
+        assert ledger.alerts(NOW) == {}
+
+    def test_windows_count_trading_days(self):
+        ledger = AlertLedger()
+        # 09-25 是 6 個交易日前 (10/02、10/03 颱風停市)，10 個日曆日的近似會漏算
+        for day in ['2024-09-24', '2024-09-25']:
+            ledger.add_warning('3017', day, '第一款')
+        assert ledger.risk('3017', datetime(2024, 10, 4, 9, 0))['count_6'] == 1
+        assert ledger.risk('3017', datetime(2024, 10, 4, 9, 0))['count_30'] == 2
+
+        # 週五的注意在週一盤前仍然顯示
+        ledger.add_warning('2330', '2024-10-04', '第一款')
+        assert '2330' in ledger.alerts(datetime(2024, 10, 7, 8, 0))
+
+    def test_active_disposition_wins_and_expired_ones_are_pruned(self):
+        ledger = AlertLedger()
+        ledger.add_warning('4979', '2024-10-04', '第一款')
+        ledger.add_disposition('4979', '2024-10-04', '2024-10-18', info='五分盤 (至 113/10/18)', detail='期間')
+        ledger.add_disposition('1101', '2024-09-01', '2024-09-13', info='五分盤 (至 113/09/13)', detail='期間')
+
+        assert ledger.alert('4979', NOW)['type'] == 'disposition'
+        ledger.prune(NOW)
+        assert '1101' not in ledger.dispositions
+
+    def test_persists(self, tmp_path):
+        path = tmp_path / 'alert_ledger.json'
+        ledger = AlertLedger(path)
+        ledger.add_warning('3017', '2024-10-04', '第一款')
+        ledger.mark('twse_notice', NOW)
+        ledger.save()
+
+        reloaded = AlertLedger(path)
+        assert reloaded.warnings == {'3017': {'2024-10-04': '第一款'}}
+        assert reloaded.since('twse_notice', NOW) == datetime(2024, 10, 4)
+
+
+class TestRefreshAlertLedger:
+
+    def test_only_fetches_since_the_high_water_mark(self):
+        ledger = AlertLedger()
+        session = FakeSession(notice=[notice('3017', '113/10/04')], punish=[punish('4979', '113/10/04～113/10/18')])
+
+        assert refresh(ledger, session) == 2
+        first = {feed: params for feed, params, _ in session.calls if params}
+        # 30 個交易日前 (跳過週末、中秋節與颱風停市日)
+        assert first['notice']['startDate'] == '20240821'
+
+        session.calls.clear()
+        assert refresh(ledger, session, datetime(2024, 10, 4, 21, 0)) == 0
+        second = {feed: params for feed, params, _ in session.calls if params}
+        assert second['notice']['startDate'] == second['punish']['startDate'] == '20241004'
+
+    def test_unchanged_tpex_feeds_are_not_reparsed(self):
+        ledger = AlertLedger()
+        session = FakeSession(tpex_warning=[{'Date': '1131004', 'SecuritiesCompanyCode': '6488', 'TradingInformation': '第一款'}],
+                              etag='"v1"')
+        refresh(ledger, session)
+        session.feeds['tpex_trading_warning_information'] = None  # would fail if parsed again
+
+        refresh(ledger, session)
+        headers = [h for feed, _, h in session.calls if feed == 'tpex_trading_warning_information']
+        assert headers[-1] == {'If-None-Match': '"v1"'}
+        assert ledger.alerts(NOW)['6488']['detail'] == '第一款'
+
+    def test_twse_error_stat_keeps_the_high_water_mark(self):
+        ledger = AlertLedger()
+        session = FakeSession(notice=[notice('3017', '113/10/04')])
+        session.broken.add('notice')
+        refresh(ledger, session)
+
+        session.broken.clear()
+        session.calls.clear()
+        assert refresh(ledger, session, datetime(2024, 10, 4, 21, 0)) == 1
+        second = {feed: params for feed, params, _ in session.calls if params}
+        assert second['notice']['startDate'] == '20240821'
+        assert second['punish']['startDate'] == '20241004'
+
+    def test_unparsable_tpex_body_is_fetched_again(self):
+        ledger = AlertLedger()
+        session = FakeSession(tpex_warning=[{'Date': '1131004', 'SecuritiesCompanyCode': '6488', 'TradingInformation': '第一款'}],
+                              etag='"v1"')
+        session.broken.add('tpex_trading_warning_information')
+        refresh(ledger, session)
+
+        session.broken.clear()
+        refresh(ledger, session)
+        headers = [h for feed, _, h in session.calls if feed == 'tpex_trading_warning_information']
+        assert headers[-1] == {}
+        assert ledger.alerts(NOW)['6488']['detail'] == '第一款'
+
+    def test_disposition_frequency(self):
+        ledger = AlertLedger()
+        refresh(ledger, FakeSession(punish=[punish('4979', '113/10/04～113/10/18')]))
+        alert = ledger.alerts(NOW)['4979']
+        assert alert['info'] == '五分盤 (至 113/10/18)'
+        assert alert['detail'] == '期間: 113/10/04～113/10/18\n措施: 第一次處置'
+
+
+class TestUpdateExistingAlerts:
+
+    def write_results(self, output_dir, alert=None):
+        stocks = [{'ticker': '3017', 'name': '奇鋐', 'alert': alert}, {'ticker': '2330', 'name': '台積電', 'alert': None}]
+        data = {'date': '2024-10-04', 'updatedAt': '2024-10-04T17:00:00', 'stocks': stocks}
+        write_scan_output(output_dir / 'daily_scan_results.json', data)
+        (output_dir / 'history').mkdir()
+        write_scan_output(output_dir / 'history' / '2024-10-04.json', data)
+
+    def run(self, tmp_path, session):
+        real_datetime = update_daily.datetime
+        with patch.object(update_daily, 'OUTPUT_DIR', tmp_path), \
+             patch.object(update_daily, 'get_http_session', return_value=session), \
+             patch.object(update_daily, 'datetime') as fake_datetime, \
+             patch.dict('os.environ', {'ALERT_LEDGER_FILE': str(tmp_path / 'ledger.json')}):
+            fake_datetime.now.return_value = NOW
+            fake_datetime.side_effect = real_datetime
+            return update_daily.update_existing_alerts()
+
+    def test_patches_changed_stocks_in_both_files(self, tmp_path):
+        self.write_results(tmp_path)
+        data, changed = self.run(tmp_path, FakeSession(notice=[notice('3017', '113/10/04')]))
+
+        assert changed == ['3017']
+        for path in [tmp_path / 'daily_scan_results.json', tmp_path / 'history' / '2024-10-04.json']:
+            saved = read_scan_output(path)
+            assert saved['stocks'][0]['alert']['type'] == 'warning'
+            assert saved['stocks'][1]['alert'] is None
+            assert 'alertUpdateTime' in saved
+
+    def test_unchanged_refresh_writes_nothing(self, tmp_path):
+        self.write_results(tmp_path)
+        session = FakeSession(notice=[notice('3017', '113/10/04')])
+        self.run(tmp_path, session)
+        before = (tmp_path / 'daily_scan_results.json').read_bytes()
+
+        data, changed = self.run(tmp_path, session)
+        assert changed == []
+        assert (tmp_path / 'daily_scan_results.json').read_bytes() == before
+        assert json.loads((tmp_path / 'ledger.json').read_text(encoding='utf-8'))['warnings']['3017']
@@ -0,0 +1,126 @@
+"""
+Unit tests for the incremental articles index (scripts/articles_index.py)
+"""
+import json
+from unittest.mock import patch
+
+import pytest
+
+import sys
+sys.path.insert(0, '.')
+from scripts import articles_index
+from scripts.articles_index import update_articles_index
+
+
+def write_article(output_dir, date, content="## 盤勢\n內容", title=None):
+    path = output_dir / 'articles' / f'{date}.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"date": date, "title": title or f"{date} 盤勢", "content": content},
+                               ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+def read(output_dir, rel_path):
+    return json.loads((output_dir / rel_path).read_text(encoding='utf-8'))
+
+
+def no_remote(rel_path):
+    return None
+
+
+class TestUpdateArticlesIndex:
+
+    def test_builds_recent_list_pages_and_manifest(self, tmp_path):
+        for date in ['2026-09-29', '2026-09-30', '2026-10-15', '2026-10-16']:
+            write_article(tmp_path, date)
+
+        pages = update_articles_index(tmp_path, fetch=no_remote)
+
+        assert pages == {"total": 4, "pages": [{"month": "2026-10", "count": 2}, {"month": "2026-09", "count": 2}]}
+        recent = read(tmp_path, 'articles_index.json')
+        assert [item['date'] for item in recent] == ['2026-10-16', '2026-10-15', '2026-09-30', '2026-09-29']
+        assert recent[0]['preview'] == '盤勢\n內容...'
+        assert [item['date'] for item in read(tmp_path, 'articles_index/2026-09.json')] == ['2026-09-30', '2026-09-29']
+        assert sorted(read(tmp_path, 'articles_index/manifest.json')['files']) == [
+            '2026-09-29.json', '2026-09-30.json', '2026-10-15.json', '2026-10-16.json']
+
+    def test_only_new_or_changed_articles_are_parsed(self, tmp_path):
+        write_article(tmp_path, '2026-10-15')
+        write_article(tmp_path, '2026-10-16')
+        update_articles_index(tmp_path, fetch=no_remote)
+
+        write_article(tmp_path, '2026-10-16', title='更新後標題')
+        write_article(tmp_path, '2026-10-17')
+        with patch.object(articles_index, 'summarize_article', wraps=articles_index.summarize_article) as summarize:
+            pages = update_articles_index(tmp_path, fetch=no_remote)
+
+        assert sorted(call.args[1] for call in summarize.call_args_list) == ['2026-10-16', '2026-10-17']
+        assert pages['total'] == 3
+        assert read(tmp_path, 'articles_index.json')[1]['title'] == '更新後標題'
+
+    def test_unchanged_run_writes_nothing(self, tmp_path):
+        write_article(tmp_path, '2026-10-16')
+        update_articles_index(tmp_path, fetch=no_remote)
+        index_file = tmp_path / 'articles_index.json'
+        mtime = index_file.stat().st_mtime_ns
+
+        with patch.object(articles_index, 'summarize_article') as summarize:
+            update_articles_index(tmp_path, fetch=no_remote)
+
+        summarize.assert_not_called()
+        assert index_file.stat().st_mtime_ns == mtime
+
+    def test_recent_list_is_capped(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('ARTICLES_INDEX_RECENT', '2')
+        for day in range(1, 6):
+            write_article(tmp_path, f'2026-10-{day:02d}')
+
+        pages = update_articles_index(tmp_path, fetch=no_remote)
+
+        assert [item['date'] for item in read(tmp_path, 'articles_index.json')] == ['2026-10-05', '2026-10-04']
+        assert pages['total'] == 5
+        assert len(read(tmp_path, 'articles_index/2026-10.json')) == 5
+
+    def test_fetches_remote_index_and_only_touched_pages(self, tmp_path):
+        remote = {
+            'articles_index/manifest.json': {"format": 1, "files": {"2026-09-30.json": "x", "2026-10-15.json": "y"}},
+            'articles_index/pages.json': {"total": 2, "pages": [{"month": "2026-10", "count": 1}, {"month": "2026-09", "count": 1}]},
+            'articles_index/2026-10.json': [{"date": "2026-10-15", "title": "舊文", "preview": "..."}],
+            'articles_index.json': [{"date": "2026-10-15", "title": "舊文", "preview": "..."},
+                                    {"date": "2026-09-30", "title": "更舊", "preview": "..."}],
+        }
+        requested = []
+
+        def fetch(rel_path):
+            requested.append(rel_path)
+            return remote.get(rel_path)
+
+        write_article(tmp_path, '2026-10-16')
+        pages = update_articles_index(tmp_path, fetch=fetch)
+
+        assert 'articles_index/2026-09.json' not in requested
+        assert pages == {"total": 3, "pages": [{"month": "2026-10", "count": 2}, {"month": "2026-09", "count": 1}]}
+        assert [item['date'] for item in read(tmp_path, 'articles_index.json')] == ['2026-10-16', '2026-10-15', '2026-09-30']
+        assert not (tmp_path / 'articles_index' / '2026-09.json').exists()
+
+    def test_migrates_legacy_full_index(self, tmp_path):
+        legacy = [{"date": f"2026-{month:02d}-01", "title": "舊文", "preview": "..."} for month in range(1, 10)]
+
+        def fetch(rel_path):
+            return legacy if rel_path == 'articles_index.json' else None
+
+        write_article(tmp_path, '2026-10-16')
+        pages = update_articles_index(tmp_path, fetch=fetch)
+
+        assert pages['total'] == 10
+        assert len(pages['pages']) == 10
+        assert read(tmp_path, 'articles_index/2026-03.json') == [legacy[2]]
+
+    def test_remote_errors_abort_the_update(self, tmp_path):
+        def fetch(rel_path):
+            raise OSError("network down")
+
+        write_article(tmp_path, '2026-10-16')
+        with pytest.raises(OSError):
+            update_articles_index(tmp_path, fetch=fetch)
+        assert not (tmp_path / 'articles_index.json').exists()
@@ -0,0 +1,178 @@
+"""
+Unit tests for the local bar store (bar_store.py)
+"""
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import sys
+sys.path.insert(0, '.')
+from bar_store import BarStore, settled_date, TW_TZ
+from stock_data_facade import StockDataFacade
+
+
+def make_bar(date, close=100.0):
+    return {'date': date, 'open': close - 1, 'high': close + 1, 'low': close - 2, 'close': close, 'volume': 1000}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BarStore(tmp_path / "bars")
+
+
+class TestBarStore:
+
+    def test_write_and_read_across_months(self, store):
+        """Bars spanning months are split into partitions and read back in order"""
+        bars = [make_bar('2024-01-30'), make_bar('2024-01-31'), make_bar('2024-02-01')]
+        store.write('2330', bars)
+
+        assert (store.root / '2330' / '2024-01.json').exists()
+        assert (store.root / '2330' / '2024-02.json').exists()
+        assert store.read('2330', '2024-01-01', '2024-02-29') == bars
+        assert store.read('2330', '2024-01-31', '2024-01-31') == [bars[1]]
+
+    def test_write_overwrites_same_date(self, store):
+        store.write('2330', [make_bar('2024-01-02', close=100.0)])
+        store.write('2330', [make_bar('2024-01-02', close=105.0)])
+
+        bars = store.read('2330', '2024-01-01', '2024-01-31')
+        assert len(bars) == 1
+        assert bars[0]['close'] == 105.0
+
+    def test_corrupted_partition_is_treated_as_missing(self, store):
+        store.write('2330', [make_bar('2024-01-02')])
+        (store.root / '2330' / '2024-01.json').write_text('{not json')
+
+        assert store.read('2330', '2024-01-01', '2024-01-31') == []
+
+    def test_missing_ranges_without_coverage(self, store):
+        assert store.missing_ranges('2330', '2024-01-01', '2024-03-31') == [('2024-01-01', '2024-03-31')]
+
+    def test_missing_ranges_head_and_tail(self, store):
+        store.set_coverage('2330', '2024-02-01', '2024-02-29')
+
+        gaps = store.missing_ranges('2330', '2024-01-15', '2024-03-10')
+        assert gaps == [('2024-01-15', '2024-01-31'), ('2024-03-01', '2024-03-10')]
+        assert store.missing_ranges('2330', '2024-02-05', '2024-02-20') == []
+
+    def test_extend_coverage_merges_adjacent_ranges(self, store):
+        store.extend_coverage('2330', '2024-02-01', '2024-02-29')
+        store.extend_coverage('2330', '2024-03-01', '2024-03-10')
+        assert store.get_coverage('2330') == ('2024-02-01', '2024-03-10')
+
+        # A disjoint range is ignored, the days in between stay missing
+        store.extend_coverage('2330', '2024-05-01', '2024-05-31')
+        assert store.get_coverage('2330') == ('2024-02-01', '2024-03-10')
+        assert store.missing_ranges('2330', '2024-02-01', '2024-05-31') == [('2024-03-11', '2024-05-31')]
+
+    def test_settled_date(self):
+        before_close = datetime(2024, 3, 5, 10, 0, tzinfo=TW_TZ)
+        after_close = datetime(2024, 3, 5, 15, 0, tzinfo=TW_TZ)
+
+        assert settled_date(before_close) == '2024-03-04'
+        assert settled_date(after_close) == '2024-03-05'
+
+
+class TestStoreFirstFacade:
+
+    def make_facade(self, store, bars):
+        facade = StockDataFacade(provider='twse', bar_store=store)
+        facade._provider_instance = MagicMock()
+
+        def fetch(stock_id, start, end):
+            found = [b for b in bars if start <= b['date'] <= end]
+            return found, [(start, end)] if found else []
+
+        facade._provider_instance.fetch_stock_price_covered.side_effect = fetch
+        return facade
+
+    def test_second_call_is_served_from_store(self, store):
+        bars = [make_bar('2024-01-02'), make_bar('2024-01-03')]
+        facade = self.make_facade(store, bars)
+
+        first = facade.get_stock_price('2330', '2024-01-01', '2024-01-05')
+        second = facade.get_stock_price('2330', '2024-01-01', '2024-01-05')
+
+        assert first == bars
+        assert second == bars
+        assert facade._provider_instance.fetch_stock_price_covered.call_count == 1
+
+    def test_only_missing_tail_is_fetched(self, store):
+        bars = [make_bar('2024-01-02'), make_bar('2024-01-03'), make_bar('2024-01-08')]
+        facade = self.make_facade(store, bars)
+
+        facade.get_stock_price('2330', '2024-01-01', '2024-01-05')
+        result = facade.get_stock_price('2330', '2024-01-01', '2024-01-10')
+
+        assert result == bars
+        last_call = facade._provider_instance.fetch_stock_price_covered.call_args_list[-1]
+        assert last_call.args == ('2330', '2024-01-06', '2024-01-10')
+
+    def test_empty_fetch_keeps_gap_open(self, store):
+        facade = self.make_facade(store, [])
+
+        assert facade.get_stock_price('2330', '2024-01-01', '2024-01-05') == []
+        assert store.get_coverage('2330') is None
+
+    def test_failed_month_stays_a_gap(self, store, monkeypatch):
+        facade = StockDataFacade(provider='twse', bar_store=store)
+        provider = facade._provider_instance
+
+        def month(stock_id, year, month):
+            # February fails, the other months answer
+            return None if month == 2 else [make_bar(f'{year}-{month:02d}-05')]
+
+        monkeypatch.setattr(provider, '_fetch_monthly_data', month)
+        result = facade.get_stock_price('2330', '2024-01-01', '2024-03-31')
+
+        assert [b['date'] for b in result] == ['2024-01-05', '2024-03-05']
+        # Without a window the newest run is kept; January and February are retried
+        assert store.get_coverage('2330') == ('2024-03-01', '2024-03-31')
+        assert store.missing_ranges('2330', '2024-01-01', '2024-03-31') == [('2024-01-01', '2024-02-29')]
+
+        # Once February answers, the retry fills the hole
+        monkeypatch.setattr(provider, '_fetch_monthly_data', lambda s, y, m: [make_bar(f'{y}-{m:02d}-05')])
+        result = facade.get_stock_price('2330', '2024-01-01', '2024-03-31')
+        assert [b['date'] for b in result] == ['2024-01-05', '2024-02-05', '2024-03-05']
+        assert store.get_coverage('2330') == ('2024-01-01', '2024-03-31')
+
+    def test_no_data_month_counts_as_fetched(self, store, monkeypatch):
+        facade = StockDataFacade(provider='twse', bar_store=store)
+        response = MagicMock(status_code=200)
+        response.json.return_value = {'stat': '很抱歉，沒有符合條件的資料!'}
+        monkeypatch.setattr(facade._provider_instance, 'session', MagicMock(get=MagicMock(return_value=response)))
+        monkeypatch.setattr('stock_data_facade.get_rate_limiter', MagicMock())
+
+        assert facade.get_stock_price('2330', '2024-01-01', '2024-01-31') == []
+        assert store.get_coverage('2330') == ('2024-01-01', '2024-01-31')
+
+    @pytest.mark.parametrize('status, payload, covered', [
+        (200, {'msg': 'success', 'data': []}, ('2024-01-01', '2024-01-31')),  # suspended / holidays only
+        (200, {'msg': 'Your level is register'}, None),
+        (500, {}, None),
+    ])
+    def test_finmind_empty_answer_counts_as_fetched(self, store, monkeypatch, status, payload, covered):
+        facade = StockDataFacade(provider='finmind', bar_store=store)
+        response = MagicMock(status_code=status)
+        response.json.return_value = payload
+        session = MagicMock(get=MagicMock(return_value=response))
+        monkeypatch.setattr(facade._provider_instance, 'session', session)
+        monkeypatch.setattr('stock_data_facade.get_rate_limiter', MagicMock())
+
+        assert facade.get_stock_price('2330', '2024-01-01', '2024-01-31') == []
+        assert facade.get_stock_prices_many(['2330'], '2024-01-01', '2024-01-31') == {'2330': []}
+        assert store.get_coverage('2330') == covered
+        assert session.get.call_count == (1 if covered else 2)
+
+    def test_facade_without_store_calls_provider(self, monkeypatch):
+        monkeypatch.delenv('STOCK_BAR_STORE_DIR', raising=False)
+        facade = StockDataFacade(provider='twse')
+        facade._provider_instance = MagicMock()
+        facade._provider_instance.fetch_stock_price.return_value = []
+
+        facade.get_stock_price('2330', '2024-01-01', '2024-01-05')
+        facade.get_stock_price('2330', '2024-01-01', '2024-01-05')
+
+        assert facade.bar_store is None
+        assert facade._provider_instance.fetch_stock_price.call_count == 2
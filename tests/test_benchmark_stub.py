@@ -0,0 +1,113 @@
+"""
+Unit tests for the upstream API stand-in used by the benchmarks (benchmarks/stub_server.py)
+
+The stub must answer in the layouts the real parsers expect, otherwise the
+benchmark would measure empty responses.
+"""
+import pytest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, '.')
+import market_daily
+from benchmarks.run_benchmark import percentile
+from benchmarks.stub_server import StubServer, SyntheticMarket, synthetic_universe
+from scripts import update_daily
+from scan_metrics import get_scan_metrics
+from stock_data_facade import HTTP_RETRIES, FinMindProvider, TWSEProvider
+
+
+END_DATE = '2024-10-04'
+
+
+@pytest.fixture(scope='module')
+def market():
+    return SyntheticMarket(synthetic_universe(40), end_date=END_DATE, days=120, alert_ratio=0.3)
+
+
+@pytest.fixture(scope='module')
+def server(market):
+    with StubServer(market) as server:
+        yield server
+
+
+def lots(bars):
+    return [dict(bar, volume=bar['volume'] // 1000) for bar in bars]
+
+
+class TestSyntheticMarket:
+
+    def test_deterministic_and_prefix_stable(self, market):
+        other = SyntheticMarket(synthetic_universe(80), end_date=END_DATE, days=120, alert_ratio=0.3)
+        assert other.bars('1101') == market.bars('1101')
+        assert synthetic_universe(40) == synthetic_universe(80)[:40]
+
+    def test_trading_days_skip_weekends(self, market):
+        assert market.trading_days[-1] == END_DATE
+        assert not market.is_trading_day('2024-10-05')
+        assert market.bars('9999') == []
+
+
+class TestPayloads:
+
+    def test_twse_stock_day(self, server, market):
+        provider = TWSEProvider()
+        provider.base_url = server.url
+
+        bars = provider.fetch_stock_price('1101', '2024-09-01', END_DATE)
+        assert bars == lots(market.bars_between('1101', '2024-09-01', END_DATE))
+
+    def test_finmind(self, server, market):
+        provider = FinMindProvider()
+        provider.base_url = f"{server.url}/api/v4/data"
+
+        bars = provider.fetch_stock_price('1102', '2024-09-01', END_DATE)
+        assert bars == market.bars_between('1102', '2024-09-01', END_DATE)
+
+    def test_whole_market_tables(self, server, market):
+        with patch.object(market_daily, 'TWSE_BASE_URL', server.url), \
+             patch.object(market_daily, 'TPEX_BASE_URL', server.url):
+            twse = market_daily.fetch_twse_market_daily(END_DATE)
+            tpex = market_daily.fetch_tpex_market_daily(END_DATE)
+            holiday = market_daily.fetch_twse_market_daily('2024-10-05')
+
+        assert set(twse) == market.listed
+        assert set(twse) | set(tpex) == set(market.codes)
+        assert tpex['1140'] == lots([market.bars('1140')[-1]])[0]
+        assert holiday == {}
+
+    def test_market_alerts(self, server, market):
+        real_datetime = update_daily.datetime
+        with patch.object(update_daily, 'TWSE_BASE_URL', server.url), \
+             patch.object(update_daily, 'TPEX_BASE_URL', server.url), \
+             patch.object(update_daily, 'datetime') as fake_datetime:
+            fake_datetime.now.return_value = real_datetime(2024, 10, 4, 20, 0)
+            fake_datetime.side_effect = real_datetime
+            alerts = update_daily.fetch_market_alerts()
+
+        assert set(alerts) == set(market.alerted())
+        assert any(alert['type'] == 'disposition' for alert in alerts.values())
+
+
+class TestFaultInjection:
+
+    def test_errors_are_retried_then_empty(self, market):
+        metrics = get_scan_metrics()
+        retries_before = metrics.counter('http.retries')
+
+        with StubServer(market, error_rate=1.0) as server:
+            provider = TWSEProvider()
+            provider.base_url = server.url
+            assert provider.fetch_stock_price('1101', '2024-10-01', END_DATE) == []
+            assert server.stats['errors'] == server.stats['requests'] == 1 + HTTP_RETRIES
+
+        assert metrics.counter('http.retries') - retries_before == HTTP_RETRIES
+
+
+class TestPercentile:
+
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile([], 50) is None
@@ -0,0 +1,156 @@
+"""
+Unit tests for the API cold start: lazy imports (api/stock.py, backend/server.py, stock_registry.py),
+the long-running local server (api/_server.py) and the benchmark probe (benchmarks/cold_start.py)
+"""
+import json
+import os
+import subprocess
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import sys
+sys.path.insert(0, '.')
+from api import _server
+from api import stock as stock_api
+import stock_registry
+from response_cache import ResponseCache
+
+
+def probe(module, *paths):
+    result = subprocess.run([sys.executable, 'benchmarks/cold_start.py', module, *paths],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+class TestLazyImports:
+
+    @pytest.mark.parametrize('module', ['api.stock', 'api.stocks'])
+    def test_api_handlers_import_no_heavy_modules(self, module):
+        report = probe(module)
+        assert report['heavy_modules'] == []
+        assert report['import_ms'] > 0
+
+    def test_backend_imports_ocr_and_history_on_first_use(self):
+        pytest.importorskip('flask')
+        pytest.importorskip('flask_cors')
+        pytest.importorskip('dotenv')
+        assert probe('backend.server')['heavy_modules'] == []
+
+    def test_facade_is_built_once_on_first_use(self):
+        facade_cls = MagicMock()
+        with patch.object(stock_api, '_stock_facade', None), \
+             patch('stock_data_facade.StockDataFacade', facade_cls):
+            first = stock_api.get_stock_facade()
+            assert stock_api.get_stock_facade() is first
+        assert facade_cls.call_count == 1
+
+
+class TestLocalServer:
+
+    @pytest.fixture
+    def server(self):
+        server = _server.make_server(port=0, warm=False)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}"
+        server.shutdown()
+        server.server_close()
+
+    def test_routes_to_handlers_and_keeps_the_cache(self, server):
+        payload = {'ticker': '2330', 'ohlc': [{'date': '2024-03-04'}]}
+        with patch.object(stock_api, '_response_cache', ResponseCache()), \
+             patch('response_cache.fetch_twse_holidays', return_value=None), \
+             patch('response_cache._schedule_failures', {}), \
+             patch.object(stock_api, 'build_stock_payload', return_value=payload) as build:
+            first = urllib.request.urlopen(f"{server}/api/stock?ticker=2330")
+            second = urllib.request.urlopen(f"{server}/api/stock?ticker=2330")
+
+        assert build.call_count == 1
+        assert (first.headers['X-Cache'], second.headers['X-Cache']) == ('MISS', 'HIT')
+        assert json.loads(second.read()) == payload
+
+    def test_route_handler_serves_the_request(self, server):
+        seen = {}
+
+        class Echo(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                seen['handler'] = type(self)
+                self.send_response(200)
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.wfile.write(self.path.encode() + b' ' + body)
+
+        with patch.object(_server, 'load_handler', return_value=Echo):
+            response = urllib.request.urlopen(f"{server}/api/echo?x=1", data=b'ping')
+            assert response.read() == b'/api/echo?x=1 ping'
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(f"{server}/api/echo")
+        assert error.value.code == 501
+        assert seen['handler'] is Echo
+
+    def test_unknown_path(self, server):
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{server}/api/unknown")
+        assert error.value.code == 404
+
+    def test_warm_up(self):
+        with patch.object(stock_api, 'get_stock_facade') as facade, \
+             patch.object(stock_api, 'get_request_registry') as registry, \
+             patch.object(_server, 'ThreadingHTTPServer'):
+            _server.make_server(port=0)
+        facade.assert_called_once()
+        registry.return_value.entries.assert_called_once()
+
+
+class TestRequestRegistry:
+
+    @pytest.fixture
+    def provider(self):
+        import stock_data_facade
+        facade = stock_data_facade.StockDataFacade()
+        provider = MagicMock()
+        provider.fetch_stock_info.return_value = {'stock_id': '8888', 'stock_name': '新公司'}
+        facade._provider_instance = provider
+        with patch.object(stock_api, '_stock_registry', None), \
+             patch.object(stock_api, 'get_stock_facade', return_value=facade), \
+             patch.object(stock_data_facade, 'get_stock_registry') as shared:
+            yield provider
+        shared.assert_not_called()
+
+    def test_names_from_the_registry_file(self, tmp_path, provider):
+        path = tmp_path / 'stock_registry.json'
+        path.write_text(json.dumps({'format': stock_registry.REGISTRY_FORMAT, 'builtFor': '2024-03-04',
+                                    'source': 'twstock_source', 'stocks': {'2330': {'name': '台積電'}}},
+                                   ensure_ascii=False), encoding='utf-8')
+        with patch.dict('os.environ', {'STOCK_REGISTRY_FILE': str(path)}):
+            assert stock_api.get_stock_name('2330') == '台積電'
+        provider.fetch_stock_info.assert_not_called()
+
+    def test_unknown_code_without_a_registry_file(self, provider):
+        with patch.dict('os.environ'):
+            os.environ.pop('STOCK_REGISTRY_FILE', None)
+            assert stock_api.get_stock_name('8888') == '新公司'
+            assert stock_api.get_stock_name('8888') == '新公司'
+        # Remembered by the request registry; the full stock list is never downloaded
+        assert provider.fetch_stock_info.call_count == 1
+
+    def test_provider_failure_falls_back_to_the_ticker(self, provider):
+        provider.fetch_stock_info.side_effect = RuntimeError('down')
+        with patch.dict('os.environ'):
+            os.environ.pop('STOCK_REGISTRY_FILE', None)
+            assert stock_api.get_stock_name('8888') == '8888'
+
+
+class TestTwstockImport:
+
+    def test_registry_imports_twstock_only_to_rebuild(self):
+        result = subprocess.run(
+            [sys.executable, '-c', "import sys, stock_registry; print('twstock' in sys.modules)"],
+            capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == 'False'
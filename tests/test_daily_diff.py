@@ -2,9 +2,12 @@ import sys
 from unittest.mock import MagicMock
 
 # Mock external dependencies to allow import without installation
-sys.modules['yfinance'] = MagicMock()
-sys.modules['twstock'] = MagicMock()
-sys.modules['pandas'] = MagicMock()
+# (only when missing, so other test modules still get the real packages)
+for _name in ('yfinance', 'twstock', 'pandas'):
+    try:
+        __import__(_name)
+    except ImportError:
+        sys.modules[_name] = MagicMock()
 
 import unittest
 import json
@@ -47,6 +50,27 @@ class TestDailyDiff(unittest.TestCase):
         self.assertEqual(len(changes['removed']), 1)
         self.assertEqual(changes['removed'][0]['ticker'], '1111')
 
+    def test_deferred_stocks_are_carried_not_removed(self):
+        """A stock deferred by the quota planner keeps its last result instead of flapping"""
+        previous_data = {'date': '2024-10-01', 'stocks': [self.stock_a, self.stock_b]}
+        results = [self.stock_b]
+
+        carried = update_daily.carry_forward_deferred(previous_data, results, ['1111', '3333'])
+        self.assertEqual(carried, [{**self.stock_a, 'carriedFrom': '2024-10-01'}])
+
+        changes = update_daily.calculate_changes(previous_data, results + carried)
+        self.assertEqual(changes['removed'], [])
+        self.assertEqual(sorted(s['ticker'] for s in changes['continued']), ['1111', '2222'])
+
+        # Deferred again: the original data date is kept
+        again = update_daily.carry_forward_deferred({'date': '2024-10-02', 'stocks': carried}, [], ['1111'])
+        self.assertEqual(again[0]['carriedFrom'], '2024-10-01')
+
+    def test_scanned_stocks_are_not_carried(self):
+        previous_data = {'date': '2024-10-01', 'stocks': [self.stock_a]}
+        self.assertEqual(update_daily.carry_forward_deferred(previous_data, [], []), [])
+        self.assertEqual(update_daily.carry_forward_deferred(previous_data, [self.stock_a], ['1111']), [])
+
     def test_no_previous_data(self):
         """Test when there is no previous data"""
         previous_data = None
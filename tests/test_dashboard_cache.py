@@ -0,0 +1,136 @@
+"""
+Unit tests for the shared disk cache of the Streamlit dashboard (src/dashboard_cache.py)
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import sys
+sys.path.insert(0, '.')
+from bar_store import TW_TZ
+from src.dashboard_cache import DashboardCache, in_session, next_open_time
+
+
+def bar(date, close=100.0):
+    return {'date': date, 'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 1200}
+
+
+SEPT = [bar(f'2024-09-{day:02d}', 100 + day) for day in (23, 24, 25, 26, 27, 30)] + [bar('2024-10-01', 131)]
+
+
+class Clock:
+
+    def __init__(self, *args):
+        self.now = datetime(*args, tzinfo=TW_TZ)
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    # Evening after the 2024-10-01 session; 10-02 and 10-03 were typhoon closures
+    return Clock(2024, 10, 1, 20, 0)
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return DashboardCache(tmp_path, intraday_ttl=300, clock=clock)
+
+
+class TestSessionHelpers:
+
+    def test_in_session(self):
+        assert in_session(datetime(2024, 10, 1, 10, 0, tzinfo=TW_TZ))
+        assert not in_session(datetime(2024, 10, 1, 14, 30, tzinfo=TW_TZ))
+        assert not in_session(datetime(2024, 10, 2, 10, 0, tzinfo=TW_TZ))
+
+    def test_next_open_skips_closed_days(self):
+        assert next_open_time(datetime(2024, 10, 1, 20, 0, tzinfo=TW_TZ)) == datetime(2024, 10, 4, 9, 0, tzinfo=TW_TZ)
+        assert next_open_time(datetime(2024, 10, 4, 8, 0, tzinfo=TW_TZ)) == datetime(2024, 10, 4, 9, 0, tzinfo=TW_TZ)
+
+
+class TestHistory:
+
+    def test_round_trip_across_instances(self, cache, tmp_path, clock):
+        cache.put_history('2330', '2024-09-23', SEPT)
+
+        assert cache.history('2330', '2024-09-23') == SEPT
+        assert cache.history('2330', '2024-09-26') == SEPT[3:]
+        # Another worker on the same directory
+        assert DashboardCache(tmp_path, clock=clock).history('2330', '2024-09-23') == SEPT
+
+    def test_start_before_coverage_is_a_miss(self, cache):
+        cache.put_history('2330', '2024-09-23', SEPT)
+        assert cache.history('2330', '2024-09-01') is None
+
+    def test_settled_quote_is_valid_until_the_next_open(self, cache, clock):
+        cache.put_history('2330', '2024-09-23', SEPT)
+
+        clock.now = datetime(2024, 10, 4, 8, 59, tzinfo=TW_TZ)
+        assert cache.history('2330', '2024-09-23') is not None
+        clock.now = datetime(2024, 10, 4, 9, 0, tzinfo=TW_TZ)
+        assert cache.history('2330', '2024-09-23') is None
+
+    def test_intraday_quote_expires_after_the_ttl(self, cache, clock):
+        clock.now = datetime(2024, 10, 1, 10, 0, tzinfo=TW_TZ)
+        cache.put_history('2330', '2024-09-23', SEPT)
+
+        # Only the settled bars are stored; the live bar stays in the quote
+        assert cache.store.read('2330', '2024-09-23', '2024-10-01') == SEPT[:-1]
+        assert cache.history('2330', '2024-09-23') == SEPT
+        clock.now += timedelta(seconds=301)
+        assert cache.history('2330', '2024-09-23') is None
+
+    def test_empty_result_is_cached(self, cache):
+        cache.put_history('9999', '2024-09-23', [])
+        assert cache.history('9999', '2024-09-23') == []
+
+    def test_corrupt_entry_is_a_miss(self, cache, tmp_path):
+        cache.put_history('2330', '2024-09-23', SEPT)
+        (tmp_path / 'quotes' / '2330.json').write_text('{', encoding='utf-8')
+        assert cache.history('2330', '2024-09-23') is None
+
+
+class TestInfoAndSuffix:
+
+    def test_info_valid_until_the_next_settle(self, cache, clock):
+        cache.put_info('2330', {'name': '台積電'})
+        assert cache.info('2330') == {'name': '台積電'}
+        clock.now = datetime(2024, 10, 4, 14, 31, tzinfo=TW_TZ)
+        assert cache.info('2330') is None
+
+    def test_suffix_does_not_expire(self, cache, clock):
+        cache.put_suffix('6488', '.TWO')
+        clock.now += timedelta(days=365)
+        assert cache.suffix('6488') == '.TWO'
+
+
+class TestWarmFromScanOutput:
+
+    @pytest.fixture
+    def scan_file(self, tmp_path):
+        path = tmp_path / 'daily_scan_results.json'
+        rows = [dict(b, k=50, d=50, volMa5=1200) for b in SEPT]
+        path.write_text(json.dumps({'stocks': [
+            {'ticker': '2330', 'name': '台積電', 'sector': '半導體業', 'market': '上市', 'ohlc': rows},
+            {'ticker': '6488', 'name': '環球晶', 'sector': '半導體業', 'market': '上櫃', 'ohlc': rows},
+        ]}, ensure_ascii=False), encoding='utf-8')
+        return path
+
+    def test_warm_writes_history_info_and_suffix(self, cache, scan_file):
+        assert cache.warm_from_scan_output(scan_file) == 2
+
+        assert cache.history('2330', '2024-09-23') == SEPT
+        assert cache.suffix('6488') == '.TWO'
+        assert cache.info('6488') == {'name': '環球晶', 'symbol': '6488', 'market': 'TWO',
+                                      'sector': '半導體業', 'industry': ''}
+
+    def test_warm_keeps_fresher_quotes(self, cache, scan_file):
+        cache.put_history('2330', '2024-09-23', SEPT[:-1] + [bar('2024-10-01', 999)])
+        assert cache.warm_from_scan_output(scan_file) == 1
+        assert cache.history('2330', '2024-09-23')[-1]['close'] == 999
+
+    def test_missing_file(self, cache, tmp_path):
+        assert cache.warm_from_scan_output(tmp_path / 'missing.json') == 0
@@ -0,0 +1,163 @@
+"""
+Unit tests for the batched yfinance fetch layer of the Streamlit app (src/data_fetcher.py)
+"""
+import sys
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+# Mock external dependencies to allow import without installation
+# (only when missing, so other test modules still get the real packages)
+for _name in ('yfinance', 'streamlit'):
+    try:
+        __import__(_name)
+    except ImportError:
+        sys.modules[_name] = MagicMock()
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, '.')
+from bar_store import TW_TZ
+from src import data_fetcher
+from src.dashboard_cache import DashboardCache
+from stock_registry import StockRegistry
+
+
+LISTED = {'name': '台積電', 'sector': '半導體業', 'market': '上市', 'type': '股票', 'listed': '1994-09-05'}
+OTC = {'name': '穩懋', 'sector': '半導體業', 'market': '上櫃', 'type': '股票', 'listed': '2010-01-28'}
+
+
+def bars(seed, n=22):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame({'Open': close - 0.5, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': rng.integers(1000, 5000, n)},
+                        index=pd.bdate_range('2024-09-02', periods=n))
+
+
+def fake_download(available):
+    """yf.download stand-in: grouped by ticker, unknown tickers come back as NaN columns"""
+    def download(tickers, **kwargs):
+        index = pd.bdate_range('2024-09-02', periods=22)
+        frames = {
+            ticker: bars(len(ticker)) if ticker in available else pd.DataFrame(np.nan, index=index, columns=bars(0).columns)
+            for ticker in tickers
+        }
+        return pd.concat(frames, axis=1)
+    return MagicMock(side_effect=download)
+
+
+class Clock:
+    """Settable clock, evening after the 2024-10-01 session by default"""
+
+    def __init__(self):
+        self.now = datetime(2024, 10, 1, 20, 0, tzinfo=TW_TZ)
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(tmp_path, clock):
+    registry = StockRegistry(sources=[lambda: {'2330': LISTED, '3105': OTC}])
+    cache = DashboardCache(tmp_path, clock=clock)
+    with patch.object(data_fetcher, 'get_stock_registry', return_value=registry), \
+         patch.object(data_fetcher, 'get_dashboard_cache', return_value=cache):
+        yield
+
+
+class TestBatchedFetch:
+
+    def test_watchlist_is_one_download_shared_by_all_lookups(self):
+        symbols = [str(2300 + i) for i in range(20)]
+        download = fake_download({f'{s}.TW' for s in symbols})
+        with patch.object(data_fetcher.yf, 'download', download):
+            data = data_fetcher.get_multiple_stocks_data(symbols, '1mo')
+            for symbol in symbols:
+                data_fetcher.get_stock_data(symbol, '1mo')
+                data_fetcher.get_current_price(symbol, '1mo')
+                data_fetcher.get_stock_info(symbol)
+
+        assert download.call_count == 1
+        assert sorted(download.call_args.args[0]) == sorted(f'{s}.TW' for s in symbols)
+        assert all(len(df) == 22 for df in data.values())
+
+    def test_registry_market_picks_the_suffix(self):
+        download = fake_download({'2330.TW', '3105.TWO'})
+        with patch.object(data_fetcher.yf, 'download', download):
+            data = data_fetcher.get_multiple_stocks_data(['2330', '3105'])
+
+        assert download.call_count == 1
+        assert set(download.call_args.args[0]) == {'2330.TW', '3105.TWO'}
+        assert not data['3105'].empty
+
+    def test_fallback_suffix_is_probed_once_and_remembered(self, clock):
+        download = fake_download({'2330.TW', '6488.TWO'})
+        with patch.object(data_fetcher.yf, 'download', download):
+            data_fetcher.get_multiple_stocks_data(['2330', '6488'])
+            assert [call.args[0] for call in download.call_args_list] == [['2330.TW', '6488.TW'], ['6488.TWO']]
+
+            # After the quote expires, the remembered suffix is requested directly
+            clock.now += timedelta(days=6)
+            data = data_fetcher.get_multiple_stocks_data(['6488'])
+
+        assert download.call_args.args[0] == ['6488.TWO']
+        assert download.call_count == 3
+        assert not data['6488'].empty
+        assert data_fetcher.get_stock_info('6488')['market'] == 'TWO'
+
+    def test_missing_symbol_is_cached_as_empty(self):
+        download = fake_download(set())
+        with patch.object(data_fetcher.yf, 'download', download):
+            assert data_fetcher.get_stock_data('9999').empty
+            assert data_fetcher.get_stock_data('9999').empty
+        # .TW, then .TWO once; the empty result is kept until it expires
+        assert download.call_count == 2
+        assert data_fetcher.get_current_price('9999')['current'] == 0
+
+    def test_restart_reads_the_disk_cache(self, tmp_path, clock):
+        download = fake_download({'2330.TW'})
+        with patch.object(data_fetcher.yf, 'download', download):
+            first = data_fetcher.get_stock_data('2330')
+            # Another worker (or a restarted process) on the same directory
+            with patch.object(data_fetcher, 'get_dashboard_cache', return_value=DashboardCache(tmp_path, clock=clock)):
+                second = data_fetcher.get_stock_data('2330')
+
+        assert download.call_count == 1
+        pd.testing.assert_frame_equal(first, second, check_dtype=False)
+
+    def test_unadjusted_prices_and_volume_in_lots(self):
+        download = fake_download({'2330.TW'})
+        with patch.object(data_fetcher.yf, 'download', download):
+            df = data_fetcher.get_stock_data('2330')
+
+        assert download.call_args.kwargs['auto_adjust'] is False
+        assert download.call_args.kwargs['start'] == '2024-08-31'
+        raw = bars(len('2330.TW'))
+        assert list(df['Volume']) == [v // 1000 for v in raw['Volume']]
+        assert df['Close'].iloc[-1] == pytest.approx(raw['Close'].iloc[-1], abs=0.005)
+
+
+class TestDerivedValues:
+
+    def test_current_price_from_the_last_two_closes(self):
+        download = fake_download({'2330.TW'})
+        with patch.object(data_fetcher.yf, 'download', download):
+            df = data_fetcher.get_stock_data('2330')
+            price = data_fetcher.get_current_price('2330')
+
+        assert price['current'] == pytest.approx(df['Close'].iloc[-1])
+        assert price['change'] == pytest.approx(df['Close'].iloc[-1] - df['Close'].iloc[-2])
+        assert download.call_count == 1
+
+    def test_info_from_the_registry(self):
+        with patch.object(data_fetcher.yf, 'download') as download:
+            info = data_fetcher.get_stock_info('3105')
+        assert info == {'name': '穩懋', 'symbol': '3105', 'market': 'TWO', 'sector': '半導體業', 'industry': ''}
+        download.assert_not_called()
@@ -0,0 +1,106 @@
+"""
+Unit tests for the concurrent fetch engine (StockDataFacade.get_stock_prices_many)
+"""
+import threading
+import time
+from unittest.mock import MagicMock
+
+import sys
+sys.path.insert(0, '.')
+from bar_store import BarStore
+from stock_data_facade import StockDataFacade, TWSEProvider, _month_list
+
+
+def make_bar(date, close=100.0):
+    return {'date': date, 'open': close - 1, 'high': close + 1, 'low': close - 2, 'close': close, 'volume': 1000}
+
+
+def make_facade(monkeypatch, bar_store=None):
+    monkeypatch.delenv('STOCK_BAR_STORE_DIR', raising=False)
+    return StockDataFacade(provider='twse', bar_store=bar_store)
+
+
+class TestMonthList:
+
+    def test_spans_year_boundary(self):
+        assert _month_list('2023-11-15', '2024-02-01') == [(2023, 11), (2023, 12), (2024, 1), (2024, 2)]
+
+
+class TestGetStockPricesMany:
+
+    def test_months_are_fetched_concurrently_and_filtered(self, monkeypatch):
+        facade = make_facade(monkeypatch)
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+
+        def fake_month(stock_id, year, month):
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            time.sleep(0.05)
+            with lock:
+                in_flight.pop()
+            return [make_bar(f'{year}-{month:02d}-01'), make_bar(f'{year}-{month:02d}-20')]
+
+        monkeypatch.setattr(facade._provider_instance, '_fetch_monthly_data', fake_month)
+
+        result = facade.get_stock_prices_many(['2330', '2317'], '2024-01-10', '2024-03-10', concurrency=4)
+
+        assert set(result) == {'2330', '2317'}
+        assert [b['date'] for b in result['2330']] == ['2024-01-20', '2024-02-01', '2024-02-20', '2024-03-01']
+        assert 1 < max(peak) <= 4
+
+    def test_concurrency_limit_is_respected(self, monkeypatch):
+        facade = make_facade(monkeypatch)
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+
+        def fake_month(stock_id, year, month):
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            time.sleep(0.02)
+            with lock:
+                in_flight.pop()
+            return []
+
+        monkeypatch.setattr(facade._provider_instance, '_fetch_monthly_data', fake_month)
+        facade.get_stock_prices_many([str(i) for i in range(10)], '2024-01-01', '2024-03-31', concurrency=2)
+
+        assert max(peak) <= 2
+
+    def test_store_serves_covered_ranges(self, monkeypatch, tmp_path):
+        store = BarStore(tmp_path / 'bars')
+        store.write('2330', [make_bar('2024-01-02'), make_bar('2024-01-03')])
+        store.set_coverage('2330', '2024-01-01', '2024-01-05')
+
+        facade = make_facade(monkeypatch, bar_store=store)
+        provider = MagicMock(spec=TWSEProvider)
+
+        async def afetch(stock_id, start, end, semaphore):
+            return ([make_bar('2024-01-04')], [(start, end)]) if stock_id == '2317' else ([], [])
+
+        provider.afetch_stock_price_covered.side_effect = afetch
+        facade._provider_instance = provider
+
+        result = facade.get_stock_prices_many(['2330', '2317'], '2024-01-01', '2024-01-05')
+
+        assert [b['date'] for b in result['2330']] == ['2024-01-02', '2024-01-03']
+        assert [b['date'] for b in result['2317']] == ['2024-01-04']
+        # Only the uncovered stock hits the provider
+        assert [c.args[0] for c in provider.afetch_stock_price_covered.call_args_list] == ['2317']
+        assert store.read('2317', '2024-01-01', '2024-01-05') == [make_bar('2024-01-04')]
+
+    def test_provider_error_returns_empty_list(self, monkeypatch):
+        facade = make_facade(monkeypatch)
+        provider = MagicMock()
+
+        async def afetch(stock_id, start, end, semaphore):
+            raise RuntimeError("boom")
+
+        provider.afetch_stock_price.side_effect = afetch
+        facade._provider_instance = provider
+
+        assert facade.get_stock_prices_many(['2330'], '2024-01-01', '2024-01-05') == {'2330': []}
@@ -0,0 +1,89 @@
+"""
+Unit tests for the history index (scripts/history_index.py) and its update in scripts/update_daily.py
+"""
+import json
+
+import pytest
+
+import sys
+sys.path.insert(0, '.')
+from scripts.history_index import (
+    FIELDS, INDEX_FILE, PARTITION_DIR, index_rows, load_index, rebuild_history_index, update_history_index
+)
+from scripts.scan_output import write_scan_output
+
+
+def stock(ticker, price=100.0, streak=2, priority=92):
+    return {"ticker": ticker, "currentPrice": price, "consecutiveRed": streak,
+            "signal": {"priority": priority}, "ohlc": [{"date": "2024-03-01", "close": price}]}
+
+
+def scan(date, tickers, previous=()):
+    stocks = [stock(t) for t in tickers]
+    return {
+        "date": date,
+        "stocks": stocks,
+        "changes": {
+            "new": [s for s in stocks if s['ticker'] not in previous],
+            "continued": [s for s in stocks if s['ticker'] in previous],
+            "removed": [stock(t) for t in previous if t not in tickers]
+        }
+    }
+
+
+def read(path):
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+class TestIndexRows:
+
+    def test_statuses(self):
+        rows = index_rows(scan('2024-03-04', ['2330', '2317'], previous=['2317', '1101']))
+        assert rows == [
+            ['2024-03-04', '1101', 'removed', 100.0, 2, 92],
+            ['2024-03-04', '2317', 'continued', 100.0, 2, 92],
+            ['2024-03-04', '2330', 'new', 100.0, 2, 92],
+        ]
+
+
+class TestUpdateHistoryIndex:
+
+    def test_appends_and_replaces_same_day(self, tmp_path):
+        update_history_index(tmp_path, scan('2024-02-29', ['1101']))
+        update_history_index(tmp_path, scan('2024-03-01', ['2330']))
+        update_history_index(tmp_path, scan('2024-03-01', ['2330', '2317']))
+
+        index = load_index(tmp_path / INDEX_FILE)
+        assert index['fields'] == FIELDS
+        assert index['dates'] == ['2024-02-29', '2024-03-01']
+        assert [r[:2] for r in index['rows']] == [['2024-02-29', '1101'], ['2024-03-01', '2317'], ['2024-03-01', '2330']]
+        assert index['partitions'] == ['2024-02', '2024-03']
+
+        march = read(tmp_path / PARTITION_DIR / '2024-03.json')
+        assert march['dates'] == ['2024-03-01']
+        assert read(tmp_path / PARTITION_DIR / '2024-02.json')['dates'] == ['2024-02-29']
+
+    def test_window_is_trimmed_but_partition_keeps_month(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('HISTORY_INDEX_WINDOW', '2')
+        for day in range(1, 5):
+            update_history_index(tmp_path, scan(f'2024-03-{day:02d}', ['2330']))
+
+        assert load_index(tmp_path / INDEX_FILE)['dates'] == ['2024-03-03', '2024-03-04']
+        assert len(read(tmp_path / PARTITION_DIR / '2024-03.json')['dates']) == 4
+
+    def test_rebuild_from_history_files(self, tmp_path):
+        history = tmp_path / 'history'
+        history.mkdir()
+        write_scan_output(history / '2024-02-29.json', scan('2024-02-29', ['1101']))
+        (history / '2024-03-01.json').write_text(json.dumps(scan('2024-03-01', ['2330'], previous=['1101'])))
+
+        index = rebuild_history_index(tmp_path, history.glob('*.json'))
+        assert index['dates'] == ['2024-02-29', '2024-03-01']
+        assert index['partitions'] == ['2024-02', '2024-03']
+        assert ['2024-03-01', '1101', 'removed', 100.0, 2, 92] in index['rows']
+
+    @pytest.mark.parametrize('content', ['not json', json.dumps({"format": 99})])
+    def test_unreadable_index_starts_over(self, tmp_path, content):
+        (tmp_path / INDEX_FILE).write_text(content)
+        index = update_history_index(tmp_path, scan('2024-03-01', ['2330']))
+        assert index['dates'] == ['2024-03-01']
@@ -0,0 +1,147 @@
+"""
+Unit tests for incremental indicator state (indicator_state.py) and the incremental scan engine
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, '.')
+from indicator_state import IndicatorState, IndicatorStateStore
+
+
+def random_bars(n=130, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(100 * np.cumprod(1 + rng.normal(0, 0.02, n)), 2)
+    open_ = np.round(close * (1 + rng.normal(0, 0.01, n)), 2)
+    high = np.maximum(close, open_) + 0.5
+    low = np.minimum(close, open_) - 0.5
+    volume = rng.integers(50, 2000, n)
+    dates = pd.bdate_range('2024-01-01', periods=n).strftime('%Y-%m-%d')
+    return [
+        {'date': d, 'open': float(o), 'high': float(h), 'low': float(l), 'close': float(c), 'volume': int(v)}
+        for d, o, h, l, c, v in zip(dates, open_, high, low, close, volume)
+    ]
+
+
+def pandas_reference(bars):
+    """Reference pandas calculation (KD: K = 2/3 * previous K + 1/3 * RSV)"""
+    df = pd.DataFrame(bars)
+    low_9 = df['low'].rolling(9).min()
+    high_9 = df['high'].rolling(9).max()
+    rsv = ((df['close'] - low_9) / (high_9 - low_9) * 100).fillna(50)
+    k = rsv.ewm(alpha=1 / 3, adjust=False).mean()
+    return {
+        'ma5': df['close'].rolling(5).mean().iloc[-1],
+        'ma60': df['close'].rolling(60).mean().iloc[-1],
+        'k': k.iloc[-1],
+        'd': k.ewm(alpha=1 / 3, adjust=False).mean().iloc[-1],
+        'prev_high': df['high'].iloc[-21:-1].max(),
+        'vol_ma5': df['volume'].rolling(5).mean().iloc[-1],
+        'volatility': df['close'].tail(20).std() / df['close'].tail(20).mean(),
+    }
+
+
+class TestIndicatorState:
+
+    def test_matches_pandas(self):
+        bars = random_bars()
+        snapshot = IndicatorState.from_bars(bars).snapshot()
+        expected = pandas_reference(bars)
+
+        for key, value in expected.items():
+            assert snapshot[key] == pytest.approx(value, rel=1e-9), key
+
+    def test_incremental_update_equals_rebuild(self):
+        bars = random_bars()
+        state = IndicatorState.from_bars(bars[:-1])
+        assert state.update(bars[-1])
+
+        assert state.snapshot() == pytest.approx(IndicatorState.from_bars(bars).snapshot())
+
+    def test_old_bar_is_ignored(self):
+        bars = random_bars(n=30)
+        state = IndicatorState.from_bars(bars)
+
+        assert not state.update(bars[-1])
+        assert state.count == 30
+
+    def test_ma_none_until_window_full(self):
+        state = IndicatorState.from_bars(random_bars(n=59))
+        assert state.ma(20) is not None
+        assert state.ma(60) is None
+
+    def test_flat_low_volume_breaks_streak(self):
+        state = IndicatorState()
+        state.update({'date': '2024-01-02', 'open': 10, 'high': 11, 'low': 9, 'close': 10.5, 'volume': 500})
+        state.update({'date': '2024-01-03', 'open': 10.5, 'high': 11, 'low': 10, 'close': 10.8, 'volume': 500})
+        assert state.consecutive_red == 2
+
+        state.update({'date': '2024-01-04', 'open': 10.8, 'high': 10.8, 'low': 10.8, 'close': 10.8, 'volume': 99})
+        assert state.consecutive_red == 0
+
+    def test_store_round_trip(self, tmp_path):
+        store = IndicatorStateStore(tmp_path / 'state' / 'indicators.json')
+        state = IndicatorState.from_bars(random_bars())
+        store.save({'2330': state})
+
+        loaded = store.load()
+        assert loaded['2330'].snapshot() == pytest.approx(state.snapshot())
+
+    def test_store_missing_file(self, tmp_path):
+        assert IndicatorStateStore(tmp_path / 'missing.json').load() == {}
+
+
+class TestIncrementalScan:
+
+    def make_df(self, bars):
+        df = pd.DataFrame(bars).rename(columns={'high': 'max', 'low': 'min', 'volume': 'Trading_Volume'})
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def test_only_new_bars_are_fetched(self):
+        from scripts import update_daily
+
+        bars = random_bars()
+        state = IndicatorState.from_bars(bars[:-1])
+
+        with patch.object(update_daily, 'fetch_bars_since', return_value=[bars[-1]]) as mock_since, \
+             patch.object(update_daily, 'fetch_stock_history') as mock_history, \
+             patch.object(update_daily, 'settled_date', return_value='2099-12-31'), \
+             patch.object(update_daily, 'get_history_start_date', return_value='1900-01-01'):
+            saved, screen = update_daily.advance_indicator_state('2330', state)
+
+        mock_history.assert_not_called()
+        assert mock_since.call_args.args[1] > bars[-2]['date']
+        assert saved.last_date == bars[-1]['date']
+        assert screen is saved
+
+    def test_unsettled_bar_is_not_persisted(self):
+        from scripts import update_daily
+
+        bars = random_bars()
+        with patch.object(update_daily, 'fetch_stock_history', return_value=self.make_df(bars)), \
+             patch.object(update_daily, 'settled_date', return_value=bars[-2]['date']):
+            saved, screen = update_daily.advance_indicator_state('2330', None)
+
+        assert saved.last_date == bars[-2]['date']
+        assert screen.last_date == bars[-1]['date']
+
+    def test_screen_agrees_with_per_stock_evaluation(self):
+        from scripts import update_daily
+
+        for seed in range(40):
+            bars = random_bars(n=80, seed=seed)
+            # Force a breakout with two red K on some samples
+            if seed % 2 == 0:
+                peak = max(b['high'] for b in bars[:-2])
+                bars[-2].update(open=peak, close=peak + 1, high=peak + 1.5, low=peak - 0.5)
+                bars[-1].update(open=peak + 1, close=peak + 3, high=peak + 3.5, low=peak + 0.5)
+
+            is_qualified, change_pct = update_daily.screen_indicator_state(IndicatorState.from_bars(bars))
+            with patch.object(update_daily, 'get_stock_name', return_value=('名稱', '產業', '上市')):
+                data, expected_change = update_daily.evaluate_livermore_criteria('2330', self.make_df(bars))
+
+            assert is_qualified == (data is not None), seed
+            assert change_pct == pytest.approx(expected_change)
@@ -0,0 +1,115 @@
+"""
+Unit tests for the shared indicator library (indicators.py) and its entry points
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, '.')
+import indicators
+from indicators import compute_indicators, consecutive_red
+from indicator_state import IndicatorState
+
+
+def random_columns(n=150, seed=3):
+    rng = np.random.default_rng(seed)
+    close = np.round(100 * np.cumprod(1 + rng.normal(0, 0.02, n)), 2)
+    open_ = np.round(close * (1 + rng.normal(0, 0.01, n)), 2)
+    high = np.maximum(close, open_) + 0.5
+    low = np.minimum(close, open_) - 0.5
+    # A few flat bars (high == low) exercise the RSV fallback
+    high[40:50] = low[40:50] = open_[40:50] = close[40:50] = 100.0
+    volume = rng.integers(50, 2000, n).astype(float)
+    return open_, high, low, close, volume
+
+
+def pandas_reference(open_, high, low, close, volume):
+    df = pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume})
+    rsv = ((df['close'] - df['low'].rolling(9).min()) / (df['high'].rolling(9).max() - df['low'].rolling(9).min()) * 100).fillna(50)
+    k = rsv.ewm(alpha=1 / 3, adjust=False).mean()
+    return {
+        'ma5': df['close'].rolling(5).mean(),
+        'ma60': df['close'].rolling(60).mean(),
+        'k': k,
+        'd': k.ewm(alpha=1 / 3, adjust=False).mean(),
+        'vol_ma5': df['volume'].rolling(5, min_periods=1).mean(),
+    }
+
+
+def as_float(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+class TestComputeIndicators:
+
+    @pytest.mark.parametrize('has_numpy', [True, False])
+    def test_matches_pandas(self, has_numpy):
+        columns = random_columns()
+        with patch.object(indicators, 'HAS_NUMPY', has_numpy):
+            result = compute_indicators(*(list(c) for c in columns))
+        expected = pandas_reference(*columns)
+
+        for key, series in expected.items():
+            np.testing.assert_allclose(as_float(result[key]), series.to_numpy(), rtol=1e-9, err_msg=key)
+
+    def test_numpy_and_pure_python_agree(self):
+        columns = random_columns(seed=7)
+        fast = compute_indicators(*columns)
+        with patch.object(indicators, 'HAS_NUMPY', False):
+            slow = compute_indicators(*(list(c) for c in columns))
+
+        assert fast['consecutive_red'] == slow['consecutive_red']
+        assert fast['prev_high'] == slow['prev_high']
+        assert fast['volatility'] == pytest.approx(slow['volatility'], rel=1e-12)
+        for key in ('ma10', 'ma20', 'k', 'd'):
+            np.testing.assert_allclose(as_float(fast[key]), as_float(slow[key]), rtol=1e-9, err_msg=key)
+
+    def test_latest_values_match_indicator_state(self):
+        columns = random_columns(seed=11)
+        result = compute_indicators(*columns)
+        bars = [
+            {'date': f'2024-{i // 28 + 1:02d}-{i % 28 + 1:02d}', 'open': o, 'high': h, 'low': l, 'close': c, 'volume': int(v)}
+            for i, (o, h, l, c, v) in enumerate(zip(*columns))
+        ]
+        snapshot = IndicatorState.from_bars(bars).snapshot()
+
+        for key in ('ma5', 'ma60', 'k', 'd', 'vol_ma5'):
+            assert result[key][-1] == pytest.approx(snapshot[key], rel=1e-9), key
+        for key in ('consecutive_red', 'prev_high', 'volatility'):
+            assert result[key] == pytest.approx(snapshot[key], rel=1e-9), key
+
+    def test_short_history(self):
+        result = compute_indicators([10.0], [11.0], [9.0], [10.5], [500])
+        assert result['ma5'] == [None]
+        assert result['k'] == [50.0] and result['d'] == [50.0]
+        assert result['prev_high'] is None and result['volatility'] is None
+        assert result['consecutive_red'] == 1
+
+
+class TestConsecutiveRed:
+
+    def test_flat_low_volume_bar_breaks_the_streak(self):
+        # Volumes are in lots: a flat bar under 100 lots is not a red K
+        assert consecutive_red([10, 10, 10], [11, 10, 11], [500, 99, 500]) == 1
+        assert consecutive_red([10, 10, 10], [11, 10, 11], [500, 100, 500]) == 3
+        assert consecutive_red([10, 10], [9, 11], [500, 500]) == 1
+
+
+class TestEntryPoints:
+
+    def test_vercel_api_uses_the_scanner_threshold(self):
+        from api import stock as stock_api
+
+        rows = [
+            {'date': f'2024-02-{day:02d}', 'open': 100.0, 'max': 101.0, 'min': 99.0,
+             'close': 100.0 if day == 29 else 100.5, 'Trading_Volume': 500}
+            for day in range(1, 30)
+        ]
+        with patch.object(indicators, 'HAS_NUMPY', False):
+            payload = stock_api.build_stock_payload('2330', raw_data=rows, name='台積電')
+
+        # 500 lots is not a "no volume" flat bar (the old API threshold was 1000)
+        assert payload['consecutiveRed'] == 29
+        assert payload['ma20'] == pytest.approx((19 * 100.5 + 100.0) / 20, abs=0.01)
@@ -0,0 +1,85 @@
+"""
+Unit tests for the vectorized Livermore screener (scripts/livermore_screener.py)
+"""
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+from scripts.livermore_screener import build_price_matrix, screen_livermore
+
+
+def make_history(last_days, total_days=70, base_price=10.0):
+    """Flat history at base_price (Must be > 60 for MA60), followed by last_days"""
+    history_len = total_days - len(last_days['close'])
+    return {
+        field: np.array([base_price] * history_len + list(last_days[field]), dtype=float)
+        if field != 'volume' else np.array([50] * history_len + list(last_days[field]), dtype=float)
+        for field in ('open', 'high', 'low', 'close', 'volume')
+    }
+
+
+BREAKOUT = {
+    'open':   [10.0, 12.0],
+    'high':   [10.5, 13.5],
+    'low':    [9.8, 12.0],
+    'close':  [10.4, 13.0],
+    'volume': [500, 800],
+}
+
+
+class TestBuildPriceMatrix:
+
+    def test_histories_are_right_aligned(self):
+        matrix = build_price_matrix({
+            'A': {f: np.arange(1, 4, dtype=float) for f in ('open', 'high', 'low', 'close', 'volume')},
+            'B': {f: np.arange(1, 6, dtype=float) for f in ('open', 'high', 'low', 'close', 'volume')},
+        })
+
+        assert matrix.close.shape == (5, 2)
+        assert np.isnan(matrix.close[:2, 0]).all()
+        assert matrix.close[-1].tolist() == [3.0, 5.0]
+        assert matrix.lengths.tolist() == [3, 5]
+
+
+class TestScreenLivermore:
+
+    def test_breakout_qualifies(self):
+        screen = screen_livermore(build_price_matrix({'2330': make_history(BREAKOUT)}))
+
+        assert screen['qualified'][0]
+        assert screen['consecutive_red'][0] == 2
+        assert screen['prev_high'][0] == 10.5
+        assert round(screen['change_pct'][0], 2) == 25.0
+
+    def test_flat_low_volume_breaks_streak(self):
+        """昨日為無量一字線 (< 100 張) 時連紅中斷"""
+        last_days = {key: list(values) for key, values in BREAKOUT.items()}
+        last_days['open'][0] = last_days['close'][0] = 10.4
+        last_days['volume'][0] = 99
+
+        screen = screen_livermore(build_price_matrix({'2330': make_history(last_days)}))
+
+        assert screen['consecutive_red'][0] == 1
+        assert not screen['qualified'][0]
+        assert screen['valid'][0]
+
+    def test_missing_ma60_does_not_qualify(self):
+        screen = screen_livermore(build_price_matrix({'2330': make_history(BREAKOUT, total_days=40)}))
+
+        assert screen['is_breakout'][0]
+        assert not screen['is_above_all_ma'][0]
+        assert not screen['qualified'][0]
+
+    def test_short_history_is_invalid(self):
+        screen = screen_livermore(build_price_matrix({
+            'NEW': make_history(BREAKOUT, total_days=15),
+            '2330': make_history(BREAKOUT),
+        }))
+
+        assert screen['valid'].tolist() == [False, True]
+        assert np.isnan(screen['change_pct'][0])
+        assert screen['qualified'].tolist() == [False, True]
+
+    def test_empty_universe(self):
+        screen = screen_livermore(build_price_matrix({}))
+        assert len(screen['qualified']) == 0
@@ -0,0 +1,238 @@
+"""
+Unit tests for bulk whole-market daily ingestion (market_daily.py)
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+
+import sys
+sys.path.insert(0, '.')
+import market_daily
+from bar_store import BarStore
+from trading_calendar import TradingCalendar
+
+
+TWSE_FIELDS = ['證券代號', '證券名稱', '成交股數', '成交筆數', '成交金額', '開盤價', '最高價', '最低價', '收盤價']
+TPEX_FIELDS = ['代號', '名稱', '收盤 ', '漲跌', '開盤 ', '最高 ', '最低', '均價 ', '成交股數  ']
+
+
+def mock_response(payload, status_code=200):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = payload
+    return response
+
+
+def patch_http_get(**kwargs):
+    """Patch the shared session's get; yields the get mock"""
+    session = MagicMock()
+    session.get = MagicMock(**kwargs)
+    return patch('market_daily.get_http_session', return_value=session)
+
+
+def twse_payload(rows):
+    return {'stat': 'OK', 'tables': [{'title': '每日收盤行情', 'fields': TWSE_FIELDS, 'data': rows}]}
+
+
+def tpex_payload(rows):
+    return {'tables': [{'fields': TPEX_FIELDS, 'data': rows}]}
+
+
+class TestParsing:
+
+    def test_twse_tables_payload(self):
+        with patch_http_get(return_value=mock_response(twse_payload([
+            ['2330', '台積電', '25,000,000', '1', '1', '590.00', '600.00', '588.00', '598.00'],
+            ['9999', '停牌股', '0', '0', '0', '--', '--', '--', '--'],
+        ]))):
+            bars = market_daily.fetch_twse_market_daily('2024-01-02')
+
+        assert list(bars) == ['2330']
+        assert bars['2330'] == {
+            'date': '2024-01-02', 'open': 590.0, 'high': 600.0, 'low': 588.0, 'close': 598.0, 'volume': 25000
+        }
+
+    def test_twse_legacy_data9_payload(self):
+        with patch_http_get(return_value=mock_response({
+            'stat': 'OK',
+            'fields9': TWSE_FIELDS,
+            'data9': [['2317', '鴻海', '10,000', '1', '1', '100.00', '101.00', '99.00', '100.50']]
+        })):
+            bars = market_daily.fetch_twse_market_daily('2024-01-02')
+        assert bars['2317']['close'] == 100.5
+        assert bars['2317']['volume'] == 10
+
+    def test_twse_holiday_returns_empty(self):
+        with patch_http_get(return_value=mock_response({'stat': '很抱歉，沒有符合條件的資料!'})):
+            assert market_daily.fetch_twse_market_daily('2024-02-08') == {}
+
+    def test_twse_error_stat_returns_none(self):
+        with patch_http_get(return_value=mock_response({'stat': '查詢日期大於今日，請重新查詢!'})):
+            assert market_daily.fetch_twse_market_daily('2024-01-02') is None
+
+    def test_twse_unrecognised_layout_returns_none(self):
+        with patch_http_get(return_value=mock_response({'stat': 'OK', 'tables': [{'fields': ['代號'], 'data': []}]})):
+            assert market_daily.fetch_twse_market_daily('2024-01-02') is None
+
+    def test_request_error_returns_none(self):
+        with patch_http_get(side_effect=Exception("timeout")):
+            assert market_daily.fetch_twse_market_daily('2024-01-02') is None
+            assert market_daily.fetch_tpex_market_daily('2024-01-02') is None
+
+    def test_tpex_fields_with_whitespace(self):
+        with patch_http_get(return_value=mock_response(tpex_payload([
+            ['6446', '藥華藥', '500.00', '+5.00', '495.00', '505.00', '490.00', '498.00', '1,234,000']
+        ]))):
+            bars = market_daily.fetch_tpex_market_daily('2024-01-02')
+        assert bars['6446']['open'] == 495.0
+        assert bars['6446']['close'] == 500.0
+        assert bars['6446']['volume'] == 1234
+
+
+class MarketRangeCase:
+    """Unthrottled requests, a fixed settled date and an in-memory calendar"""
+
+    @pytest.fixture(autouse=True)
+    def no_throttle(self):
+        self.calendar = TradingCalendar()
+        with patch('market_daily.get_rate_limiter'), \
+             patch('market_daily.settled_date', return_value='2024-12-31'), \
+             patch('market_daily.get_trading_calendar', return_value=self.calendar):
+            yield
+
+    def fake_get(self, failing_dates=(), closed_dates=(), twse_payloads=None):
+        def _get(url, params=None, timeout=None):
+            if 'MI_INDEX' in url:
+                date = params['date']
+                if date in failing_dates:
+                    raise Exception("boom")
+                if date in closed_dates:
+                    return mock_response({'stat': '很抱歉，沒有符合條件的資料!'})
+                if twse_payloads and date in twse_payloads:
+                    return mock_response(twse_payloads[date])
+                return mock_response(twse_payload([
+                    ['2330', '台積電', '1,000', '1', '1', '10', '11', '9', date[-2:]]
+                ]))
+            roc_year, month, day = params['d'].split('/')
+            if f"{int(roc_year) + 1911}{month}{day}" in closed_dates:
+                return mock_response(tpex_payload([]))
+            return mock_response(tpex_payload([
+                ['6446', '藥華藥', '500.00', '+5.00', '495.00', '505.00', '490.00', '498.00', '1,234,000']
+            ]))
+        return _get
+
+
+class TestIngestMarketRange(MarketRangeCase):
+
+    def test_ingests_weekdays_into_store(self, tmp_path):
+        store = BarStore(tmp_path)
+        with patch_http_get(side_effect=self.fake_get()) as mock_session:
+            # 2024-01-05 is Friday, 06/07 weekend, 08 Monday
+            summary = market_daily.ingest_market_range(store, '2024-01-05', '2024-01-08')
+
+        assert mock_session.return_value.get.call_count == 4
+        assert summary['days'] == 2
+        assert [b['date'] for b in store.read('2330', '2024-01-01', '2024-01-31')] == ['2024-01-05', '2024-01-08']
+        assert store.get_coverage('2330') == ('2024-01-05', '2024-01-08')
+        assert market_daily.get_ingested_until(store) == '2024-01-08'
+
+    def test_skips_days_already_ingested(self, tmp_path):
+        store = BarStore(tmp_path)
+        with patch_http_get(side_effect=self.fake_get()):
+            market_daily.ingest_market_range(store, '2024-01-05', '2024-01-08')
+
+        with patch_http_get(side_effect=self.fake_get()) as mock_session:
+            summary = market_daily.ingest_market_range(store, '2024-01-05', '2024-01-09')
+
+        assert mock_session.return_value.get.call_count == 2
+        assert summary['start'] == '2024-01-09'
+        assert store.get_coverage('2330') == ('2024-01-05', '2024-01-09')
+
+    def test_stops_at_failed_day(self, tmp_path):
+        store = BarStore(tmp_path)
+        with patch_http_get(side_effect=self.fake_get(failing_dates={'20240109'})):
+            summary = market_daily.ingest_market_range(store, '2024-01-08', '2024-01-10')
+
+        assert summary['end'] == '2024-01-08'
+        assert market_daily.get_ingested_until(store) == '2024-01-08'
+
+    def test_skips_holidays_and_learns_closures(self, tmp_path):
+        store = BarStore(tmp_path)
+        with patch_http_get(side_effect=self.fake_get(closed_dates={'20241011'})) as mock_session:
+            # 2024-10-10 National Day is known; 2024-10-11 closes unexpectedly
+            summary = market_daily.ingest_market_range(store, '2024-10-09', '2024-10-14')
+
+        requested = sorted({call.kwargs['params']['date'] for call in mock_session.return_value.get.call_args_list
+                            if 'MI_INDEX' in call.args[0]})
+        assert requested == ['20241009', '20241011', '20241014']
+        assert summary['days'] == 2
+        assert not self.calendar.is_trading_day('2024-10-11')
+        assert self.calendar.offset('2024-10-14', -1) == '2024-10-09'
+
+    def test_unexpected_empty_day_is_retried_not_closed(self, tmp_path):
+        store = BarStore(tmp_path)
+        payloads = {
+            '20241009': {'stat': 'OK', 'tables': [{'title': '大盤統計資訊', 'fields': ['指數'], 'data': []}]},
+            '20241011': {'stat': '系統忙碌中，請稍後再試'},
+        }
+        for day in ('20241009', '20241011'):
+            with patch_http_get(side_effect=self.fake_get(twse_payloads={day: payloads[day]})):
+                summary = market_daily.ingest_market_range(store, f"{day[:4]}-{day[4:6]}-{day[6:]}", '2024-10-14')
+            assert summary['days'] == 0
+            assert self.calendar.is_trading_day(f"{day[:4]}-{day[4:6]}-{day[6:]}")
+
+        assert market_daily.get_ingested_until(store) is None
+
+    def test_one_empty_market_is_retried(self, tmp_path):
+        store = BarStore(tmp_path)
+
+        def get(url, params=None, timeout=None):
+            if 'MI_INDEX' in url:
+                return self.fake_get()(url, params, timeout)
+            return mock_response({'tables': []})
+
+        with patch_http_get(side_effect=get):
+            summary = market_daily.ingest_market_range(store, '2024-10-09', '2024-10-14')
+
+        assert summary['end'] is None
+        assert self.calendar.is_trading_day('2024-10-09')
+
+
+class TestBackfillMarketRange(MarketRangeCase):
+
+    def test_backfills_backwards_within_the_day_budget(self, tmp_path):
+        store = BarStore(tmp_path)
+        with patch_http_get(side_effect=self.fake_get()):
+            market_daily.ingest_market_range(store, '2024-10-14', '2024-10-15')
+
+            # 10-11, 10-09, 10-08 (10-10 National Day is skipped without a request)
+            first = market_daily.backfill_market_range(store, '2024-10-01', max_days=3)
+            assert first['start'] == '2024-10-08'
+            assert first['requests'] == 6
+            assert market_daily.get_ingested_from(store) == '2024-10-08'
+            assert store.get_coverage('2330') == ('2024-10-08', '2024-10-15')
+
+            second = market_daily.backfill_market_range(store, '2024-10-01', max_days=10)
+            assert second['start'] == '2024-10-01'
+            assert store.get_coverage('2330') == ('2024-10-01', '2024-10-15')
+            assert market_daily.get_ingested_until(store) == '2024-10-15'
+
+            # Already covered: no requests
+            assert market_daily.backfill_market_range(store, '2024-10-01', max_days=10)['requests'] == 0
+
+        dates = [b['date'] for b in store.read('2330', '2024-10-01', '2024-10-15')]
+        # 10-02 / 10-03 were typhoon closures
+        assert dates == ['2024-10-01', '2024-10-04', '2024-10-07', '2024-10-08',
+                         '2024-10-09', '2024-10-11', '2024-10-14', '2024-10-15']
+
+    def test_backfill_stops_at_failed_day(self, tmp_path):
+        store = BarStore(tmp_path)
+        with patch_http_get(side_effect=self.fake_get(failing_dates={'20241008'})):
+            market_daily.ingest_market_range(store, '2024-10-14', '2024-10-15')
+            summary = market_daily.backfill_market_range(store, '2024-10-01', max_days=10)
+
+        assert summary['start'] == '2024-10-09'
+        assert market_daily.get_ingested_from(store) == '2024-10-09'
+
+    def test_backfill_needs_an_ingested_range(self, tmp_path):
+        store = BarStore(tmp_path)
+        assert market_daily.backfill_market_range(store, '2024-10-01', max_days=10)['start'] is None
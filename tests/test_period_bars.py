@@ -0,0 +1,166 @@
+"""
+Unit tests for weekly / monthly bars (bar_store.resample_bars, indicator_state.PeriodState)
+and the multi-timeframe scan (scripts/update_daily.py)
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock, patch
+
+import sys
+sys.path.insert(0, '.')
+from bar_store import period_key, resample_bars
+from indicator_state import IndicatorState, IndicatorStateStore, PeriodState
+
+
+def random_bars(n=400, seed=1):
+    rng = np.random.default_rng(seed)
+    close = np.round(100 * np.cumprod(1 + rng.normal(0.002, 0.02, n)), 2)
+    open_ = np.round(close * (1 + rng.normal(0, 0.01, n)), 2)
+    volume = rng.integers(50, 2000, n)
+    dates = pd.bdate_range('2023-01-02', periods=n).strftime('%Y-%m-%d')
+    return [
+        {'date': d, 'open': float(o), 'high': float(max(o, c) + 0.5), 'low': float(min(o, c) - 0.5),
+         'close': float(c), 'volume': int(v)}
+        for d, o, c, v in zip(dates, open_, close, volume)
+    ]
+
+
+def bar(date, open_, close, volume=1000):
+    return {'date': date, 'open': open_, 'high': max(open_, close) + 1, 'low': min(open_, close) - 1,
+            'close': close, 'volume': volume}
+
+
+class TestResample:
+
+    def test_period_keys(self):
+        assert period_key('2024-10-04', 'W') == '2024-09-30'
+        assert period_key('2024-09-30', 'W') == '2024-09-30'
+        assert period_key('2024-10-04', 'M') == '2024-10'
+        with pytest.raises(ValueError):
+            period_key('2024-10-04', 'Q')
+
+    def test_weekly_bars_are_dated_by_last_trading_day(self):
+        bars = [bar('2024-09-30', 10, 11), bar('2024-10-01', 11, 12), bar('2024-10-04', 12, 9),
+                bar('2024-10-07', 9, 10)]
+        weekly = resample_bars(bars, 'W')
+
+        assert [b['date'] for b in weekly] == ['2024-10-04', '2024-10-07']
+        assert weekly[0] == {'date': '2024-10-04', 'open': 10, 'high': 13, 'low': 8, 'close': 9, 'volume': 3000}
+
+    def test_matches_pandas_resample(self):
+        bars = random_bars()
+        df = pd.DataFrame(bars).set_index(pd.to_datetime([b['date'] for b in bars]))
+        expected = df.resample('MS').agg({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+
+        monthly = resample_bars(bars, 'M')
+        assert [b['close'] for b in monthly] == expected['close'].tolist()
+        assert [b['volume'] for b in monthly] == expected['volume'].tolist()
+
+
+class TestPeriodState:
+
+    @pytest.mark.parametrize('timeframe', ['W', 'M'])
+    def test_equals_indicators_over_resampled_bars(self, timeframe):
+        bars = random_bars()
+        state = PeriodState.from_bars(timeframe, bars)
+        expected = IndicatorState.from_bars(resample_bars(bars, timeframe)).snapshot()
+
+        assert state.count == expected['count']
+        assert state.snapshot() == pytest.approx(expected, rel=1e-9)
+
+    def test_daily_update_only_touches_the_current_period(self):
+        bars = random_bars()
+        state = PeriodState.from_bars('W', bars[:-1])
+        completed = state.completed.to_dict()
+
+        state.update(bars[-1])
+        if period_key(bars[-1]['date'], 'W') == period_key(bars[-2]['date'], 'W'):
+            assert state.completed.to_dict() == completed
+        assert state.current['close'] == bars[-1]['close']
+        assert not state.update(bars[-1])
+
+    def test_round_trip_through_store(self, tmp_path):
+        bars = random_bars()
+        store = IndicatorStateStore(tmp_path / 'indicators_weekly.json', PeriodState)
+        store.save({'2330': PeriodState.from_bars('W', bars[:-3])})
+
+        loaded = store.load()['2330']
+        for b in bars[-3:]:
+            loaded.update(b)
+        assert loaded.snapshot() == pytest.approx(PeriodState.from_bars('W', bars).snapshot(), rel=1e-9)
+
+
+class TestTimeframeScan:
+
+    def test_advance_builds_a_period_state_from_long_history(self):
+        from scripts import update_daily
+
+        bars = random_bars()
+        df = pd.DataFrame([{'date': b['date'], 'open': b['open'], 'max': b['high'], 'min': b['low'],
+                            'close': b['close'], 'Trading_Volume': b['volume']} for b in bars])
+        with patch.object(update_daily, 'fetch_stock_history', return_value=df) as mock_history, \
+             patch.object(update_daily, 'settled_date', return_value='2099-12-31'):
+            saved, screen = update_daily.advance_indicator_state('2330', None, 'W')
+
+        assert mock_history.call_args.args[1] == update_daily.get_history_start_date('W')
+        assert isinstance(saved, PeriodState) and screen is saved
+        assert saved.count == len(resample_bars(bars, 'W'))
+
+    def test_scan_and_tag(self, tmp_path):
+        from scripts import update_daily
+
+        bars = random_bars()
+        states = {'2330': PeriodState.from_bars('W', bars), '2317': None}
+        with patch.dict('os.environ', {'INDICATOR_STATE_FILE': str(tmp_path / 'indicators.json')}), \
+             patch.object(update_daily, 'advance_indicator_state',
+                          side_effect=lambda code, state, timeframe: (states[code], states[code])), \
+             patch.object(update_daily, 'screen_indicator_state', return_value=(True, 1.0)):
+            qualified = update_daily.scan_timeframes(['2330', '2317'], ['W'])
+
+        assert qualified == {'W': ['2330']}
+        assert (tmp_path / 'indicators_weekly.json').exists()
+
+        stocks = [{'ticker': '2330', 'tags': []}, {'ticker': '2454', 'tags': ['盤整突破']}]
+        update_daily.tag_timeframe_breakouts(stocks, qualified)
+        assert stocks[0]['tags'] == ['週線突破']
+        assert stocks[1]['tags'] == ['盤整突破']
+
+
+class TestTimeframeBootstraps:
+
+    def states(self):
+        fresh = PeriodState('W')
+        fresh.last_date = '2099-01-01'
+        return {'2330': fresh, '2317': None}
+
+    def test_bulk_ingest_waits_for_the_backfill(self):
+        from scripts import update_daily
+
+        window_start = update_daily.get_history_start_date('W')
+        with patch.object(update_daily, 'bulk_ingest_store', return_value=MagicMock()), \
+             patch.object(update_daily, 'get_ingested_from', return_value='2099-01-01'):
+            advance, postponed = update_daily.plan_timeframe_bootstraps(['2330', '2317', '2454'], self.states(), 'W')
+        assert advance == ['2330']
+        assert postponed == ['2317', '2454']
+
+        with patch.object(update_daily, 'bulk_ingest_store', return_value=MagicMock()), \
+             patch.object(update_daily, 'get_ingested_from', return_value=window_start):
+            advance, postponed = update_daily.plan_timeframe_bootstraps(['2330', '2317'], self.states(), 'W')
+        assert advance == ['2330', '2317']
+        assert postponed == []
+
+    def test_quota_provider_bootstraps_within_the_budget(self):
+        from scripts import update_daily
+
+        limiter = MagicMock()
+        limiter.budget.return_value = 1
+        with patch.object(update_daily, 'bulk_ingest_store', return_value=None), \
+             patch.object(update_daily, 'get_quota_provider', return_value='finmind'), \
+             patch.object(update_daily, 'get_rate_limiter', return_value=limiter), \
+             patch.object(update_daily, 'estimate_request_cost', return_value=1):
+            advance, postponed = update_daily.plan_timeframe_bootstraps(['2330', '2317', '2454'], self.states(), 'M')
+
+        limiter.budget.assert_called_once_with(0)
+        assert advance == ['2330', '2317']
+        assert postponed == ['2454']
@@ -0,0 +1,144 @@
+"""
+Unit tests for the token-bucket rate limiter (rate_limiter.py) and quota-based scan batching
+"""
+import json
+import pytest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, '.')
+import rate_limiter
+from rate_limiter import TokenBucket, get_rate_limiter, provider_quota, save_rate_limit_state
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiters(monkeypatch):
+    monkeypatch.delenv('RATE_LIMIT_STATE_FILE', raising=False)
+    rate_limiter.reset_rate_limiters()
+    yield
+    rate_limiter.reset_rate_limiters()
+
+
+class TestTokenBucket:
+
+    def test_burst_then_paced(self, clock):
+        bucket = TokenBucket('twse', rate=2.0, capacity=3, clock=clock, sleep=clock.sleep)
+
+        for _ in range(3):
+            assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+
+        # The fourth request waits half a second for one token
+        assert bucket.acquire()
+        assert clock.now == pytest.approx(1000.5)
+
+    def test_refill_is_capped_at_capacity(self, clock):
+        bucket = TokenBucket('twse', rate=1.0, capacity=5, tokens=0, clock=clock, sleep=clock.sleep)
+        clock.now += 100
+        assert bucket.available() == 5
+
+    def test_acquire_timeout(self, clock):
+        bucket = TokenBucket('finmind', rate=600 / 3600, capacity=600, tokens=0, clock=clock, sleep=clock.sleep)
+
+        assert not bucket.acquire(timeout=1)
+        assert clock.now == 1000.0
+        assert bucket.acquire(timeout=6)
+
+    def test_budget_includes_refill_within_wait(self, clock):
+        bucket = TokenBucket('finmind', rate=600 / 3600, capacity=600, tokens=10, clock=clock, sleep=clock.sleep)
+        assert bucket.budget(0) == 10
+        assert bucket.budget(600) == 110
+
+
+class TestProviderQuota:
+
+    def test_finmind_quota_depends_on_token(self, monkeypatch):
+        monkeypatch.delenv('FINMIND_API_TOKEN', raising=False)
+        monkeypatch.delenv('RATE_LIMIT_FINMIND_PER_HOUR', raising=False)
+        assert provider_quota('finmind') == (600, 3600, 600)
+
+        monkeypatch.setenv('FINMIND_API_TOKEN', 'dummy')
+        assert provider_quota('finmind') == (1200, 3600, 1200)
+
+    def test_exchange_quota_from_env(self, monkeypatch):
+        monkeypatch.setenv('RATE_LIMIT_TWSE_PER_MINUTE', '60')
+        assert provider_quota('twse') == (60, 60, 2)
+
+    def test_unknown_provider(self):
+        with pytest.raises(ValueError):
+            provider_quota('unknown')
+
+
+class TestPersistence:
+
+    def test_state_survives_restart(self, monkeypatch, tmp_path):
+        state_file = tmp_path / 'state' / 'rate_limit.json'
+        monkeypatch.setenv('RATE_LIMIT_STATE_FILE', str(state_file))
+        monkeypatch.delenv('FINMIND_API_TOKEN', raising=False)
+        monkeypatch.delenv('RATE_LIMIT_FINMIND_PER_HOUR', raising=False)
+
+        limiter = get_rate_limiter('finmind')
+        for _ in range(100):
+            assert limiter.try_acquire()
+        save_rate_limit_state()
+
+        saved = json.loads(state_file.read_text())
+        assert saved['finmind']['tokens'] == pytest.approx(500, abs=1)
+
+        # A new process restores the spent budget
+        rate_limiter.reset_rate_limiters()
+        assert get_rate_limiter('finmind').available() == pytest.approx(500, abs=1)
+
+    def test_registry_returns_shared_instance(self):
+        assert get_rate_limiter('twse') is get_rate_limiter('twse')
+
+
+class TestPlanScanBatch:
+
+    def test_pending_first_then_by_rank(self, clock, tmp_path):
+        from scripts import update_daily
+
+        pending_file = tmp_path / 'scan_pending.json'
+        pending_file.write_text(json.dumps({'pending': ['D', 'GONE']}))
+        bucket = TokenBucket('finmind', rate=600 / 3600, capacity=600, tokens=2, clock=clock, sleep=clock.sleep)
+
+        with patch.object(update_daily, 'SCAN_PENDING_FILE', pending_file), \
+             patch.object(update_daily, 'load_market_cap_ranks', return_value={'C': 1, 'A': 2}), \
+             patch.object(update_daily, 'estimate_request_cost', return_value=1), \
+             patch.object(update_daily, 'get_history_sessions', return_value=75):
+            batch, deferred = update_daily.plan_scan_batch(['A', 'B', 'C', 'D'], bucket, max_wait=6)
+
+        # 2 tokens now + 1 refilled within 6 seconds
+        assert batch == ['D', 'C', 'A']
+        assert deferred == ['B']
+
+    def test_covered_stocks_cost_nothing(self, clock, tmp_path):
+        from scripts import update_daily
+
+        bucket = TokenBucket('finmind', rate=600 / 3600, capacity=600, tokens=1, clock=clock, sleep=clock.sleep)
+        costs = {'A': 1, 'B': 1, 'C': 0}
+
+        with patch.object(update_daily, 'SCAN_PENDING_FILE', tmp_path / 'missing.json'), \
+             patch.object(update_daily, 'load_market_cap_ranks', return_value={}), \
+             patch.object(update_daily, 'estimate_request_cost', side_effect=lambda code, s, e: costs[code]), \
+             patch.object(update_daily, 'get_history_sessions', return_value=75):
+            batch, deferred = update_daily.plan_scan_batch(['A', 'B', 'C'], bucket, max_wait=0)
+
+        assert batch == ['A', 'C']
+        assert deferred == ['B']
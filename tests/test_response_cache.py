@@ -0,0 +1,202 @@
+"""
+Unit tests for the /api/stock response cache (response_cache.py) and its use in api/stock.py
+"""
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from http.server import HTTPServer
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import sys
+sys.path.insert(0, '.')
+from bar_store import TW_TZ
+import response_cache
+from response_cache import ResponseCache, entry_lifetime, next_settle_time
+from trading_calendar import TradingCalendar
+from api import stock as stock_api
+
+
+def tw(*args):
+    return datetime(*args, tzinfo=TW_TZ)
+
+
+def payload(date, close=100.0):
+    return {'ticker': '2330', 'currentPrice': close, 'ohlc': [{'date': date, 'close': close}]}
+
+
+class FakeClock:
+    def __init__(self, now: datetime):
+        self.now = now.timestamp()
+
+    def __call__(self):
+        return self.now
+
+
+class TestSessionExpiry:
+
+    def test_next_settle_skips_weekend(self):
+        assert next_settle_time(tw(2024, 3, 4, 10, 0)) == tw(2024, 3, 4, 14, 30)   # Monday morning
+        assert next_settle_time(tw(2024, 3, 4, 15, 0)) == tw(2024, 3, 5, 14, 30)
+        assert next_settle_time(tw(2024, 3, 8, 18, 0)) == tw(2024, 3, 11, 14, 30)  # Friday evening
+
+    def test_eod_entry_lives_until_next_settle(self):
+        # Monday evening, Monday bar settled: valid until Tuesday 14:30
+        seconds, kind = entry_lifetime('2024-03-04', tw(2024, 3, 4, 20, 0), 60)
+        assert kind == 'eod'
+        assert seconds == pytest.approx(18.5 * 3600)
+
+        # Saturday, Friday bar is the last session: valid until Monday 14:30
+        seconds, kind = entry_lifetime('2024-03-08', tw(2024, 3, 9, 12, 0), 60)
+        assert kind == 'eod'
+        assert seconds == pytest.approx((48 + 2.5) * 3600)
+
+    def test_intraday_and_behind_use_short_ttl(self):
+        assert entry_lifetime('2024-03-05', tw(2024, 3, 5, 10, 0), 60) == (60, 'intraday')
+        # After settle but upstream still serves Monday
+        assert entry_lifetime('2024-03-04', tw(2024, 3, 5, 15, 0), 60) == (60, 'behind')
+        assert entry_lifetime(None, tw(2024, 3, 5, 15, 0), 60) == (60, 'behind')
+
+
+class TestHolidaySchedule:
+
+    # 2026 is not built in: the request path fetches its schedule
+    SCHEDULE_2026 = {'2026-04-03': '兒童節', '2026-04-06': '民族掃墓節'}
+
+    @pytest.fixture
+    def fetch(self):
+        fetch = MagicMock(return_value=dict(self.SCHEDULE_2026))
+        with patch.object(response_cache, 'get_trading_calendar', return_value=TradingCalendar()), \
+             patch.object(response_cache, '_schedule_failures', {}), \
+             patch.object(response_cache, 'fetch_twse_holidays', fetch):
+            yield fetch
+
+    def test_holiday_entry_lives_until_the_next_session(self, fetch):
+        # Friday 2026-04-03 is a holiday: Thursday's bar is the last session
+        seconds, kind = entry_lifetime('2026-04-02', tw(2026, 4, 3, 20, 0), 60)
+        assert kind == 'eod'
+        assert next_settle_time(tw(2026, 4, 3, 20, 0)) == tw(2026, 4, 7, 14, 30)
+        assert seconds == pytest.approx((3 * 24 + 18.5) * 3600)
+        fetch.assert_called_once_with(2026)
+
+    def test_failed_download_is_retried_later(self, fetch):
+        fetch.return_value = None
+        assert entry_lifetime('2026-04-02', tw(2026, 4, 3, 20, 0), 60) == (60, 'behind')
+        entry_lifetime('2026-04-02', tw(2026, 4, 3, 20, 0), 60)
+        assert fetch.call_count == 1
+
+        fetch.return_value = dict(self.SCHEDULE_2026)
+        with patch.object(response_cache.time, 'monotonic', return_value=time.monotonic() + 3601):
+            assert entry_lifetime('2026-04-02', tw(2026, 4, 3, 20, 0), 60)[1] == 'eod'
+        assert fetch.call_count == 2
+
+
+class TestResponseCache:
+
+    def test_hit_until_next_settle(self):
+        clock = FakeClock(tw(2024, 3, 4, 20, 0))
+        cache = ResponseCache(clock=clock)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return payload('2024-03-04')
+
+        assert cache.get_or_compute('2330', compute)[1] is False
+        clock.now = tw(2024, 3, 5, 14, 29).timestamp()
+        entry, hit = cache.get_or_compute('2330', compute)
+        assert hit is True
+        assert entry.headers()['Cache-Control'].startswith('public, max-age=60, s-maxage=60')
+
+        clock.now = tw(2024, 3, 5, 14, 30).timestamp()
+        assert cache.get_or_compute('2330', compute)[1] is False
+        assert len(calls) == 2
+
+    def test_intraday_entry_expires_after_ttl(self):
+        clock = FakeClock(tw(2024, 3, 5, 10, 0))
+        cache = ResponseCache(intraday_ttl=30, clock=clock)
+        cache.put('2330', payload('2024-03-05'))
+
+        clock.now += 29
+        assert cache.get('2330') is not None
+        clock.now += 1
+        assert cache.get('2330') is None
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_entries=2, clock=FakeClock(tw(2024, 3, 4, 20, 0)))
+        cache.put('2330', payload('2024-03-04'))
+        cache.put('2317', payload('2024-03-04'))
+        cache.get('2330')
+        cache.put('2454', payload('2024-03-04'))
+
+        assert cache.get('2317') is None
+        assert cache.get('2330') is not None
+        assert len(cache) == 2
+
+    def test_not_found_is_not_cached(self):
+        cache = ResponseCache(clock=FakeClock(tw(2024, 3, 4, 20, 0)))
+        assert cache.get_or_compute('0000', lambda: None) == (None, False)
+        assert len(cache) == 0
+
+    def test_concurrent_misses_compute_once(self):
+        cache = ResponseCache(clock=FakeClock(tw(2024, 3, 4, 20, 0)))
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return payload('2024-03-04')
+
+        threads = [threading.Thread(target=cache.get_or_compute, args=('2330', compute)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+
+    def test_etag_matching(self):
+        cache = ResponseCache(clock=FakeClock(tw(2024, 3, 4, 20, 0)))
+        entry = cache.put('2330', payload('2024-03-04'))
+        other = cache.put('2317', payload('2024-03-04', close=101.0))
+
+        assert entry.etag != other.etag
+        assert entry.matches(entry.etag)
+        assert entry.matches(f'"stale", W/{entry.etag}')
+        assert entry.matches('*')
+        assert not entry.matches(other.etag)
+        assert not entry.matches(None)
+
+
+class TestStockEndpoint:
+
+    @pytest.fixture
+    def server(self):
+        server = HTTPServer(('127.0.0.1', 0), stock_api.handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+
+    def test_second_request_is_cached_and_revalidates(self, server):
+        cache = ResponseCache(clock=FakeClock(tw(2024, 3, 4, 20, 0)))
+        with patch.object(stock_api, '_response_cache', cache), \
+             patch.object(stock_api, 'build_stock_payload', return_value=payload('2024-03-04')) as build:
+            first = urllib.request.urlopen(f"{server}/api/stock?ticker=2330.TW")
+            second = urllib.request.urlopen(f"{server}/api/stock?ticker=2330")
+            etag = second.headers['ETag']
+
+            with pytest.raises(urllib.error.HTTPError) as not_modified:
+                urllib.request.urlopen(urllib.request.Request(
+                    f"{server}/api/stock?ticker=2330", headers={'If-None-Match': etag}))
+
+        assert build.call_count == 1
+        assert (first.headers['X-Cache'], second.headers['X-Cache']) == ('MISS', 'HIT')
+        assert first.read() == second.read()
+        assert 'no-store' not in second.headers['Cache-Control']
+        assert not_modified.value.code == 304
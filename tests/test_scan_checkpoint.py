@@ -0,0 +1,100 @@
+"""
+Unit tests for the resumable scan checkpoint (scripts/scan_checkpoint.py)
+"""
+import pytest
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, '.')
+from scripts.scan_checkpoint import ScanCheckpoint, prune_checkpoints
+from scripts import update_daily
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return ScanCheckpoint(tmp_path / 'checkpoints', '2024-03-05')
+
+
+class TestScanCheckpoint:
+
+    def test_results_and_failures_round_trip(self, checkpoint):
+        checkpoint.record_result('2330', {'ticker': '2330'}, 3.2)
+        checkpoint.record_result('2317', None, -1.0)
+        checkpoint.record_failure('2454', 'timeout')
+
+        completed, failures = checkpoint.load()
+        assert completed == {'2330': ({'ticker': '2330'}, 3.2), '2317': (None, -1.0)}
+        assert failures == {'2454': 'timeout'}
+
+    def test_retried_success_clears_failure(self, checkpoint):
+        checkpoint.record_failure('2454', 'timeout')
+        checkpoint.record_result('2454', None, 0.5)
+
+        completed, failures = checkpoint.load()
+        assert '2454' in completed
+        assert failures == {}
+
+    def test_remaining_keeps_failed_and_missing(self, checkpoint):
+        checkpoint.record_result('2330', None, 1.0)
+        checkpoint.record_failure('2454', 'timeout')
+
+        assert checkpoint.remaining(['2330', '2454', '2317']) == ['2454', '2317']
+
+    def test_truncated_last_line_is_ignored(self, checkpoint):
+        checkpoint.record_result('2330', None, 1.0)
+        with open(checkpoint.path / 'results.jsonl', 'a', encoding='utf-8') as f:
+            f.write('{"code": "2317", "da')
+
+        completed, _ = checkpoint.load()
+        assert list(completed) == ['2330']
+
+    def test_reset(self, checkpoint):
+        checkpoint.record_result('2330', None, 1.0)
+        assert checkpoint.exists()
+
+        checkpoint.reset()
+        assert not checkpoint.exists()
+        assert checkpoint.load() == ({}, {})
+
+    def test_prune_keeps_latest_days(self, tmp_path):
+        root = tmp_path / 'checkpoints'
+        for day in ('2024-03-01', '2024-03-04', '2024-03-05'):
+            ScanCheckpoint(root, day).record_result('2330', None, 1.0)
+
+        prune_checkpoints(root, keep=2)
+        assert sorted(p.name for p in root.iterdir()) == ['2024-03-04', '2024-03-05']
+
+
+class TestErrorsAreDistinguished:
+
+    def test_raise_errors_on_missing_data(self):
+        with patch.object(update_daily, 'fetch_stock_history', return_value=None):
+            assert update_daily.check_livermore_criteria('2330') == (None, None)
+            with pytest.raises(update_daily.StockDataUnavailable):
+                update_daily.check_livermore_criteria('2330', raise_errors=True)
+
+    def test_per_stock_scan_records_failures(self, checkpoint):
+        def fake_check(code, market_alerts, allowed, raise_errors=False, lookback_days=None):
+            if code == 'BAD':
+                raise ConnectionError("upstream down")
+            return None, 1.5
+
+        with patch.object(update_daily, 'check_livermore_criteria', side_effect=fake_check):
+            update_daily.scan_per_stock(['2330', 'BAD'], {}, set(), checkpoint)
+
+        completed, failures = checkpoint.load()
+        assert completed == {'2330': (None, 1.5)}
+        assert failures == {'BAD': 'upstream down'}
+
+    def test_merge_combines_previous_and_resumed_results(self, checkpoint):
+        checkpoint.record_result('2330', {'ticker': '2330'}, 5.0)
+        checkpoint.record_result('2317', None, -2.0)
+        checkpoint.record_failure('2454', 'timeout')
+        # The resumed run retries 2454
+        checkpoint.record_result('2454', {'ticker': '2454'}, 0.0)
+
+        results, market_stats, failures = update_daily.merge_checkpoint_results(checkpoint, ['2330', '2317', '2454'])
+
+        assert sorted(r['ticker'] for r in results) == ['2330', '2454']
+        assert market_stats == {'up': 1, 'down': 1, 'flat': 1, 'total_scanned': 3}
+        assert failures == {}
@@ -0,0 +1,105 @@
+"""
+Unit tests for scan run metrics (scan_metrics.py) and their use in scripts/update_daily.py
+"""
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+
+import sys
+sys.path.insert(0, '.')
+import scan_metrics
+from scan_metrics import ScanMetrics, record_http_response
+from scripts import update_daily
+from scripts.scan_checkpoint import ScanCheckpoint
+from tests.test_scan_pipeline import HISTORIES, fake_fetch
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    metrics = ScanMetrics()
+    monkeypatch.setattr(scan_metrics, '_metrics', metrics)
+    return metrics
+
+
+class TestScanMetrics:
+
+    def test_span_aggregation(self):
+        clock = FakeClock()
+        metrics = ScanMetrics(clock=clock)
+        for seconds in [0.01] * 99 + [1.0]:
+            with metrics.span('fetch'):
+                clock.now += seconds
+
+        report = metrics.report()['spans']['fetch']
+        assert report['count'] == 100
+        assert report['total_s'] == pytest.approx(1.99)
+        assert report['p50_ms'] == pytest.approx(10)
+        assert report['max_ms'] == pytest.approx(1000)
+
+    def test_span_recorded_when_block_raises(self):
+        metrics = ScanMetrics()
+        with pytest.raises(ValueError):
+            with metrics.span('broken'):
+                raise ValueError()
+        assert metrics.report()['spans']['broken']['count'] == 1
+
+    def test_merge_snapshot(self):
+        parent, worker = ScanMetrics(), ScanMetrics()
+        parent.count('http.requests', 2)
+        worker.count('http.requests', 3)
+        worker.record('indicators', 0.5)
+
+        parent.merge(worker.snapshot())
+        assert parent.counter('http.requests') == 5
+        assert parent.report()['spans']['indicators']['count'] == 1
+
+    def test_write_report(self, tmp_path):
+        metrics = ScanMetrics()
+        metrics.count('bar_store.hits')
+        path = tmp_path / 'out' / 'scan_metrics.json'
+
+        metrics.write_report(path, date='2024-03-05')
+        saved = json.loads(path.read_text())
+        assert saved['date'] == '2024-03-05'
+        assert saved['counters'] == {'bar_store.hits': 1}
+
+    def test_http_hook_counts_bytes_errors_and_retries(self, fresh_metrics):
+        response = MagicMock(url='https://www.twse.com.tw/exchangeReport/STOCK_DAY', content=b'x' * 10, status_code=503)
+        response.raw.retries.history = ('first', 'second')
+
+        record_http_response(response)
+        assert fresh_metrics.snapshot()['counters'] == {
+            'http.requests': 1,
+            'http.requests.www.twse.com.tw': 1,
+            'http.bytes': 10,
+            'http.errors': 1,
+            'http.retries': 2
+        }
+
+
+class TestScanInstrumentation:
+
+    def test_pipeline_merges_worker_spans(self, fresh_metrics, tmp_path):
+        with patch.object(update_daily, 'fetch_stock_history', side_effect=fake_fetch), \
+             patch.object(update_daily, 'COMPUTE_BATCH_SIZE', 4):
+            update_daily.scan_pipeline(list(HISTORIES), {}, set(), ScanCheckpoint(tmp_path, '2024-04-01'), compute_workers=2)
+
+        assert fresh_metrics.report()['spans']['indicators']['count'] == len(HISTORIES)
+
+    def test_write_scan_metrics_keeps_daily_copy(self, fresh_metrics, tmp_path):
+        fresh_metrics.count('http.requests', 7)
+        with patch.object(update_daily, 'OUTPUT_DIR', tmp_path):
+            update_daily.write_scan_metrics('2024-03-05', {'engine': 'incremental'})
+
+        latest = json.loads((tmp_path / 'scan_metrics.json').read_text())
+        daily = json.loads((tmp_path / 'metrics' / '2024-03-05.json').read_text())
+        assert latest['run'] == daily['run'] == {'engine': 'incremental'}
+        assert latest['counters']['http.requests'] == 7
@@ -0,0 +1,89 @@
+"""
+Unit tests for the compact scan output format (scripts/scan_output.py)
+"""
+import gzip
+import json
+
+import sys
+sys.path.insert(0, '.')
+from scripts.scan_output import (
+    FORMAT_VERSION, compact_scan_output, expand_scan_output, read_scan_output, write_scan_output
+)
+
+
+def make_stock(ticker, days=30):
+    return {
+        "ticker": ticker,
+        "name": f"股票{ticker}",
+        "currentPrice": 100.0,
+        "consecutiveRed": 3,
+        "signal": {"type": "breakout", "text": "🔥 股價創 20 日新高", "priority": 93},
+        "alert": None,
+        "ohlc": [
+            {"date": f"2024-02-{day + 1:02d}", "open": 99.5 + day, "high": 101.0 + day, "low": 98.0 + day,
+             "close": 100.0 + day, "volume": 1200 + day, "volMa5": 1100, "k": 55.1, "d": 50.3,
+             "ma5": 99.1 + day, "ma10": 98.2 + day, "ma20": None if day < 19 else 97.0 + day}
+            for day in range(days)
+        ]
+    }
+
+
+def make_output():
+    stocks = [make_stock(str(2000 + i)) for i in range(30)]
+    removed = [make_stock(str(1000 + i)) for i in range(5)]
+    return {
+        "date": "2024-03-04",
+        "stocks": stocks,
+        "marketStats": {"up": 10, "down": 5, "flat": 1, "total_scanned": 16},
+        "summary": {"total": 30, "counts": {"new": 10, "continued": 20, "removed": 5}},
+        "changes": {"new": stocks[:10], "continued": stocks[10:], "removed": removed}
+    }
+
+
+class TestCompactFormat:
+
+    def test_round_trip(self):
+        output = make_output()
+        compact = compact_scan_output(output)
+
+        assert compact['format'] == FORMAT_VERSION
+        assert compact['stocks'][0]['ohlc']['close'][:2] == [100.0, 101.0]
+        assert compact['changes']['new'] == [s['ticker'] for s in output['stocks'][:10]]
+        assert len(compact['changes']['removedStocks']) == 5
+        assert expand_scan_output(compact) == output
+
+    def test_legacy_passes_through(self):
+        output = make_output()
+        assert expand_scan_output(output) is output
+        assert compact_scan_output(compact_scan_output(output)) == compact_scan_output(output)
+        assert expand_scan_output(None) is None
+
+    def test_several_times_smaller(self):
+        output = make_output()
+        legacy = json.dumps(output, ensure_ascii=False, indent=2).encode('utf-8')
+        compact = json.dumps(compact_scan_output(output), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        assert len(compact) * 3 < len(legacy)
+
+
+class TestWriteScanOutput:
+
+    def test_write_and_read(self, tmp_path):
+        path = tmp_path / 'daily_scan_results.json'
+        output = make_output()
+        write_scan_output(path, output, precompress=['gz'])
+
+        assert read_scan_output(path) == output
+        assert gzip.decompress((tmp_path / 'daily_scan_results.json.gz').read_bytes()) == path.read_bytes()
+        assert b'\n' not in path.read_bytes()
+
+    def test_reads_legacy_file(self, tmp_path):
+        path = tmp_path / 'legacy.json'
+        output = make_output()
+        path.write_text(json.dumps(output, ensure_ascii=False, indent=2), encoding='utf-8')
+        assert read_scan_output(path) == output
+
+    def test_no_precompress_by_default(self, tmp_path, monkeypatch):
+        monkeypatch.delenv('SCAN_OUTPUT_PRECOMPRESS', raising=False)
+        path = tmp_path / 'daily_scan_results.json'
+        write_scan_output(path, make_output())
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['daily_scan_results.json']
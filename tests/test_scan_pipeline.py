@@ -0,0 +1,132 @@
+"""
+Unit tests for the two-stage fetch / compute scan pipeline (scan_pipeline in scripts/update_daily.py)
+"""
+import concurrent.futures
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock, patch
+
+import sys
+sys.path.insert(0, '.')
+from scripts import update_daily
+from scripts.scan_checkpoint import ScanCheckpoint
+
+
+def make_df(seed, breakout=False, n=80):
+    rng = np.random.default_rng(seed)
+    close = np.round(100 * np.cumprod(1 + rng.normal(0, 0.02, n)), 2)
+    open_ = np.round(close * (1 + rng.normal(0, 0.01, n)), 2)
+    high = np.maximum(close, open_) + 0.5
+    low = np.minimum(close, open_) - 0.5
+    if breakout:
+        peak = high[:-2].max()
+        open_[-2:], close[-2:] = [peak, peak + 1], [peak + 1, peak + 3]
+        high[-2:], low[-2:] = [peak + 1.5, peak + 3.5], [peak - 0.5, peak + 0.5]
+    return pd.DataFrame({
+        'date': pd.bdate_range('2024-01-01', periods=n),
+        'stock_id': str(seed),
+        'Trading_Volume': rng.integers(500, 2000, n),
+        'open': open_, 'max': high, 'min': low, 'close': close,
+    })
+
+
+HISTORIES = {f'{1000 + i}': make_df(i, breakout=(i % 3 == 0)) for i in range(30)}
+
+
+def fake_fetch(code):
+    if code == 'DOWN':
+        raise ConnectionError("upstream down")
+    return HISTORIES.get(code)
+
+
+@pytest.fixture
+def targets():
+    return list(HISTORIES) + ['DOWN', 'EMPTY']
+
+
+class TestScanPipeline:
+
+    @pytest.mark.parametrize('compute_workers', [1, 2])
+    def test_matches_per_stock_scan(self, targets, tmp_path, compute_workers):
+        checkpoint = ScanCheckpoint(tmp_path, '2024-04-01')
+
+        with patch.object(update_daily, 'fetch_stock_history', side_effect=fake_fetch), \
+             patch.object(update_daily, 'COMPUTE_BATCH_SIZE', 4), \
+             patch.object(update_daily, 'PIPELINE_QUEUE_SIZE', 3):
+            results, market_stats = update_daily.scan_pipeline(
+                targets, {}, set(), checkpoint, compute_workers=compute_workers
+            )
+            expected_results, expected_stats = update_daily.scan_per_stock(targets, {}, set())
+
+        assert market_stats == expected_stats
+        assert sorted(r['ticker'] for r in results) == sorted(r['ticker'] for r in expected_results)
+        assert len(results) == 10
+
+        completed, failures = checkpoint.load()
+        assert len(completed) == len(HISTORIES)
+        assert failures == {'DOWN': 'upstream down', 'EMPTY': 'No price data'}
+
+
+def run_briefly(target, timeout=20):
+    """Run target on a daemon thread; fail instead of hanging the suite"""
+    outcome = {}
+
+    def run():
+        try:
+            outcome['value'] = target()
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "scan_pipeline hung"
+    return outcome
+
+
+class TestPipelineFailures:
+
+    @pytest.fixture(autouse=True)
+    def small_queue(self):
+        with patch.object(update_daily, 'fetch_stock_history', side_effect=fake_fetch), \
+             patch.object(update_daily, 'COMPUTE_BATCH_SIZE', 4), \
+             patch.object(update_daily, 'PIPELINE_QUEUE_SIZE', 2):
+            yield
+
+    def test_compute_error_fails_the_batch(self, tmp_path):
+        checkpoint = ScanCheckpoint(tmp_path, '2024-04-01')
+        with patch.object(update_daily, '_evaluate_batch', side_effect=MemoryError('oom')):
+            outcome = run_briefly(lambda: update_daily.scan_pipeline(
+                list(HISTORIES), {}, set(), checkpoint, compute_workers=1))
+
+        assert outcome['value'][0] == []
+        completed, failures = checkpoint.load()
+        assert not completed
+        assert set(failures) == set(HISTORIES)
+        assert all(error == 'Compute error: oom' for error in failures.values())
+
+    def test_broken_process_pool_fails_the_batch(self, tmp_path):
+        checkpoint = ScanCheckpoint(tmp_path, '2024-04-01')
+        pool = MagicMock()
+        warm = concurrent.futures.Future()
+        warm.set_result([])
+        pool.submit.side_effect = [warm] + [BrokenProcessPool('worker died')] * len(HISTORIES)
+        with patch.object(update_daily.concurrent.futures, 'ProcessPoolExecutor', return_value=pool):
+            outcome = run_briefly(lambda: update_daily.scan_pipeline(
+                list(HISTORIES), {}, set(), checkpoint, compute_workers=2))
+
+        assert outcome['value'][0] == []
+        assert len(checkpoint.load()[1]) == len(HISTORIES)
+        pool.shutdown.assert_called_once()
+
+    def test_unexpected_error_is_raised_without_hanging(self, tmp_path):
+        checkpoint = ScanCheckpoint(tmp_path, '2024-04-01')
+        with patch.object(update_daily, 'checkpoint_result', side_effect=OSError('disk full')):
+            outcome = run_briefly(lambda: update_daily.scan_pipeline(
+                list(HISTORIES), {}, set(), checkpoint, compute_workers=1))
+
+        assert isinstance(outcome['error'], OSError)
@@ -0,0 +1,84 @@
+"""
+Unit tests for the streaming scan (stream_scan / format_scan_event in scripts/update_daily.py)
+"""
+import json
+import threading
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, '.')
+from scripts import update_daily
+from tests.test_scan_pipeline import HISTORIES, fake_fetch
+
+
+TARGETS = list(HISTORIES) + ['DOWN']
+
+
+def run_stream(targets=TARGETS, **kwargs):
+    with patch.object(update_daily, 'fetch_stock_history', side_effect=fake_fetch):
+        return list(update_daily.stream_scan(targets, {}, set(), **kwargs))
+
+
+class TestStreamScan:
+
+    def test_matches_per_stock_scan(self):
+        events = run_stream()
+        with patch.object(update_daily, 'fetch_stock_history', side_effect=fake_fetch):
+            expected_results, expected_stats = update_daily.scan_per_stock(TARGETS, {}, set())
+
+        assert events[0] == {'type': 'start', 'total': len(TARGETS), 'lookbackDays': update_daily.LOOKBACK_DAYS}
+        done = events[-1]
+        assert done['type'] == 'done'
+        assert done['marketStats'] == expected_stats
+        assert done['failed'] == ['DOWN']
+
+        stocks = [event['stock']['ticker'] for event in events if event['type'] == 'stock']
+        assert sorted(stocks) == sorted(r['ticker'] for r in expected_results)
+        assert done['qualified'] == len(stocks)
+
+    def test_running_counters_grow(self):
+        events = run_stream(progress_every=5)
+        running = [event for event in events if event['type'] in ('stock', 'progress')]
+
+        assert [event['done'] for event in running] == sorted(event['done'] for event in running)
+        scanned = [event['marketStats']['total_scanned'] for event in running]
+        assert scanned == sorted(scanned)
+        assert any(event['type'] == 'progress' for event in running)
+
+    def test_custom_lookback(self):
+        events = run_stream(lookback_days=10)
+        assert events[0]['lookbackDays'] == 10
+        texts = [event['stock']['signal']['text'] for event in events if event['type'] == 'stock']
+        assert texts and all('10 日新高' in text or '箱型' in text for text in texts)
+
+    def test_closing_the_stream_cancels_pending_stocks(self):
+        started = []
+        lock = threading.Lock()
+
+        def slow_fetch(code):
+            with lock:
+                started.append(code)
+            return fake_fetch(code)
+
+        with patch.object(update_daily, 'fetch_stock_history', side_effect=slow_fetch), \
+             patch.object(update_daily, 'MAX_WORKERS', 1):
+            stream = update_daily.stream_scan(TARGETS * 10, {}, set(), progress_every=1)
+            next(stream)
+            next(stream)
+            stream.close()
+
+        assert len(started) < len(TARGETS * 10)
+
+
+class TestFormatScanEvent:
+
+    def test_ndjson_line(self):
+        line = update_daily.format_scan_event({'type': 'progress', 'done': 1})
+        assert line.endswith('\n') and line.count('\n') == 1
+        assert json.loads(line) == {'type': 'progress', 'done': 1}
+
+    def test_sse_message(self):
+        message = update_daily.format_scan_event({'type': 'stock', 'stock': {'name': '台積電'}}, 'sse')
+        assert message.startswith('event: stock\ndata: ')
+        assert message.endswith('\n\n')
+        assert '台積電' in message
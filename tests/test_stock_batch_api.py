@@ -0,0 +1,118 @@
+"""
+Unit tests for the batch stock endpoint (api/stocks.py) and the batch path of the response cache
+"""
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import HTTPServer
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import sys
+sys.path.insert(0, '.')
+from api import stock as stock_api
+from api import stocks as stocks_api
+from response_cache import ResponseCache
+from tests.test_response_cache import FakeClock, payload, tw
+
+
+def bars(count=30, start_close=100.0):
+    return [
+        {'date': f'2024-02-{day:02d}', 'open': start_close + day - 1, 'high': start_close + day + 1,
+         'low': start_close + day - 2, 'close': start_close + day, 'volume': 5000}
+        for day in range(1, count + 1)
+    ]
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(clock=FakeClock(tw(2024, 3, 4, 20, 0)))
+
+
+class TestBatchCache:
+
+    def test_misses_computed_in_one_call(self, cache):
+        cache.put('2330', payload('2024-03-04'))
+        compute_many = MagicMock(return_value={'2317': payload('2024-03-04', 101.0), '0000': None})
+
+        entries = cache.get_or_compute_many(['2330', '2317', '0000'], compute_many)
+        compute_many.assert_called_once_with(['2317', '0000'])
+        assert entries['0000'] is None
+
+        # Second call is served from the cache entirely
+        cache.get_or_compute_many(['2330', '2317'], compute_many)
+        assert compute_many.call_count == 1
+
+    def test_combine_splices_bodies_and_takes_earliest_expiry(self, cache):
+        eod = cache.put('2330', payload('2024-03-04'))
+        behind = cache.put('2317', payload('2024-03-01'))
+
+        batch = cache.combine({'2330': eod, '2317': behind, '0000': None})
+        body = json.loads(batch.body)
+        assert body['stocks']['2330'] == payload('2024-03-04')
+        assert body['missing'] == ['0000']
+        assert batch.expires_at == behind.expires_at
+        assert batch.kind == 'mixed'
+
+
+class TestBuildStockPayloads:
+
+    def test_fetches_all_histories_in_one_call(self):
+        facade = MagicMock()
+        facade.get_stock_prices_many.return_value = {'2330': bars(), '2317': bars(start_close=50.0), '0000': []}
+
+        with patch.object(stock_api, '_stock_facade', facade), \
+             patch.object(stock_api, 'get_stock_name', side_effect=lambda code: f'name-{code}'):
+            payloads = stock_api.build_stock_payloads(['2330', '2317', '0000'])
+
+        assert facade.get_stock_prices_many.call_count == 1
+        facade.get_stock_price.assert_not_called()
+        assert payloads['0000'] is None
+        assert payloads['2330']['name'] == 'name-2330'
+        assert payloads['2317']['currentPrice'] == 80.0
+        assert payloads['2330'] == stock_api.build_stock_payload('2330', stock_api.to_finmind_rows(bars()), 'name-2330')
+
+
+class TestStocksEndpoint:
+
+    @pytest.fixture
+    def server(self):
+        server = HTTPServer(('127.0.0.1', 0), stocks_api.handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+
+    def test_parse_tickers(self):
+        query = {'tickers': ['2330.TW, 2317', '2330'], 'ticker': ['6488.TWO']}
+        assert stocks_api.parse_tickers(query) == ['2330', '2317', '6488']
+
+    def test_one_round_trip(self, server, cache):
+        built = {'2330': payload('2024-03-04'), '2317': payload('2024-03-04', 101.0), '0000': None}
+        with patch.object(stocks_api, '_response_cache', cache), \
+             patch.object(stocks_api, 'build_stock_payloads', side_effect=lambda codes: {c: built[c] for c in codes}) as build:
+            response = urllib.request.urlopen(f"{server}/api/stocks?tickers=2330,2317,0000")
+            body = json.loads(response.read())
+
+            with pytest.raises(urllib.error.HTTPError) as not_modified:
+                urllib.request.urlopen(urllib.request.Request(
+                    f"{server}/api/stocks?tickers=2330,2317,0000", headers={'If-None-Match': response.headers['ETag']}))
+
+        # Only the ticker without data is looked up again
+        assert [c.args[0] for c in build.call_args_list] == [['2330', '2317', '0000'], ['0000']]
+        assert set(body['stocks']) == {'2330', '2317'}
+        assert body['missing'] == ['0000']
+        assert response.headers['Cache-Control'].startswith('public')
+        assert not_modified.value.code == 304
+
+    def test_rejects_missing_and_too_many(self, server):
+        with pytest.raises(urllib.error.HTTPError) as missing:
+            urllib.request.urlopen(f"{server}/api/stocks")
+        assert missing.value.code == 400
+
+        tickers = ','.join(str(1000 + i) for i in range(stock_api.MAX_BATCH_TICKERS + 1))
+        with pytest.raises(urllib.error.HTTPError) as too_many:
+            urllib.request.urlopen(f"{server}/api/stocks?tickers={tickers}")
+        assert too_many.value.code == 400
@@ -0,0 +1,148 @@
+"""
+Unit tests for the stock metadata registry (stock_registry.py)
+"""
+import json
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import sys
+sys.path.insert(0, '.')
+import stock_registry
+from bar_store import TW_TZ
+from stock_registry import StockRegistry, merge_listing
+
+
+TSMC = {'name': '台積電', 'sector': '半導體業', 'market': '上市', 'type': '股票', 'listed': '1994-09-05'}
+ETF = {'name': '元大台灣50', 'sector': 'ETF', 'market': '上市', 'type': 'ETF', 'listed': '2003-06-30'}
+
+
+def at(day, hour=15):
+    return datetime(2024, 3, day, hour, 0, tzinfo=TW_TZ)
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def counting_source(table):
+    calls = []
+
+    def table_source():
+        calls.append(1)
+        return dict(table)
+    return table_source, calls
+
+
+class TestStockRegistry:
+
+    def test_lookups_build_once_per_day(self):
+        source, calls = counting_source({'2330': TSMC, '0050': ETF})
+        clock = Clock(at(4))
+        registry = StockRegistry(sources=[source], clock=clock)
+
+        assert registry.describe('2330') == ('台積電', '半導體業', '上市')
+        assert registry.name('0050') == '元大台灣50'
+        assert registry.describe('9999') == ('9999', '其他', '上市')
+        assert registry.get('2330')['status'] == 'listed'
+        assert len(calls) == 1
+
+        clock.now = at(5)
+        registry.name('2330')
+        assert len(calls) == 2
+
+    def test_persisted_registry_is_reused_the_same_day(self, tmp_path):
+        path = tmp_path / 'stock_registry.json'
+        source, calls = counting_source({'2330': TSMC})
+        StockRegistry(path, sources=[source], clock=Clock(at(4))).name('2330')
+
+        reloaded = StockRegistry(path, sources=[source], clock=Clock(at(4)))
+        assert reloaded.name('2330') == '台積電'
+        assert len(calls) == 1
+        assert json.loads(path.read_text(encoding='utf-8'))['builtFor'] == '2024-03-04'
+
+    def test_registry_without_sources_only_reads_the_file(self, tmp_path):
+        path = tmp_path / 'stock_registry.json'
+        source, calls = counting_source({'2330': TSMC})
+        StockRegistry(path, sources=[source], clock=Clock(at(4))).name('2330')
+
+        # A later day: nothing to rebuild from, the file is served as is
+        reader = StockRegistry(path, sources=(), clock=Clock(at(8)))
+        with patch.object(stock_registry, 'count') as count:
+            assert reader.name('2330') == '台積電'
+            assert reader.name('9999') == '9999'
+        count.assert_not_called()
+        assert len(calls) == 1
+        assert StockRegistry(tmp_path / 'missing.json', sources=()).name('2330') == '2330'
+
+    def test_falls_back_to_next_source_and_keeps_data_on_failure(self):
+        def broken_source():
+            raise OSError("offline")
+
+        source, _ = counting_source({'2330': TSMC})
+        clock = Clock(at(4))
+        registry = StockRegistry(sources=[broken_source, source], clock=clock)
+        assert registry.name('2330') == '台積電'
+
+        registry.sources = [broken_source]
+        clock.now = at(5)
+        assert registry.name('2330') == '台積電'
+
+    def test_missing_codes_are_marked_delisted(self):
+        previous = merge_listing({}, {'2330': TSMC, '1101': {**TSMC, 'name': '台泥'}}, '2024-03-01')
+        merged = merge_listing(previous, {'2330': TSMC}, '2024-03-04')
+
+        assert merged['1101']['status'] == 'delisted'
+        assert merged['1101']['delisted'] == '2024-03-04'
+        assert merge_listing(merged, {'2330': TSMC}, '2024-03-05')['1101']['delisted'] == '2024-03-04'
+        assert merge_listing(previous, {'2330': TSMC}, '2024-03-04', same_source=False)['1101']['status'] == 'listed'
+
+    def test_twstock_source_skips_warrants(self):
+        codes = {
+            '2330': MagicMock(type='股票', market='上市', group='半導體業', start='1994/09/05'),
+            '030001': MagicMock(type='上市認購(售)權證', market='上市', group='', start='2024/01/02'),
+        }
+        codes['2330'].name = '台積電'
+        with patch.object(stock_registry, 'HAS_TWSTOCK', True), \
+             patch.object(stock_registry, 'twstock', MagicMock(codes=codes), create=True):
+            table = stock_registry.twstock_source()
+
+        assert table == {'2330': TSMC}
+
+
+class TestRegistryLookups:
+
+    def setup_method(self):
+        source, _ = counting_source({'2330': TSMC})
+        self.registry = StockRegistry(sources=[source])
+
+    def test_update_daily_reads_the_registry(self):
+        from scripts import update_daily
+        with patch.object(update_daily, 'get_stock_registry', return_value=self.registry):
+            assert update_daily.get_stock_name('2330') == ('台積電', '半導體業', '上市')
+
+    def test_facade_skips_the_provider_for_known_codes(self):
+        import stock_data_facade
+        facade = stock_data_facade.StockDataFacade()
+        provider = MagicMock()
+        provider.fetch_stock_info.return_value = {'stock_id': '8888', 'stock_name': '新公司'}
+        facade._provider_instance = provider
+
+        with patch.object(stock_data_facade, 'get_stock_registry', return_value=self.registry):
+            assert facade.get_stock_info('2330')['stock_name'] == '台積電'
+            provider.fetch_stock_info.assert_not_called()
+
+            assert facade.get_stock_info('8888')['stock_name'] == '新公司'
+            assert facade.get_stock_info('8888')['stock_name'] == '新公司'
+        assert provider.fetch_stock_info.call_count == 1
+
+    def test_facade_loader_stock_info_table(self):
+        import stock_facade_adapter
+        with patch.object(stock_facade_adapter, 'get_stock_registry', return_value=self.registry):
+            df = stock_facade_adapter.FacadeDataLoader().TaiwanStockInfo()
+
+        assert df.to_dict('records') == [{'stock_id': '2330', 'stock_name': '台積電', 'industry_category': '半導體業',
+                                          'type': 'twse', 'date': '1994-09-05'}]
@@ -0,0 +1,98 @@
+"""
+Unit tests for the TWSE trading calendar (trading_calendar.py)
+"""
+import json
+from unittest.mock import MagicMock, patch
+
+import sys
+sys.path.insert(0, '.')
+import trading_calendar
+from trading_calendar import TradingCalendar, fetch_twse_holidays
+
+
+class TestTradingCalendar:
+
+    def test_weekends_holidays_and_typhoon_days(self):
+        calendar = TradingCalendar()
+        assert calendar.is_trading_day('2024-10-01')
+        assert not calendar.is_trading_day('2024-10-05')   # Saturday
+        assert not calendar.is_trading_day('2024-10-10')   # National Day
+        assert not calendar.is_trading_day('2024-10-02')   # Typhoon Krathon
+        assert calendar.closure_reason('2024-10-31') == '颱風停止交易'
+        assert len(calendar.trading_days('2024-01-01', '2024-12-31')) == 242
+
+    def test_offsets_count_trading_days(self):
+        calendar = TradingCalendar()
+        assert calendar.offset('2024-10-11', -5) == '2024-10-01'
+        assert calendar.offset('2024-10-05', 0) == '2024-10-04'
+        assert calendar.offset('2024-10-04', 1) == '2024-10-07'
+        # Crosses the precomputed range into earlier years
+        assert calendar.offset('2024-01-02', -300) < '2023-01-01'
+
+    def test_previous_and_recent_sessions(self):
+        calendar = TradingCalendar()
+        assert calendar.previous_trading_day('2024-10-07') == '2024-10-04'
+        assert calendar.previous_trading_day('2024-02-15') == '2024-02-05'
+        assert calendar.recent_sessions(3, '2024-10-11') == ['2024-10-11', '2024-10-09', '2024-10-08']
+
+    def test_unscheduled_years_trade_every_weekday(self):
+        calendar = TradingCalendar()
+        assert calendar.is_trading_day('2030-01-01')
+        assert calendar.offset('2030-01-07', -1) == '2030-01-04'
+
+    def test_ensure_year_fetches_once_and_persists(self, tmp_path):
+        path = tmp_path / 'trading_calendar.json'
+        calendar = TradingCalendar(path)
+        assert calendar.is_trading_day('2026-01-01')
+
+        fetch = MagicMock(return_value={'2026-01-01': '中華民國開國紀念日'})
+        assert calendar.ensure_year(2026, fetch=fetch)
+        assert calendar.ensure_year(2026, fetch=fetch)
+        assert fetch.call_count == 1
+        assert not calendar.is_trading_day('2026-01-01')
+
+        reloaded = TradingCalendar(path)
+        assert not reloaded.is_trading_day('2026-01-01')
+        assert reloaded.ensure_year(2026, fetch=MagicMock(side_effect=AssertionError))
+
+    def test_failed_fetch_is_retried(self):
+        calendar = TradingCalendar()
+        assert not calendar.ensure_year(2026, fetch=lambda year: None)
+        assert calendar.ensure_year(2026, fetch=lambda year: {})
+
+    def test_learned_closures_persist(self, tmp_path):
+        path = tmp_path / 'trading_calendar.json'
+        calendar = TradingCalendar(path)
+        assert calendar.offset('2024-10-15', -1) == '2024-10-14'
+
+        calendar.add_closure('2024-10-14', '停止交易')
+        assert calendar.offset('2024-10-15', -1) == '2024-10-11'
+        assert json.loads(path.read_text(encoding='utf-8'))['closures']['2024-10-14'] == '停止交易'
+        assert not TradingCalendar(path).is_trading_day('2024-10-14')
+
+
+class TestFetchTwseHolidays:
+
+    def test_keeps_weekday_closures_only(self):
+        payload = {'stat': 'ok', 'data': [
+            ['2026-01-01', '中華民國開國紀念日', ''],
+            ['2026-01-02', '國曆新年開始交易日', ''],
+            ['2026-01-03', '補假', ''],                 # Saturday
+            ['115/02/16', '農曆除夕', ''],
+        ]}
+        session = MagicMock()
+        session.get.return_value.json.return_value = payload
+
+        with patch('stock_data_facade.get_http_session', return_value=session), \
+             patch.object(trading_calendar, 'get_rate_limiter'):
+            closures = fetch_twse_holidays(2026)
+
+        assert closures == {'2026-01-01': '中華民國開國紀念日', '2026-02-16': '農曆除夕'}
+        assert session.get.call_args.kwargs['params']['queryYear'] == 115
+
+    def test_request_error_returns_none(self):
+        session = MagicMock()
+        session.get.side_effect = Exception("boom")
+        with patch('stock_data_facade.get_http_session', return_value=session), \
+             patch.object(trading_calendar, 'get_rate_limiter'):
+            assert fetch_twse_holidays(2026) is None
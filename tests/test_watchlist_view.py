@@ -0,0 +1,102 @@
+"""
+Unit tests for the selected-stock view and summary grid of the Streamlit watchlist (src/watchlist_view.py)
+"""
+import sys
+from collections import OrderedDict
+from unittest.mock import MagicMock, patch
+
+# Mock external dependencies to allow import without installation
+# (only when missing, so other test modules still get the real packages)
+for _name in ('plotly', 'plotly.graph_objects', 'plotly.subplots'):
+    try:
+        __import__(_name)
+    except ImportError:
+        sys.modules[_name] = MagicMock()
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, '.')
+from src import watchlist_view
+
+
+def bars(seed=0, n=22):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame({'Open': close - 0.5, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': rng.integers(1, 50, n).astype(float)},
+                        index=pd.bdate_range('2024-09-02', periods=n))
+
+
+@pytest.fixture(autouse=True)
+def chart():
+    with patch.object(watchlist_view, '_views', OrderedDict()), \
+         patch.object(watchlist_view, 'create_candlestick_chart', side_effect=lambda **kwargs: object()) as chart:
+        yield chart
+
+
+class TestStockView:
+
+    def test_view_is_reused_for_the_same_last_bar(self, chart):
+        first = watchlist_view.get_stock_view('2330', '台積電', bars())
+        second = watchlist_view.get_stock_view('2330', '台積電', bars())
+
+        assert second is first
+        assert chart.call_count == 1
+        assert set(first) >= {'current_price', 'change_pct', 'k_value', 'd_value', 'kd_status',
+                              'volume_analysis', 'advice', 'figure'}
+
+    def test_intraday_update_rebuilds(self, chart):
+        df = bars()
+        first = watchlist_view.get_stock_view('2330', '台積電', df)
+        df.iloc[-1, df.columns.get_loc('Close')] += 1
+        second = watchlist_view.get_stock_view('2330', '台積電', df)
+
+        assert second is not first
+        assert second['current_price'] == pytest.approx(first['current_price'] + 1)
+        assert chart.call_count == 2
+
+    def test_symbols_are_kept_apart_and_evicted_lru(self, chart):
+        with patch.object(watchlist_view, 'MAX_VIEWS', 2):
+            a = watchlist_view.get_stock_view('2330', '台積電', bars(1))
+            watchlist_view.get_stock_view('2317', '鴻海', bars(2))
+            assert watchlist_view.get_stock_view('2330', '台積電', bars(1)) is a
+            watchlist_view.get_stock_view('2454', '聯發科', bars(3))
+            # 2317 was least recently used
+            assert watchlist_view.get_stock_view('2330', '台積電', bars(1)) is a
+            watchlist_view.get_stock_view('2317', '鴻海', bars(2))
+
+        assert chart.call_count == 4
+
+    def test_input_frame_is_not_modified(self):
+        df = bars()
+        watchlist_view.get_stock_view('2330', '台積電', df)
+        assert 'K' not in df.columns
+
+    def test_no_data(self, chart):
+        assert watchlist_view.get_stock_view('9999', '9999', pd.DataFrame()) is None
+        chart.assert_not_called()
+
+
+class TestSummaryRow:
+
+    def test_last_two_closes(self):
+        df = bars()
+        row = watchlist_view.summary_row('2330', '台積電', df, is_new=True)
+        change = (df['Close'].iloc[-1] / df['Close'].iloc[-2] - 1) * 100
+
+        assert row['代碼'] == '✨ 2330'
+        assert row['現價'] == pytest.approx(df['Close'].iloc[-1], abs=0.005)
+        assert row['漲跌幅 (%)'] == pytest.approx(change, abs=0.005)
+        assert row['日期'] == '2024-10-01'
+
+    def test_summary_computes_no_indicators(self, chart):
+        with patch.object(watchlist_view, 'calculate_kd') as calculate_kd:
+            watchlist_view.summary_row('2330', '台積電', bars())
+        calculate_kd.assert_not_called()
+        chart.assert_not_called()
+
+    def test_no_data(self):
+        row = watchlist_view.summary_row('9999', '9999', pd.DataFrame())
+        assert row == {'代碼': '9999', '名稱': '9999', '現價': None, '漲跌幅 (%)': None, '日期': None}
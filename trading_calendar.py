@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+TWSE Trading Calendar
+
+Knows which days the Taiwan stock market trades, so the scanner can count
+trading days exactly instead of approximating them with calendar days:
+
+1. Weekends never trade
+2. Exchange holidays, including settlement-only days before Lunar New Year
+   (built in for known years, refreshed from the TWSE holiday schedule)
+3. Ad-hoc closures such as typhoon days (built in for known years, and
+   learned when a past weekday's full-market table comes back empty)
+
+Trading days are precomputed into a sorted list with an ordinal index, so
+"N trading days before" is a dictionary lookup plus list indexing.
+
+Without a schedule for a year (offline and not built in), every weekday of
+that year is treated as a trading day - the same as before.
+
+Environment Variable:
+    TRADING_CALENDAR_FILE: JSON file to persist fetched and learned closures (default: disabled)
+
+Usage:
+    from trading_calendar import get_trading_calendar
+
+    calendar = get_trading_calendar()
+    calendar.is_trading_day('2024-10-10')     # False (National Day)
+    calendar.offset('2024-10-11', -5)          # '2024-10-01' (typhoon days skipped)
+"""
+
+import bisect
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from bar_store import settled_date
+from rate_limiter import get_rate_limiter
+from scan_metrics import count
+
+
+CALENDAR_FORMAT = 1
+
+# Weekday closures of the TWSE (holidays, settlement-only days and typhoon days)
+KNOWN_CLOSURES = {
+    2024: {
+        '2024-01-01': '中華民國開國紀念日',
+        '2024-02-06': '市場無交易，僅辦理結算交割作業',
+        '2024-02-07': '市場無交易，僅辦理結算交割作業',
+        '2024-02-08': '農曆春節',
+        '2024-02-09': '農曆春節',
+        '2024-02-12': '農曆春節',
+        '2024-02-13': '農曆春節',
+        '2024-02-14': '農曆春節',
+        '2024-02-28': '和平紀念日',
+        '2024-04-04': '兒童節',
+        '2024-04-05': '民族掃墓節',
+        '2024-05-01': '勞動節',
+        '2024-06-10': '端午節',
+        '2024-07-24': '颱風停止交易',
+        '2024-07-25': '颱風停止交易',
+        '2024-09-17': '中秋節',
+        '2024-10-02': '颱風停止交易',
+        '2024-10-03': '颱風停止交易',
+        '2024-10-10': '國慶日',
+        '2024-10-31': '颱風停止交易',
+    },
+    2025: {
+        '2025-01-01': '中華民國開國紀念日',
+        '2025-01-23': '市場無交易，僅辦理結算交割作業',
+        '2025-01-24': '市場無交易，僅辦理結算交割作業',
+        '2025-01-27': '農曆春節',
+        '2025-01-28': '農曆春節',
+        '2025-01-29': '農曆春節',
+        '2025-01-30': '農曆春節',
+        '2025-01-31': '農曆春節',
+        '2025-02-28': '和平紀念日',
+        '2025-04-03': '兒童節',
+        '2025-04-04': '民族掃墓節',
+        '2025-05-01': '勞動節',
+        '2025-05-30': '端午節',
+        '2025-09-29': '教師節',
+        '2025-10-06': '中秋節',
+        '2025-10-10': '國慶日',
+        '2025-10-24': '臺灣光復暨金門古寧頭大捷紀念日',
+        '2025-12-25': '行憲紀念日',
+    },
+}
+
+
+def _parse_date(value: str) -> Optional[str]:
+    """'2024-01-01', '2024/01/01' or ROC '113/01/01' -> '2024-01-01'"""
+    parts = str(value).strip().replace('-', '/').split('/')
+    try:
+        year, month, day = (int(part) for part in parts)
+        if year < 1911:
+            year += 1911
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def fetch_twse_holidays(year: int) -> Optional[Dict[str, str]]:
+    """
+    Weekday closures of one year from the TWSE holiday schedule
+
+    Entries that mark the first or last trading day around a holiday are
+    trading days and are left out. Returns None if the download fails.
+    """
+    # Imported here: stock_data_facade pulls in the bar store and providers
+    from stock_data_facade import TWSE_BASE_URL, get_http_session
+
+    try:
+        get_rate_limiter('twse').acquire()
+        response = get_http_session().get(
+            f"{TWSE_BASE_URL}/rwd/zh/holidaySchedule/holidaySchedule",
+            params={'response': 'json', 'queryYear': year - 1911},
+            timeout=10
+        )
+        payload = response.json()
+    except Exception as e:
+        print(f"⚠️ Could not fetch the TWSE holiday schedule for {year}: {e}")
+        return None
+
+    if str(payload.get('stat', '')).lower() != 'ok':
+        return None
+
+    closures = {}
+    for row in payload.get('data', []):
+        day = _parse_date(row[0]) if row else None
+        name = str(row[1]) if len(row) > 1 else ''
+        if not day or not day.startswith(str(year)) or '交易日' in name:
+            continue
+        if date.fromisoformat(day).weekday() < 5:
+            closures[day] = name
+    return closures
+
+
+class TradingCalendar:
+    """Trading days of the TWSE with precomputed ordinals"""
+
+    def __init__(self, path=None, closures: Optional[Dict[str, str]] = None,
+                 scheduled_years: Iterable[int] = ()):
+        self.path = Path(path) if path else None
+        self._closures: Dict[str, str] = {}
+        self._scheduled_years = set(scheduled_years)
+        for year, days in KNOWN_CLOSURES.items():
+            self._closures.update(days)
+            self._scheduled_years.add(year)
+        self._load()
+        self._closures.update(closures or {})
+
+        self._sessions: List[str] = []
+        self._ordinal: Dict[str, int] = {}
+        self._first_year = self._last_year = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('format') != CALENDAR_FORMAT:
+            return
+        self._closures.update(data.get('closures', {}))
+        self._scheduled_years.update(data.get('scheduledYears', []))
+
+    def _save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'format': CALENDAR_FORMAT,
+            'scheduledYears': sorted(self._scheduled_years),
+            'closures': dict(sorted(self._closures.items()))
+        }
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _build(self, first_year: int, last_year: int):
+        sessions = []
+        day = date(first_year, 1, 1)
+        end = date(last_year, 12, 31)
+        while day <= end:
+            iso = day.isoformat()
+            if day.weekday() < 5 and iso not in self._closures:
+                sessions.append(iso)
+            day += timedelta(days=1)
+        self._sessions = sessions
+        self._ordinal = {iso: i for i, iso in enumerate(sessions)}
+        self._first_year, self._last_year = first_year, last_year
+
+    def _ensure_range(self, *days: str):
+        years = [int(day[:4]) for day in days]
+        first, last = min(years), max(years)
+        if self._first_year is not None and self._first_year <= first - 1 and last + 1 <= self._last_year:
+            return
+        with self._lock:
+            first_year = min(first - 1, self._first_year or first - 1)
+            last_year = max(last + 1, self._last_year or last + 1)
+            self._build(first_year, last_year)
+
+    def is_trading_day(self, day: str) -> bool:
+        self._ensure_range(day)
+        return day in self._ordinal
+
+    def closure_reason(self, day: str) -> Optional[str]:
+        return self._closures.get(day)
+
+    def session_on_or_before(self, day: str) -> str:
+        """The trading day itself, or the latest trading day before it"""
+        self._ensure_range(day)
+        index = bisect.bisect_right(self._sessions, day) - 1
+        return self._sessions[index]
+
+    def offset(self, day: str, sessions: int) -> str:
+        """
+        The trading day `sessions` trading days from `day`
+
+        A non-trading `day` counts from the latest trading day before it, so
+        offset(day, 0) is the session on or before `day`.
+        """
+        anchor = self.session_on_or_before(day)
+        index = self._ordinal[anchor] + sessions
+        while not 0 <= index < len(self._sessions):
+            # Extend the precomputed range by the missing number of years
+            years = abs(sessions) // 240 + 1
+            edge = self._first_year - years if index < 0 else self._last_year + years
+            self._ensure_range(f"{edge:04d}-01-01", anchor)
+            index = self._ordinal[anchor] + sessions
+        return self._sessions[index]
+
+    def previous_trading_day(self, day: str) -> str:
+        """The latest trading day strictly before `day`"""
+        return self.offset((date.fromisoformat(day) - timedelta(days=1)).isoformat(), 0)
+
+    def trading_days(self, start: str, end: str) -> List[str]:
+        """Trading days between start and end (inclusive)"""
+        if start > end:
+            return []
+        self._ensure_range(start, end)
+        return self._sessions[bisect.bisect_left(self._sessions, start):bisect.bisect_right(self._sessions, end)]
+
+    def recent_sessions(self, sessions: int, day: Optional[str] = None) -> List[str]:
+        """The last `sessions` trading days up to `day` (default: last settled day), newest first"""
+        anchor = self.session_on_or_before(day or settled_date())
+        return [self.offset(anchor, -i) for i in range(sessions)]
+
+    def add_closure(self, day: str, reason: str):
+        """Record an ad-hoc closure (e.g. a typhoon day) and persist it"""
+        if day in self._closures:
+            return
+        with self._lock:
+            self._closures[day] = reason
+            if self._first_year is not None:
+                self._build(self._first_year, self._last_year)
+            self._save()
+        count('trading_calendar.learned_closures')
+
+    def ensure_year(self, year: int, fetch=fetch_twse_holidays) -> bool:
+        """Fetch the holiday schedule of a year once; returns whether the year is scheduled"""
+        if year in self._scheduled_years:
+            return True
+        closures = fetch(year)
+        if closures is None:
+            return False
+        with self._lock:
+            self._closures.update(closures)
+            self._scheduled_years.add(year)
+            if self._first_year is not None:
+                self._build(self._first_year, self._last_year)
+            self._save()
+        return True
+
+
+_calendar: Optional[TradingCalendar] = None
+_calendar_lock = threading.Lock()
+
+
+def get_trading_calendar() -> TradingCalendar:
+    """Get the shared trading calendar (persisted to TRADING_CALENDAR_FILE if set)"""
+    global _calendar
+    if _calendar is None:
+        with _calendar_lock:
+            if _calendar is None:
+                _calendar = TradingCalendar(os.getenv('TRADING_CALENDAR_FILE'))
+    return _calendar